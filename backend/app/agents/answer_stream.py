@@ -0,0 +1,603 @@
+"""
+Answer Streaming - Token-level streaming for answer-producing nodes
+
+Answers are cleaned of internal content before the user sees them:
+<thinking> blocks, leaked reasoning-node JSON and (for the pedagogical tutor)
+scaffolding labels. AnswerStreamFilter does this as a single-pass streaming
+transducer, and the same filter backs clean_answer() for whole responses, so
+streamed text and the stored `response` are identical.
+
+For pedagogical_tutor / math_agent:
+- the node's model is tagged with INTERNAL_MODEL_TAGS so LangGraph's
+  "messages" stream mode never emits its raw chunks
+- each chunk is passed through AnswerStreamFilter
+- the filtered text is published as a text-delta on the "custom" stream
+  (see stream_events.publish)
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+THINKING_OPEN = "<thinking>"
+THINKING_CLOSE = "</thinking>"
+
+# Internal pedagogical structure labels - make responses feel robotic when visible
+SCAFFOLDING_LABELS = (
+    "Activation", "Exploration", "Guidance", "Challenge",
+    "Verification", "Connection", "Understanding",
+)
+
+# Top-level keys of the reasoning node's JSON analysis (see reasoning_node prompt)
+LEAKED_JSON_KEYS = frozenset({"perception", "analysis", "planning", "decision"})
+
+_LABEL_ALTERNATION = "|".join(SCAFFOLDING_LABELS)
+
+# Bold label first so "**Activation:**" is not matched as "Activation:" with stray "**"
+_MARKER_RE = re.compile(
+    rf"(?P<open><thinking>)|(?P<close></thinking>)|(?P<label>\*\*(?:{_LABEL_ALTERNATION}):\*\*|(?:{_LABEL_ALTERNATION}):)",
+    re.IGNORECASE,
+)
+_CLOSE_RE = re.compile(re.escape(THINKING_CLOSE), re.IGNORECASE)
+
+_MARKERS = [THINKING_OPEN, THINKING_CLOSE] + [
+    variant.lower()
+    for label in SCAFFOLDING_LABELS
+    for variant in (f"**{label}:**", f"{label}:")
+]
+_MAX_MARKER_LENGTH = max(len(m) for m in _MARKERS)
+
+
+def _prefix_trie_pattern(words) -> str:
+    """Regex matching any non-empty prefix of the words, as a trie (one pass in C)"""
+    trie: Dict[str, Dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+
+    def pattern(node: Dict) -> str:
+        branches = [
+            re.escape(char) + (f"(?:{pattern(child)})?" if child else "")
+            for char, child in sorted(node.items())
+        ]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return pattern(trie)
+
+
+# Text ending in the start of a marker is held back; the leftmost match is the longest suffix
+_HOLD_RE = re.compile(
+    "(?=[" + re.escape("".join({m[0] for m in _MARKERS})) + "])" + _prefix_trie_pattern(_MARKERS) + r"\Z",
+    re.IGNORECASE,
+)
+
+# A leaked JSON object can only start a line: `{` or a ``` fence after indentation
+_LINE_START_CANDIDATE_RE = re.compile(r"[ \t]*[{`]")
+_NEWLINE_CANDIDATE_RE = re.compile(r"\n[ \t]*[{`]")
+_JSON_SPECIAL_RE = re.compile(r'[{}"\\]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+_NEWLINES_RE = re.compile(r"\n{3,}")
+_LEAK_HEAD_LIMIT = 64  # Chars to wait for a JSON key before treating `{` as text
+
+
+def _leak_head(buf: str) -> Tuple[str, int]:
+    """
+    Classify text starting at a line-start `{` / ``` candidate
+
+    Returns ("leak", index after the object's `{`), ("text", 0) or
+    ("more", 0) when the first key is not complete yet.
+    """
+    n = len(buf)
+    i = 0
+    if buf[0] == "`":
+        if n < 3:
+            return ("more", 0) if "```".startswith(buf) else ("text", 0)
+        if not buf.startswith("```"):
+            return "text", 0
+        i = 3
+        tag = buf[i:i + 4].lower()
+        if tag == "json":
+            i += 4
+        elif "json".startswith(tag) and i + len(tag) == n:
+            return "more", 0
+        while i < n and buf[i].isspace():
+            i += 1
+        if i == n:
+            return "more", 0
+    if buf[i] != "{":
+        return "text", 0
+    brace = i
+    i += 1
+    while i < n and buf[i].isspace():
+        i += 1
+    if i == n:
+        return "more", 0
+    if buf[i] != '"':
+        return "text", 0
+    end = buf.find('"', i + 1)
+    if end == -1:
+        prefix = buf[i + 1:]
+        return ("more", 0) if any(key.startswith(prefix) for key in LEAKED_JSON_KEYS) else ("text", 0)
+    return ("leak", brace + 1) if buf[i + 1:end] in LEAKED_JSON_KEYS else ("text", 0)
+
+
+class AnswerStreamFilter:
+    """
+    Streaming transducer that removes internal content from an answer
+
+    Usage:
+        stream_filter = AnswerStreamFilter(strip_labels=True)
+        for chunk in chunks:
+            emit(stream_filter.feed(chunk))
+        emit(stream_filter.finish())
+
+    Output equals the previous whole-response helpers (strip_thinking_blocks,
+    then strip_scaffolding_labels when strip_labels) for any chunking, except
+    where one removal joined text into a new label the helpers then removed
+    too; it additionally drops reasoning-node JSON objects that start a line.
+    scripts/benchmark_answer_filter.py checks both properties.
+    Two stages, each touching a character a bounded number of times:
+    - markers: <thinking>...</thinking> and labels; only a tail that could
+      still begin a marker is held back. Thinking text is kept until its
+      close tag, because an unclosed block loses only its tag (as before).
+    - emit: leading/trailing whitespace is held until non-space text follows
+      (so nothing is trimmed after the fact), newline runs are collapsed,
+      and line-start `{` / ``` is held until its first JSON key is known.
+    """
+
+    def __init__(self, strip_labels: bool = False):
+        self.strip_labels = strip_labels
+        self._reset()
+
+    def _reset(self) -> None:
+        # markers stage
+        self._pending = ""            # Held-back tail that may begin a marker
+        self._inside_thinking = False
+        self._thinking: List[str] = []  # Text of the open thinking block
+        # emit stage
+        self._skip_whitespace = True  # Leading whitespace, and whitespace after removed content
+        self._ws = ""                 # Trailing whitespace not yet emitted
+        self._at_line_start = True
+        self._leak_mode: Optional[str] = None  # "head" | "body" | "fence"
+        self._leak_buf = ""
+        self._fenced = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> str:
+        """Filter one chunk; returns text that is safe to show now"""
+        if not chunk:
+            return ""
+        text = self._pending + chunk
+        self._pending = ""
+        return self._process(text, final=False)
+
+    def finish(self) -> str:
+        """Flush held-back text at the end of the stream and reset"""
+        text, self._pending = self._pending, ""
+        out = [self._process(text, final=True)] if text else []
+        while self._inside_thinking:
+            # Unclosed block: only the tag is dropped
+            replay = "".join(self._thinking)
+            self._thinking = []
+            self._inside_thinking = False
+            self._skip_whitespace = True
+            out.append(self._process(replay, final=True))
+        while self._leak_mode == "head":
+            # Stream ended before the candidate was decided - it was text
+            buf, self._leak_buf, self._leak_mode = self._leak_buf, "", None
+            if buf:
+                out.append(self._release(buf[0]))
+                out.append(self._emit(buf[1:]))
+        self._reset()  # Trailing whitespace and unterminated JSON are dropped
+        return "".join(out)
+
+    # ---------- markers stage ----------
+
+    def _process(self, text: str, final: bool) -> str:
+        out = []
+        pos = 0
+        hold_start = len(text) if final else self._hold_start(text)
+
+        while pos < hold_start:
+            if self._inside_thinking:
+                close = _CLOSE_RE.search(text, pos)
+                if close is None or close.start() >= hold_start:
+                    # Whole rest is thinking; keep only a possible partial close tag
+                    self._thinking.append(text[pos:hold_start])
+                    pos = hold_start
+                    break
+                pos = close.end()
+                self._thinking = []
+                self._inside_thinking = False
+                self._skip_whitespace = True
+                continue
+
+            # Searched to the end of text, so a marker still completing in the held
+            # tail (e.g. "**Activation:" awaiting "**") is not matched in part.
+            # Every marker contains ":" or "<" - most chunks skip the search
+            match = _MARKER_RE.search(text, pos) if (":" in text or "<" in text) else None
+            if match is None or match.start() >= hold_start:
+                out.append(self._emit(text[pos:hold_start]))
+                pos = hold_start
+                break
+
+            out.append(self._emit(text[pos:match.start()]))
+            pos = match.end()
+            if match.group("open"):
+                self._inside_thinking = True
+                self._skip_whitespace = True  # Applies if the block turns out unclosed
+            elif match.group("close") or self.strip_labels:
+                self._skip_whitespace = True
+            else:
+                out.append(self._emit(match.group(0)))
+
+        self._pending = text[pos:]
+        return "".join(out)
+
+    @staticmethod
+    def _hold_start(text: str) -> int:
+        """Start of the longest suffix that could begin a marker"""
+        hold = _HOLD_RE.search(text, max(0, len(text) - _MAX_MARKER_LENGTH))
+        return hold.start() if hold else len(text)
+
+    # ---------- emit stage ----------
+
+    def _emit(self, piece: str) -> str:
+        out = []
+        while piece:
+            if self._skip_whitespace:
+                stripped = piece.lstrip()
+                if not stripped:
+                    break
+                if "\n" in piece[:len(piece) - len(stripped)]:
+                    self._at_line_start = True
+                piece = stripped
+                self._skip_whitespace = False
+            if self._leak_mode is not None:
+                piece = self._leak_step(piece, out)
+                continue
+
+            candidate = None
+            if self._at_line_start:
+                candidate = _LINE_START_CANDIDATE_RE.match(piece)
+            if candidate is None and "\n" in piece:
+                candidate = _NEWLINE_CANDIDATE_RE.search(piece)
+            if candidate is None:
+                out.append(self._release(piece))
+                break
+            start = candidate.end() - 1
+            out.append(self._release(piece[:start]))
+            self._leak_mode = "head"
+            piece = piece[start:]
+        return "".join(out)
+
+    def _release(self, text: str) -> str:
+        """Emit text, holding its trailing whitespace until more text follows"""
+        if not text:
+            return ""
+        core = text.rstrip()
+        if not core:
+            self._ws += text
+            if "\n" in text:
+                self._at_line_start = True
+            return ""
+        piece = self._ws + core
+        self._ws = text[len(core):]
+        self._at_line_start = "\n" in self._ws
+        if self.strip_labels and "\n\n\n" in piece:
+            piece = _NEWLINES_RE.sub("\n\n", piece)
+        return piece
+
+    def _leak_step(self, piece: str, out: List[str]) -> str:
+        """Advance the leaked-JSON states; returns the unconsumed rest of piece"""
+        if self._leak_mode == "head":
+            buf = self._leak_buf + piece
+            verdict, body_start = _leak_head(buf)
+            if verdict == "more" and len(buf) < _LEAK_HEAD_LIMIT:
+                self._leak_buf = buf
+                return ""
+            self._leak_buf = ""
+            if verdict != "leak":
+                # Ordinary text: emit the candidate char, rescan the rest
+                self._leak_mode = None
+                out.append(self._release(buf[0]))
+                return buf[1:]
+            self._ws = self._ws.rstrip(" \t")  # Drop the object's indentation
+            self._fenced = buf.startswith("`")
+            self._depth, self._in_string, self._escape = 1, False, False
+            self._leak_mode = "body"
+            return buf[body_start:]
+
+        if self._leak_mode == "body":
+            end = self._skip_json(piece)
+            if end == -1:
+                return ""
+            self._leak_mode = "fence" if self._fenced else None
+            self._skip_whitespace = True
+            return piece[end:]
+
+        # "fence": drop the closing ``` of a fenced leak
+        buf = self._leak_buf + piece
+        stripped = buf.lstrip()
+        if len(stripped) < 3 and "```".startswith(stripped):
+            self._leak_buf = buf
+            return ""
+        self._leak_buf = ""
+        self._leak_mode = None
+        self._skip_whitespace = True
+        return stripped[3:] if stripped.startswith("```") else stripped
+
+    def _skip_json(self, piece: str) -> int:
+        """Index just past the object's closing brace, or -1 if it continues"""
+        pos = 0
+        while True:
+            if self._in_string:
+                if self._escape:
+                    if pos >= len(piece):
+                        return -1
+                    pos += 1
+                    self._escape = False
+                    continue
+                special = _STRING_SPECIAL_RE.search(piece, pos)
+                if special is None:
+                    return -1
+                pos = special.end()
+                if special.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+            special = _JSON_SPECIAL_RE.search(piece, pos)
+            if special is None:
+                return -1
+            pos = special.end()
+            char = special.group()
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos
+
+
+def clean_answer(text: str, strip_labels: bool = False) -> str:
+    """Whole-response form of AnswerStreamFilter (same output as streaming it)"""
+    if not text:
+        return text
+    answer_filter = AnswerStreamFilter(strip_labels=strip_labels)
+    return answer_filter.feed(text) + answer_filter.finish()
+
+
+def chunk_text(content: Any) -> str:
+    """Text of a model chunk's content (handles the Gemini 2.5+ list-of-blocks format)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+            elif isinstance(block, str):
+                parts.append(block)
+        return "".join(parts)
+    return str(content) if content else ""
+
+
+class AnswerStreamError(Exception):
+    """
+    stream_answer failed (model error, timeout)
+
+    partial is the text already streamed to the client (possibly empty);
+    finish_interrupted_answer ends the answer consistently with it.
+    """
+
+    def __init__(self, partial: str, first_token_ms: Optional[float] = None):
+        super().__init__(f"answer stream failed after {len(partial)} streamed chars")
+        self.partial = partial
+        self.first_token_ms = first_token_ms
+
+
+# Appended when an answer fails after part of it was streamed (the sent text cannot be retracted)
+INTERRUPTED_NOTICE = "\n\n_Sorry, the rest of this answer was interrupted. Please ask again if you need more._"
+
+
+def finish_interrupted_answer(streamed: str, fallback: str) -> str:
+    """
+    End an answer whose generation failed; returns what the client now has
+
+    Nothing streamed yet: the fallback is sent. Otherwise the partial answer
+    stays and an interruption notice is appended to it.
+    """
+    if not streamed:
+        emit_answer_delta(fallback)
+        return fallback
+    emit_answer_delta(INTERRUPTED_NOTICE)
+    return streamed + INTERRUPTED_NOTICE
+
+
+def emit_answer_delta(text: str) -> None:
+    """Send answer text to the client stream (no-op outside a streaming run)"""
+    if not text:
+        return
+    from app.agents.stream_events import publish
+    publish({"type": "text-delta", "textDelta": text})
+
+
+def stream_answer(
+    model,
+    prompt: Any,
+    node: str,
+    config: Optional[Dict] = None,
+    strip_labels: bool = False,
+    budget=None,
+    quality=None,
+    escalate_to=None,
+    deadline: Optional[float] = None
+) -> Tuple[str, Optional[float]]:
+    """
+    Generate an answer token by token, streaming filtered text to the client
+
+    Args:
+        model: Chat model (tagged internal here so raw chunks are not forwarded)
+        prompt: Prompt / messages passed to model.stream()
+        node: Node name, recorded in the model run metadata
+        config: Node RunnableConfig, so events attach to the node's run
+        strip_labels: Also remove scaffolding labels (pedagogical tutor)
+        budget: GenerationBudget for the turn (generation_budget.py): caps the
+            model call and ends the answer at a sentence past its soft budget;
+            its outcome fields are filled in and recorded in BudgetStats
+        quality: QualityProbe (streaming_quality.py): the opening is held back
+            until it passes; a failing opening is discarded and regenerated
+            once with RESTART_GUIDANCE (quality.restarted is set), or kept
+            and streamed on when there is no budget to regenerate
+            (quality.kept_failing is set)
+        escalate_to: Model for the regenerated answer (next model_cascade
+            tier); None regenerates with the same model
+        deadline: The turn's deadline (deadline.py): the model call gets the
+            remaining budget as its timeout, the answer ends at the first
+            chunk past it, and a failing opening is not regenerated once
+            the budget is too low for a repair (the answer continues)
+
+    Returns:
+        (cleaned response text - exactly what was streamed, ms from call to
+        first streamed text or None)
+
+    Raises:
+        GenerationCancelled: the run's CancelToken was tripped (client gone);
+            the model stream is closed first so its HTTP request ends too
+        AnswerStreamError: the model call failed; carries the text already
+            streamed (partial) so the caller can end the answer consistently
+    """
+    from app.agents.stream_events import INTERNAL_MODEL_TAGS
+    from app.agents.cancellation import get_cancel_token
+    from app.agents.generation_budget import BudgetGuard, apply_budget, get_budget_stats, is_hard_capped
+    from app.agents.streaming_quality import RESTART_GUIDANCE, get_quality_stats, with_guidance
+    from app.agents.deadline import apply_timeout, call_timeout, get_deadline_stats, has_budget_for
+
+    cancel_token = get_cancel_token(config)
+    turn = {"deadline": deadline}  # For the deadline helpers, which read it from state
+
+    stream_model = apply_timeout(apply_budget(model, budget), call_timeout(turn)).with_config(
+        tags=INTERNAL_MODEL_TAGS,
+        metadata={"component": node, "streamed_via": "custom"},
+    )
+    visible_parts = []
+    first_token_ms = None
+    start = time.time()
+
+    def emit(text: str) -> None:
+        nonlocal first_token_ms
+        if first_token_ms is None:
+            first_token_ms = (time.time() - start) * 1000
+        visible_parts.append(text)
+        emit_answer_delta(text)
+
+    def can_regenerate(probe) -> bool:
+        """Whether a failing opening may be regenerated; if not, it is kept (and flagged)"""
+        if has_budget_for(turn, "repair"):
+            return True
+        get_deadline_stats().record_skip("repair")
+        probe.kept_failing = True
+        logger.warning(f"{node}: opening failed the quality probe ({probe.reason}), too little turn budget to regenerate")
+        return False
+
+    try:
+        attempt_prompt = prompt
+        for attempt in (0, 1):
+            probe = quality if attempt == 0 else None  # A restarted answer streams as is
+            held = [] if probe is not None else None  # Opening text waiting for the probe's verdict
+            stream_filter = AnswerStreamFilter(strip_labels=strip_labels)
+            guard = BudgetGuard(budget) if budget is not None else None
+            restart = False
+            attempt_start = time.time()
+
+            chunks = stream_model.stream(attempt_prompt, config=config)
+            try:
+                for chunk in chunks:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        logger.info(f"{node}: stream cancelled after {len(visible_parts)} deltas ({cancel_token.reason})")
+                        cancel_token.raise_if_cancelled()
+                    if budget is not None and is_hard_capped(chunk):
+                        budget.hard_capped = True
+                    text = chunk_text(getattr(chunk, "content", chunk))
+                    if not text:
+                        continue
+                    visible = stream_filter.feed(text)
+                    stop = False
+                    if visible and guard is not None:
+                        visible, stop = guard.feed(visible)
+                    past_deadline = deadline is not None and time.time() > deadline
+                    stop = stop or past_deadline
+                    if visible and held is not None:
+                        held.append(visible)
+                        verdict = probe.feed(visible)
+                        if verdict is None:
+                            if not stop:
+                                continue
+                            verdict = probe.finish()
+                        if not verdict and can_regenerate(probe):
+                            restart = True
+                            break
+                        visible, held = "".join(held), None  # On track (or kept): release the opening
+                    if visible:
+                        emit(visible)
+                    if stop:
+                        if past_deadline:
+                            get_deadline_stats().record_timeout(node)
+                            logger.warning(f"{node}: answer ended at the turn deadline")
+                        else:
+                            logger.info(f"{node}: answer ended at its generation budget ({budget.soft_chars} chars)")
+                        break
+            finally:
+                close = getattr(chunks, "close", None)
+                if close:
+                    close()  # Stops the underlying HTTP stream if we left early
+
+            # Held-back text after a budget stop lies past the cut
+            tail = "" if restart else stream_filter.finish()
+            if guard is not None and not restart:
+                tail = guard.finish() if guard.stopped else tail + guard.finish()
+            if held is not None and not restart:
+                # The whole answer fit in the probe window
+                probe.feed(tail)
+                if probe.finish() or not can_regenerate(probe):
+                    tail = "".join(held) + tail
+                else:
+                    restart = True
+
+            if restart:
+                wasted = time.time() - attempt_start
+                quality.restarted = True
+                quality.restart_seconds = wasted
+                get_quality_stats().record_restart(node, probe.reason or "failed", wasted)
+                logger.warning(f"{node}: opening failed the quality probe ({probe.reason}), regenerating after {wasted:.1f}s")
+                attempt_prompt = with_guidance(prompt, RESTART_GUIDANCE)
+                if escalate_to is not None:
+                    stream_model = apply_timeout(apply_budget(escalate_to, budget), call_timeout(turn)).with_config(
+                        tags=INTERNAL_MODEL_TAGS,
+                        metadata={"component": node, "streamed_via": "custom", "escalated": True},
+                    )
+                if budget is not None:
+                    budget.stopped_at_budget = budget.hard_capped = False
+                continue
+
+            if tail:
+                emit(tail)
+            break
+    except Exception as e:
+        # The caller must know what the client already has, to end the answer consistently
+        raise AnswerStreamError("".join(visible_parts), first_token_ms) from e
+
+    response_text = "".join(visible_parts)
+    if budget is not None:
+        budget.output_chars = len(response_text)
+        get_budget_stats().record(budget)
+    return response_text, first_token_ms
@@ -0,0 +1,135 @@
+"""
+Generation Cancellation - Stop work for chat turns nobody is reading
+
+When the SSE client disconnects, astream_agent is cancelled. LangGraph stops
+scheduling nodes, but a sync node already running in a worker thread (the
+tutor or math answer stream) would keep generating. astream_agent therefore
+hands every run a CancelToken (config["configurable"]["cancel_token"]) and
+trips it on cancellation; stream_answer checks it between chunks, closes the
+model's HTTP stream and raises GenerationCancelled.
+
+CancellationStats counts cancelled turns and estimates what they saved,
+from the average length/duration of turns that completed.
+"""
+
+from typing import Any, Dict, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CANCEL_TOKEN_KEY = "cancel_token"
+CHARS_PER_TOKEN = 4  # Rough average for English answers
+
+
+class GenerationCancelled(BaseException):
+    """
+    Raised inside a node when its turn was cancelled
+
+    BaseException (like asyncio.CancelledError) so the nodes' broad
+    `except Exception` fallbacks do not turn it into a fallback answer.
+    """
+
+
+class CancelToken:
+    """Thread-safe flag shared between the request task and node threads"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "client_disconnected") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason)
+
+
+def get_cancel_token(config: Optional[Dict[str, Any]]) -> Optional[CancelToken]:
+    """The run's CancelToken from a node's RunnableConfig (None outside astream_agent)"""
+    configurable = (config or {}).get("configurable") or {}
+    return configurable.get(CANCEL_TOKEN_KEY)
+
+
+def estimate_tokens(chars: int) -> int:
+    return chars // CHARS_PER_TOKEN
+
+
+class CancellationStats:
+    """
+    Counts completed vs cancelled stream turns and estimates the savings
+
+    Savings per cancelled turn = average completed turn (EMA) minus what the
+    cancelled turn had already produced / spent, floored at zero. Until a turn
+    has completed there is no baseline and nothing is claimed.
+    """
+
+    EMA_ALPHA = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.cancelled = 0
+        self.by_stage: Dict[str, int] = {}
+        self.partial_tokens = 0
+        self.tokens_saved_est = 0
+        self.seconds_saved_est = 0.0
+        self._avg_tokens: Optional[float] = None
+        self._avg_seconds: Optional[float] = None
+
+    def record_completed(self, response_chars: int, seconds: float) -> None:
+        tokens = estimate_tokens(response_chars)
+        with self._lock:
+            self.completed += 1
+            if self._avg_tokens is None:
+                self._avg_tokens, self._avg_seconds = float(tokens), seconds
+            else:
+                self._avg_tokens += self.EMA_ALPHA * (tokens - self._avg_tokens)
+                self._avg_seconds += self.EMA_ALPHA * (seconds - self._avg_seconds)
+
+    def record_cancelled(self, response_chars: int, seconds: float, stage: Optional[str] = None) -> Dict[str, Any]:
+        """Record a cancelled turn; returns its estimated savings"""
+        tokens = estimate_tokens(response_chars)
+        with self._lock:
+            self.cancelled += 1
+            stage = stage or "unknown"
+            self.by_stage[stage] = self.by_stage.get(stage, 0) + 1
+            self.partial_tokens += tokens
+            saved_tokens = max(0, int((self._avg_tokens or 0) - tokens)) if self._avg_tokens is not None else 0
+            saved_seconds = max(0.0, (self._avg_seconds or 0) - seconds) if self._avg_seconds is not None else 0.0
+            self.tokens_saved_est += saved_tokens
+            self.seconds_saved_est += saved_seconds
+        return {"tokens_saved_est": saved_tokens, "seconds_saved_est": round(saved_seconds, 2)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.completed + self.cancelled
+            return {
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "cancel_rate": round(self.cancelled / total, 3) if total else 0.0,
+                "cancelled_by_stage": dict(self.by_stage),
+                "partial_tokens_persisted": self.partial_tokens,
+                "tokens_saved_est": self.tokens_saved_est,
+                "seconds_saved_est": round(self.seconds_saved_est, 1),
+                "avg_completed_tokens": round(self._avg_tokens or 0),
+                "avg_completed_seconds": round(self._avg_seconds or 0, 2),
+            }
+
+
+_cancellation_stats = None
+
+
+def get_cancellation_stats() -> CancellationStats:
+    """Get or create the process-wide cancellation stats"""
+    global _cancellation_stats
+    if _cancellation_stats is None:
+        _cancellation_stats = CancellationStats()
+    return _cancellation_stats
@@ -20,6 +20,9 @@ from app.agents.state import AgentState
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from app.config import settings
+from app.agents.llm_cache import get_llm_result_cache, looks_like_json
+from app.agents.stream_events import INTERNAL_MODEL_TAGS
+from app.agents.deadline import has_budget_for, skip_stage
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +58,8 @@ class ContextEngineer:
             google_api_key=settings.google_api_key,
             temperature=0.1,
             max_output_tokens=1024,
-        )
+            cache=get_llm_result_cache("compaction", validate=looks_like_json),  # Same history prefix, same summary
+        ).with_config(tags=INTERNAL_MODEL_TAGS)  # Summaries never stream to the user
     
     def should_compact(self, conversation_history: List[dict]) -> bool:
         """Determine if conversation should be compacted"""
@@ -272,6 +276,8 @@ Key Concepts: {', '.join(compaction_summary.get('key_concepts', []))}
         conversation_history = state.get("conversation_history", []) or []
         
         # Check if compaction is needed
+        if self.should_compact(conversation_history) and not has_budget_for(state, "compaction"):
+            return skip_stage(state, "compaction")  # Not enough turn budget left; the full history is used
         if self.should_compact(conversation_history):
             logger.info(f"📦 Compacting conversation: {len(conversation_history)} messages")
             
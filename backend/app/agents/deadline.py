@@ -0,0 +1,171 @@
+"""
+Turn Deadlines - One time budget per turn, checked by every stage
+
+Nothing in the pipeline knew how much time a turn had left: compaction, the
+student-history fetch, graph lookups, the repair loop and evaluator
+persistence always ran, so one slow dependency stretched the whole answer.
+
+astream_agent / run_agent put an absolute deadline (epoch seconds,
+settings.turn_deadline_seconds from the start of the turn) in
+state["deadline"]. Stages then ask:
+
+- has_budget_for(state, stage): optional stages (student_history,
+  compaction, graph_context, repair, evaluator_persistence) only run while
+  the remaining budget is above settings.deadline_stage_min_seconds[stage].
+  A skipped stage calls skip_stage(), which records it in DeadlineStats,
+  in processing_times ("<stage>_skipped": budget left in ms at the
+  decision) and in state["deadline_skips"], which ends up in the Langfuse
+  trace output. evaluator_persistence is not dropped: the interaction log
+  and mastery update move to a background thread instead.
+- call_timeout(state, cap): timeout for a required call, the remaining
+  budget (at most cap, at least settings.deadline_min_call_timeout_seconds).
+  apply_timeout() sets it on a chat model copy, like apply_budget does for
+  output caps; run_with_timeout() bounds a blocking helper.
+
+Streamed tutor/math answers also end at the deadline (stream_answer), so
+p99 turn latency is bounded by configuration rather than by the slowest
+dependency. Without a deadline in state (direct node calls, or
+settings.turn_deadline_enabled off) every check passes and no timeout is set.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Blocking helpers run here so a caller can stop waiting at its timeout; a late call finishes on its own
+_deadline_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="deadline-call")
+
+
+def start_deadline() -> Optional[float]:
+    """Absolute deadline for a turn starting now, or None when deadlines are disabled"""
+    if not settings.turn_deadline_enabled:
+        return None
+    return time.time() + settings.turn_deadline_seconds
+
+
+def remaining_seconds(state: Dict[str, Any]) -> Optional[float]:
+    """Budget left for the turn (negative once overrun), or None without a deadline"""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def has_budget_for(state: Dict[str, Any], stage: str) -> bool:
+    """Whether an optional stage still fits in the turn's remaining budget"""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return True
+    return remaining >= settings.deadline_stage_min_seconds.get(stage, 0.0)
+
+
+def skip_stage(state: Dict[str, Any], stage: str) -> Dict[str, Any]:
+    """
+    Record that an optional stage was skipped for lack of budget
+
+    Returns the state updates to merge into the node's output
+    (processing_times and deadline_skips).
+    """
+    remaining_ms = round((remaining_seconds(state) or 0.0) * 1000)
+    get_deadline_stats().record_skip(stage)
+    logger.info(f"⏱️ Deadline: skipping {stage} ({remaining_ms} ms of the turn budget left)")
+
+    processing_times = dict(state.get("processing_times") or {})
+    processing_times[f"{stage}_skipped"] = remaining_ms
+    skips: List[Dict[str, Any]] = list(state.get("deadline_skips") or [])
+    skips.append({"stage": stage, "remaining_ms": remaining_ms})
+    return {"processing_times": processing_times, "deadline_skips": skips}
+
+
+def call_timeout(state: Dict[str, Any], cap: Optional[float] = None) -> Optional[float]:
+    """Timeout for a required call: the remaining budget, at most cap; None without a deadline"""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return cap
+    timeout = remaining if cap is None else min(cap, remaining)
+    return max(settings.deadline_min_call_timeout_seconds, timeout)
+
+
+def apply_timeout(model, seconds: Optional[float]):
+    """
+    A copy of the chat model with a request timeout (see apply_budget)
+
+    Sets `timeout` (Gemini) or `request_timeout` (OpenAI, Groq); returns the
+    model unchanged if it has neither or seconds is None.
+    """
+    if seconds is None:
+        return model
+    fields = getattr(type(model), "model_fields", None) or {}
+    for name in ("timeout", "request_timeout"):
+        if name in fields:
+            try:
+                return model.model_copy(update={name: seconds})
+            except Exception as e:
+                logger.warning(f"Could not set a timeout on {type(model).__name__}: {e}")
+                return model
+    return model
+
+
+def run_with_timeout(fn: Callable[..., Any], timeout: Optional[float], *args: Any, **kwargs: Any) -> Any:
+    """Call fn, waiting at most timeout seconds (raises concurrent.futures.TimeoutError)"""
+    if timeout is None:
+        return fn(*args, **kwargs)
+    return _deadline_executor.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+
+class DeadlineStats:
+    """Turns finished within / past their deadline, and optional stages skipped or timed out"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.exceeded = 0
+        self.overrun_ms = 0.0
+        self.skipped: Dict[str, int] = {}
+        self.timed_out: Dict[str, int] = {}
+
+    def record_skip(self, stage: str) -> None:
+        with self._lock:
+            self.skipped[stage] = self.skipped.get(stage, 0) + 1
+
+    def record_timeout(self, stage: str) -> None:
+        with self._lock:
+            self.timed_out[stage] = self.timed_out.get(stage, 0) + 1
+
+    def record_turn(self, deadline: Optional[float], finished_at: float) -> None:
+        if deadline is None:
+            return
+        with self._lock:
+            self.turns += 1
+            if finished_at > deadline:
+                self.exceeded += 1
+                self.overrun_ms += (finished_at - deadline) * 1000
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget_seconds": settings.turn_deadline_seconds if settings.turn_deadline_enabled else None,
+                "turns": self.turns,
+                "exceeded": self.exceeded,
+                "exceeded_rate": round(self.exceeded / self.turns, 3) if self.turns else 0.0,
+                "avg_overrun_ms": round(self.overrun_ms / self.exceeded) if self.exceeded else 0,
+                "skipped": dict(self.skipped),
+                "timed_out": dict(self.timed_out),
+            }
+
+
+_deadline_stats = None
+
+
+def get_deadline_stats() -> DeadlineStats:
+    """Get or create the process-wide deadline stats"""
+    global _deadline_stats
+    if _deadline_stats is None:
+        _deadline_stats = DeadlineStats()
+    return _deadline_stats
@@ -9,10 +9,10 @@ Implements:
 Integrates with Langfuse for scoring and analytics
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, List
 import logging
 import time
-import re
 from app.agents.state import AgentState, ScaffoldingLevel, BloomLevel
 from app.observability.langfuse_client import (
     create_observation,
@@ -20,10 +20,17 @@ from app.observability.langfuse_client import (
     get_langfuse_client,
     create_child_span_from_state
 )
+from app.circuit_breaker import get_circuit_breaker
 from app.config import settings
+from app.agents.deadline import has_budget_for, skip_stage
+# Concept/misconception tables live in the shared matcher; re-exported for existing imports
+from app.agents.text_matcher import CONCEPT_PATTERNS, MISCONCEPTION_PATTERNS, scan_text
 
 logger = logging.getLogger(__name__)
 
+# Interaction logging / mastery updates deferred when the turn budget runs out (see evaluator_node)
+_persistence_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="evaluator-persist")
+
 
 # COMP 237 concept hierarchy for mastery tracking
 COMP237_CONCEPTS = {
@@ -37,52 +44,6 @@ COMP237_CONCEPTS = {
     "data_preprocessing": ["normalization", "feature_engineering", "train_test_split"],
 }
 
-# Concept detection patterns for automatic tagging
-# Patterns should be flexible to match various phrasings
-# Note: Using word-start \b but allowing word to continue (no trailing \b for prefixes)
-CONCEPT_PATTERNS = {
-    "backpropagation": r"\b(backprop\w*|back.?propagat\w*|chain.?rule|error.?propagat\w*)",
-    "gradient_descent": r"\b(gradient.?descent|learning.?rate|optimi[sz]\w+|minimize|converge|gradient)",
-    "neural_networks": r"\b(neural.?network\w*|perceptron\w*|hidden.?layer\w*|deep.?learn\w*|ann\b|neuron\w*|activation.?function\w*)",
-    "classification": r"\b(classif\w+|decision.?tree\w*|knn\b|k-?nearest|svm\b|support.?vector\w*|naive.?bayes|logistic.?regress\w*)",
-    "regression": r"\b(regress\w+|linear.?model\w*|polynomial|predict\w*.*(continuous|number|value)|linear.?regress\w*)",
-    "clustering": r"\b(cluster\w+|k-?means|hierarchical|unsupervised.?learn\w*|grouping|dbscan)",
-    "probability": r"\b(bayes\w*|probabilit\w+|prior|posterior|conditional|likelihood|distribution)",
-    "supervised_learning": r"\b(supervis\w+|labeled.?data|training.?label\w*|target.?variable|train.?test)",
-    "unsupervised_learning": r"\b(unsupervis\w+|unlabeled|dimensionality.?reduc\w*|pca\b)",
-    "model_evaluation": r"\b(accuracy|precision|recall|f1.?score|confusion.?matrix|cross.?validat\w*|overfit\w*|underfit\w*|bias.?variance)",
-    "data_preprocessing": r"\b(normali[sz]\w*|feature.?engineer\w*|data.?clean\w*|missing.?value\w*|scaling|encoding|preprocess\w*)",
-}
-
-# Common misconception patterns in AI/ML
-MISCONCEPTION_PATTERNS = {
-    "classification_regression_swap": {
-        "pattern": r"\b(regression|regress).*(categor|class|discrete)|\b(classif).*(continuous|number|value)\b",
-        "description": "Confusing classification (categories) with regression (continuous values)",
-        "concept": "classification"
-    },
-    "overfitting_underfitting_swap": {
-        "pattern": r"\b(overfit).*(simple|less\s+data)|\b(underfit).*(complex|more\s+data)\b",
-        "description": "Confusing overfitting (too complex) with underfitting (too simple)",
-        "concept": "model_evaluation"
-    },
-    "supervised_unsupervised_swap": {
-        "pattern": r"\b(supervised).*(no\s+labels|unlabeled)|\b(unsupervised).*(labeled|target)\b",
-        "description": "Confusing supervised (labeled data) with unsupervised (unlabeled)",
-        "concept": "supervised_learning"
-    },
-    "gradient_descent_direction": {
-        "pattern": r"\bgradient.*(increase|maximize|ascent)\b(?!.*negative)",
-        "description": "Thinking gradient descent goes UP the gradient (it goes DOWN)",
-        "concept": "gradient_descent"
-    },
-    "learning_rate_inverse": {
-        "pattern": r"\b(high|large)\s+learning.*(slow|precise)|\b(low|small)\s+learning.*(fast|quick)\b",
-        "description": "Inverting learning rate effects (high=fast/unstable, low=slow/stable)",
-        "concept": "gradient_descent"
-    },
-}
-
 # Map intent values to user-friendly display names for UI
 AGENT_DISPLAY_NAMES = {
     "tutor": "Concept Tutor",
@@ -101,17 +62,16 @@ def detect_misconceptions(query: str) -> List[Dict]:
     
     Returns list of detected misconceptions with metadata
     """
-    query_lower = query.lower()
     detected = []
     
-    for name, info in MISCONCEPTION_PATTERNS.items():
-        if re.search(info["pattern"], query_lower, re.IGNORECASE):
-            detected.append({
-                "misconception_id": name,
-                "description": info["description"],
-                "concept": info["concept"]
-            })
-            logger.info(f"🔍 Detected misconception: {name}")
+    for name in scan_text(query).labels("misconception"):
+        info = MISCONCEPTION_PATTERNS[name]
+        detected.append({
+            "misconception_id": name,
+            "description": info["description"],
+            "concept": info["concept"]
+        })
+        logger.info(f"🔍 Detected misconception: {name}")
     
     return detected
 
@@ -240,14 +200,14 @@ def detect_concept_from_query(query: str) -> Optional[str]:
     Returns:
         Concept tag string or None
     """
-    query_lower = query.lower()
+    matches = scan_text(query)
     
-    for concept, pattern in CONCEPT_PATTERNS.items():
-        if re.search(pattern, query_lower, re.IGNORECASE):
-            return concept
+    concept = matches.first("concept")
+    if concept:
+        return concept
     
     # Fallback: check for general course keywords
-    if any(kw in query_lower for kw in ["course", "class", "comp 237", "comp237"]):
+    if matches.has("course_general"):
         return "course_general"
     
     return None
@@ -263,7 +223,8 @@ def log_interaction_to_supabase_sync(
     scaffolding_level: Optional[str],
     query: str,
     response_preview: str,
-    misconceptions: Optional[List[Dict]] = None
+    misconceptions: Optional[List[Dict]] = None,
+    intent_source: Optional[str] = None
 ) -> bool:
     """
     Log interaction to Supabase `interactions` table for learning analytics (SYNCHRONOUS VERSION)
@@ -279,6 +240,7 @@ def log_interaction_to_supabase_sync(
         query: Student's query
         response_preview: First 200 chars of response
         misconceptions: List of detected misconceptions
+        intent_source: What decided the intent (reasoning LLM, fast-path rule, local classifier, ...)
         
     Returns:
         True if logged successfully
@@ -306,6 +268,10 @@ def log_interaction_to_supabase_sync(
             metadata["misconceptions"] = misconceptions
             logger.info(f"📊 Recording {len(misconceptions)} misconception(s)")
         
+        # Lets the intent classifier's training data leave out its own predictions
+        if intent_source:
+            metadata["intent_source"] = intent_source
+        
         interaction_data = {
             "student_id": user_id,
             "type": interaction_type,
@@ -317,7 +283,12 @@ def log_interaction_to_supabase_sync(
             "metadata": metadata
         }
         
-        response = supabase.table("interactions").insert(interaction_data).execute()
+        # Dropped while Supabase is failing rather than holding up the turn
+        response = get_circuit_breaker("supabase").call(
+            supabase.table("interactions").insert(interaction_data).execute, degraded="skip"
+        )
+        if response is None:
+            return False
         logger.info(f"📊 Logged interaction: {interaction_type} for concept: {concept_focus}")
         return True
         
@@ -390,7 +361,12 @@ async def log_interaction_to_supabase(
             "metadata": metadata
         }
         
-        response = supabase.table("interactions").insert(interaction_data).execute()
+        # Dropped while Supabase is failing rather than holding up the turn
+        response = get_circuit_breaker("supabase").call(
+            supabase.table("interactions").insert(interaction_data).execute, degraded="skip"
+        )
+        if response is None:
+            return False
         logger.info(f"📊 Logged interaction: {interaction_type} for concept: {concept_focus}")
         return True
         
@@ -431,10 +407,16 @@ def update_student_mastery_sync(
         
         supabase = create_client(settings.supabase_url, settings.supabase_service_role_key)
         
-        # Get current mastery score
-        existing = supabase.table("student_mastery").select("mastery_score").eq(
-            "user_id", user_id
-        ).eq("concept_tag", concept_tag).execute()
+        # Get current mastery score (the update is skipped while Supabase is failing)
+        breaker = get_circuit_breaker("supabase")
+        existing = breaker.call(
+            supabase.table("student_mastery").select("mastery_score").eq(
+                "user_id", user_id
+            ).eq("concept_tag", concept_tag).execute,
+            degraded="skip",
+        )
+        if existing is None:
+            return False
         
         new_score = 0.5
         if existing.data and len(existing.data) > 0:
@@ -443,20 +425,20 @@ def update_student_mastery_sync(
             new_score = calculate_mastery_score(old_score, evaluation_confidence, decay_factor)
             
             from datetime import datetime, timezone
-            supabase.table("student_mastery").update({
+            breaker.call(supabase.table("student_mastery").update({
                 "mastery_score": new_score,
                 "decay_factor": decay_factor,
                 "last_assessed_at": datetime.now(timezone.utc).isoformat()
-            }).eq("user_id", user_id).eq("concept_tag", concept_tag).execute()
+            }).eq("user_id", user_id).eq("concept_tag", concept_tag).execute)
         else:
             # Insert new mastery record
             new_score = evaluation_confidence * 0.5  # Start lower for first interaction
-            supabase.table("student_mastery").insert({
+            breaker.call(supabase.table("student_mastery").insert({
                 "user_id": user_id,
                 "concept_tag": concept_tag,
                 "mastery_score": new_score,
                 "decay_factor": decay_factor,
-            }).execute()
+            }).execute)
         
         logger.info(f"📈 Updated mastery: {concept_tag} = {new_score:.2f} for user {user_id[:8]}...")
         return True
@@ -716,96 +698,114 @@ def evaluator_node(state: AgentState) -> AgentState:
     # Calculate processing time
     processing_time = (time.time() - start_time) * 1000
     
-    # Step 4: Log interaction to Supabase (synchronous for reliability)
-    # Instrumented with Langfuse span for observability
-    interaction_span = create_child_span_from_state(
-        state=state,
-        name="log_interaction_supabase",
-        input_data={"user_id": user_id[:8] if user_id else None, "concept": detected_concept},
-        metadata={"span_type": "TOOL"}
-    )
-    try:
-        # Determine outcome based on confusion and response quality
-        # Valid outcomes: 'correct', 'incorrect', 'confusion_detected', 'passive_read'
-        if confusion_detected:
-            outcome = "confusion_detected"
-        else:
-            outcome = "correct" if evaluation["passed"] else "incorrect"
-        
-        # Map scaffolding level to DB-compatible values
-        # DB allows: 'hint', 'example', 'guided', 'explain', 'explained', 'demonstrated', 'activation', 'socratic', 'verification', NULL
-        scaffolding_map = {
-            "hint": "hint",
-            "guided": "guided",
-            "explained": "explained",
-            "demonstrated": "demonstrated",
-            "activation": "activation",
-            "socratic": "socratic",
-        }
-        db_scaffolding = scaffolding_map.get(scaffolding_level) if scaffolding_level else None
-        
-        # Use synchronous logging for reliability
-        log_result = log_interaction_to_supabase_sync(
-            user_id=user_id,
-            interaction_type="question_asked",
-            concept_focus=detected_concept,
-            outcome=outcome,
-            intent=intent,
-            agent_used=intent,
-            scaffolding_level=db_scaffolding,
-            query=query,
-            response_preview=response[:200] if response else "",
-            misconceptions=detected_misconceptions
-        )
-        if log_result:
-            logger.info(f"✅ Interaction logged successfully for user {user_id[:8] if user_id else 'none'}...")
-            if interaction_span:
-                interaction_span.update(output={"logged": True, "outcome": outcome}, level="DEFAULT")
-        else:
-            logger.debug("Interaction not logged (no user_id or Supabase not configured)")
-            if interaction_span:
-                interaction_span.update(output={"logged": False, "reason": "no user_id or Supabase not configured"}, level="DEFAULT")
-    except Exception as e:
-        logger.warning(f"Could not log interaction: {e}")
-        if interaction_span:
-            interaction_span.update(output={"error": str(e)}, level="ERROR")
-    finally:
-        if interaction_span:
-            interaction_span.end()
-    
-    # Step 5: Update student mastery if concept detected
-    # Instrumented with Langfuse span for observability
-    if detected_concept and user_id:
-        mastery_span = create_child_span_from_state(
+    def persist() -> None:
+        # Step 4: Log interaction to Supabase (synchronous for reliability)
+        # Instrumented with Langfuse span for observability
+        interaction_span = create_child_span_from_state(
             state=state,
-            name="update_mastery",
-            input_data={
-                "user_id": user_id[:8] if user_id else None,
-                "concept": detected_concept,
-                "confidence": evaluation.get("confidence", 0.5)
-            },
+            name="log_interaction_supabase",
+            input_data={"user_id": user_id[:8] if user_id else None, "concept": detected_concept},
             metadata={"span_type": "TOOL"}
         )
         try:
-            mastery_result = update_student_mastery_sync(
+            # Determine outcome based on confusion and response quality
+            # Valid outcomes: 'correct', 'incorrect', 'confusion_detected', 'passive_read'
+            if confusion_detected:
+                outcome = "confusion_detected"
+            else:
+                outcome = "correct" if evaluation["passed"] else "incorrect"
+        
+            # Map scaffolding level to DB-compatible values
+            # DB allows: 'hint', 'example', 'guided', 'explain', 'explained', 'demonstrated', 'activation', 'socratic', 'verification', NULL
+            scaffolding_map = {
+                "hint": "hint",
+                "guided": "guided",
+                "explained": "explained",
+                "demonstrated": "demonstrated",
+                "activation": "activation",
+                "socratic": "socratic",
+            }
+            db_scaffolding = scaffolding_map.get(scaffolding_level) if scaffolding_level else None
+        
+            # Routed from the reasoning node: record whether the LLM or a local tier decided
+            routing_decision = (state.get("model_parameters") or {}).get("routing_decision") or {}
+            intent_source = routing_decision.get("routing_method")
+            if intent_source == "reasoning_node":
+                intent_source = state.get("reasoning_source") or intent_source
+        
+            # Use synchronous logging for reliability
+            log_result = log_interaction_to_supabase_sync(
                 user_id=user_id,
-                concept_tag=detected_concept,
-                evaluation_confidence=evaluation.get("confidence", 0.5)
+                interaction_type="question_asked",
+                concept_focus=detected_concept,
+                outcome=outcome,
+                intent=intent,
+                agent_used=intent,
+                scaffolding_level=db_scaffolding,
+                query=query,
+                response_preview=response[:200] if response else "",
+                misconceptions=detected_misconceptions,
+                intent_source=intent_source
             )
-            if mastery_result:
-                logger.info(f"✅ Mastery updated for concept: {detected_concept}")
-                if mastery_span:
-                    mastery_span.update(
-                        output={"updated": True, "concept": detected_concept},
-                        level="DEFAULT"
-                    )
+            if log_result:
+                logger.info(f"✅ Interaction logged successfully for user {user_id[:8] if user_id else 'none'}...")
+                if interaction_span:
+                    interaction_span.update(output={"logged": True, "outcome": outcome}, level="DEFAULT")
+            else:
+                logger.debug("Interaction not logged (no user_id or Supabase not configured)")
+                if interaction_span:
+                    interaction_span.update(output={"logged": False, "reason": "no user_id or Supabase not configured"}, level="DEFAULT")
         except Exception as e:
-            logger.warning(f"Could not update mastery: {e}")
-            if mastery_span:
-                mastery_span.update(output={"error": str(e)}, level="ERROR")
+            logger.warning(f"Could not log interaction: {e}")
+            if interaction_span:
+                interaction_span.update(output={"error": str(e)}, level="ERROR")
         finally:
-            if mastery_span:
-                mastery_span.end()
+            if interaction_span:
+                interaction_span.end()
+    
+        # Step 5: Update student mastery if concept detected
+        # Instrumented with Langfuse span for observability
+        if detected_concept and user_id:
+            mastery_span = create_child_span_from_state(
+                state=state,
+                name="update_mastery",
+                input_data={
+                    "user_id": user_id[:8] if user_id else None,
+                    "concept": detected_concept,
+                    "confidence": evaluation.get("confidence", 0.5)
+                },
+                metadata={"span_type": "TOOL"}
+            )
+            try:
+                mastery_result = update_student_mastery_sync(
+                    user_id=user_id,
+                    concept_tag=detected_concept,
+                    evaluation_confidence=evaluation.get("confidence", 0.5)
+                )
+                if mastery_result:
+                    logger.info(f"✅ Mastery updated for concept: {detected_concept}")
+                    if mastery_span:
+                        mastery_span.update(
+                            output={"updated": True, "concept": detected_concept},
+                            level="DEFAULT"
+                        )
+            except Exception as e:
+                logger.warning(f"Could not update mastery: {e}")
+                if mastery_span:
+                    mastery_span.update(output={"error": str(e)}, level="ERROR")
+            finally:
+                if mastery_span:
+                    mastery_span.end()
+    
+    
+    # Persistence is optional work for the turn: with the budget nearly spent it
+    # runs in the background instead of holding up the end of the stream
+    deferred_persistence = not has_budget_for(state, "evaluator_persistence")
+    if deferred_persistence:
+        state.update(skip_stage(state, "evaluator_persistence"))
+        _persistence_executor.submit(persist)
+    else:
+        persist()
     
     # Update processing times
     processing_times = state.get("processing_times", {})
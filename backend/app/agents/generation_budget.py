@@ -0,0 +1,298 @@
+"""
+Generation Budgets - Per-turn output limits applied on the model call
+
+get_expected_length_range (intent, follow-up, the reasoning node's length
+hint) defines how long an answer should be, but was only enforced after
+generation: truncate_response_if_needed cut long follow-ups that had already
+been generated and billed, and calculate_response_confidence penalised length,
+sometimes triggering a full repair regeneration. Each turn now gets a
+GenerationBudget derived from the same range:
+
+- soft_chars: once the streamed answer passes this, stream_answer stops at
+  the next sentence end (at most tail_chars later), closes the model stream
+  and adds a short offer to continue
+- max_output_tokens: hard cap set on the model call itself (answer + tail +
+  thinking tokens), for answers that never reach a sentence end
+- thinking_budget: Gemini 2.5 thinking tokens, which count against
+  max_output_tokens; none for short answers and most follow-ups
+
+BudgetStats counts, per intent, how often turns end on the soft budget or
+hit the hard cap.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+import logging
+import math
+import re
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough average for English answers
+CONTINUATION_OFFER = "\n\nWant me to explain any part in more detail?"
+
+# Thinking tokens by intent for first turns (default 0); follow-ups get FOLLOW_UP_THINKING at most
+THINKING_BUDGETS = {"math": 1024, "coder": 1024, "tutor": 512, "explain": 512}
+FOLLOW_UP_THINKING = {"math": 256, "coder": 256}
+
+# Models whose hidden reasoning counts against the output cap but cannot be budgeted
+UNBUDGETED_REASONING_MODELS = ("o1", "o3", "o4")
+
+# A sentence end (punctuation after a word, then whitespace), a line break not
+# introducing a list, or a code fence (no cutting inside code blocks)
+_BOUNDARY_RE = re.compile(r"(?<=[\w)\]\"'*`$])[.!?]\s|(?<!:)\n|```")
+
+
+def get_expected_length_range(intent: str, is_follow_up: bool, response_length_hint: Optional[str] = None) -> tuple[int, int]:
+    """
+    Get expected response length range based on intent and context.
+    
+    UPDATED (Dec 2025): Relaxed limits to prevent over-truncation.
+    Follow-ups should be shorter but not artificially clipped.
+    
+    Returns:
+        Tuple of (min_chars, max_chars)
+    """
+    # Use hint from reasoning node if available
+    if response_length_hint:
+        if response_length_hint == "short":
+            return (50, 400)  # Relaxed from 300
+        elif response_length_hint == "medium":
+            if is_follow_up:
+                return (150, 800)  # Relaxed from 500
+            return (300, 1500)  # Relaxed from 1200
+        elif response_length_hint == "detailed":
+            if is_follow_up:
+                return (300, 1200)  # Relaxed from 800
+            return (800, 2800)  # Relaxed from 2500
+    
+    # Intent-based defaults (relaxed to allow natural responses)
+    if intent == "fast":
+        return (50, 400)  # 1-4 sentences
+    elif intent == "syllabus_query":
+        return (100, 600)  # 2-5 sentences
+    elif intent == "coder":
+        return (200, 2000)  # Code + explanation (code can be long)
+    elif intent == "explain":
+        if is_follow_up:
+            return (100, 800)  # Relaxed from 500 - allow substantive clarifications
+        return (400, 1800)  # 3-6 paragraphs
+    elif intent == "tutor":
+        if is_follow_up:
+            return (100, 900)  # Relaxed from 450 - clarifications need room
+        return (300, 1600)  # Relaxed from 1200 - full scaffolding
+    elif intent == "math":
+        if is_follow_up:
+            return (150, 1000)  # Math clarifications need room for formulas
+        return (300, 2500)  # Mathematical derivations can be longer
+    
+    # Default
+    if is_follow_up:
+        return (100, 800)
+    return (200, 1200)
+
+
+@dataclass
+class GenerationBudget:
+    """Output limits for one answer, plus what happened when it was generated"""
+    intent: str
+    soft_chars: int
+    tail_chars: int
+    max_output_tokens: int
+    thinking_budget: int
+    # Outcome (set while streaming)
+    stopped_at_budget: bool = False
+    hard_capped: bool = False
+    output_chars: int = 0
+
+    @property
+    def enforced(self) -> bool:
+        return self.stopped_at_budget or self.hard_capped
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "intent": self.intent,
+            "soft_chars": self.soft_chars,
+            "max_output_tokens": self.max_output_tokens,
+            "thinking_budget": self.thinking_budget,
+            "stopped_at_budget": self.stopped_at_budget,
+            "hard_capped": self.hard_capped,
+            "output_chars": self.output_chars,
+        }
+
+
+def budget_for_state(state: Dict[str, Any], intent: Optional[str] = None) -> Optional[GenerationBudget]:
+    """
+    The generation budget for this turn (None when budgets are disabled)
+    
+    Follow-ups get exactly the expected maximum, so truncate_response_if_needed
+    has nothing left to cut; first turns get settings.generation_budget_headroom
+    on top, since the expected range only penalises overruns mildly.
+    """
+    if not settings.generation_budget_enabled:
+        return None
+    intent = intent or state.get("intent") or "fast"
+    is_follow_up = bool(state.get("is_follow_up"))
+    hint = state.get("response_length_hint")
+    _, max_chars = get_expected_length_range(intent, is_follow_up, hint)
+
+    soft_chars = max_chars if is_follow_up else int(max_chars * settings.generation_budget_headroom)
+    tail_tokens = settings.generation_budget_tail_tokens
+    if hint == "short":
+        thinking = 0
+    elif is_follow_up:
+        thinking = FOLLOW_UP_THINKING.get(intent, 0)
+    else:
+        thinking = THINKING_BUDGETS.get(intent, 0)
+
+    return GenerationBudget(
+        intent=intent,
+        soft_chars=soft_chars,
+        tail_chars=tail_tokens * CHARS_PER_TOKEN,
+        max_output_tokens=math.ceil(soft_chars / CHARS_PER_TOKEN) + tail_tokens + thinking,
+        thinking_budget=thinking,
+    )
+
+
+def apply_budget(model, budget: Optional[GenerationBudget]):
+    """
+    A copy of the chat model with the budget's output/thinking caps set
+    
+    Works on the LangChain model fields (max_output_tokens for Gemini,
+    max_tokens for OpenAI/Groq, num_predict for Ollama); the copy shares the
+    original's client. Returns the model unchanged if it has none of them.
+    """
+    if budget is None:
+        return model
+    fields = getattr(type(model), "model_fields", None) or {}
+    update: Dict[str, Any] = {}
+    model_name = str(getattr(model, "model_name", "") or getattr(model, "model", ""))
+    if not model_name.startswith(UNBUDGETED_REASONING_MODELS):
+        for name in ("max_output_tokens", "max_tokens", "num_predict"):
+            if name in fields:
+                update[name] = budget.max_output_tokens
+                break
+    if "thinking_budget" in fields:
+        update["thinking_budget"] = budget.thinking_budget
+    if not update:
+        return model
+    try:
+        return model.model_copy(update=update)
+    except Exception as e:
+        logger.warning(f"Could not apply generation budget to {type(model).__name__}: {e}")
+        return model
+
+
+def is_hard_capped(chunk: Any) -> bool:
+    """Whether a model (chunk) finished because it ran out of output tokens"""
+    metadata = getattr(chunk, "response_metadata", None) or {}
+    return str(metadata.get("finish_reason", "")).upper() in ("MAX_TOKENS", "LENGTH")
+
+
+class BudgetGuard:
+    """
+    Applies a GenerationBudget to streamed (already filtered) answer text
+
+    feed() returns the text to send and whether to stop: past soft_chars the
+    text is cut at the first sentence end outside a code block; past
+    soft_chars + tail_chars at the last space. finish() gives the closing
+    text for an answer that was cut.
+    """
+
+    def __init__(self, budget: GenerationBudget):
+        self.budget = budget
+        self._chars = 0
+        self._carry = ""  # Last chars of the previous piece, for boundaries split across pieces
+        self._in_fence = False
+        self.stopped = False
+
+    def feed(self, text: str) -> Tuple[str, bool]:
+        if self.stopped:
+            return "", True
+        joined = self._carry + text
+        offset = len(self._carry)
+        budget_at = offset + self.budget.soft_chars - self._chars
+        cut = None
+        for match in _BOUNDARY_RE.finditer(joined):
+            if match.end() <= offset:
+                continue  # Seen with the previous piece
+            if match.group() == "```":
+                self._in_fence = not self._in_fence
+            elif match.start() >= budget_at and not self._in_fence:
+                cut = match.start() if match.group() == "\n" else match.start() + 1
+                break
+
+        if cut is None:
+            limit = budget_at - offset + self.budget.tail_chars
+            if len(text) <= limit:
+                self._chars += len(text)
+                self._carry = joined[-2:]
+                return text, False
+            # No sentence end within the tail: stop at the last word boundary
+            space = text.rfind(" ", 0, max(0, limit))
+            emitted = text[:space if space > 0 else max(0, limit)]
+            self._stop(len(emitted))
+            return emitted, True
+
+        emitted = text[:max(0, cut - offset)]
+        self._stop(len(emitted))
+        return emitted, True
+
+    def _stop(self, emitted_chars: int) -> None:
+        self._chars += emitted_chars
+        self.stopped = True
+        self.budget.stopped_at_budget = True
+
+    def finish(self) -> str:
+        """Closing text after a cut answer ("" if it ended on its own)"""
+        if not self.budget.enforced:
+            return ""
+        closing = "\n```" if self._in_fence else ""
+        if self.budget.hard_capped and not self.budget.stopped_at_budget:
+            closing += "..."
+        return closing + CONTINUATION_OFFER
+
+
+class BudgetStats:
+    """Per-intent counts of budgeted turns and how they ended"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_intent: Dict[str, Dict[str, int]] = {}
+
+    def record(self, budget: GenerationBudget) -> None:
+        with self._lock:
+            stats = self._by_intent.setdefault(
+                budget.intent, {"turns": 0, "hit_budget": 0, "stopped_at_budget": 0, "hard_capped": 0, "output_chars": 0}
+            )
+            stats["turns"] += 1
+            stats["hit_budget"] += int(budget.enforced)
+            stats["stopped_at_budget"] += int(budget.stopped_at_budget)
+            stats["hard_capped"] += int(budget.hard_capped)
+            stats["output_chars"] += budget.output_chars
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for intent, stats in self._by_intent.items():
+                turns = stats["turns"]
+                result[intent] = {
+                    **stats,
+                    "hit_rate": round(stats["hit_budget"] / turns, 3) if turns else 0.0,
+                    "avg_output_chars": round(stats["output_chars"] / turns) if turns else 0,
+                }
+            return result
+
+
+_budget_stats = None
+
+
+def get_budget_stats() -> BudgetStats:
+    """Get or create the process-wide generation budget stats"""
+    global _budget_stats
+    if _budget_stats is None:
+        _budget_stats = BudgetStats()
+    return _budget_stats
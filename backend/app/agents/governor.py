@@ -3,11 +3,13 @@ Governor (Policy Engine) for Course Marshal
 Enforces course policies and constraints
 """
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 import time
 from app.agents.state import AgentState
+from app.config import settings
 from app.rag.langchain_chroma import get_langchain_chroma_client
+from app.rag.scope_index import get_scope_check_stats, get_scope_index
 from app.observability.langfuse_client import (
     create_observation, 
     update_observation_with_usage
@@ -15,6 +17,11 @@ from app.observability.langfuse_client import (
 
 logger = logging.getLogger(__name__)
 
+OUT_OF_SCOPE_REASON = (
+    "This topic is not clearly covered in COMP 237. Please ask about course content like "
+    "machine learning, neural networks, or AI concepts from your course materials."
+)
+
 
 class Governor:
     """
@@ -87,14 +94,19 @@ class Governor:
         
         Uses a hybrid approach:
         1. Reasoning Node: If high confidence (>0.8) that it's a valid intent, ALLOW.
-        2. Vector Search: Fallback to similarity search if reasoning is unsure.
+        2. Scope Index: Course centroids vs off-topic exemplars (one dot product),
+           decides clear cases (see app/rag/scope_index.py).
+        3. Vector Search: Fallback to similarity search in the ambiguous band.
         """
+        stats = get_scope_check_stats()
+        start = time.perf_counter()
         # SMART BYPASS: Trust the Reasoning Node if it's confident
         # If the reasoning node identified it as a valid educational intent with high confidence,
         # we trust it even if the vector store doesn't have an exact match.
         valid_intents = ["tutor", "math", "coder", "explain"]
         if reasoning_intent in valid_intents and reasoning_confidence >= 0.8:
             logger.info(f"Governor: Reasoning node confident ({reasoning_confidence:.2f}) - bypassing vector check")
+            stats.record("reasoning_bypass", (time.perf_counter() - start) * 1000)
             return {
                 "approved": True,
                 "reason": f"Reasoning node validated {reasoning_intent} intent",
@@ -107,7 +119,17 @@ class Governor:
             SCOPE_THRESHOLD = 0.85  # More permissive (higher distance allowed)
         else:
             SCOPE_THRESHOLD = 0.80  # Strict default
-            
+        
+        index_decision = self._check_scope_index(query, relaxed=bool(key_concepts))
+        if index_decision is not None:
+            return index_decision
+        
+        return self._check_scope_vector(query, SCOPE_THRESHOLD)
+
+    def _check_scope_vector(self, query: str, threshold: float) -> Dict[str, any]:
+        """Scope from a k=3 Chroma similarity search: closest L2 distance against threshold"""
+        stats = get_scope_check_stats()
+        start = time.perf_counter()
         try:
             results = self.vectorstore.similarity_search_with_score(
                 query=query,
@@ -129,12 +151,14 @@ class Governor:
             min_score = min(score for _, score in results)
             avg_score = sum(score for _, score in results) / len(results)
             
+            stats.record("vector_search", (time.perf_counter() - start) * 1000)
+            
             # Check against threshold
-            if min_score > SCOPE_THRESHOLD:
-                logger.info(f"❌ Scope check failed (min_score: {min_score:.3f}, avg: {avg_score:.3f}, threshold: {SCOPE_THRESHOLD})")
+            if min_score > threshold:
+                logger.info(f"❌ Scope check failed (min_score: {min_score:.3f}, avg: {avg_score:.3f}, threshold: {threshold})")
                 return {
                     "approved": False,
-                    "reason": "This topic is not clearly covered in COMP 237. Please ask about course content like machine learning, neural networks, or AI concepts from your course materials.",
+                    "reason": OUT_OF_SCOPE_REASON,
                 }
                 
             logger.info(f"✓ Scope check passed (min_score: {min_score:.3f})")
@@ -151,6 +175,42 @@ class Governor:
                 "reason": "Scope check error, allowing query",
             }
 
+    def _check_scope_index(self, query: str, relaxed: bool = False) -> Optional[Dict[str, any]]:
+        """
+        Decide scope from the precomputed index, or None in the ambiguous band
+        
+        relaxed (key concepts detected) lowers the acceptance bar by 0.05,
+        like the looser vector-search threshold.
+        """
+        index = get_scope_index()
+        if index is None:
+            return None
+        start = time.perf_counter()
+        try:
+            (in_sim, out_sim, label), cached = index.score_query(query, self.vectorstore.embeddings.embed_query)
+        except Exception as e:
+            logger.warning(f"Governor: scope index unavailable for this query, using vector search: {e}")
+            return None
+        ms = (time.perf_counter() - start) * 1000
+        
+        accept = settings.scope_accept_similarity - (0.05 if relaxed else 0.0)
+        if in_sim >= accept and in_sim >= out_sim:
+            get_scope_check_stats().record("index_cached" if cached else "index_accept", ms)
+            logger.info(f"✓ Scope index: in scope (sim {in_sim:.3f} to {label}) [{ms:.2f}ms]")
+            return {
+                "approved": True,
+                "reason": "Topic is within course scope",
+            }
+        if in_sim < settings.scope_reject_similarity and out_sim > in_sim:
+            get_scope_check_stats().record("index_cached" if cached else "index_reject", ms)
+            logger.info(f"❌ Scope index: out of scope (course sim {in_sim:.3f}, off-topic sim {out_sim:.3f}) [{ms:.2f}ms]")
+            return {
+                "approved": False,
+                "reason": OUT_OF_SCOPE_REASON,
+            }
+        logger.debug(f"Scope index ambiguous (course {in_sim:.3f}, off-topic {out_sim:.3f}); using vector search")
+        return None
+
     def _check_integrity(self, query: str) -> Dict[str, any]:
         """
         Law 2: Check if query requests full solution for graded work
@@ -0,0 +1,231 @@
+"""
+Graph Context Stage - Concept graph lookups alongside vector retrieval
+
+Pulls prerequisite / next-topic / related-concept context from the GraphRAG
+service (Neo4j or the in-memory fallback) for the concepts identified by the
+reasoning node (`key_concepts_detected`).
+
+Design:
+- Every concept is looked up as its own task on a small shared thread pool,
+  so lookups run concurrently with vector retrieval (the `tools` node for the
+  general agent, the inline RAG call for tutor/math).
+- Each lookup has a strict deadline (settings.graph_lookup_deadline_ms).
+  A lookup that misses it is dropped - a slow graph never delays the answer.
+  Dropping does not stop its thread (each Neo4j read is bounded by the
+  "neo4j" circuit breaker's timeout instead), so lookups in flight are
+  counted and a concept is not submitted while every pool thread is busy:
+  a hung graph skips graph context rather than queueing lookups behind it.
+- The merged context is rendered with GraphRAGService.build_combined_context
+  under settings.graph_context_token_budget before it reaches a prompt.
+- Graph context is optional: once the turn's remaining budget is too low
+  (deadline.py), no lookups are started and the skip is recorded.
+"""
+
+from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+import logging
+import re
+import threading
+import time
+
+from app.agents.state import AgentState
+from app.agents.deadline import has_budget_for, skip_stage
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Max concepts looked up per turn (reasoning usually returns 1-3)
+MAX_GRAPH_CONCEPTS = 3
+
+# Shared pool for graph lookups - bounded so a hung backend cannot pile up threads
+GRAPH_LOOKUP_THREADS = 4
+_graph_executor = ThreadPoolExecutor(max_workers=GRAPH_LOOKUP_THREADS, thread_name_prefix="graph-lookup")
+_in_flight = 0  # Submitted lookups not finished yet, dropped ones included
+_in_flight_lock = threading.Lock()
+
+
+@dataclass
+class GraphLookup:
+    """Handle for in-flight per-concept graph lookups"""
+    started_at: float
+    futures: Dict[str, Future] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)  # Not submitted: every pool thread was busy
+
+
+def normalize_concept_ids(concepts: Optional[List[str]]) -> List[str]:
+    """
+    Map free-text concepts from the reasoning node to concept graph ids
+
+    e.g. "Neural Networks" -> "neural_networks", "k-means" -> "k_means"
+    """
+    concept_ids = []
+    for concept in concepts or []:
+        if not isinstance(concept, str):
+            continue
+        concept_id = re.sub(r"[^a-z0-9]+", "_", concept.lower()).strip("_")
+        if concept_id and concept_id not in concept_ids:
+            concept_ids.append(concept_id)
+    return concept_ids[:MAX_GRAPH_CONCEPTS]
+
+
+def _lookup_concept(concept_id: str, mastery_scores: Optional[Dict[str, float]]) -> Dict:
+    """Single concept lookup (runs on the graph pool)"""
+    from app.rag.graph_rag import get_graph_rag_service
+    return get_graph_rag_service().get_concept_graph_context(concept_id, mastery_scores)
+
+
+def _lookup_done(_future: Future) -> None:
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def _submit_lookup(concept_id: str, mastery_scores: Optional[Dict[str, float]]) -> Optional[Future]:
+    """Submit one lookup, or None while every pool thread is still busy"""
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= GRAPH_LOOKUP_THREADS:
+            return None
+        _in_flight += 1
+    try:
+        future = _graph_executor.submit(_lookup_concept, concept_id, mastery_scores)
+    except Exception:
+        _lookup_done(None)
+        raise
+    future.add_done_callback(_lookup_done)
+    return future
+
+
+def start_graph_lookup(
+    concepts: Optional[List[str]],
+    mastery_scores: Optional[Dict[str, float]] = None,
+    state: Optional[AgentState] = None
+) -> Optional[GraphLookup]:
+    """
+    Submit one graph lookup per concept and return immediately
+
+    Related concepts are ranked for the student when mastery_scores is given.
+    With the node's state, nothing is started once the turn budget is too
+    low for graph context; the skip is recorded in the state (skip_stage).
+
+    Returns:
+        GraphLookup handle to pass to collect_graph_context(), or None when
+        GraphRAG is disabled or there is nothing to look up
+    """
+    if not settings.graph_rag_enabled:
+        return None
+
+    concept_ids = normalize_concept_ids(concepts)
+    if not concept_ids:
+        return None
+    if state is not None and not has_budget_for(state, "graph_context"):
+        state.update(skip_stage(state, "graph_context"))
+        return None
+
+    lookup = GraphLookup(started_at=time.time())
+    for concept_id in concept_ids:
+        try:
+            future = _submit_lookup(concept_id, mastery_scores)
+        except Exception as e:
+            logger.warning(f"Could not schedule graph lookup for {concept_id}: {e}")
+            continue
+        if future is None:
+            lookup.skipped.append(concept_id)
+        else:
+            lookup.futures[concept_id] = future
+    if lookup.skipped:
+        logger.warning(f"Graph lookup pool busy ({GRAPH_LOOKUP_THREADS} lookups in flight), skipping: {lookup.skipped}")
+    return lookup
+
+
+def collect_graph_context(lookup: Optional[GraphLookup]) -> Optional[Dict[str, Any]]:
+    """
+    Wait for in-flight lookups, each bounded by its own deadline
+
+    The deadline is measured from submission, so time spent on vector
+    retrieval in the meantime counts against it.
+
+    Returns:
+        Merged graph context (concepts, prerequisites, next_topics, related)
+        plus lookup stats, or None if nothing was found
+    """
+    if lookup is None or not lookup.futures:
+        return None
+
+    from app.rag.graph_rag import GraphRAGService
+
+    deadline = lookup.started_at + settings.graph_lookup_deadline_ms / 1000.0
+    concept_contexts = []
+    timed_out = []
+
+    for concept_id, future in lookup.futures.items():
+        try:
+            concept_data = future.result(timeout=max(0.0, deadline - time.time()))
+            if concept_data:
+                concept_contexts.append(concept_data)
+        except FutureTimeoutError:
+            timed_out.append(concept_id)  # Its thread finishes on its own, bounded by the neo4j breaker timeout
+        except Exception as e:
+            logger.warning(f"Graph lookup failed for {concept_id}: {e}")
+
+    if timed_out:
+        logger.warning(f"⏱️ Graph lookup deadline exceeded for: {timed_out}")
+
+    if not concept_contexts:
+        return None
+
+    graph_context = GraphRAGService.merge_concept_contexts(concept_contexts)
+    graph_context["timed_out"] = timed_out
+    graph_context["skipped_busy"] = lookup.skipped
+    return graph_context
+
+
+def build_graph_context_section(graph_context: Optional[Dict], query: str) -> str:
+    """
+    Render graph context for a prompt under the configured token budget
+
+    Vector results are already formatted by each node, so only the graph
+    sections are rendered here and appended to the node's context string.
+    """
+    if not graph_context or not graph_context.get("concepts"):
+        return ""
+
+    try:
+        from app.rag.graph_rag import get_graph_rag_service
+        return get_graph_rag_service().build_combined_context(
+            vector_results=[],
+            graph_context=graph_context,
+            query=query,
+            max_tokens=settings.graph_context_token_budget
+        ).strip()
+    except Exception as e:
+        logger.warning(f"Could not render graph context: {e}")
+        return ""
+
+
+def graph_context_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Graph context node for LangGraph
+
+    Runs in the same step as the `tools` node so the concept graph lookups
+    overlap vector retrieval; the agent picks up `graph_context` on its next turn.
+    """
+    start_time = time.time()
+
+    lookup = start_graph_lookup(state.get("key_concepts_detected"), state.get("student_mastery_scores"), state)
+    graph_context = collect_graph_context(lookup)
+
+    processing_time = (time.time() - start_time) * 1000
+    processing_times = state.get("processing_times", {}) or {}
+    processing_times["graph_context"] = processing_time
+
+    concept_count = len(graph_context.get("concepts", [])) if graph_context else 0
+    logger.info(f"🕸️ Graph context: {concept_count} concepts in {processing_time:.1f}ms")
+
+    # Empty dict (not None) marks the stage as done so it is not re-run on later tool calls
+    return {
+        "graph_context": graph_context or {},
+        "processing_times": processing_times,
+        "deadline_skips": state.get("deadline_skips")
+    }
@@ -0,0 +1,140 @@
+"""
+Graph Variants - Per-turn choice of a compiled tutor graph
+
+Every turn used to run the full topology: reasoning → governor → supervisor
+→ agent/tools → quality_gate → length_enforcer → evaluator, although for
+fast and syllabus_query turns the quality gate and the evaluator only do
+their "lightweight" pass. create_tutor_agent now compiles one graph per
+variant (cached by get_tutor_agent):
+
+- full:      the whole pipeline; tutor, math, explain and coder turns, and
+             every turn the pre-router is not sure about
+- minimal:   fast / syllabus_query turns, including greetings and
+             acknowledgements. No length enforcer (follow-ups never take
+             this path); the quality gate only runs when the model cascade
+             could still escalate the answer; the evaluator is the
+             lightweight one. The governor stays: with the scope index
+             (app/rag/scope_index.py) it is cheap, and every turn gets the
+             same policy checks whichever graph runs it
+
+select_graph_variant is the pre-router. It runs before the graph starts and
+reuses the reasoning fast path's local classification (classify_locally),
+with the same threshold, so the reasoning node inside the graph reaches the
+same intent: a turn is only sent down a shorter graph when the reasoning
+LLM would not have been consulted anyway. Anything else gets the full graph.
+A greeting or acknowledgement that answers a pending tutor question is left
+to the reasoning LLM (classify_locally returns None), so it runs the full
+graph too.
+
+The supervisor can still override the reasoning intent (a confusion signal
+turns a quick question into a tutor turn). The minimal graph then ends in
+its reroute node, and run_agent / astream_agent rerun the turn on the full
+graph rather than answering it with the general agent.
+
+GraphVariantStats records, per variant and final intent, turns, node hops
+and latency, and estimates what the shorter variants save against full
+runs of the same intent. Rerouted turns are counted as mismatches and
+recorded as full-graph turns (hops and latency of both runs).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+GRAPH_VARIANTS = ("full", "minimal")
+# Intents whose quality gate and evaluator only ever did their lightweight pass
+LIGHTWEIGHT_INTENTS = frozenset({"fast", "syllabus_query"})
+
+
+def select_graph_variant(query: str, conversation_history: Optional[List[dict]] = None) -> Tuple[str, Optional[str]]:
+    """(variant, predicted intent) for a turn, decided before the graph runs"""
+    if not settings.graph_variants_enabled or not settings.reasoning_fast_path_enabled:
+        return "full", None
+    from app.agents.reasoning_fast_path import classify_locally
+
+    start = time.perf_counter()
+    try:
+        local = classify_locally(query, conversation_history)
+    except Exception as e:
+        logger.warning(f"Graph pre-router failed, using the full graph: {e}")
+        local = None
+    variant, intent = "full", None
+    if local and local[1].confidence >= settings.reasoning_fast_path_threshold:
+        intent = local[1].recommended_intent
+        if intent in LIGHTWEIGHT_INTENTS:
+            variant = "minimal"
+    get_graph_variant_stats().record_preroute((time.perf_counter() - start) * 1000)
+    return variant, intent
+
+
+class GraphVariantStats:
+    """Turns, node hops and latency per graph variant and final intent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns: Dict[Tuple[str, str], List[float]] = {}  # (variant, intent) -> [turns, hops, seconds]
+        self.mismatches = 0
+        self.preroute_calls = 0
+        self._preroute_ms = 0.0
+
+    def record_preroute(self, ms: float) -> None:
+        with self._lock:
+            self.preroute_calls += 1
+            self._preroute_ms += ms
+
+    def record_reroute(self) -> None:
+        with self._lock:
+            self.mismatches += 1
+
+    def record_turn(self, variant: str, intent: Optional[str], hops: int, seconds: float) -> None:
+        intent = intent or "unknown"
+        with self._lock:
+            entry = self._turns.setdefault((variant, intent), [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += hops
+            entry[2] += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            variants: Dict[str, int] = {}
+            by_intent: Dict[str, Dict[str, Any]] = {}
+            for (variant, intent), (turns, hops, seconds) in sorted(self._turns.items()):
+                variants[variant] = variants.get(variant, 0) + turns
+                by_intent.setdefault(intent, {})[variant] = {
+                    "turns": turns,
+                    "avg_hops": round(hops / turns, 2),
+                    "avg_ms": round(seconds / turns * 1000),
+                }
+            saved_seconds = 0.0
+            for intent, runs in by_intent.items():
+                full = runs.get("full")
+                for variant, run in runs.items():
+                    if variant == "full" or not full:
+                        continue
+                    # Against full-graph turns of the same intent (e.g. ones the reasoning LLM classified)
+                    run["hops_saved"] = round(full["avg_hops"] - run["avg_hops"], 2)
+                    run["ms_saved_est"] = full["avg_ms"] - run["avg_ms"]
+                    saved_seconds += run["ms_saved_est"] * run["turns"] / 1000
+            return {
+                "turns": variants,
+                "by_intent": by_intent,
+                "intent_mismatches": self.mismatches,
+                "preroute_avg_ms": round(self._preroute_ms / self.preroute_calls, 3) if self.preroute_calls else 0.0,
+                "latency_saved_seconds_est": round(saved_seconds, 1),
+            }
+
+
+_graph_variant_stats = None
+
+
+def get_graph_variant_stats() -> GraphVariantStats:
+    """Get or create the process-wide graph variant stats"""
+    global _graph_variant_stats
+    if _graph_variant_stats is None:
+        _graph_variant_stats = GraphVariantStats()
+    return _graph_variant_stats
@@ -0,0 +1,303 @@
+"""
+Intent Classifier - Locally trained router over logged turns
+
+Intent came from the reasoning LLM or Supervisor.classify_with_llm, a
+300-1500 ms Gemini call per turn. Every past turn is already logged in the
+`interactions` table with its intent and query text, which is enough to
+train a small CPU model:
+
+- features: hashed word unigrams/bigrams and character 3-grams
+  (zlib.crc32, so indices are stable across processes), L2-normalised
+- model: multinomial logistic regression (numpy only), full-batch Adam
+  with L2 regularisation and balanced class weights
+
+predict() hashes the query and sums a few dozen weight rows: microseconds,
+no network call.
+
+Models are versioned under MODEL_DIR as `intent-<version>.npz` (weights)
+plus `intent-<version>.json` (labels, feature config, training metrics).
+CURRENT_FILE names the active version; it is written last and atomically,
+so a reader never sees a half-written model. Training and evaluation live
+in scripts/train_intent_classifier.py and scripts/evaluate_intent_classifier.py.
+
+The supervisor uses the classifier as its primary router when its
+probability clears settings.intent_classifier_threshold; lower-confidence
+queries still go to the LLM.
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import re
+import zlib
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT_VERSION = 1
+MODEL_DIR = Path(__file__).parent.parent.parent / "cleaned_data" / "models" / "intent_classifier"
+CURRENT_FILE = "current.json"
+
+INTENTS = ["fast", "explain", "tutor", "math", "coder", "syllabus_query"]
+
+DEFAULT_N_FEATURES = 2 ** 16
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[^\sa-z0-9]")
+
+
+def _hash(feature: str, n_features: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % n_features
+
+
+def featurize(text: str, n_features: int = DEFAULT_N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (indices, values) of the hashed, L2-normalised feature vector for one query
+
+    Index 0 is reserved for the bias feature, which every query has.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    features = [f"w:{t}" for t in tokens]
+    features += [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        if len(token) > 3:
+            padded = f"<{token}>"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    features.append(f"n:{min(len(tokens), 40) // 5}")  # Coarse length bucket
+
+    indices = np.fromiter((1 + _hash(f, n_features - 1) for f in features), dtype=np.int64, count=len(features))
+    indices, counts = np.unique(indices, return_counts=True)
+    values = np.sqrt(counts.astype(np.float32))
+    values /= np.linalg.norm(values)
+    return np.concatenate(([0], indices)), np.concatenate(([1.0], values)).astype(np.float32)
+
+
+def _featurize_batch(texts: Sequence[str], n_features: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR-style (indptr, indices, values) for a list of queries"""
+    rows = [featurize(t, n_features) for t in texts]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(r[0]) for r in rows])
+    indices = np.concatenate([r[0] for r in rows]) if rows else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([r[1] for r in rows]) if rows else np.zeros(0, dtype=np.float32)
+    return indptr, indices, values
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class IntentClassifier:
+    """Hashed n-gram logistic regression; weights are (n_features, n_labels)"""
+
+    def __init__(self, weights: np.ndarray, labels: List[str], version: str = "", metadata: Optional[Dict[str, Any]] = None):
+        self.weights = weights
+        self.labels = labels
+        self.version = version
+        self.metadata = metadata or {}
+        self.n_features = weights.shape[0]
+
+    def predict_proba(self, query: str) -> np.ndarray:
+        indices, values = featurize(query, self.n_features)
+        return _softmax(values @ self.weights[indices])
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        """(intent, probability) for one query"""
+        proba = self.predict_proba(query)
+        best = int(proba.argmax())
+        return self.labels[best], float(proba[best])
+
+    def predict_batch(self, queries: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        indptr, indices, values = _featurize_batch(queries, self.n_features)
+        logits = np.add.reduceat(self.weights[indices] * values[:, None], indptr[:-1], axis=0)
+        proba = _softmax(logits)
+        best = proba.argmax(axis=1)
+        return [self.labels[i] for i in best], proba[np.arange(len(best)), best]
+
+    # ---------- persistence ----------
+
+    def save(self, model_dir: Path = MODEL_DIR, activate: bool = False) -> Path:
+        """Write intent-<version>.npz/.json; with activate, point CURRENT_FILE at it"""
+        model_dir = Path(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        if not self.version:
+            self.version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        weights_path = model_dir / f"intent-{self.version}.npz"
+        np.savez_compressed(weights_path, weights=self.weights.astype(np.float32))
+        meta = {
+            **self.metadata,
+            "format": MODEL_FORMAT_VERSION,
+            "version": self.version,
+            "labels": self.labels,
+            "n_features": self.n_features,
+        }
+        _write_json(model_dir / f"intent-{self.version}.json", meta)
+        if activate:
+            activate_version(self.version, model_dir)
+        logger.info(f"✅ Wrote intent classifier {self.version} → {weights_path}")
+        return weights_path
+
+    @classmethod
+    def load(cls, version: Optional[str] = None, model_dir: Path = MODEL_DIR) -> Optional["IntentClassifier"]:
+        """Load a version (default: the active one); returns None if missing or incompatible"""
+        model_dir = Path(model_dir)
+        try:
+            if version is None:
+                current = model_dir / CURRENT_FILE
+                if not current.exists():
+                    return None
+                with open(current) as f:
+                    version = json.load(f)["version"]
+            with open(model_dir / f"intent-{version}.json") as f:
+                meta = json.load(f)
+            if meta.get("format") != MODEL_FORMAT_VERSION:
+                logger.warning(f"Intent classifier {version} has format {meta.get('format')} != {MODEL_FORMAT_VERSION}, ignoring")
+                return None
+            with np.load(model_dir / f"intent-{version}.npz", allow_pickle=False) as data:
+                weights = data["weights"]
+            return cls(weights, meta["labels"], version=version, metadata=meta)
+        except Exception as e:
+            logger.warning(f"Could not load intent classifier {version or '(current)'} from {model_dir}: {e}")
+            return None
+
+
+def _write_json(path: Path, payload: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def activate_version(version: str, model_dir: Path = MODEL_DIR) -> None:
+    """Make a saved version the one get_intent_classifier() loads"""
+    model_dir = Path(model_dir)
+    if not (model_dir / f"intent-{version}.npz").exists():
+        raise FileNotFoundError(f"No intent classifier {version} in {model_dir}")
+    _write_json(model_dir / CURRENT_FILE, {"version": version})
+
+
+def list_versions(model_dir: Path = MODEL_DIR) -> List[str]:
+    return sorted(p.stem[len("intent-"):] for p in Path(model_dir).glob("intent-*.npz"))
+
+
+# ---------- training ----------
+
+def train_intent_classifier(
+    texts: Sequence[str],
+    labels: Sequence[str],
+    n_features: int = DEFAULT_N_FEATURES,
+    epochs: int = 150,
+    learning_rate: float = 0.05,
+    l2: float = 1e-5,
+    balanced: bool = True,
+) -> IntentClassifier:
+    """
+    Fit the classifier on (query, intent) pairs
+
+    Full-batch Adam over the sparse features: the gradient of each class
+    column is one np.bincount over the non-zeros, so a few thousand logged
+    turns train in seconds on a CPU.
+    """
+    label_names = [intent for intent in INTENTS if intent in set(labels)]
+    label_names += sorted(set(labels) - set(label_names))
+    index = {name: i for i, name in enumerate(label_names)}
+    y = np.array([index[label] for label in labels], dtype=np.int64)
+    n, k = len(y), len(label_names)
+
+    indptr, cols, vals = _featurize_batch(texts, n_features)
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+
+    if balanced:
+        counts = np.bincount(y, minlength=k)
+        sample_weight = (n / (k * counts))[y]
+    else:
+        sample_weight = np.ones(n)
+    sample_weight = sample_weight / sample_weight.sum()
+
+    onehot = np.zeros((n, k))
+    onehot[np.arange(n), y] = 1.0
+    weights = np.zeros((n_features, k))
+    m = np.zeros_like(weights)
+    v = np.zeros_like(weights)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for step in range(1, epochs + 1):
+        logits = np.add.reduceat(weights[cols] * vals[:, None], indptr[:-1], axis=0)
+        residual = (_softmax(logits) - onehot) * sample_weight[:, None]
+        grad = np.stack([
+            np.bincount(cols, weights=residual[rows, c] * vals, minlength=n_features) for c in range(k)
+        ], axis=1)
+        grad += l2 * weights
+        m = beta1 * m + (1 - beta1) * grad
+        v = beta2 * v + (1 - beta2) * grad ** 2
+        weights -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+    logits = np.add.reduceat(weights[cols] * vals[:, None], indptr[:-1], axis=0)
+    train_accuracy = float((logits.argmax(axis=1) == y).mean()) if n else 0.0
+    return IntentClassifier(
+        weights.astype(np.float32),
+        label_names,
+        metadata={
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+            "train_examples": n,
+            "train_accuracy": round(train_accuracy, 4),
+            "class_counts": {name: int((y == i).sum()) for i, name in enumerate(label_names)},
+            "epochs": epochs,
+            "l2": l2,
+        },
+    )
+
+
+# ---------- serving ----------
+
+_intent_classifier = None
+_intent_classifier_loaded = False
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """Get the active classifier (loaded once), or None when disabled or not trained yet"""
+    global _intent_classifier, _intent_classifier_loaded
+    if not settings.intent_classifier_enabled:
+        return None
+    if not _intent_classifier_loaded:
+        _intent_classifier_loaded = True
+        model_dir = Path(settings.intent_classifier_dir) if settings.intent_classifier_dir else MODEL_DIR
+        _intent_classifier = IntentClassifier.load(model_dir=model_dir)
+        if _intent_classifier is not None:
+            logger.info(f"Loaded intent classifier {_intent_classifier.version} ({', '.join(_intent_classifier.labels)})")
+        else:
+            logger.info(f"No intent classifier in {model_dir}; routing uses the LLM classifier")
+    return _intent_classifier
+
+
+def classify_intent(query: str) -> Optional[Tuple[str, float]]:
+    """(intent, probability) from the local classifier, or None if it is unavailable or unsure"""
+    classifier = get_intent_classifier()
+    if classifier is None or not query.strip():
+        return None
+    intent, confidence = classifier.predict(query)
+    if confidence < settings.intent_classifier_threshold:
+        return None
+    return intent, confidence
+
+
+def classifier_info() -> Dict[str, Any]:
+    """Active model version and its recorded metrics, for the admin health endpoint"""
+    classifier = get_intent_classifier()
+    if classifier is None:
+        return {"active": False, "enabled": settings.intent_classifier_enabled}
+    meta = classifier.metadata
+    return {
+        "active": True,
+        "version": classifier.version,
+        "labels": classifier.labels,
+        "threshold": settings.intent_classifier_threshold,
+        "trained_at": meta.get("trained_at"),
+        "train_examples": meta.get("train_examples"),
+        "heldout": meta.get("heldout"),
+    }
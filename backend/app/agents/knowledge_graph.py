@@ -9,6 +9,7 @@ This module provides functions to:
 
 import logging
 from typing import List, Optional, Dict
+from app.circuit_breaker import get_circuit_breaker
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -287,6 +288,26 @@ def format_student_history(
     return "\n".join(parts)
 
 
+# Personalized PageRank ranker over CONCEPT_UNLOCKS (built on first use)
+_unlock_ranker = None
+
+
+def _get_unlock_ranker():
+    """Get or create the concept ranker for the CONCEPT_UNLOCKS graph"""
+    global _unlock_ranker
+    if _unlock_ranker is None:
+        from app.rag.concept_ranker import ConceptRanker
+        concept_ids = list(CONCEPT_NAMES) + [c for unlocks in CONCEPT_UNLOCKS.values() for c in unlocks]
+        edges = [(src, dst) for src, unlocks in CONCEPT_UNLOCKS.items() for dst in unlocks]
+        _unlock_ranker = ConceptRanker(concept_ids + list(CONCEPT_UNLOCKS), edges)
+    return _unlock_ranker
+
+
+def _get_prerequisites(concept_id: str) -> List[str]:
+    """Concepts that directly unlock concept_id"""
+    return [src for src, unlocks in CONCEPT_UNLOCKS.items() if concept_id in unlocks]
+
+
 def get_next_concepts(
     current_concept: str,
     mastery_scores: Dict[str, float],
@@ -295,6 +316,10 @@ def get_next_concepts(
     """
     Suggest next concepts to learn based on current concept and mastery.
     
+    Candidates are ranked by personalized PageRank along CONCEPT_UNLOCKS,
+    seeded by the current concept and discounted by mastery, so topics
+    several hops ahead can surface when the direct follow-ups are mastered.
+    
     Args:
         current_concept: The concept the student just learned about
         mastery_scores: Dict of concept_tag -> mastery_score
@@ -303,33 +328,40 @@ def get_next_concepts(
     Returns:
         List of dicts with concept info: [{id, name, reason, ready}]
     """
-    suggestions = []
+    if current_concept not in CONCEPT_UNLOCKS:
+        return []
     
-    # Get concepts that this one unlocks
-    unlocked = CONCEPT_UNLOCKS.get(current_concept, [])
+    # Over-fetch so mastered concepts can be filtered out
+    ranked = _get_unlock_ranker().rank(
+        [current_concept], mastery=mastery_scores, k=max_suggestions * 3, mode="next"
+    )
     
-    for concept_id in unlocked:
-        # Check if student has high mastery of prerequisites
-        current_mastery = mastery_scores.get(current_concept, 0.0)
+    suggestions = []
+    for concept_id, score in ranked:
         concept_mastery = mastery_scores.get(concept_id, 0.0)
         
         # Skip if already mastered
         if concept_mastery > 0.8:
             continue
         
-        # Check if ready (current concept mastered enough)
-        ready = current_mastery >= 0.5
+        # Ready when every direct prerequisite is mastered enough
+        prerequisites = _get_prerequisites(concept_id)
+        ready = all(mastery_scores.get(p, 0.0) >= 0.5 for p in prerequisites)
+        
+        # Explain via the current concept when it is a direct prerequisite
+        builds_on = current_concept if current_concept in prerequisites else (prerequisites[0] if prerequisites else current_concept)
         
         suggestions.append({
             "id": concept_id,
             "name": CONCEPT_NAMES.get(concept_id, concept_id),
-            "reason": f"Builds on {CONCEPT_NAMES.get(current_concept, current_concept)}",
+            "reason": f"Builds on {CONCEPT_NAMES.get(builds_on, builds_on)}",
             "ready": ready,
-            "current_mastery": concept_mastery
+            "current_mastery": concept_mastery,
+            "score": score
         })
     
-    # Sort by readiness and current mastery (prefer concepts student has started)
-    suggestions.sort(key=lambda x: (not x["ready"], -x["current_mastery"]))
+    # Ready concepts first, then by PageRank score (stable sort keeps rank order on ties)
+    suggestions.sort(key=lambda x: (not x["ready"], -x["score"]))
     
     return suggestions[:max_suggestions]
 
@@ -429,16 +461,17 @@ def get_recent_student_interactions(user_id: str, limit: int = 10) -> List[Dict]
         
         supabase = create_client(settings.supabase_url, settings.supabase_service_role_key)
         
-        # Fetch recent interactions for this student
-        response = supabase.table("interactions").select(
+        # Fetch recent interactions for this student (skipped while Supabase is failing)
+        query = supabase.table("interactions").select(
             "concept_focus, outcome, scaffolding_level, created_at, type"
         ).eq(
             "student_id", user_id
         ).order(
             "created_at", desc=True
-        ).limit(limit).execute()
+        ).limit(limit)
+        response = get_circuit_breaker("supabase").call(query.execute, degraded="skip")
         
-        if response.data:
+        if response is not None and response.data:
             logger.info(f"Fetched {len(response.data)} recent interactions for user {user_id[:8]}...")
             return response.data
         
@@ -469,11 +502,15 @@ def get_student_mastery_scores(user_id: str) -> Dict[str, float]:
         
         supabase = create_client(settings.supabase_url, settings.supabase_service_role_key)
         
-        response = supabase.table("student_mastery").select(
+        # While Supabase is failing, the student's last fetched scores are served
+        query = supabase.table("student_mastery").select(
             "concept_tag, mastery_score, last_assessed_at"
         ).eq(
             "user_id", user_id
-        ).execute()
+        )
+        response = get_circuit_breaker("supabase").call(
+            query.execute, degraded="cache", cache_key=("student_mastery", user_id)
+        )
         
         if response.data:
             return {
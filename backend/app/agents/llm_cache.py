@@ -0,0 +1,244 @@
+"""
+LLM Result Cache - Exact-prompt cache for internal, low-temperature calls
+
+Several internal calls repeat exactly: ReasoningEngine on the same query and
+history, the Supervisor's intent-classification prompt, ContextEngineer
+summaries of the same history prefix. Each repeat was billed and waited for
+again.
+
+LLMResultCache is a LangChain BaseCache, so a model opts in explicitly with
+`cache=get_llm_result_cache("<namespace>")` and LangChain does the rest:
+the cache key is a SHA-256 over the model's llm_string (model name,
+temperature, max tokens, stop, ...) and the serialised messages, so any
+change to the model, its parameters or the rendered prompt is a miss.
+User-facing answer models never get a cache, and streamed calls are not
+cached by LangChain.
+
+Entries live in Redis as llm:cache:<namespace>:<digest> with a TTL
+(settings.llm_cache_ttl_seconds). A per-namespace sorted set indexes the
+keys by write time and is trimmed to settings.llm_cache_max_entries, oldest
+first; entries over settings.llm_cache_max_entry_bytes are not stored. A
+namespace can pass a validator so failed outputs (e.g. reasoning text that
+is not JSON) are never cached. Redis errors count as misses; Redis calls go
+through the "redis" circuit breaker, which skips the cache while it is open.
+
+LLMCacheStats reports hits, misses and the estimated latency saved per
+namespace (hits x the average time of a miss).
+"""
+
+from hashlib import sha256
+from typing import Any, Callable, Dict, Optional, Sequence
+import json
+import logging
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+from app.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm:cache"
+MAX_PENDING = 1000  # Misses awaiting their update(), for latency estimates
+
+
+def _text(generation: Generation) -> str:
+    message = getattr(generation, "message", None)
+    content = message.content if message is not None else generation.text
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block) for block in content
+        )
+    return content if isinstance(content, str) else str(content)
+
+
+def looks_like_json(text: str) -> bool:
+    """Validator for calls whose output is parsed as a JSON object"""
+    return "{" in text and "}" in text
+
+
+class LLMCacheStats:
+    """Per-namespace hits, misses, writes and estimated latency saved"""
+
+    EMA_ALPHA = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, namespace: str) -> Dict[str, float]:
+        return self._namespaces.setdefault(namespace, {
+            "hits": 0, "misses": 0, "writes": 0, "rejected": 0, "errors": 0,
+            "avg_miss_ms": 0.0, "saved_ms": 0.0,
+        })
+
+    def record(self, namespace: str, event: str) -> None:
+        with self._lock:
+            entry = self._entry(namespace)
+            entry[event] += 1
+            if event == "hits":
+                entry["saved_ms"] += entry["avg_miss_ms"]
+
+    def record_call(self, namespace: str, ms: float) -> None:
+        """Duration of a call that missed the cache"""
+        with self._lock:
+            entry = self._entry(namespace)
+            if entry["avg_miss_ms"]:
+                entry["avg_miss_ms"] += self.EMA_ALPHA * (ms - entry["avg_miss_ms"])
+            else:
+                entry["avg_miss_ms"] = ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {}
+            for namespace, entry in sorted(self._namespaces.items()):
+                lookups = entry["hits"] + entry["misses"]
+                report[namespace] = {
+                    "hits": int(entry["hits"]),
+                    "misses": int(entry["misses"]),
+                    "hit_rate": round(entry["hits"] / lookups, 3) if lookups else 0.0,
+                    "writes": int(entry["writes"]),
+                    "rejected": int(entry["rejected"]),
+                    "errors": int(entry["errors"]),
+                    "avg_miss_ms": round(entry["avg_miss_ms"]),
+                    "latency_saved_seconds_est": round(entry["saved_ms"] / 1000, 1),
+                }
+            return report
+
+
+_llm_cache_stats = None
+
+
+def get_llm_cache_stats() -> LLMCacheStats:
+    """Get or create the process-wide LLM cache stats"""
+    global _llm_cache_stats
+    if _llm_cache_stats is None:
+        _llm_cache_stats = LLMCacheStats()
+    return _llm_cache_stats
+
+
+class LLMResultCache(BaseCache):
+    """Redis-backed exact-prompt cache for one namespace of internal calls"""
+
+    def __init__(self, namespace: str, validate: Optional[Callable[[str], bool]] = None):
+        self.namespace = namespace
+        self.validate = validate or (lambda text: bool(text.strip()))
+        self._index_key = f"{KEY_PREFIX}:{namespace}:index"
+        self._pending: Dict[str, float] = {}
+        self._breaker = get_circuit_breaker("redis")
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        digest = sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{self.namespace}:{digest}"
+
+    def _redis(self):
+        if self._breaker.state == "open":
+            return None
+        try:
+            from app.redis_client import get_redis_client
+            return get_redis_client()
+        except Exception as e:
+            self._mark_unavailable(e)
+            return None
+
+    def _mark_unavailable(self, error: Exception) -> None:
+        get_llm_cache_stats().record(self.namespace, "errors")
+        if isinstance(error, CircuitOpenError):
+            return
+        logger.warning(f"LLM cache ({self.namespace}): Redis unavailable, calling the model directly: {error}")
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        stats = get_llm_cache_stats()
+        key = self._key(prompt, llm_string)
+        client = self._redis()
+        raw = None
+        if client is not None:
+            try:
+                raw = self._breaker.call(client.get, key)
+            except Exception as e:
+                self._mark_unavailable(e)
+        if raw is None:
+            stats.record(self.namespace, "misses")
+            if len(self._pending) >= MAX_PENDING:
+                self._pending.clear()  # Calls that failed never reach update()
+            self._pending[key] = time.monotonic()
+            return None
+        try:
+            contents = json.loads(raw)
+        except ValueError:
+            stats.record(self.namespace, "misses")
+            return None
+        stats.record(self.namespace, "hits")
+        logger.debug(f"LLM cache hit ({self.namespace})")
+        return [ChatGeneration(message=AIMessage(content=content)) for content in contents]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        stats = get_llm_cache_stats()
+        key = self._key(prompt, llm_string)
+        started = self._pending.pop(key, None)
+        if started is not None:
+            stats.record_call(self.namespace, (time.monotonic() - started) * 1000)
+
+        if not return_val or not all(self.validate(_text(g)) for g in return_val):
+            stats.record(self.namespace, "rejected")
+            return
+        contents = [
+            g.message.content if isinstance(getattr(g, "message", None), AIMessage) else g.text
+            for g in return_val
+        ]
+        payload = json.dumps(contents, separators=(",", ":"))
+        if len(payload) > settings.llm_cache_max_entry_bytes:
+            stats.record(self.namespace, "rejected")
+            return
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            with client.pipeline(transaction=False) as pipe:
+                pipe.set(key, payload, ex=settings.llm_cache_ttl_seconds)
+                pipe.zadd(self._index_key, {key: time.time()})
+                pipe.expire(self._index_key, settings.llm_cache_ttl_seconds)
+                pipe.zcard(self._index_key)
+                size = self._breaker.call(pipe.execute)[-1]
+            overflow = size - settings.llm_cache_max_entries
+            if overflow > 0:
+                evicted = [member for member, _ in self._breaker.call(client.zpopmin, self._index_key, overflow)]
+                if evicted:
+                    self._breaker.call(client.delete, *evicted)
+            stats.record(self.namespace, "writes")
+        except Exception as e:
+            self._mark_unavailable(e)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drop every entry of this namespace"""
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            keys = self._breaker.call(client.zrange, self._index_key, 0, -1)
+            if keys:
+                self._breaker.call(client.delete, *keys)
+            self._breaker.call(client.delete, self._index_key)
+        except Exception as e:
+            self._mark_unavailable(e)
+
+
+_llm_result_caches: Dict[str, LLMResultCache] = {}
+
+
+def get_llm_result_cache(namespace: str, validate: Optional[Callable[[str], bool]] = None) -> Optional[LLMResultCache]:
+    """
+    Cache for an internal model's `cache=` argument, or None when caching is disabled
+
+    One instance per namespace; the validator of the first caller is kept.
+    """
+    if not settings.llm_cache_enabled:
+        return None
+    if namespace not in _llm_result_caches:
+        _llm_result_caches[namespace] = LLMResultCache(namespace, validate)
+    return _llm_result_caches[namespace]
@@ -11,62 +11,24 @@ Handles:
 """
 
 from typing import Dict, List, Optional
+from langchain_core.runnables import RunnableConfig
 import logging
 import time
-import re
 from app.agents.state import AgentState, MathDerivation
 from app.agents.supervisor import Supervisor
+from app.agents.graph_context import start_graph_lookup, collect_graph_context, build_graph_context_section
+from app.agents.answer_stream import AnswerStreamError, finish_interrupted_answer, stream_answer
+from app.agents.generation_budget import budget_for_state
+from app.agents.streaming_quality import QualityProbe, calculate_response_confidence
+from app.agents.model_cascade import finish_streamed, next_tier_model, tier_model, with_top_tier
+from app.agents.stream_events import publish_retrieval_started, publish_retrieval_completed, publish_sources
+from app.agents.text_matcher import MATH_TOPICS, scan_text  # Math topic patterns (shared matcher)
 from app.observability.langfuse_client import update_observation_with_usage
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 
-def strip_thinking_blocks(text: str) -> str:
-    """
-    Remove <thinking>...</thinking> blocks from response text.
-    These blocks are internal reasoning and should not be shown to users.
-    """
-    if not text:
-        return text
-    pattern = r'<thinking>.*?</thinking>\s*'
-    cleaned = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
-    cleaned = re.sub(r'</?thinking>\s*', '', cleaned, flags=re.IGNORECASE)
-    return cleaned.strip()
-
-
-# Math topic detection patterns
-MATH_TOPICS = {
-    "gradient_descent": [
-        r"gradient\s*descent", r"learning\s*rate", r"optimization",
-        r"minimize", r"gradient", r"step\s*size"
-    ],
-    "backpropagation": [
-        r"backprop", r"back\s*propagation", r"backward\s*pass",
-        r"chain\s*rule", r"error\s*propagation"
-    ],
-    "loss_functions": [
-        r"loss\s*function", r"cost\s*function", r"mse", r"mean\s*squared",
-        r"cross[\-\s]*entropy", r"error\s*function"
-    ],
-    "probability": [
-        r"bayes", r"probability", r"conditional", r"prior", r"posterior",
-        r"likelihood", r"naive\s*bayes"
-    ],
-    "linear_algebra": [
-        r"matrix", r"vector", r"transpose", r"inverse", r"dot\s*product",
-        r"eigenvalue", r"linear\s*regression"
-    ],
-    "derivatives": [
-        r"derivative", r"partial\s*derivative", r"differentiate",
-        r"calculus", r"slope", r"rate\s*of\s*change"
-    ],
-    "neural_networks": [
-        r"activation", r"sigmoid", r"relu", r"softmax", r"weights",
-        r"bias", r"neuron", r"layer"
-    ]
-}
-
-
 MATH_AGENT_PROMPT = """You are a mathematical reasoning specialist for COMP 237: Introduction to AI.
 Your role is to guide students through mathematical problems using a scaffolded, Socratic approach.
 Do NOT solve the problem for them immediately. Guide them to the solution.
@@ -148,16 +110,8 @@ def detect_math_topic(query: str) -> str:
     
     Returns the most likely topic or 'general_math'
     """
-    query_lower = query.lower()
-    
-    topic_scores = {}
-    for topic, patterns in MATH_TOPICS.items():
-        score = 0
-        for pattern in patterns:
-            if re.search(pattern, query_lower):
-                score += 1
-        if score > 0:
-            topic_scores[topic] = score
+    # Score = number of a topic's patterns that matched (one scan for all topics)
+    topic_scores = scan_text(query).counts.get("math_topic", {})
     
     if topic_scores:
         return max(topic_scores, key=topic_scores.get)
@@ -183,11 +137,12 @@ def create_derivation_structure(
     )
 
 
-def math_agent_node(state: AgentState) -> Dict:
+def math_agent_node(state: AgentState, config: Optional[RunnableConfig] = None) -> Dict:
     """
     Math Agent node for LangGraph
     
-    Specializes in mathematical explanations with step-by-step derivations
+    Specializes in mathematical explanations with step-by-step derivations.
+    The answer is streamed to the client as it is generated (see answer_stream).
     """
     logger.info("🔢 Math Agent: Processing mathematical query")
     start_time = time.time()
@@ -196,15 +151,23 @@ def math_agent_node(state: AgentState) -> Dict:
     query = state.get("effective_query") or state.get("query", "")
     retrieved_context = state.get("retrieved_context", [])
     
+    # Start concept graph lookups now so they overlap vector retrieval below
+    graph_lookup = start_graph_lookup(state.get("key_concepts_detected"), state.get("student_mastery_scores"), state)
+    
     # CRITICAL: Fetch RAG context if not already present
     # Math agent needs course materials for accurate mathematical explanations
     if not retrieved_context:
         logger.info("🔢 Math Agent: No context available - fetching from RAG")
-        from app.agents.sub_agents import RAGAgent
-        rag_agent = RAGAgent()
+        from app.agents.sub_agents import get_rag_agent
+        publish_retrieval_started()
+        rag_agent = get_rag_agent()
         retrieved_context = rag_agent.retrieve_context(query, state=state)  # Pass state for Langfuse tracing
+        publish_retrieval_completed()
         logger.info(f"🔢 Math Agent: Retrieved {len(retrieved_context)} documents")
     
+    # Citations go to the client now, while the answer is still to be generated
+    response_sources = publish_sources(retrieved_context)
+    
     # Create observation as child of root trace (v3 pattern)
     from app.observability.langfuse_client import create_child_span_from_state
     observation = create_child_span_from_state(
@@ -230,6 +193,14 @@ def math_agent_node(state: AgentState) -> Dict:
     
     context_str = "\n\n---\n\n".join(context_parts) if context_parts else "No course materials retrieved."
     
+    # Merge concept graph context (each lookup bounded by its own deadline)
+    graph_start = time.time()
+    graph_context = collect_graph_context(graph_lookup)
+    graph_section = build_graph_context_section(graph_context, query)
+    if graph_section:
+        context_str = f"{context_str}\n\n{graph_section}"
+    graph_time = (time.time() - graph_start) * 1000
+    
     # Build the prompt
     # Try to fetch prompt from Langfuse
     full_prompt = ""
@@ -260,25 +231,32 @@ def math_agent_node(state: AgentState) -> Dict:
     
     # Get the model - use Gemini Flash for math (good at reasoning)
     supervisor = Supervisor()
-    model = supervisor.get_model("gemini-flash")
+    cascade = with_top_tier(state.get("model_cascade"), "gemini-flash")  # Cheap tiers first (model_cascade.py)
+    model = supervisor.get_model(tier_model(cascade) if cascade else "gemini-flash")
+    next_model = next_tier_model(cascade)  # Regenerates an opening that fails the quality probe
+    escalate_to = supervisor.get_model(next_model) if next_model else None
+    budget = budget_for_state(state, "math")  # Length/thinking caps applied on the model call
+    # Opening checked on the stream (restarted if failing) instead of a quality_gate repair afterwards
+    quality = QualityProbe(state.get("intent") or "math") if settings.streaming_quality_enabled else None
+    quality_checked = False
     
+    first_token_ms = None
+    streamed_text = ""  # The generated answer, once streamed
+    fallback = f"I'd be happy to help with the mathematics of {math_topic.replace('_', ' ')}. Could you be more specific about what aspect you'd like me to explain?"
     try:
-        response = model.invoke(full_prompt)
-        # Handle Gemini 2.5+ list content format
-        raw_content = response.content if hasattr(response, 'content') else str(response)
-        if isinstance(raw_content, list):
-            text_parts = []
-            for block in raw_content:
-                if isinstance(block, dict) and block.get('type') == 'text':
-                    text_parts.append(block.get('text', ''))
-                elif isinstance(block, str):
-                    text_parts.append(block)
-            response_text = ''.join(text_parts)
-        else:
-            response_text = raw_content if isinstance(raw_content, str) else str(raw_content)
-        
-        # Strip <thinking> blocks from response - these are for internal reasoning
-        response_text = strip_thinking_blocks(response_text)
+        # Streamed token by token; thinking blocks are filtered incrementally and
+        # the returned text is the cleaned answer exactly as streamed
+        generation_start = time.time()
+        response_text, first_token_ms = stream_answer(
+            model, full_prompt, "math_agent", config, budget=budget, quality=quality,
+            escalate_to=escalate_to, deadline=state.get("deadline")
+        )
+        streamed_text = response_text
+        quality_checked = quality is not None
+        cascade = finish_streamed(cascade, time.time() - generation_start, len(response_text), quality)
+        if first_token_ms is not None:
+            first_token_ms += (generation_start - start_time) * 1000  # Measured from node start
+            logger.info(f"🔢 Math Agent: First token after {first_token_ms:.0f}ms")
         
         # Create a structured derivation object for state
         math_derivation = MathDerivation(
@@ -291,9 +269,17 @@ def math_agent_node(state: AgentState) -> Dict:
         
         logger.info(f"🔢 Math Agent: Generated explanation for '{math_topic}'")
         
+    except AnswerStreamError as e:
+        logger.error(f"Error in math agent: {e.__cause__ or e}")
+        # The fallback only if nothing was sent; otherwise the partial answer ends with a notice
+        response_text = finish_interrupted_answer(e.partial, fallback)
+        math_derivation = None
     except Exception as e:
         logger.error(f"Error in math agent: {e}")
-        response_text = f"I'd be happy to help with the mathematics of {math_topic.replace('_', ' ')}. Could you be more specific about what aspect you'd like me to explain?"
+        if streamed_text:
+            response_text = streamed_text  # The generated answer went out in full
+        else:
+            response_text = finish_interrupted_answer("", fallback)
         math_derivation = None
     
     # Calculate processing time
@@ -306,6 +292,7 @@ def math_agent_node(state: AgentState) -> Dict:
             output_data={
                 "math_topic": math_topic,
                 "response_length": len(response_text),
+                "time_to_first_token_ms": first_token_ms,
                 "response_preview": response_text[:200] + "..."
             },
             level="DEFAULT",
@@ -316,27 +303,33 @@ def math_agent_node(state: AgentState) -> Dict:
     # Update processing times
     processing_times = state.get("processing_times", {}) or {}
     processing_times["math_agent"] = processing_time
+    if first_token_ms is not None:
+        processing_times["math_agent_first_token"] = first_token_ms
+    if graph_lookup is not None:
+        processing_times["graph_context"] = graph_time  # Time spent waiting on graph lookups
     
     logger.info(f"🔢 Math Agent: Completed in {processing_time:.1f}ms")
     
-    # Build response_sources from retrieved_context
-    response_sources = []
-    for doc in retrieved_context[:5]:
-        source_file = doc.get("source_file") or doc.get("source_filename") or doc.get("metadata", {}).get("source_file", "Unknown")
-        if source_file and source_file != "Unknown":
-            response_sources.append({
-                "title": source_file,
-                "url": doc.get("public_url", ""),
-                "description": doc.get("preview", doc.get("content", "")[:100] if doc.get("content") else ""),
-                "relevance_score": doc.get("relevance_score", 0.0)
-            })
+    # Scored here when the streaming quality gate ran; the graph then skips quality_gate
+    quality_fields = {}
+    if quality_checked:
+        quality_fields = {
+            "quality_checked": True,
+            "quality_restarts": int(quality.restarted),
+            "quality_kept_failing": quality.kept_failing,
+            "response_confidence": calculate_response_confidence(response_text, state.get("intent") or "math", state),
+        }
     
     return {
         "response": response_text,
         "response_sources": response_sources,  # Include sources for frontend
         "math_explanation": response_text,
         "math_derivation": math_derivation,
-        "processing_times": processing_times
+        "generation_budget": budget.to_dict() if budget else None,
+        **quality_fields,
+        "model_cascade": cascade,
+        "processing_times": processing_times,
+        "deadline_skips": state.get("deadline_skips")
     }
 
 
@@ -0,0 +1,260 @@
+"""
+Model Cascade - Cheap-first model selection with escalation
+
+_intent_to_model picks one model per intent, so simple questions always pay
+for the routed model, and the repair loop reran that same model. With the
+cascade, the supervisor plans a list of tiers per turn: the cheap models
+configured for the intent (settings.model_cascade_tiers, available ones
+only) followed by the routed model. The turn starts on the cheapest tier
+whose recorded success rate is good enough, and moves up one tier when its
+answer fails:
+
+- agent path (coder, syllabus_query, explain, fast): quality_gate_node's
+  confidence check; the repair loop regenerates on the next tier
+- tutor / math: the streaming quality probe (streaming_quality.py); the
+  restarted opening is generated on the next tier
+
+The plan lives in state["model_cascade"] (a plain dict, see plan_cascade).
+CascadeStats records every attempt per intent and model - success rate,
+latency, estimated output cost - and the success rates feed back into
+where later turns start. A cheap tier below
+settings.model_cascade_min_success_rate is skipped, except for a small
+exploration share of turns so its rate can recover.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import logging
+import random
+import statistics
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough average for English answers
+
+# Approximate list price per 1M output tokens (USD), for cost estimates only
+OUTPUT_COST_PER_MTOK = {
+    "gemini-2.5-flash-lite": 0.40,
+    "gemini-flash": 2.50,
+    "gemini-2.0-flash": 0.40,
+    "gemini-2.5-flash": 2.50,
+    "gemini-tutor": 2.50,
+    "gpt-4.1-mini": 1.60,
+    "gpt-4o": 10.00,
+    "o3-mini": 4.40,
+    "groq-llama-70b": 0.79,
+    "groq-llama-8b": 0.08,
+    "ollama-mistral-7b": 0.0,
+    "ollama-qwen2-7b": 0.0,
+}
+DEFAULT_COST_PER_MTOK = 2.50
+
+
+def estimate_cost(model: str, output_chars: int) -> float:
+    tokens = output_chars / CHARS_PER_TOKEN
+    return tokens * OUTPUT_COST_PER_MTOK.get(model, DEFAULT_COST_PER_MTOK) / 1_000_000
+
+
+class CascadeStats:
+    """Per intent and model: attempts, success rate, latency, estimated cost"""
+
+    RECENT_TURNS = 200  # Window for per-intent latency percentiles
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._intents: Dict[str, Dict[str, Any]] = {}
+
+    def _model_entry(self, intent: str, model: str) -> Dict[str, float]:
+        return self._models.setdefault(intent, {}).setdefault(
+            model, {"attempts": 0, "accepted": 0, "seconds": 0.0, "cost": 0.0}
+        )
+
+    def record_attempt(self, intent: str, model: str, seconds: float, output_chars: int, accepted: bool) -> None:
+        with self._lock:
+            entry = self._model_entry(intent, model)
+            entry["attempts"] += 1
+            entry["accepted"] += int(accepted)
+            entry["seconds"] += seconds
+            entry["cost"] += estimate_cost(model, output_chars)
+
+    def record_turn(self, intent: str, seconds: float, escalations: int, cost: float) -> None:
+        with self._lock:
+            entry = self._intents.setdefault(intent, {
+                "turns": 0, "escalated": 0, "cost": 0.0,
+                "recent_seconds": deque(maxlen=self.RECENT_TURNS),
+            })
+            entry["turns"] += 1
+            entry["escalated"] += int(escalations > 0)
+            entry["cost"] += cost
+            entry["recent_seconds"].append(seconds)
+
+    def success_rate(self, intent: str, model: str) -> Optional[float]:
+        """Share of accepted answers, or None until min_samples attempts are recorded"""
+        with self._lock:
+            entry = self._models.get(intent, {}).get(model)
+            if not entry or entry["attempts"] < settings.model_cascade_min_samples:
+                return None
+            return entry["accepted"] / entry["attempts"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {}
+            for intent in sorted(set(self._models) | set(self._intents)):
+                turns = self._intents.get(intent, {})
+                recent: Deque[float] = turns.get("recent_seconds") or deque()
+                count = turns.get("turns", 0)
+                report[intent] = {
+                    "turns": count,
+                    "escalation_rate": round(turns.get("escalated", 0) / count, 3) if count else 0.0,
+                    "p50_seconds": round(statistics.median(recent), 2) if recent else None,
+                    "est_output_cost_usd": round(turns.get("cost", 0.0), 4),
+                    "models": {
+                        model: {
+                            "attempts": int(entry["attempts"]),
+                            "success_rate": round(entry["accepted"] / entry["attempts"], 3),
+                            "avg_seconds": round(entry["seconds"] / entry["attempts"], 2),
+                            "est_output_cost_usd": round(entry["cost"], 4),
+                        }
+                        for model, entry in self._models.get(intent, {}).items()
+                        if entry["attempts"]
+                    },
+                }
+            return report
+
+
+_cascade_stats = None
+
+
+def get_cascade_stats() -> CascadeStats:
+    """Get or create the process-wide cascade stats"""
+    global _cascade_stats
+    if _cascade_stats is None:
+        _cascade_stats = CascadeStats()
+    return _cascade_stats
+
+
+# ---------- per-turn plan ----------
+
+def plan_cascade(intent: str, routed_model: str, supervisor) -> Optional[Dict[str, Any]]:
+    """
+    Tiers for this turn: available cheap models for the intent, then the routed model
+
+    Returns None when the cascade is disabled. Intents without cheap tiers
+    still get a one-tier plan, so their latency and cost are reported too.
+    """
+    if not settings.model_cascade_enabled:
+        return None
+    cheap = [
+        model for model in settings.model_cascade_tiers.get(intent, [])
+        if model != routed_model and supervisor.is_available(model)
+    ]
+    stats = get_cascade_stats()
+    start = 0
+    for model in cheap:
+        rate = stats.success_rate(intent, model)
+        if rate is None or rate >= settings.model_cascade_min_success_rate:
+            break
+        if random.random() < settings.model_cascade_explore_rate:
+            logger.debug(f"Cascade: exploring {model} for {intent} (success rate {rate:.2f})")
+            break
+        start += 1
+    return {
+        "intent": intent,
+        "tiers": cheap + [routed_model],
+        "tier": start,
+        "seconds": 0.0,  # Time spent on the current tier
+        "spent_seconds": 0.0,  # Time spent on tiers that were escalated from
+        "spent_cost": 0.0,
+        "escalations": 0,
+        "done": False,
+    }
+
+
+def with_top_tier(cascade: Optional[Dict[str, Any]], model: str) -> Optional[Dict[str, Any]]:
+    """Replace the routed (last) tier, for nodes that always answer with a fixed model (tutor, math)"""
+    if not cascade or cascade["tiers"][-1] == model:
+        return cascade
+    cheap = [tier for tier in cascade["tiers"][:-1] if tier != model]
+    return {**cascade, "tiers": cheap + [model], "tier": min(cascade["tier"], len(cheap))}
+
+
+def tier_model(cascade: Dict[str, Any]) -> str:
+    """Model for the cascade's current tier"""
+    return cascade["tiers"][cascade["tier"]]
+
+
+def can_escalate(cascade: Optional[Dict[str, Any]]) -> bool:
+    return bool(cascade) and not cascade["done"] and cascade["tier"] < len(cascade["tiers"]) - 1
+
+
+def next_tier_model(cascade: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Model an escalation would move to, or None at the top tier"""
+    return cascade["tiers"][cascade["tier"] + 1] if can_escalate(cascade) else None
+
+
+def add_seconds(cascade: Optional[Dict[str, Any]], seconds: float) -> Optional[Dict[str, Any]]:
+    """Count generation time against the current tier"""
+    if not cascade:
+        return cascade
+    return {**cascade, "seconds": cascade["seconds"] + seconds}
+
+
+def escalate(cascade: Dict[str, Any], output_chars: int, reason: str) -> Dict[str, Any]:
+    """Record a failed attempt on the current tier and move to the next one"""
+    model = tier_model(cascade)
+    get_cascade_stats().record_attempt(cascade["intent"], model, cascade["seconds"], output_chars, accepted=False)
+    escalated = {
+        **cascade,
+        "tier": cascade["tier"] + 1,
+        "seconds": 0.0,
+        "spent_seconds": cascade["spent_seconds"] + cascade["seconds"],
+        "spent_cost": cascade["spent_cost"] + estimate_cost(model, output_chars),
+        "escalations": cascade["escalations"] + 1,
+    }
+    logger.info(f"⏫ Cascade: {cascade['intent']} escalating {model} → {tier_model(escalated)} ({reason})")
+    return escalated
+
+
+def accept(cascade: Optional[Dict[str, Any]], output_chars: int) -> Optional[Dict[str, Any]]:
+    """Record the final answer's attempt and the turn (once per turn)"""
+    if not cascade or cascade["done"]:
+        return cascade
+    model = tier_model(cascade)
+    stats = get_cascade_stats()
+    stats.record_attempt(cascade["intent"], model, cascade["seconds"], output_chars, accepted=True)
+    stats.record_turn(
+        cascade["intent"],
+        cascade["spent_seconds"] + cascade["seconds"],
+        cascade["escalations"],
+        cascade["spent_cost"] + estimate_cost(model, output_chars),
+    )
+    return {**cascade, "done": True}
+
+
+def finish_streamed(
+    cascade: Optional[Dict[str, Any]],
+    seconds: float,
+    output_chars: int,
+    quality=None
+) -> Optional[Dict[str, Any]]:
+    """
+    Record a tutor/math turn streamed by stream_answer
+
+    If the quality probe restarted the answer on the next tier, the first
+    attempt is recorded as failed and the rest is accepted on the next tier.
+    Without a probe the answer is left for quality_gate_node to judge.
+    """
+    if not cascade:
+        return cascade
+    if quality is not None and quality.restarted and can_escalate(cascade):
+        cascade = add_seconds(cascade, quality.restart_seconds)
+        cascade = escalate(cascade, len(quality.text), quality.reason or "quality_probe")
+        seconds -= quality.restart_seconds
+    cascade = add_seconds(cascade, seconds)
+    if quality is None:
+        return cascade
+    return accept(cascade, output_chars)
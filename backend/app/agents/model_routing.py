@@ -0,0 +1,321 @@
+"""
+Latency-Aware Routing - Pick each intent's model by live latency and errors
+
+_intent_to_model maps intents to models statically, but Groq, GitHub Models
+and Gemini latency and error rates swing during the day. Every chat model
+the Supervisor builds carries a ModelLatencyCallback, which records per
+call the time to first token (streamed calls), output tokens/sec and
+whether the call failed. Samples go to a capped Redis list per provider
+model (model:latency:{model_id}), so every worker routes on the same
+picture; a worker-local window is used while Redis is unreachable (the
+"redis" circuit breaker, app/circuit_breaker.py, is open or a call fails).
+
+choose_model() then picks, among the intent's allowed models
+(settings.model_routing_candidates) that are available and under the
+cost ceiling, the one with the lowest expected latency:
+
+    (ttft + expected output tokens / tokens per sec) / (1 - error rate)
+
+The static choice is kept unless another model is clearly faster
+(ROUTING_MARGIN) or the static model has no recent samples to compare.
+Models without enough recent samples are tried on a small share of turns
+so they get measured.
+
+Routing mode ("adaptive" / "static") defaults to
+settings.adaptive_routing_enabled and can be overridden at runtime for
+all workers from the admin API (set_routing_mode).
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough average for English answers
+ROUTING_MARGIN = 0.85  # Switch only if expected latency is below this share of the static model's
+MIN_ERROR_FACTOR = 0.05  # Floor for (1 - error rate), so failing models get a large finite penalty
+STATS_CACHE_S = 5.0  # Reuse aggregated stats for this long before re-reading Redis
+ROUTING_MODE_KEY = "model:routing:mode"
+ROUTING_MODES = ("adaptive", "static")
+
+
+def _samples_key(model_id: str) -> str:
+    return f"model:latency:{model_id}"
+
+
+def model_id_of(model: Any) -> Optional[str]:
+    """Provider model id of a LangChain chat model (aliases share one id)"""
+    name = getattr(model, "model_name", None) or getattr(model, "model", None)
+    if not isinstance(name, str):
+        return None
+    return name.removeprefix("models/")
+
+
+# ---------- stats ----------
+
+class ModelLatencyStats:
+    """Rolling per-model latency samples, shared through Redis"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._breaker = get_circuit_breaker("redis")
+
+    def _redis(self):
+        if self._breaker.state == "open":
+            return None
+        try:
+            from app.redis_client import get_redis_client
+            return get_redis_client()
+        except Exception as e:
+            self._mark_unavailable(e)
+            return None
+
+    def _mark_unavailable(self, error: Exception) -> None:
+        if isinstance(error, CircuitOpenError):
+            return
+        logger.warning(f"Model latency stats: Redis unavailable, using worker-local samples: {error}")
+
+    def record(self, model_id: str, ttft_ms: Optional[float], tokens_per_sec: Optional[float], error: bool) -> None:
+        sample = {"t": round(time.time(), 1), "ttft": ttft_ms, "tps": tokens_per_sec, "err": int(error)}
+        with self._lock:
+            self._local.setdefault(model_id, deque(maxlen=settings.model_routing_max_samples)).appendleft(sample)
+            self._cache.pop(model_id, None)
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            with client.pipeline(transaction=False) as pipe:
+                pipe.lpush(_samples_key(model_id), json.dumps(sample, separators=(",", ":")))
+                pipe.ltrim(_samples_key(model_id), 0, settings.model_routing_max_samples - 1)
+                pipe.expire(_samples_key(model_id), settings.model_routing_window_seconds)
+                self._breaker.call(pipe.execute)
+        except Exception as e:
+            self._mark_unavailable(e)
+
+    def _samples(self, model_id: str) -> List[Dict[str, Any]]:
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = self._breaker.call(client.lrange, _samples_key(model_id), 0, settings.model_routing_max_samples - 1)
+                return [json.loads(item) for item in raw]
+            except Exception as e:
+                self._mark_unavailable(e)
+        with self._lock:
+            return list(self._local.get(model_id, ()))
+
+    def get(self, model_id: str) -> Dict[str, Any]:
+        """Aggregates over the window: samples, p50 TTFT, median tokens/sec, error rate"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(model_id)
+            if cached and now - cached[0] < STATS_CACHE_S:
+                return cached[1]
+        cutoff = time.time() - settings.model_routing_window_seconds
+        samples = [s for s in self._samples(model_id) if s.get("t", 0) >= cutoff]
+        ttfts = [s["ttft"] for s in samples if s.get("ttft") is not None and not s.get("err")]
+        rates = [s["tps"] for s in samples if s.get("tps") and not s.get("err")]
+        aggregate = {
+            "samples": len(samples),
+            "ttft_ms_p50": round(statistics.median(ttfts)) if ttfts else None,
+            "tokens_per_sec": round(statistics.median(rates), 1) if rates else None,
+            "error_rate": round(sum(s.get("err", 0) for s in samples) / len(samples), 3) if samples else None,
+        }
+        with self._lock:
+            self._cache[model_id] = (now, aggregate)
+        return aggregate
+
+
+_model_latency_stats = None
+
+
+def get_model_latency_stats() -> ModelLatencyStats:
+    """Get or create the process-wide model latency stats"""
+    global _model_latency_stats
+    if _model_latency_stats is None:
+        _model_latency_stats = ModelLatencyStats()
+    return _model_latency_stats
+
+
+class ModelLatencyCallback(BaseCallbackHandler):
+    """Records TTFT, tokens/sec and errors for one chat model's calls"""
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        self._runs: Dict[UUID, List[Any]] = {}  # run_id -> [start, first token time, streamed chars]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._runs[run_id] = [time.time(), None, 0]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs) -> None:
+        run = self._runs.get(run_id)
+        if run is None or not token:
+            return
+        if run[1] is None:
+            run[1] = time.time()
+        run[2] += len(token)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, first_token, streamed_chars = run
+        tokens = _output_tokens(response) or (streamed_chars // CHARS_PER_TOKEN)
+        self._record(start, first_token, tokens, error=False)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, first_token, streamed_chars = run
+        # A stream closed by us (budget stop, quality restart, cancelled turn) is not a model failure
+        stopped_by_us = not isinstance(error, Exception)
+        self._record(start, first_token, streamed_chars // CHARS_PER_TOKEN, error=not stopped_by_us)
+
+    def _record(self, start: float, first_token: Optional[float], tokens: int, error: bool) -> None:
+        try:
+            end = time.time()
+            ttft_ms = (first_token - start) * 1000 if first_token else None
+            generating = end - (first_token or start)
+            tokens_per_sec = tokens / generating if tokens and generating > 0 else None
+            get_model_latency_stats().record(self.model_id, ttft_ms, tokens_per_sec, error)
+        except Exception as e:
+            logger.debug(f"Could not record latency for {self.model_id}: {e}")
+
+
+def _output_tokens(response: Any) -> Optional[int]:
+    """Output token count from an LLMResult's usage metadata, if the provider sent it"""
+    try:
+        message = response.generations[0][0].message
+        usage = getattr(message, "usage_metadata", None) or {}
+        return usage.get("output_tokens")
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+# ---------- routing ----------
+
+_routing_mode_cache: Tuple[float, Optional[str]] = (0.0, None)
+
+
+def get_routing_mode() -> str:
+    """'adaptive' or 'static' - the runtime override if one is set, else the setting"""
+    global _routing_mode_cache
+    checked_at, override = _routing_mode_cache
+    if time.monotonic() - checked_at >= STATS_CACHE_S:
+        client = get_model_latency_stats()._redis()
+        override = None
+        if client is not None:
+            try:
+                override = get_circuit_breaker("redis").call(client.get, ROUTING_MODE_KEY)
+            except Exception as e:
+                get_model_latency_stats()._mark_unavailable(e)
+        _routing_mode_cache = (time.monotonic(), override)
+    if override in ROUTING_MODES:
+        return override
+    return "adaptive" if settings.adaptive_routing_enabled else "static"
+
+
+def set_routing_mode(mode: Optional[str]) -> None:
+    """Override the routing mode on all workers; None clears the override"""
+    global _routing_mode_cache
+    from app.redis_client import get_redis_client
+    if mode is None:
+        get_redis_client().delete(ROUTING_MODE_KEY)
+    elif mode in ROUTING_MODES:
+        get_redis_client().set(ROUTING_MODE_KEY, mode)
+    else:
+        raise ValueError(f"Unknown routing mode: {mode}")
+    _routing_mode_cache = (0.0, None)  # Re-read on the next routing decision
+
+
+def expected_seconds(stats: Dict[str, Any], expected_tokens: int) -> Optional[float]:
+    """Expected time for an answer of expected_tokens, or None without enough data"""
+    if stats["samples"] < settings.model_routing_min_samples or not stats["tokens_per_sec"]:
+        return None
+    ttft_s = (stats["ttft_ms_p50"] or 0) / 1000
+    generation_s = expected_tokens / stats["tokens_per_sec"]
+    return (ttft_s + generation_s) / max(MIN_ERROR_FACTOR, 1 - (stats["error_rate"] or 0))
+
+
+def rank_candidates(intent: str, static_model: str, supervisor, expected_tokens: int) -> List[Dict[str, Any]]:
+    """The intent's candidate models with their stats and expected latency"""
+    from app.agents.model_cascade import OUTPUT_COST_PER_MTOK, DEFAULT_COST_PER_MTOK
+
+    names = [static_model] + [m for m in settings.model_routing_candidates.get(intent, []) if m != static_model]
+    latency_stats = get_model_latency_stats()
+    ranked = []
+    for name in names:
+        cost = OUTPUT_COST_PER_MTOK.get(name, DEFAULT_COST_PER_MTOK)
+        model_id = model_id_of(supervisor.get_model(name)) if supervisor.is_available(name) else None
+        stats = latency_stats.get(model_id) if model_id else None
+        ranked.append({
+            "model": name,
+            "model_id": model_id,
+            "available": model_id is not None,
+            "within_cost": name == static_model or cost <= settings.model_routing_max_cost_per_mtok,
+            "cost_per_mtok": cost,
+            "stats": stats,
+            "expected_seconds": expected_seconds(stats, expected_tokens) if stats else None,
+        })
+    return ranked
+
+
+def choose_model(intent: str, static_model: str, supervisor, expected_tokens: int) -> Tuple[str, str]:
+    """(model, reason): the static model unless an allowed model is clearly faster"""
+    if get_routing_mode() != "adaptive":
+        return static_model, "static routing"
+    ranked = rank_candidates(intent, static_model, supervisor, expected_tokens)
+    eligible = [c for c in ranked if c["available"] and c["within_cost"]]
+    unmeasured = [c for c in eligible if c["expected_seconds"] is None and c["model"] != static_model]
+    if unmeasured and random.random() < settings.model_routing_explore_rate:
+        pick = random.choice(unmeasured)
+        return pick["model"], "measuring latency"
+    static = ranked[0]
+    measured = [c for c in eligible if c["expected_seconds"] is not None]
+    if not measured or static["expected_seconds"] is None:
+        return static_model, "static routing (no latency data to compare)"
+    best = min(measured, key=lambda c: c["expected_seconds"])
+    if best["model"] != static_model and best["expected_seconds"] < static["expected_seconds"] * ROUTING_MARGIN:
+        return best["model"], (
+            f"expected {best['expected_seconds']:.1f}s vs {static['expected_seconds']:.1f}s on {static_model}"
+        )
+    return static_model, f"static model is fastest (expected {static['expected_seconds']:.1f}s)"
+
+
+def routing_table(supervisor) -> Dict[str, Any]:
+    """Current routing per intent: static model, candidates with stats, and the pick"""
+    from app.agents.generation_budget import get_expected_length_range
+
+    table = {}
+    for intent in ["tutor", "math", "coder", "syllabus_query", "explain", "fast"]:
+        static_model = supervisor._static_intent_model(intent)
+        expected_tokens = get_expected_length_range(intent, False)[1] // CHARS_PER_TOKEN
+        ranked = rank_candidates(intent, static_model, supervisor, expected_tokens)
+        eligible = [c for c in ranked if c["available"] and c["within_cost"] and c["expected_seconds"] is not None]
+        best = min(eligible, key=lambda c: c["expected_seconds"]) if eligible else None
+        table[intent] = {
+            "static_model": static_model,
+            "fastest_measured": best["model"] if best else None,
+            "expected_tokens": expected_tokens,
+            "candidates": ranked,
+        }
+    return {
+        "mode": get_routing_mode(),
+        "max_cost_per_mtok": settings.model_routing_max_cost_per_mtok,
+        "window_seconds": settings.model_routing_window_seconds,
+        "intents": table,
+    }
@@ -10,30 +10,26 @@ Based on:
 """
 
 from typing import Dict, List, Optional
+from langchain_core.runnables import RunnableConfig
 import logging
 import time
 import re
 from app.agents.state import AgentState, ThinkingStep, ScaffoldingLevel, PedagogicalApproach
 from app.agents.supervisor import Supervisor
+from app.agents.graph_context import start_graph_lookup, collect_graph_context, build_graph_context_section
+from app.agents.answer_stream import AnswerStreamError, emit_answer_delta, finish_interrupted_answer, stream_answer
+from app.agents.generation_budget import budget_for_state
+from app.agents.streaming_quality import QualityProbe, calculate_response_confidence
+from app.agents.model_cascade import finish_streamed, next_tier_model, tier_model, with_top_tier
+from app.agents.stream_events import publish_retrieval_started, publish_retrieval_completed, publish_sources
+from app.agents.text_matcher import CONCEPT_PATTERNS, scan_text  # Concept patterns shared with evaluator
 from app.observability.langfuse_client import update_observation_with_usage
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
-
-# Concept detection patterns (shared with evaluator)
-CONCEPT_PATTERNS = {
-    "backpropagation": r"\b(backprop\w*|back.?propagation|chain.?rule|error.?propagation)\b",
-    "gradient_descent": r"\b(gradient.?descent|learning.?rate|optimization|minimize|converge)\b",
-    "neural_networks": r"\b(neural.?network\w*|perceptron|hidden.?layer|deep.?learning|ann)\b",
-    "classification": r"\b(classification|classify|classifier|decision.?tree|knn|k-nearest|svm|support.?vector|naive.?bayes)\b",
-    "regression": r"\b(regression|regress\w*|linear.?model|polynomial|predict.*(continuous|number|value))\b",
-    "clustering": r"\b(cluster\w*|k-?means|hierarchical|unsupervised|grouping)\b",
-    "probability": r"\b(bayes|probability|prior|posterior|conditional|likelihood)\b",
-    "supervised_learning": r"\b(supervised|labeled.?data|training.?labels|target.?variable)\b",
-    "unsupervised_learning": r"\b(unsupervised|unlabeled|clustering|dimensionality)\b",
-    "model_evaluation": r"\b(accuracy|precision|recall|f1|confusion.?matrix|cross.?validation|overfit\w*)\b",
-}
+# Sent when generation fails before any of the answer was streamed
+TUTOR_FALLBACK = "I'd love to help you understand this concept. Could you tell me more about what's confusing you?"
 
 
 async def get_student_mastery(user_id: str, concept_tag: str) -> Optional[float]:
@@ -79,11 +75,7 @@ async def get_student_mastery(user_id: str, concept_tag: str) -> Optional[float]
 
 def detect_concept_from_query(query: str) -> Optional[str]:
     """Detect AI/ML concept from query text"""
-    query_lower = query.lower()
-    for concept, pattern in CONCEPT_PATTERNS.items():
-        if re.search(pattern, query_lower, re.IGNORECASE):
-            return concept
-    return None
+    return scan_text(query).first("concept")
 
 
 # Confusion detection patterns
@@ -136,79 +128,6 @@ DETAILED_ANSWER_PATTERNS = [
 ]
 
 
-def strip_thinking_blocks(text: str) -> str:
-    """
-    Remove <thinking>...</thinking> blocks from response text.
-    
-    These blocks are internal reasoning from the LLM and should NOT
-    be shown to users. They also cause Markdown parser errors in the frontend.
-    
-    Args:
-        text: Raw response from LLM
-        
-    Returns:
-        Cleaned text with thinking blocks removed
-    """
-    if not text:
-        return text
-    
-    # Pattern matches <thinking>...</thinking> including newlines
-    pattern = r'<thinking>.*?</thinking>\s*'
-    cleaned = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Also strip any leftover standalone tags
-    cleaned = re.sub(r'</?thinking>\s*', '', cleaned, flags=re.IGNORECASE)
-    
-    # Strip leading whitespace that may remain
-    return cleaned.strip()
-
-
-def strip_scaffolding_labels(text: str) -> str:
-    """
-    Remove visible scaffolding labels from response text.
-    
-    Labels like **Activation:**, **Exploration:**, **Guidance:** are internal
-    pedagogical structure and make responses feel robotic when visible.
-    
-    UPDATED (Dec 2025): These are internal framework labels, not user-facing.
-    
-    Args:
-        text: Response text potentially containing scaffolding labels
-        
-    Returns:
-        Cleaned text with scaffolding labels removed
-    """
-    if not text:
-        return text
-    
-    # Remove common scaffolding labels (with or without markdown bold)
-    scaffolding_patterns = [
-        r'\*\*Activation:\*\*\s*',
-        r'\*\*Exploration:\*\*\s*',
-        r'\*\*Guidance:\*\*\s*',
-        r'\*\*Challenge:\*\*\s*',
-        r'\*\*Verification:\*\*\s*',
-        r'\*\*Connection:\*\*\s*',
-        r'\*\*Understanding:\*\*\s*',
-        r'Activation:\s*',
-        r'Exploration:\s*',
-        r'Guidance:\s*',
-        r'Challenge:\s*',
-        r'Verification:\s*',
-        r'Connection:\s*',
-        r'Understanding:\s*',
-    ]
-    
-    cleaned = text
-    for pattern in scaffolding_patterns:
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
-    
-    # Clean up any resulting double newlines
-    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
-    
-    return cleaned.strip()
-
-
 def detect_depth_preference(query: str) -> Optional[str]:
     """
     Detect if user has indicated a preference for quick vs detailed answer.
@@ -473,12 +392,13 @@ def generate_thinking_steps(query: str, context: List[dict]) -> List[ThinkingSte
     return steps
 
 
-def pedagogical_tutor_node(state: AgentState) -> Dict:
+def pedagogical_tutor_node(state: AgentState, config: Optional[RunnableConfig] = None) -> Dict:
     """
     Pedagogical Tutor node for LangGraph
     
     Implements Socratic scaffolding with stochastic exploration.
     For follow-ups, uses lighter scaffolding to avoid verbose responses.
+    The answer is streamed to the client as it is generated (see answer_stream).
     """
     logger.info("📚 Pedagogical Tutor: Analyzing student query")
     start_time = time.time()
@@ -496,15 +416,23 @@ def pedagogical_tutor_node(state: AgentState) -> Dict:
     if is_follow_up:
         logger.info(f"📚 Tutor: FOLLOW-UP detected (length_hint={response_length_hint}) - using lighter scaffolding")
     
+    # Start concept graph lookups now so they overlap vector retrieval below
+    graph_lookup = start_graph_lookup(state.get("key_concepts_detected"), state.get("student_mastery_scores"), state)
+    
     # CRITICAL: Fetch RAG context if not already present
     # The pedagogical tutor needs course materials to provide accurate information
     if not retrieved_context:
         logger.info("📚 Tutor: No context available - fetching from RAG")
-        from app.agents.sub_agents import RAGAgent
-        rag_agent = RAGAgent()
+        from app.agents.sub_agents import get_rag_agent
+        publish_retrieval_started()
+        rag_agent = get_rag_agent()
         retrieved_context = rag_agent.retrieve_context(query, state=state)  # Pass state for Langfuse tracing
+        publish_retrieval_completed()
         logger.info(f"📚 Tutor: Retrieved {len(retrieved_context)} documents")
     
+    # Citations go to the client now, while the answer is still to be generated
+    response_sources = publish_sources(retrieved_context)
+    
     # Early check: Practice problem requested without context
     practice_keywords = ["practice", "problem", "quiz", "test", "exercise", "try"]
     is_practice_request = any(kw in query_lower for kw in practice_keywords)
@@ -523,6 +451,7 @@ def pedagogical_tutor_node(state: AgentState) -> Dict:
 - Natural Language Processing (text processing, sentiment analysis)
 
 Which area interests you?"""
+        emit_answer_delta(practice_prompt)
         
         return {
             "response": practice_prompt,
@@ -570,6 +499,7 @@ Which area interests you?"""
             )
             observation.end()
         
+        emit_answer_delta(diagnostic_question)
         return {
             "response": diagnostic_question,
             "diagnostic_asked": True,
@@ -630,21 +560,27 @@ Which area interests you?"""
     
     context_str = "\n\n---\n\n".join(context_parts) if context_parts else "No course materials found."
     
+    # Merge concept graph context (each lookup bounded by its own deadline)
+    graph_start = time.time()
+    graph_context = collect_graph_context(graph_lookup)
+    graph_section = build_graph_context_section(graph_context, query)
+    if graph_section:
+        context_str = f"{context_str}\n\n{graph_section}"
+    graph_time = (time.time() - graph_start) * 1000
+    
     # Step 6: Generate response using adaptive prompt builder
     supervisor = Supervisor()
-    model = supervisor.get_model("gemini-flash")  # Use fast model but with high temperature for exploration
+    # Cheap cascade tiers first (model_cascade.py); the top tier is the fast model with high temperature for exploration
+    cascade = with_top_tier(state.get("model_cascade"), "gemini-flash")
+    model = supervisor.get_model(tier_model(cascade) if cascade else "gemini-flash")
+    next_model = next_tier_model(cascade)  # Regenerates an opening that fails the quality probe
+    escalate_to = supervisor.get_model(next_model) if next_model else None
     
     # Detect frustrated/negation follow-ups (e.g., "no", "still don't get it")
     # These require ULTRA-SHORT clarification mode
     is_frustrated_followup = False
     if is_follow_up:
-        frustrated_patterns = [
-            r"^no\.?!?$", r"^nope\.?!?$", r"^not\s+really\.?$",
-            r"^(i\s+)?still\s+(don'?t|can'?t)\s+(get|understand)",
-            r"^(that|it|this)\s+(doesn'?t|don'?t)\s+make\s+sense",
-            r"^(i'?m\s+)?(still\s+)?confused\.?!?$", r"^huh\??$", r"^what\??$",
-        ]
-        is_frustrated_followup = any(re.search(p, query_lower, re.IGNORECASE) for p in frustrated_patterns)
+        is_frustrated_followup = scan_text(query_lower).has("frustrated")
     
     # Add scaffolding guidance to prompt - LIGHTER for follow-ups, ULTRA-LIGHT for frustrated follow-ups
     if is_frustrated_followup:
@@ -774,96 +710,111 @@ Remember: Match your tone and depth to the student's needs. Sound like a helpful
         )
         logger.info("📚 Tutor: Using adaptive prompt builder for context-aware response")
     
+    first_token_ms = None
+    streamed_text = ""  # The generated answer, once streamed
+    budget = budget_for_state(state, "tutor")  # Length/thinking caps applied on the model call
+    # Opening checked on the stream (restarted if failing) instead of a quality_gate repair afterwards
+    quality = QualityProbe(state.get("intent") or "tutor") if settings.streaming_quality_enabled else None
+    quality_checked = False
     try:
         # Use higher temperature for stochastic exploration
-        response = model.invoke(full_prompt)
-        
-        # Handle Gemini 2.5+ list content format (after tool calls)
-        # Content can be a list of blocks: [{'type': 'text', 'text': '...'}]
-        raw_content = response.content if hasattr(response, 'content') else str(response)
-        if isinstance(raw_content, list):
-            text_parts = []
-            for block in raw_content:
-                if isinstance(block, dict) and block.get('type') == 'text':
-                    text_parts.append(block.get('text', ''))
-                elif isinstance(block, str):
-                    text_parts.append(block)
-            response_text = ''.join(text_parts)
-        else:
-            response_text = raw_content if isinstance(raw_content, str) else str(raw_content)
-        
-        # CRITICAL: Strip <thinking> blocks from response - these are for internal reasoning
-        # and should NOT be shown to the user (causes Markdown parser errors in frontend)
-        response_text = strip_thinking_blocks(response_text)
-        
-        # CRITICAL: Strip visible scaffolding labels (Activation/Exploration/Guidance)
-        # These are internal pedagogical structure and make responses feel robotic
-        response_text = strip_scaffolding_labels(response_text)
+        # Streamed token by token; thinking blocks and labels are filtered incrementally
+        generation_start = time.time()
+        response_text, first_token_ms = stream_answer(
+            model, full_prompt, "pedagogical_tutor", config, strip_labels=True, budget=budget, quality=quality,
+            escalate_to=escalate_to, deadline=state.get("deadline")
+        )
+        # Free of <thinking> blocks (internal reasoning that breaks the frontend
+        # Markdown parser) and scaffolding labels - exactly what was streamed
+        # (see AnswerStreamFilter)
+        streamed_text = response_text
+        quality_checked = quality is not None
+        cascade = finish_streamed(cascade, time.time() - generation_start, len(response_text), quality)
+        if first_token_ms is not None:
+            first_token_ms += (generation_start - start_time) * 1000  # Measured from node start
+            logger.info(f"📚 Tutor: First token after {first_token_ms:.0f}ms")
         
         logger.info(f"📚 Tutor: Using {scaffolding_level} scaffolding, {pedagogical_approach} approach")
         
-        # Step 8: Add "next concepts" suggestions from knowledge graph
-        # SKIP for follow-ups to keep responses focused
-        if detected_concept and user_id and not is_follow_up:
-            try:
-                from app.agents.knowledge_graph import (
-                    get_next_concepts, 
-                    format_next_concepts_message,
-                    get_student_mastery_all
-                )
-                import asyncio
-                
-                # Get all mastery scores
+        # Suggestions, diagram and quiz are appended after the streamed answer;
+        # if this fails the client keeps exactly the streamed answer
+        try:
+            # Step 8: Add "next concepts" suggestions from knowledge graph
+            # SKIP for follow-ups to keep responses focused
+            if detected_concept and user_id and not is_follow_up:
                 try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        import concurrent.futures
-                        with concurrent.futures.ThreadPoolExecutor() as pool:
-                            future = pool.submit(asyncio.run, get_student_mastery_all(user_id))
-                            mastery_scores = future.result(timeout=1.0)
-                    else:
-                        mastery_scores = asyncio.run(get_student_mastery_all(user_id))
-                except Exception:
-                    mastery_scores = {}
+                    from app.agents.knowledge_graph import (
+                        get_next_concepts, 
+                        format_next_concepts_message,
+                        get_student_mastery_all
+                    )
+                    import asyncio
+                
+                    # Get all mastery scores
+                    try:
+                        loop = asyncio.get_event_loop()
+                        if loop.is_running():
+                            import concurrent.futures
+                            with concurrent.futures.ThreadPoolExecutor() as pool:
+                                future = pool.submit(asyncio.run, get_student_mastery_all(user_id))
+                                mastery_scores = future.result(timeout=1.0)
+                        else:
+                            mastery_scores = asyncio.run(get_student_mastery_all(user_id))
+                    except Exception:
+                        mastery_scores = {}
                 
-                # Get next concept suggestions
-                next_concepts = get_next_concepts(detected_concept, mastery_scores, max_suggestions=2)
-                if next_concepts:
-                    next_concepts_msg = format_next_concepts_message(next_concepts)
-                    response_text += next_concepts_msg
-                    logger.info(f"📚 Tutor: Added {len(next_concepts)} next concept suggestions")
-            except Exception as e:
-                logger.debug(f"Could not add next concepts: {e}")
+                    # Get next concept suggestions
+                    next_concepts = get_next_concepts(detected_concept, mastery_scores, max_suggestions=2)
+                    if next_concepts:
+                        next_concepts_msg = format_next_concepts_message(next_concepts)
+                        response_text += next_concepts_msg
+                        logger.info(f"📚 Tutor: Added {len(next_concepts)} next concept suggestions")
+                except Exception as e:
+                    logger.debug(f"Could not add next concepts: {e}")
         
-        # Step 9: Add visual diagram for the concept (if available and detailed response)
-        # SKIP for follow-ups to keep responses focused
-        if detected_concept and depth_preference != "quick" and scaffolding_level in ["explained", "demonstrated"] and not is_follow_up:
-            try:
-                from app.agents.visual_diagrams import get_diagram_for_detected_concept, format_diagram_for_response
-                diagram = get_diagram_for_detected_concept(detected_concept)
-                if diagram:
-                    diagram_text = format_diagram_for_response(diagram, title=f"{detected_concept.replace('_', ' ').title()} Visualization")
-                    response_text += diagram_text
-                    logger.info(f"📚 Tutor: Added visual diagram for {detected_concept}")
-            except Exception as e:
-                logger.debug(f"Could not add visual diagram: {e}")
+            # Step 9: Add visual diagram for the concept (if available and detailed response)
+            # SKIP for follow-ups to keep responses focused
+            if detected_concept and depth_preference != "quick" and scaffolding_level in ["explained", "demonstrated"] and not is_follow_up:
+                try:
+                    from app.agents.visual_diagrams import get_diagram_for_detected_concept, format_diagram_for_response
+                    diagram = get_diagram_for_detected_concept(detected_concept)
+                    if diagram:
+                        diagram_text = format_diagram_for_response(diagram, title=f"{detected_concept.replace('_', ' ').title()} Visualization")
+                        response_text += diagram_text
+                        logger.info(f"📚 Tutor: Added visual diagram for {detected_concept}")
+                except Exception as e:
+                    logger.debug(f"Could not add visual diagram: {e}")
         
-        # Step 10: Add quiz question for the concept (if detailed response)
-        # SKIP for follow-ups to keep responses focused
-        if detected_concept and depth_preference != "quick" and scaffolding_level in ["explained", "demonstrated"] and not is_follow_up:
-            try:
-                from app.agents.quiz_generator import get_quiz_for_concept, format_quiz_for_response
-                quiz_questions = get_quiz_for_concept(detected_concept, count=1)
-                if quiz_questions:
-                    quiz_text = format_quiz_for_response(quiz_questions)
-                    response_text += quiz_text
-                    logger.info(f"📚 Tutor: Added quiz question for {detected_concept}")
-            except Exception as e:
-                logger.debug(f"Could not add quiz: {e}")
+            # Step 10: Add quiz question for the concept (if detailed response)
+            # SKIP for follow-ups to keep responses focused
+            if detected_concept and depth_preference != "quick" and scaffolding_level in ["explained", "demonstrated"] and not is_follow_up:
+                try:
+                    from app.agents.quiz_generator import get_quiz_for_concept, format_quiz_for_response
+                    quiz_questions = get_quiz_for_concept(detected_concept, count=1)
+                    if quiz_questions:
+                        quiz_text = format_quiz_for_response(quiz_questions)
+                        response_text += quiz_text
+                        logger.info(f"📚 Tutor: Added quiz question for {detected_concept}")
+                except Exception as e:
+                    logger.debug(f"Could not add quiz: {e}")
         
+        except Exception as e:
+            logger.warning(f"Tutor: could not add follow-up material: {e}")
+            response_text = streamed_text
+        
+        # Stream what was added after generation (next concepts, diagram, quiz)
+        emit_answer_delta(response_text[len(streamed_text):])
+        
+    except AnswerStreamError as e:
+        logger.error(f"Error in pedagogical tutor: {e.__cause__ or e}")
+        # The fallback only if nothing was sent; otherwise the partial answer ends with a notice
+        response_text = finish_interrupted_answer(e.partial, TUTOR_FALLBACK)
     except Exception as e:
         logger.error(f"Error in pedagogical tutor: {e}")
-        response_text = "I'd love to help you understand this concept. Could you tell me more about what's confusing you?"
+        if streamed_text:
+            response_text = streamed_text  # The generated answer went out in full; additions are dropped
+        else:
+            response_text = finish_interrupted_answer("", TUTOR_FALLBACK)
     
     # Calculate processing time
     processing_time = (time.time() - start_time) * 1000
@@ -877,6 +828,7 @@ Remember: Match your tone and depth to the student's needs. Sound like a helpful
                 "pedagogical_approach": pedagogical_approach,
                 "bloom_level": bloom_level,
                 "confusion_score": confusion_score,
+                "time_to_first_token_ms": first_token_ms,
                 "response_preview": response_text[:200] + "..."
             },
             level="DEFAULT",
@@ -887,20 +839,22 @@ Remember: Match your tone and depth to the student's needs. Sound like a helpful
     # Update processing times
     processing_times = state.get("processing_times", {}) or {}
     processing_times["pedagogical_tutor"] = processing_time
+    if first_token_ms is not None:
+        processing_times["pedagogical_tutor_first_token"] = first_token_ms
+    if graph_lookup is not None:
+        processing_times["graph_context"] = graph_time  # Time spent waiting on graph lookups
     
     logger.info(f"📚 Pedagogical Tutor: Completed in {processing_time:.1f}ms")
     
-    # Build response_sources from retrieved_context
-    response_sources = []
-    for doc in retrieved_context[:5]:
-        source_file = doc.get("source_file") or doc.get("source_filename") or doc.get("metadata", {}).get("source_file", "Unknown")
-        if source_file and source_file != "Unknown":
-            response_sources.append({
-                "title": source_file,
-                "url": doc.get("public_url", ""),
-                "description": doc.get("preview", doc.get("content", "")[:100] if doc.get("content") else ""),
-                "relevance_score": doc.get("relevance_score", 0.0)
-            })
+    # Scored here when the streaming quality gate ran; the graph then skips quality_gate
+    quality_fields = {}
+    if quality_checked:
+        quality_fields = {
+            "quality_checked": True,
+            "quality_restarts": int(quality.restarted),
+            "quality_kept_failing": quality.kept_failing,
+            "response_confidence": calculate_response_confidence(response_text, state.get("intent") or "tutor", state),
+        }
     
     return {
         "response": response_text,
@@ -911,7 +865,11 @@ Remember: Match your tone and depth to the student's needs. Sound like a helpful
         "bloom_level": bloom_level,
         "pedagogical_approach": pedagogical_approach,
         "pedagogical_strategy": f"{scaffolding_level}_{pedagogical_approach}",
-        "processing_times": processing_times
+        "generation_budget": budget.to_dict() if budget else None,
+        **quality_fields,
+        "model_cascade": cascade,
+        "processing_times": processing_times,
+        "deadline_skips": state.get("deadline_skips")
     }
 
 
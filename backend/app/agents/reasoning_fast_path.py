@@ -0,0 +1,258 @@
+"""
+Reasoning Fast Path - Local classification before the reasoning LLM
+
+reasoning_node made a Gemini call through ReasoningEngine.reason for every
+turn, including "thanks", "ok" and "when is the midterm". classify_locally
+is a deterministic tier in front of it that recognises:
+
+- greetings / acknowledgements (whole message from a closed list)
+- clear syllabus lookups and code pastes (Supervisor.FAST_PATH_PATTERNS)
+- short concept questions ("what is backpropagation?", "I don't understand
+  k-means") that name exactly one course concept (CONCEPT_PATTERNS)
+
+and builds a full ReasoningOutput with a confidence. Queries no rule
+covers go to the trained intent classifier (intent_classifier.py), whose
+probability becomes the confidence. Follow-ups, which need the conversation
+to be contextualised, are always left to the LLM, and so are greetings and
+acknowledgements that answer a question the tutor just asked.
+reasoning_node only calls the LLM when the local confidence is below
+settings.reasoning_fast_path_threshold.
+
+FastPathStats reports the fast-path rate per rule and the latency saved
+(the average LLM reasoning time of this worker). No LLM call is made to
+check fast-path turns: a share of them (settings.reasoning_fast_path_sample_rate)
+is appended as (query, history, rule, local intent) to a JSONL sample log,
+and scripts/audit_reasoning_fast_path.py --samples compares those against
+the reasoning LLM offline.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from app.agents.intent_classifier import get_intent_classifier
+from app.agents.reasoning_node import ReasoningOutput, detect_follow_up_heuristic
+from app.agents.supervisor import CONFUSION_OVERRIDE_PATTERNS, FAST_PATH_PATTERNS
+from app.agents.text_matcher import scan_text
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_LOG = Path(__file__).parent.parent.parent / "logs" / "reasoning_fast_path_samples.jsonl"
+
+# Whole-message greetings and acknowledgements ("yes"/"no" answer check-in questions, so not here)
+_GREETING_RE = re.compile(r"^(hi|hello|hey|hiya|good (morning|afternoon|evening))( there)?[\s!.,]*$")
+_ACK_RE = re.compile(
+    r"^((thanks|thank you|thx|ty|ok|okay|got it|cool|great|awesome|perfect|makes sense|bye|goodbye)"
+    r"( so much| a lot)?[\s!.,:)]*)+$"
+)
+# Course logistics lookups beyond Supervisor.FAST_PATH_PATTERNS
+_SYLLABUS_RE = re.compile(
+    r"^(when|where)\s+(is|are)\s+(the\s+|our\s+)?(midterm|final|exam|quiz|test|assignment|lab|project|office hours)"
+    r"|\b(due date|deadline|office hours|grading scheme|late policy)\b"
+)
+# Definitional questions about a single named concept
+_CONCEPT_QUESTION_RE = re.compile(r"^(what\s+(is|are)|what'?s|define|explain|describe)\b")
+_QUICK_RE = re.compile(r"\b(briefly|in one sentence|quick(ly)?|short answer)\b")
+_QUICK_PREFIX_RE = re.compile(r"^(briefly|quickly|in one sentence)[,:]?\s*")
+_MAX_CONCEPT_QUESTION_WORDS = 10
+
+_FAST_PATH_RES = {intent: [re.compile(p, re.IGNORECASE) for p in patterns] for intent, patterns in FAST_PATH_PATTERNS.items()}
+_CONFUSION_RES = [re.compile(p) for p in CONFUSION_OVERRIDE_PATTERNS]
+
+# Reasoning fields for a learned prediction, per intent
+_LEARNED_FIELDS: Dict[str, Dict[str, Any]] = {
+    "fast": {"bloom_level": "remember", "teaching_strategy": "direct", "response_length": "short"},
+    "explain": {"topic_domain": "ml_concepts", "teaching_strategy": "direct"},
+    "tutor": {"topic_domain": "ml_concepts", "teaching_strategy": "scaffolded", "scaffolding_level": "guided"},
+    "math": {"topic_domain": "math", "bloom_level": "apply", "scaffolding_level": "demonstrated"},
+    "coder": {"query_type": "request", "topic_domain": "code", "bloom_level": "apply", "teaching_strategy": "direct"},
+    "syllabus_query": {"topic_domain": "logistics", "bloom_level": "remember", "teaching_strategy": "direct", "response_length": "short"},
+}
+
+
+def _output(rule: str, intent: str, confidence: float, **fields: Any) -> Tuple[str, ReasoningOutput]:
+    fields.setdefault("query_type", "question")
+    fields.setdefault("topic_domain", "general")
+    return rule, ReasoningOutput(
+        recommended_intent=intent,
+        confidence=confidence,
+        reasoning=f"Local classifier: {rule}",
+        **fields,
+    )
+
+
+def _classify_learned(query: str, concepts: List[str]) -> Optional[Tuple[str, ReasoningOutput]]:
+    """Intent from the trained classifier, with its probability as the confidence"""
+    classifier = get_intent_classifier()
+    if classifier is None:
+        return None
+    intent, confidence = classifier.predict(query)
+    if confidence < settings.intent_classifier_threshold:
+        return None
+    return _output("learned", intent, round(confidence, 3), key_concepts=concepts, **_LEARNED_FIELDS.get(intent, {}))
+
+
+def awaiting_reply(conversation_history: Optional[List[dict]]) -> bool:
+    """Whether the last assistant message asked the student something"""
+    for msg in reversed(conversation_history or []):
+        if msg.get("role") == "assistant":
+            return str(msg.get("content") or "").rstrip().endswith("?")
+    return False
+
+
+def classify_locally(query: str, conversation_history: Optional[List[dict]] = None) -> Optional[Tuple[str, ReasoningOutput]]:
+    """
+    (rule, ReasoningOutput) for turns recognisable without the LLM, else None
+
+    Deterministic (no I/O once the classifier is loaded), so the same
+    query always gets the same answer.
+    """
+    text = query.lower().strip()
+    if not text:
+        return None
+
+    is_follow_up, _, _ = detect_follow_up_heuristic(query, conversation_history or [])
+    if is_follow_up:
+        return None  # Needs the conversation to be contextualised
+
+    if _GREETING_RE.match(text) or _ACK_RE.match(text):
+        if awaiting_reply(conversation_history):
+            return None  # "ok" after "Want to try an example?" answers the tutor, it is not small talk
+        return _output(
+            "greeting" if _GREETING_RE.match(text) else "acknowledgement", "fast", 0.97,
+            query_type="request", requires_retrieval=False, bloom_level="remember",
+            teaching_strategy="direct", scaffolding_level="hint", response_length="short",
+        )
+
+    matches = scan_text(text)
+    concepts = matches.labels("concept")
+
+    if any(p.search(text) for p in _FAST_PATH_RES["coder"]):
+        return _output(
+            "code", "coder", 0.9,
+            query_type="request", topic_domain="code", key_concepts=concepts,
+            bloom_level="apply", teaching_strategy="direct", scaffolding_level="demonstrated",
+        )
+
+    if not concepts and (_SYLLABUS_RE.search(text) or any(p.search(text) for p in _FAST_PATH_RES["syllabus_query"])):
+        return _output(
+            "syllabus", "syllabus_query", 0.92,
+            topic_domain="logistics", bloom_level="remember",
+            teaching_strategy="direct", scaffolding_level="explained", response_length="short",
+        )
+
+    words = len(text.split())
+    if len(concepts) != 1 or words > _MAX_CONCEPT_QUESTION_WORDS or matches.has("misconception"):
+        return _classify_learned(query, concepts)
+    confusion = [p.pattern for p in _CONFUSION_RES if p.search(text)]
+    if confusion:
+        return _output(
+            "confused_concept", "tutor", 0.88,
+            topic_domain="ml_concepts", key_concepts=concepts, confusion_signals=confusion,
+            prior_knowledge_level="novice", teaching_strategy="scaffolded", scaffolding_level="explained",
+        )
+    if _CONCEPT_QUESTION_RE.match(_QUICK_PREFIX_RE.sub("", text)):
+        quick = bool(_QUICK_RE.search(text))
+        return _output(
+            "quick_concept" if quick else "concept_question", "fast" if quick else "explain", 0.88,
+            topic_domain="ml_concepts", key_concepts=concepts,
+            teaching_strategy="direct", scaffolding_level="explained",
+            response_length="short" if quick else "medium",
+        )
+    return _classify_learned(query, concepts)
+
+
+class FastPathStats:
+    """Fast-path rate per rule, latency saved, and turns sampled for the offline audit"""
+
+    EMA_ALPHA = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.by_rule: Dict[str, int] = {}
+        self.llm_calls = 0
+        self._avg_llm_ms: Optional[float] = None
+        self.saved_ms_est = 0.0
+        self.sampled = 0
+
+    def record_llm(self, ms: float) -> None:
+        with self._lock:
+            self.turns += 1
+            self.llm_calls += 1
+            if self._avg_llm_ms is None:
+                self._avg_llm_ms = ms
+            else:
+                self._avg_llm_ms += self.EMA_ALPHA * (ms - self._avg_llm_ms)
+
+    def record_fast_path(self, rule: str, ms: float) -> None:
+        with self._lock:
+            self.turns += 1
+            self.by_rule[rule] = self.by_rule.get(rule, 0) + 1
+            if self._avg_llm_ms is not None:
+                self.saved_ms_est += max(0.0, self._avg_llm_ms - ms)
+
+    def record_sample(self) -> None:
+        with self._lock:
+            self.sampled += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            fast = sum(self.by_rule.values())
+            return {
+                "turns": self.turns,
+                "fast_path_rate": round(fast / self.turns, 3) if self.turns else 0.0,
+                "fast_path_by_rule": dict(self.by_rule),
+                "llm_calls": self.llm_calls,
+                "avg_llm_reasoning_ms": round(self._avg_llm_ms or 0),
+                "latency_saved_seconds_est": round(self.saved_ms_est / 1000, 1),
+                "sampled_for_audit": self.sampled,
+            }
+
+
+_fast_path_stats = None
+
+
+def get_fast_path_stats() -> FastPathStats:
+    """Get or create the process-wide reasoning fast-path stats"""
+    global _fast_path_stats
+    if _fast_path_stats is None:
+        _fast_path_stats = FastPathStats()
+    return _fast_path_stats
+
+
+# One background thread: the sample log is best-effort and its writes stay off the request path
+_sample_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reasoning-sample")
+_sample_lock = threading.Lock()
+
+
+def _write_sample(record: Dict[str, Any]) -> None:
+    path = Path(settings.reasoning_fast_path_sample_path) if settings.reasoning_fast_path_sample_path else SAMPLE_LOG
+    try:
+        with _sample_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        get_fast_path_stats().record_sample()
+    except Exception as e:
+        logger.debug(f"Could not write reasoning fast-path sample: {e}")
+
+
+def maybe_sample(query: str, history: Optional[List[dict]], rule: str, local_intent: str) -> None:
+    """Log a sampled share of fast-path turns for the offline LLM audit (no LLM call here)"""
+    if random.random() < settings.reasoning_fast_path_sample_rate:
+        record = {
+            "ts": time.time(),
+            "query": query,
+            "history": list(history or [])[-2:],  # Enough for follow-up detection
+            "rule": rule,
+            "local_intent": local_intent,
+        }
+        _sample_executor.submit(_write_sample, record)
@@ -11,15 +11,24 @@ This node sits between Governor and Supervisor, adding a "thinking" phase
 that analyzes the query, student context, and determines optimal strategy.
 """
 
-from typing import Dict, List, Optional, Any
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Deque, Dict, List, Literal, Optional, Any
 import logging
+import statistics
+import threading
 import time
 import json
 from dataclasses import dataclass, field
+from pydantic import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.agents.state import AgentState, ScaffoldingLevel, BloomLevel, PedagogicalApproach
 from app.config import settings
+from app.agents.text_matcher import scan_text
+from app.agents.llm_cache import get_llm_result_cache
+from app.agents.deadline import call_timeout, get_deadline_stats, has_budget_for, run_with_timeout, skip_stage
+from app.agents.stream_events import INTERNAL_MODEL_TAGS
 from app.observability.langfuse_client import create_child_span_from_state, update_observation_with_usage
 
 logger = logging.getLogger(__name__)
@@ -57,11 +66,132 @@ class ReasoningOutput:
     diagnostic_question: Optional[str] = None
 
 
+# Response schema for the provider's structured-output (JSON schema) mode.
+# Mirrors ReasoningOutput, grouped by phase like the system prompt.
+class ReasoningPerception(BaseModel):
+    query_type: Literal["question", "request", "clarification", "follow_up"] = "question"
+    topic_domain: Literal["ml_concepts", "math", "code", "logistics", "general"] = "general"
+    key_concepts: List[str] = Field(default_factory=list)
+    is_follow_up: bool = False
+    contextualized_query: Optional[str] = None
+
+
+class ReasoningAnalysis(BaseModel):
+    confusion_signals: List[str] = Field(default_factory=list)
+    prior_knowledge_level: Literal["novice", "intermediate", "advanced", "unknown"] = "unknown"
+    bloom_level: BloomLevel = "understand"
+    requires_retrieval: bool = True
+
+
+class ReasoningPlanning(BaseModel):
+    teaching_strategy: PedagogicalApproach = "scaffolded"
+    scaffolding_level: ScaffoldingLevel = "explained"
+    response_length: Literal["short", "medium", "detailed"] = "medium"
+
+
+class ReasoningDecision(BaseModel):
+    recommended_intent: Literal["tutor", "math", "coder", "syllabus_query", "explain", "fast"] = "tutor"
+    confidence: float = Field(default=0.7, description="0.0 to 1.0")
+    reasoning: str = ""
+
+
+class ReasoningSchema(BaseModel):
+    """Structured analysis of a student query"""
+
+    perception: ReasoningPerception = Field(default_factory=ReasoningPerception)
+    analysis: ReasoningAnalysis = Field(default_factory=ReasoningAnalysis)
+    planning: ReasoningPlanning = Field(default_factory=ReasoningPlanning)
+    decision: ReasoningDecision = Field(default_factory=ReasoningDecision)
+
+
+def _matches_schema(text: str) -> bool:
+    """Cache validator: only outputs that parse into ReasoningSchema are reused"""
+    try:
+        ReasoningSchema.model_validate_json(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _structured_output(model):
+    """
+    ReasoningSchema output with the raw message alongside
+
+    Native JSON schema where langchain-google-genai supports it (2.1+); older
+    versions reject the method, so fall back to their default function
+    calling. Function-call replies carry no text, so they are not cached.
+    """
+    try:
+        return model.with_structured_output(ReasoningSchema, method="json_schema", include_raw=True)
+    except (ValueError, TypeError, NotImplementedError) as e:
+        logger.warning(f"JSON-schema structured output unsupported, using function calling: {e}")
+        return model.with_structured_output(ReasoningSchema, include_raw=True)
+
+
+class ReasoningStats:
+    """Reasoning-stage latency, structured-output failures, and classification LLM calls per turn"""
+
+    RECENT = 500  # Window for latency percentiles
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.failures: Dict[str, int] = {}
+        self.turns = 0
+        self.classification_calls = 0
+        self.turns_with_second_call = 0
+        self._stage_ms: Deque[float] = deque(maxlen=self.RECENT)
+
+    def record_call(self, failure: Optional[str] = None) -> None:
+        """One structured reasoning call; failure is "parse" or "error" when it fell back"""
+        with self._lock:
+            self.llm_calls += 1
+            if failure:
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+
+    def record_stage(self, ms: float) -> None:
+        with self._lock:
+            self._stage_ms.append(ms)
+
+    def record_turn(self, classification_calls: int) -> None:
+        """LLM calls spent deciding the intent of one turn (reasoning + supervisor fallback)"""
+        with self._lock:
+            self.turns += 1
+            self.classification_calls += classification_calls
+            self.turns_with_second_call += int(classification_calls > 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stage = sorted(self._stage_ms)
+            failed = sum(self.failures.values())
+            return {
+                "llm_calls": self.llm_calls,
+                "failure_rate": round(failed / self.llm_calls, 3) if self.llm_calls else 0.0,
+                "failures": dict(self.failures),
+                "turns": self.turns,
+                "classification_calls_per_turn": round(self.classification_calls / self.turns, 3) if self.turns else 0.0,
+                "turns_with_second_call": self.turns_with_second_call,
+                "stage_ms_p50": round(statistics.median(stage)) if stage else None,
+                "stage_ms_p95": round(stage[int(0.95 * (len(stage) - 1))]) if stage else None,
+            }
+
+
+_reasoning_stats = None
+
+
+def get_reasoning_stats() -> ReasoningStats:
+    """Get or create the process-wide reasoning stats"""
+    global _reasoning_stats
+    if _reasoning_stats is None:
+        _reasoning_stats = ReasoningStats()
+    return _reasoning_stats
+
+
 # System prompt for the reasoning LLM
 REASONING_SYSTEM_PROMPT = """You are a pedagogical reasoning engine for an AI tutoring system (COMP 237: Introduction to AI).
 Your job is to ANALYZE the student's query and determine the optimal teaching strategy.
 
-You will output a structured JSON analysis. Do NOT provide the actual answer to the student's question.
+You will output a structured JSON analysis (the response schema is enforced). Do NOT provide the actual answer to the student's question.
 
 ## CRITICAL: Follow-up Question Handling
 
@@ -69,7 +199,7 @@ When the student query contains anaphoric references (that, it, this, them, etc.
 - Look at the conversation history to understand what they're referring to
 - Infer the full meaning from context
 - Identify the actual topic they're asking about
-- Set `requires_context` to true and include `contextualized_query` in your analysis
+- Set `is_follow_up` to true and include `contextualized_query` in your analysis
 
 Examples of follow-up patterns that need contextualization:
 - "what does that mean" → needs context from previous message
@@ -182,6 +312,66 @@ Examples of follow-up patterns that need contextualization:
 """
 
 
+def detect_follow_up_heuristic(query: str, conversation_history: List[dict]) -> tuple[bool, Optional[str], bool]:
+    """
+    Heuristic-based follow-up detection before LLM reasoning
+    (also used by the local reasoning fast path).
+    
+    Returns:
+        Tuple of (is_follow_up, contextualized_query, is_frustrated_followup)
+        - is_frustrated_followup: True for "no", "still don't get it" etc. → triggers SHORT responses
+    """
+    if not conversation_history or len(conversation_history) < 2:
+        return False, None, False
+    
+    query_lower = query.lower().strip()
+    
+    # Frustrated / follow-up / incomplete patterns are all checked in one scan
+    # (FRUSTRATED_FOLLOW_UP_PATTERNS etc. in the shared matcher)
+    matches = scan_text(query_lower)
+    is_frustrated = matches.has("frustrated")
+    
+    # Strong follow-up signals
+    if matches.has("follow_up"):
+        # Try to contextualize from last assistant message
+        last_assistant_msg = None
+        for msg in reversed(conversation_history):
+            if msg.get("role") == "assistant":
+                last_assistant_msg = msg.get("content", "")
+                break
+        
+        if last_assistant_msg:
+            # Extract topic from last response (simple heuristic)
+            # Look for concepts mentioned
+            contextualized = query
+            # If query is very short, try to infer from context
+            if len(query.split()) < 5:
+                # Try to extract topic from last assistant message
+                # This is a simple heuristic - LLM will do better
+                contextualized = f"{query} (referring to previous explanation about the topic)"
+            return True, contextualized, is_frustrated
+        return True, query, is_frustrated
+    
+    # Very short queries MAY be follow-ups, but only if they contain anaphoric references
+    # or are incomplete phrases. Short standalone questions like "What is SVM?" should NOT
+    # be classified as follow-ups just because conversation history exists.
+    if len(query.split()) < 4 and len(conversation_history) >= 2:
+        # Check for anaphoric references (pronouns referring to previous context)
+        anaphoric_words = {"it", "that", "this", "they", "them", "those", "these", "here", "there"}
+        # Strip punctuation from words for matching
+        query_words = [w.strip("?.,!:;'\"") for w in query_lower.split()]
+        has_anaphoric = any(word in anaphoric_words for word in query_words)
+        
+        # Check for incomplete phrases that need context
+        is_incomplete = matches.has("incomplete")
+        
+        # Only classify as follow-up if it has anaphoric references or is incomplete
+        if has_anaphoric or is_incomplete:
+            return True, query, is_frustrated
+    
+    return False, None, False
+
+
 class ReasoningEngine:
     """
     Multi-step reasoning engine that analyzes queries before routing.
@@ -192,110 +382,24 @@ class ReasoningEngine:
     
     def __init__(self):
         """Initialize with a fast, low-temperature model for consistent reasoning"""
-        self.model = ChatGoogleGenerativeAI(
+        # Native JSON-schema output: the response always parses into ReasoningSchema
+        # (include_raw keeps parse failures visible instead of raising)
+        self.model = _structured_output(ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=settings.google_api_key,
             temperature=0.1,  # Low temperature for consistent analysis
             max_output_tokens=1024,
-        ).with_config(
-            # Tag for event filtering - prevents output from streaming to user
-            tags=["reasoning_internal", "no_stream"],
+            timeout=settings.reasoning_timeout_seconds,  # Falls back to default reasoning rather than eat the turn budget
+            cache=get_llm_result_cache("reasoning", validate=_matches_schema),  # Repeated queries skip the call
+        )).with_config(
+            # Internal tags - LangGraph never streams this model's tokens to the user
+            tags=["reasoning_internal", *INTERNAL_MODEL_TAGS],
             metadata={"component": "reasoning_engine", "internal": True}
         )
     
     def _detect_follow_up_heuristic(self, query: str, conversation_history: List[dict]) -> tuple[bool, Optional[str], bool]:
-        """
-        Heuristic-based follow-up detection before LLM reasoning.
-        
-        Returns:
-            Tuple of (is_follow_up, contextualized_query, is_frustrated_followup)
-            - is_frustrated_followup: True for "no", "still don't get it" etc. → triggers SHORT responses
-        """
-        if not conversation_history or len(conversation_history) < 2:
-            return False, None, False
-        
-        query_lower = query.lower().strip()
-        
-        # FRUSTRATED FOLLOW-UP PATTERNS (require SHORT responses)
-        # These are single-word rejections or continued confusion after previous explanation
-        frustrated_patterns = [
-            r"^no\.?!?$",  # Just "no"
-            r"^nope\.?!?$",  # Just "nope"
-            r"^(i\s+)?still\s+(don'?t|can'?t)\s+(get|understand)",
-            r"^(that|it|this)\s+(doesn'?t|don'?t)\s+make\s+sense",
-            r"^not\s+really\.?$",
-            r"^(i'?m\s+)?(still\s+)?confused\.?!?$",
-            r"^huh\??$",
-            r"^what\??$",  # Just "what?" as confusion
-        ]
-        
-        import re
-        is_frustrated = any(re.search(p, query_lower, re.IGNORECASE) for p in frustrated_patterns)
-        
-        # Strong follow-up signals
-        follow_up_patterns = [
-            r"^(what|how|why|when|where)\s+(does|do|is|are|was|were)\s+(that|it|this|they|those)\s+",
-            r"^(what|how|why)\s+(does|do|is|are)\s+(that|it|this|they)\s+",
-            r"^(i\s+)?don'?t\s+(get|understand|know)\s+(it|that|this)?",
-            r"^(can\s+you\s+)?(explain|clarify)\s+(more|further|that|it|this)",
-            r"^(what|how)\s+(about|do\s+you\s+mean)\s+",
-            r"^(okay|ok|alright|got\s+it),\s+(what|how|why)",
-            r"^(i\s+)?(still\s+)?(don'?t|can'?t)\s+(get|understand|see|grasp)",
-            r"^(that|it|this)\s+(doesn'?t|don'?t)\s+make\s+sense",
-            r"^(i'?m\s+)?(still\s+)?(confused|lost|stuck)",
-            r"^(can\s+you\s+)?(give|show|provide)\s+(me\s+)?(an\s+)?example",
-            r"^(what|how)\s+(does|do)\s+(that|it|this)\s+work",
-        ]
-        
-        for pattern in follow_up_patterns:
-            if re.search(pattern, query_lower):
-                # Try to contextualize from last assistant message
-                last_assistant_msg = None
-                for msg in reversed(conversation_history):
-                    if msg.get("role") == "assistant":
-                        last_assistant_msg = msg.get("content", "")
-                        break
-                
-                if last_assistant_msg:
-                    # Extract topic from last response (simple heuristic)
-                    # Look for concepts mentioned
-                    contextualized = query
-                    # If query is very short, try to infer from context
-                    if len(query.split()) < 5:
-                        # Try to extract topic from last assistant message
-                        # This is a simple heuristic - LLM will do better
-                        contextualized = f"{query} (referring to previous explanation about the topic)"
-                    return True, contextualized, is_frustrated
-                return True, query, is_frustrated
-        
-        # Very short queries MAY be follow-ups, but only if they contain anaphoric references
-        # or are incomplete phrases. Short standalone questions like "What is SVM?" should NOT
-        # be classified as follow-ups just because conversation history exists.
-        if len(query.split()) < 4 and len(conversation_history) >= 2:
-            # Check for anaphoric references (pronouns referring to previous context)
-            anaphoric_words = {"it", "that", "this", "they", "them", "those", "these", "here", "there"}
-            # Strip punctuation from words for matching
-            query_words = [w.strip("?.,!:;'\"") for w in query_lower.split()]
-            has_anaphoric = any(word in anaphoric_words for word in query_words)
-            
-            # Check for incomplete phrases that need context
-            incomplete_patterns = [
-                r"^(yes|no|yeah|yep|nope|sure|okay|ok|right|exactly|correct)\b",
-                r"^(and|but|so|also|too)\s+",
-                r"^(why|how|what|huh)\s*\??!?$",  # Just "why?", "how?", "what?", "huh?"
-                r"^(really|seriously|actually)\s*\??$",
-                r"^\?\s*$",  # Just a question mark
-                r"\bmore\b",  # Contains "more" (e.g., "tell me more", "explain more")
-                r"^go\s+on\b",  # "go on"
-                r"^continue\b",  # "continue"
-            ]
-            is_incomplete = any(re.search(p, query_lower) for p in incomplete_patterns)
-            
-            # Only classify as follow-up if it has anaphoric references or is incomplete
-            if has_anaphoric or is_incomplete:
-                return True, query, is_frustrated
-        
-        return False, None, False
+        """Heuristic follow-up detection (see detect_follow_up_heuristic)"""
+        return detect_follow_up_heuristic(query, conversation_history)
     
     def _build_context_summary(self, conversation_history: List[dict]) -> str:
         """Summarize conversation history for context, with emphasis on recent content for follow-ups"""
@@ -397,81 +501,55 @@ Provide your analysis as a JSON object following the format specified in the sys
                 SystemMessage(content=REASONING_SYSTEM_PROMPT),
                 HumanMessage(content=user_prompt)
             ])
-            
-            # Handle Gemini 2.5+ list content format
-            raw_content = response.content
-            if isinstance(raw_content, list):
-                text_parts = []
-                for block in raw_content:
-                    if isinstance(block, dict) and block.get('type') == 'text':
-                        text_parts.append(block.get('text', ''))
-                    elif isinstance(block, str):
-                        text_parts.append(block)
-                content = ''.join(text_parts).strip()
-            else:
-                content = raw_content.strip() if isinstance(raw_content, str) else str(raw_content).strip()
-            
-            # Handle markdown code blocks
-            if "```" in content:
-                parts = content.split("```")
-                if len(parts) >= 2:
-                    json_part = parts[1]
-                    if json_part.startswith("json"):
-                        json_part = json_part[4:]
-                    content = json_part.strip()
-            
-            result = json.loads(content)
-            
-            # Convert to ReasoningOutput
-            perception = result.get("perception", {})
-            analysis = result.get("analysis", {})
-            planning = result.get("planning", {})
-            decision = result.get("decision", {})
-            
-            # Use heuristic detection if LLM didn't detect follow-up but heuristic did
-            is_follow_up = perception.get("is_follow_up", False) or is_follow_up_heuristic
-            contextualized_query = perception.get("contextualized_query") or contextualized_heuristic
-            
-            # CRITICAL: Force SHORT response for frustrated follow-ups ("no", "still don't get it")
-            # This prevents verbose re-explanations when student is frustrated
-            response_length = planning.get("response_length", "medium")
-            if is_frustrated_heuristic and is_follow_up:
-                response_length = "short"
-                logger.info(f"⚠️ Frustrated follow-up detected: forcing short response")
-            
-            return ReasoningOutput(
-                # Perception
-                query_type=perception.get("query_type", "question"),
-                topic_domain=perception.get("topic_domain", "general"),
-                key_concepts=perception.get("key_concepts", []),
-                is_follow_up=is_follow_up,
-                contextualized_query=contextualized_query,
-                
-                # Analysis
-                confusion_signals=analysis.get("confusion_signals", []),
-                prior_knowledge_level=analysis.get("prior_knowledge_level", "unknown"),
-                bloom_level=analysis.get("bloom_level", "understand"),
-                requires_retrieval=analysis.get("requires_retrieval", True),
-                
-                # Planning
-                teaching_strategy=planning.get("teaching_strategy", "scaffolded"),
-                scaffolding_level=planning.get("scaffolding_level", "explained"),
-                response_length=response_length,  # May be overridden to "short" for frustrated follow-ups
-                
-                # Decision
-                recommended_intent=decision.get("recommended_intent", "tutor"),
-                confidence=decision.get("confidence", 0.7),
-                reasoning=decision.get("reasoning", ""),
-            )
-            
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse reasoning JSON: {e}")
-            # Return default reasoning on parse failure
-            return self._default_reasoning(query)
-            
         except Exception as e:
             logger.error(f"Reasoning engine error: {e}")
+            get_reasoning_stats().record_call(failure="error")
+            return self._default_reasoning(query)
+        
+        result = response.get("parsed")
+        if result is None:
+            logger.warning(f"Reasoning output did not match the schema: {response.get('parsing_error')}")
+            get_reasoning_stats().record_call(failure="parse")
             return self._default_reasoning(query)
+        get_reasoning_stats().record_call()
+        
+        perception, analysis, planning, decision = result.perception, result.analysis, result.planning, result.decision
+        
+        # Use heuristic detection if LLM didn't detect follow-up but heuristic did
+        is_follow_up = perception.is_follow_up or is_follow_up_heuristic
+        contextualized_query = perception.contextualized_query or contextualized_heuristic
+        
+        # CRITICAL: Force SHORT response for frustrated follow-ups ("no", "still don't get it")
+        # This prevents verbose re-explanations when student is frustrated
+        response_length = planning.response_length
+        if is_frustrated_heuristic and is_follow_up:
+            response_length = "short"
+            logger.info(f"⚠️ Frustrated follow-up detected: forcing short response")
+        
+        return ReasoningOutput(
+            # Perception
+            query_type=perception.query_type,
+            topic_domain=perception.topic_domain,
+            key_concepts=perception.key_concepts,
+            is_follow_up=is_follow_up,
+            contextualized_query=contextualized_query,
+            
+            # Analysis
+            confusion_signals=analysis.confusion_signals,
+            prior_knowledge_level=analysis.prior_knowledge_level,
+            bloom_level=analysis.bloom_level,
+            requires_retrieval=analysis.requires_retrieval,
+            
+            # Planning
+            teaching_strategy=planning.teaching_strategy,
+            scaffolding_level=planning.scaffolding_level,
+            response_length=response_length,  # May be overridden to "short" for frustrated follow-ups
+            
+            # Decision
+            recommended_intent=decision.recommended_intent,
+            confidence=min(max(decision.confidence, 0.0), 1.0),
+            reasoning=decision.reasoning,
+        )
     
     def _default_reasoning(self, query: str) -> ReasoningOutput:
         """Fallback reasoning when LLM fails"""
@@ -546,7 +624,9 @@ def reasoning_node(state: AgentState) -> Dict[str, Any]:
     recent_interactions = []
     has_prior_sessions = False
     
-    if state.get("user_id"):
+    if state.get("user_id") and not has_budget_for(state, "student_history"):
+        state.update(skip_stage(state, "student_history"))  # Personalization is optional; the turn budget is not
+    elif state.get("user_id"):
         try:
             from app.agents.knowledge_graph import (
                 get_recent_student_interactions,
@@ -559,7 +639,11 @@ def reasoning_node(state: AgentState) -> Dict[str, Any]:
             
             # Use synchronous functions (no async needed)
             try:
-                context_summary = get_student_context_summary(user_id)
+                context_summary = run_with_timeout(
+                    get_student_context_summary,
+                    call_timeout(state, settings.student_history_timeout_seconds),
+                    user_id
+                )
                 
                 if context_summary:
                     mastery_scores = context_summary.get("mastery_scores", {})
@@ -578,6 +662,9 @@ def reasoning_node(state: AgentState) -> Dict[str, Any]:
                         logger.debug("No student history formatted (empty result)")
                 else:
                     logger.debug(f"No context summary found for user {user_id}")
+            except FutureTimeoutError:
+                get_deadline_stats().record_timeout("student_history")
+                logger.warning("Student context fetch timed out; continuing without personalization")
             except Exception as e:
                 logger.warning(f"Failed to fetch student context: {e}")
         except ImportError as e:
@@ -587,20 +674,40 @@ def reasoning_node(state: AgentState) -> Dict[str, Any]:
     from app.agents.context_engineer import engineer_context
     context_updates = engineer_context(state)
     if context_updates:
-        # Update state with compacted context
+        # Update state with compacted context (or the skip record when the budget ran low)
         state.update(context_updates)
-        logger.info("📦 Context engineered: conversation compacted")
-    
-    # Run reasoning engine
-    engine = ReasoningEngine()
-    reasoning = engine.reason(
-        query=state.get("query", ""),
-        conversation_history=state.get("conversation_history"),
-        student_context=student_context if student_context else None
-    )
+        if context_updates.get("context_compacted"):
+            logger.info("📦 Context engineered: conversation compacted")
+    
+    # Tier 1: local deterministic classifier (greetings, syllabus lookups, obvious concept questions)
+    # Tier 2: the reasoning LLM, only when the local confidence is too low
+    from app.agents.reasoning_fast_path import classify_locally, get_fast_path_stats, maybe_sample
+    local = None
+    local_start = time.time()
+    if settings.reasoning_fast_path_enabled:
+        local = classify_locally(state.get("query", ""), state.get("conversation_history"))
+        if local and local[1].confidence < settings.reasoning_fast_path_threshold:
+            local = None
+    
+    if local:
+        rule, reasoning = local
+        logger.info(f"⚡ Reasoning fast path: {rule} → {reasoning.recommended_intent} (LLM reasoning skipped)")
+        get_fast_path_stats().record_fast_path(rule, (time.time() - local_start) * 1000)
+        maybe_sample(state.get("query", ""), state.get("conversation_history"), rule, reasoning.recommended_intent)
+    else:
+        # Run reasoning engine
+        llm_start = time.time()
+        engine = ReasoningEngine()
+        reasoning = engine.reason(
+            query=state.get("query", ""),
+            conversation_history=state.get("conversation_history"),
+            student_context=student_context if student_context else None
+        )
+        get_fast_path_stats().record_llm((time.time() - llm_start) * 1000)
     
     # Calculate processing time
     processing_time = (time.time() - start_time) * 1000
+    get_reasoning_stats().record_stage(processing_time)
     
     # === BUILD VISIBLE CHAIN-OF-THOUGHT ===
     # These are the actual reasoning steps shown to users, per CoT paper best practices
@@ -671,12 +778,14 @@ def reasoning_node(state: AgentState) -> Dict[str, Any]:
         "reasoning_intent": reasoning.recommended_intent,
         "reasoning_confidence": reasoning.confidence,
         "reasoning_strategy": reasoning.teaching_strategy,
+        "reasoning_source": f"fast_path:{local[0]}" if local else "llm",
         "reasoning_context_needed": ["retrieved_context"] if reasoning.requires_retrieval else [],
         "is_follow_up": reasoning.is_follow_up,
         "contextualized_query": reasoning.contextualized_query,
         "effective_query": effective_query,
         "intent": reasoning.recommended_intent,  # Set intent from reasoning
         "processing_times": processing_times,
+        "deadline_skips": state.get("deadline_skips"),
         # NEW: Chain-of-thought for frontend visibility
         "thought_chain": thought_chain,
         # NEW: Student history for personalization
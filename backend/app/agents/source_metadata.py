@@ -7,6 +7,7 @@ various metadata formats that can occur in the pipeline.
 """
 
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Optional, List, Dict, Any
 import logging
 
@@ -26,6 +27,11 @@ class Source:
     bb_content_id: Optional[str] = None
     bb_course_id: Optional[str] = None
     
+    @cached_property
+    def display_title(self) -> str:
+        """Display title, computed once per source"""
+        return self._get_display_title()
+    
     def _get_display_title(self) -> str:
         """
         Generate a user-friendly display title from the filename.
@@ -43,34 +49,9 @@ class Source:
         
         # Handle res##### format - extract topic from content if possible
         if re.match(r'^res\d+$', base_name, re.IGNORECASE):
-            content = self.content_preview.lower() if self.content_preview else ""
-            
-            # ML/AI topic detection
-            topic_patterns = [
-                (r'neural network|hidden layer|perceptron|feedforward|feed.?forward', 'Neural Networks'),
-                (r'gradient descent|learning rate', 'Gradient Descent'),
-                (r'backpropagation|back.?prop', 'Backpropagation'),
-                (r'decision tree', 'Decision Trees'),
-                (r'support vector|svm', 'Support Vector Machines'),
-                (r'k-?nearest|knn', 'K-Nearest Neighbors'),
-                (r'naive bayes', 'Naive Bayes'),
-                (r'regression|linear model', 'Regression'),
-                (r'classification|classifier', 'Classification'),
-                (r'clustering|k-?means', 'Clustering'),
-                (r'overfitting|underfitting', 'Model Fitting'),
-                (r'cross.?validation', 'Cross Validation'),
-                (r'activation function', 'Activation Functions'),
-                (r'loss function|cost function', 'Loss Functions'),
-                (r'layer|input layer|output layer', 'Network Layers'),
-                (r'epoch|batch|training', 'Model Training'),
-                (r'accuracy|precision|recall|f1', 'Model Evaluation'),
-            ]
-            
-            for pattern, topic in topic_patterns:
-                if re.search(pattern, content):
-                    return topic
-            
-            return "Course Material"
+            # ML/AI topic detection (SOURCE_TOPIC_PATTERNS in the shared matcher)
+            from app.agents.text_matcher import scan_text
+            return scan_text(self.content_preview or "", "source").first("source_topic") or "Course Material"
         
         # Handle syllabus
         if 'syllabus' in lower_name:
@@ -116,7 +97,7 @@ class Source:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization."""
-        display_title = self._get_display_title()
+        display_title = self.display_title
         
         # Add page number to description if available
         page_info = f" (Page {self.page_number})" if self.page_number else ""
@@ -138,7 +119,7 @@ class Source:
     
     def to_citation(self) -> str:
         """Format for inline citation with context."""
-        display_title = self._get_display_title()
+        display_title = self.display_title
         
         if self.url:
             return f"[{display_title}]({self.url})"
@@ -336,6 +317,25 @@ def extract_sources(rag_results: List[Any]) -> List[Source]:
     return sources
 
 
+def sources_for_client(rag_results: List[Any], max_sources: int = 5) -> List[Dict[str, Any]]:
+    """
+    Sources as sent in a `sources` stream event and stored in response_sources.
+    
+    Args:
+        rag_results: List of RAG retrieval results (dicts or Documents)
+        max_sources: Maximum number of sources to include
+        
+    Returns:
+        Source dicts (to_dict plus the id/content keys the extension reads),
+        most relevant first, "Unknown" files dropped
+    """
+    valid_sources = [s for s in extract_sources(rag_results) if s.filename != "Unknown"][:max_sources]
+    return [
+        {**source.to_dict(), "id": f"src-{i+1}", "content": source.content_preview}
+        for i, source in enumerate(valid_sources)
+    ]
+
+
 def format_sources_for_response(sources: List[Source], max_sources: int = 3) -> str:
     """
     Format sources for appending to response.
@@ -65,7 +65,11 @@ class AgentState(TypedDict):
     # ========== Routing Decisions ==========
     intent: Optional[str]  # "fast", "coder", "reasoning", "syllabus_query", "tutor", "math"
     model_selected: Optional[str]  # "gemini-flash", "groq-llama-70b", "gpt-4.1-mini", etc.
+    model_cascade: Optional[dict]  # Cheap-first tiers for this turn (model_cascade.plan_cascade)
     model_override: Optional[str]  # User-specified model override (bypasses auto-selection)
+    graph_variant: Optional[str]  # Compiled graph running the turn: "full" or "minimal" (graph_variants.py)
+    deadline: Optional[float]  # Epoch seconds the turn should be done by (deadline.py)
+    deadline_skips: Optional[List[dict]]  # Optional stages skipped for lack of budget: [{stage, remaining_ms}]
     
     # ========== Reasoning Node Output (LLM-First Architecture) ==========
     # These fields are populated by the reasoning node before routing
@@ -73,6 +77,7 @@ class AgentState(TypedDict):
     reasoning_intent: Optional[str]  # Intent determined by reasoning (may differ from final)
     reasoning_confidence: Optional[float]  # Confidence in the intent (0.0-1.0)
     reasoning_strategy: Optional[str]  # Teaching strategy determined by reasoning
+    reasoning_source: Optional[str]  # "llm" or "fast_path:<rule>" (see reasoning_fast_path.py)
     reasoning_context_needed: Optional[List[str]]  # What context the reasoning node thinks we need
     reasoning_trace: Optional[str]  # Full reasoning trace for debugging
     
@@ -101,6 +106,7 @@ class AgentState(TypedDict):
     # ========== RAG Context ==========
     retrieved_context: List[dict]  # Retrieved documents with metadata
     context_sources: List[dict]  # Source summaries with filenames/score
+    graph_context: Optional[dict]  # Concept graph context (prerequisites, next topics, related)
     
     # ========== Policy Enforcement ==========
     governor_approved: bool
@@ -142,7 +148,11 @@ class AgentState(TypedDict):
     quality_retry_count: Optional[int]  # Number of repair attempts
     repair_guidance: Optional[str]  # Specific guidance for repair
     response_confidence: Optional[float]  # Calculated confidence score
+    quality_checked: Optional[bool]  # Answer was judged on the stream (streaming_quality); skips quality_gate
+    quality_restarts: Optional[int]  # Openings regenerated by the streaming quality probe
+    quality_kept_failing: Optional[bool]  # Failing opening streamed anyway (no turn budget to regenerate)
     response_length_hint: Optional[Literal["short", "medium", "detailed"]]  # From reasoning node
+    generation_budget: Optional[dict]  # GenerationBudget applied to the answer and how it ended
     
     # ========== Error Handling ==========
     error: Optional[str]
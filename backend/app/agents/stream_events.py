@@ -0,0 +1,244 @@
+"""
+Stream Events - What the chat stream publishes, decided at the source
+
+The graph is streamed with LangGraph stream modes instead of astream_events,
+so only client-relevant events are ever produced:
+- "messages": answer tokens from MESSAGE_STREAM_NODES (the general agent).
+  Internal model calls (reasoning, intent classifier, compaction, and the
+  tutor/math raw streams) are tagged with INTERNAL_MODEL_TAGS, so LangGraph
+  never emits their tokens at all.
+- "custom":   events written explicitly by nodes via publish(): filtered
+  tutor/math answer text, queue-updates for pipeline stages
+  (with_queue_updates wraps the stage nodes), and the tutor/math retrieval
+  step and its sources, sent before answer tokens (publish_sources).
+- "updates":  node outputs, mapped once per node to chain-of-thought,
+  concepts, tool calls/results, sources and evaluation.
+
+StreamEventMapper turns those (mode, data) parts into AI SDK v5 events.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import functools
+import json
+import logging
+
+from app.agents.answer_stream import AnswerStreamFilter, chunk_text
+
+logger = logging.getLogger(__name__)
+
+try:
+    from langgraph.constants import TAG_NOSTREAM
+except ImportError:  # pragma: no cover - older langgraph
+    TAG_NOSTREAM = "nostream"
+
+# Tags for model calls whose tokens must never reach the client
+# ("no_stream" kept for existing Langfuse filters)
+INTERNAL_MODEL_TAGS = [TAG_NOSTREAM, "no_stream"]
+
+STREAM_MODES = ["updates", "messages", "custom"]
+
+# Nodes whose model tokens are the answer itself
+MESSAGE_STREAM_NODES = frozenset({"agent"})
+
+# Pipeline stages shown in the extension's queue, by node
+QUEUE_STAGES = {
+    "governor": "policy-check",
+    "reasoning": "reasoning",
+    "supervisor": "intent-routing",
+    "pedagogical_tutor": "response-gen",
+    "math_agent": "response-gen",
+    "agent": "response-gen",
+    "evaluator": "quality-check",
+}
+
+
+def publish(event: Dict[str, Any]) -> None:
+    """Write a client event from inside a node (no-op outside a streaming run)"""
+    try:
+        from langgraph.config import get_stream_writer
+        writer = get_stream_writer()
+    except Exception:
+        return  # Not inside a graph run (e.g. direct node call)
+    try:
+        writer(event)
+    except Exception as e:
+        logger.debug(f"Could not publish {event.get('type')}: {e}")
+
+
+# Queue item added while the tutor/math nodes fetch course materials
+RETRIEVAL_QUEUE_ITEM = {"id": "retrieval", "label": "Searching Course Materials"}
+
+
+def publish_retrieval_started() -> None:
+    publish({"type": "queue-add", "queueItem": {**RETRIEVAL_QUEUE_ITEM, "status": "processing"}})
+
+
+def publish_retrieval_completed() -> None:
+    publish({"type": "queue-update", "queueItemId": RETRIEVAL_QUEUE_ITEM["id"], "status": "completed"})
+
+
+def publish_sources(rag_results: List[Any], max_sources: int = 5) -> List[Dict[str, Any]]:
+    """
+    Send the sources for retrieval results now, before the answer is generated
+
+    Returns the same list for the node's response_sources; StreamEventMapper
+    does not repeat it when the node's update arrives.
+    """
+    from app.agents.source_metadata import sources_for_client
+
+    sources = sources_for_client(rag_results, max_sources)
+    if sources:
+        publish({"type": "sources", "sources": sources})
+    return sources
+
+
+def with_queue_updates(node_fn: Callable, queue_id: str) -> Callable:
+    """
+    Wrap a node so it publishes queue-update processing/completed around its run
+
+    functools.wraps keeps the original signature visible, so LangGraph still
+    passes `config` to nodes that accept it.
+    """
+    @functools.wraps(node_fn)
+    def wrapper(*args, **kwargs):
+        publish({"type": "queue-update", "queueItemId": queue_id, "status": "processing"})
+        result = node_fn(*args, **kwargs)
+        publish({"type": "queue-update", "queueItemId": queue_id, "status": "completed"})
+        return result
+    return wrapper
+
+
+def _tool_id(call_id: Optional[str], tool_name: str) -> str:
+    return f"tool-{(call_id or tool_name)[:8]}"
+
+
+class StreamEventMapper:
+    """
+    Maps LangGraph stream parts to client events for one turn
+
+    Usage:
+        mapper = StreamEventMapper()
+        async for mode, data in graph.astream(state, stream_mode=STREAM_MODES):
+            for event in mapper.map(mode, data):
+                yield event
+        for event in mapper.finish():
+            yield event
+    """
+
+    def __init__(self):
+        # Agent tokens may still carry <thinking> blocks; tutor/math text is filtered at the node
+        self._answer_filter = AnswerStreamFilter()
+        self._sources_sent: Optional[List[Dict[str, Any]]] = None  # Last sources event, to avoid resending
+
+    def map(self, mode: str, data: Any) -> List[Dict[str, Any]]:
+        if mode == "messages":
+            return self._message(data)
+        if mode == "custom":
+            if not isinstance(data, dict) or not data.get("type"):
+                return []
+            if data["type"] == "sources":
+                self._sources_sent = data.get("sources")
+            return [data]
+        if mode == "updates":
+            events = []
+            for node, output in (data or {}).items():
+                if node in MESSAGE_STREAM_NODES:
+                    events.extend(self.finish())  # Node done - release any held-back tail now
+                if isinstance(output, dict):
+                    events.extend(self._node_update(node, output))
+            return events
+        return []
+
+    def finish(self) -> List[Dict[str, Any]]:
+        tail = self._answer_filter.finish()
+        return [{"type": "text-delta", "textDelta": tail}] if tail else []
+
+    # ---------- messages ----------
+
+    def _message(self, data) -> List[Dict[str, Any]]:
+        chunk, metadata = data
+        if (metadata or {}).get("langgraph_node") not in MESSAGE_STREAM_NODES:
+            return []
+        if getattr(chunk, "type", None) == "tool":
+            return []
+        text = self._answer_filter.feed(chunk_text(getattr(chunk, "content", "")))
+        return [{"type": "text-delta", "textDelta": text}] if text else []
+
+    # ---------- updates ----------
+
+    def _node_update(self, node: str, output: Dict[str, Any]) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+
+        if node == "reasoning":
+            # Chain-of-thought from the reasoning node, shown for transparency
+            thought_chain = output.get("thought_chain") or []
+            if thought_chain:
+                logger.info(f"🧠 Emitting {len(thought_chain)} chain-of-thought steps")
+                events.append({"type": "chain-of-thought", "thoughts": thought_chain})
+            key_concepts = output.get("key_concepts_detected") or []
+            if key_concepts:
+                events.append({"type": "concepts-detected", "concepts": key_concepts})
+
+        elif node in ("pedagogical_tutor", "math_agent"):
+            sources = output.get("response_sources") or []
+            if sources and sources != self._sources_sent:  # Usually already published after retrieval
+                events.append({"type": "sources", "sources": sources})
+
+        elif node == "agent":
+            for message in output.get("messages") or []:
+                for call in getattr(message, "tool_calls", None) or []:
+                    events.append({
+                        "type": "tool-call",
+                        "toolId": _tool_id(call.get("id"), call.get("name", "tool")),
+                        "toolName": call.get("name"),
+                        "toolInput": call.get("args"),
+                        "timestamp": None,
+                    })
+
+        elif node == "tools":
+            for message in output.get("messages") or []:
+                events.extend(self._tool_result(message))
+
+        elif node == "evaluator":
+            evaluation = output.get("evaluation")
+            if evaluation:
+                logger.info(f"📤 Emitting evaluation: agent={evaluation.get('agent_used')}")
+                events.append({"type": "evaluation", "evaluation": evaluation})
+            else:
+                logger.warning("Evaluator output missing 'evaluation' key")
+
+        return events
+
+    def _tool_result(self, message) -> List[Dict[str, Any]]:
+        tool_name = getattr(message, "name", None) or "tool"
+        content = getattr(message, "content", None)
+        events = [{
+            "type": "tool-result",
+            "toolId": _tool_id(getattr(message, "tool_call_id", None), tool_name),
+            "toolName": tool_name,
+            "toolOutput": str(content) if content else None,
+            "timestamp": None,
+        }]
+
+        if tool_name == "retrieve_context":
+            # Sent with the tools update - before post_tools and the agent's next answer tokens
+            sources = self._retrieval_sources(message)
+            if sources:
+                self._sources_sent = sources
+                events.append({"type": "sources", "sources": sources})
+        return events
+
+    @staticmethod
+    def _retrieval_sources(message) -> List[Dict[str, Any]]:
+        """Format retrieve_context results for the frontend"""
+        from app.agents.source_metadata import sources_for_client
+
+        output = getattr(message, "artifact", None)
+        if not isinstance(output, list):
+            try:
+                output = json.loads(getattr(message, "content", "") or "")
+            except (TypeError, ValueError):
+                return []
+        if not isinstance(output, list):
+            return []
+        return sources_for_client(output)
@@ -0,0 +1,223 @@
+"""
+Streaming Quality Gate - Judge answers while they stream
+
+quality_gate_node scores the finished response (calculate_response_confidence)
+and, on a low score, routes back to the agent for a full regeneration with
+repair guidance - doubling latency and cost for those turns, after the
+student has already seen the first answer. For the streamed tutor/math
+answers the same signals are now computed on the stream instead:
+
+- QualityProbe holds back the first settings.quality_probe_chars of visible
+  text and tracks sentences, questions and explanation markers over it.
+  A clearly failing opening (mostly questions, no explanation) is aborted
+  and regenerated once with RESTART_GUIDANCE, before anything reaches the
+  client; an opening that is on track is released and the rest streams
+  directly.
+- The final confidence is scored once the answer is complete and returned
+  by the node with quality_checked = True, so the graph skips the
+  quality_gate hop for these answers.
+
+QualityStats reports early restarts (with the generation time they threw
+away), full repair loops, and turn latency with and without either.
+"""
+
+from typing import Any, Dict, Optional
+import logging
+import re
+import threading
+
+from app.agents.generation_budget import get_expected_length_range
+from app.agents.state import AgentState
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_MARKERS = [
+    'means', 'is a', 'refers to', 'for example', 'in other words',
+    'this is', 'essentially', 'simply put', 'think of it as',
+    'works by', 'the reason', 'because'
+]
+_MARKER_RE = re.compile("|".join(re.escape(m) for m in EXPLANATION_MARKERS), re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"[.!?]+(?=\s|$)")
+
+QUESTIONS_ONLY_RATIO = 0.7  # Opening sentences that are questions, above which (with no explanation) it fails
+
+RESTART_GUIDANCE = """
+IMPORTANT: Start with the explanation, not with questions.
+
+You MUST include:
+1. A clear DEFINITION (1-2 sentences explaining what the concept IS)
+2. A concrete EXAMPLE (not just "for example..." but an actual example)
+3. THEN a check-in question
+"""
+
+
+def calculate_response_confidence(response: str, intent: str, state: Optional[AgentState] = None) -> float:
+    """
+    Calculate confidence score for response quality with context-aware length checking.
+    
+    UPDATED (Dec 2025): More lenient scoring to avoid over-repair.
+    Focus on catching genuinely bad responses, not penalizing natural variation.
+    
+    Low confidence triggers repair loop.
+    
+    Returns:
+        Score between 0.0 and 1.0
+    """
+    if not response:
+        return 0.0
+    
+    base_score = 0.6  # Start higher - assume good until proven otherwise
+    response_length = len(response)
+    
+    # Context-aware length checking
+    is_follow_up = state.get("is_follow_up", False) if state else False
+    response_length_hint = state.get("response_length_hint") if state else None
+    min_chars, max_chars = get_expected_length_range(intent, is_follow_up, response_length_hint)
+    
+    # Length scoring - RELAXED penalties
+    if response_length < min_chars:
+        # Too short - penalize based on how short
+        ratio = response_length / min_chars if min_chars > 0 else 0
+        base_score -= 0.2 * (1 - ratio)  # Reduced from 0.3
+    elif response_length > max_chars:
+        # Too long - very mild penalty (let natural responses through)
+        excess_ratio = (response_length - max_chars) / max_chars
+        base_score -= min(0.1, excess_ratio * 0.05)  # Reduced from 0.2 cap
+    else:
+        # Within range - small bonus
+        base_score += 0.1
+    
+    # Follow-up specific check - only penalize EXTREME overages
+    if is_follow_up and response_length > max_chars * 2.0:  # Changed from 1.5x
+        base_score -= 0.15  # Reduced from 0.2
+        logger.info(f"📏 Follow-up response long ({response_length} chars) - minor penalty")
+    
+    # Question ratio check - only penalize if MOSTLY questions with NO substance
+    sentences = [s.strip() for s in response.split('.') if s.strip()]
+    if sentences:
+        question_count = sum(1 for s in sentences if '?' in s)
+        question_ratio = question_count / len(sentences)
+        
+        # Only penalize if >70% questions AND very short (likely just questions)
+        if question_ratio > 0.7 and response_length < min_chars * 0.7:
+            base_score -= 0.15  # Reduced from 0.25
+        # Reward good question balance (10-40%) for tutor intent
+        elif intent == "tutor" and 0.1 <= question_ratio <= 0.5:
+            base_score += 0.05
+    
+    # Check for explanation markers (positive signals) - reduced bonus
+    response_lower = response.lower()
+    marker_count = sum(1 for m in EXPLANATION_MARKERS if m in response_lower)
+    base_score += min(0.1, marker_count * 0.02)  # Reduced from 0.2 max
+    
+    # Structure bonus - reduced to avoid rewarding verbose formatting
+    if any(c in response for c in ['•', '-', '1.', '2.']):
+        base_score += 0.05  # Reduced from 0.1
+    
+    return max(0.0, min(1.0, base_score))
+
+
+class QualityProbe:
+    """
+    Incremental quality signals over the opening of a streamed answer
+
+    feed() returns None while undecided, True once the opening is on track,
+    False if it is clearly failing; finish() decides for answers shorter
+    than the probe window.
+    """
+
+    def __init__(self, intent: str, probe_chars: Optional[int] = None):
+        self.intent = intent
+        self.probe_chars = settings.quality_probe_chars if probe_chars is None else probe_chars
+        self.text = ""
+        self.reason: Optional[str] = None
+        self.restarted = False  # Set by stream_answer when the opening was regenerated
+        self.restart_seconds = 0.0  # Time spent on the discarded opening
+        self.kept_failing = False  # Set by stream_answer when a failing opening was sent (no budget to regenerate)
+
+    def feed(self, text: str) -> Optional[bool]:
+        self.text += text
+        if len(self.text) < self.probe_chars:
+            return None
+        return self._verdict()
+
+    def finish(self) -> bool:
+        return self._verdict()
+
+    def signals(self) -> Dict[str, int]:
+        ends = _SENTENCE_END_RE.findall(self.text)
+        return {
+            "sentences": len(ends),
+            "questions": sum(1 for end in ends if "?" in end),
+            "markers": len(_MARKER_RE.findall(self.text)),
+        }
+
+    def _verdict(self) -> bool:
+        signals = self.signals()
+        sentences = signals["sentences"]
+        if (
+            sentences >= 2
+            and signals["questions"] / sentences > QUESTIONS_ONLY_RATIO
+            and signals["markers"] == 0
+        ):
+            self.reason = "questions_only"
+            return False
+        return True
+
+
+def with_guidance(prompt: Any, guidance: str) -> Any:
+    """The prompt for a restarted generation (string prompts or message lists)"""
+    if isinstance(prompt, str):
+        return f"{prompt}\n\n{guidance}"
+    if isinstance(prompt, list):
+        return [*prompt, ("system", guidance)]
+    return prompt
+
+
+class QualityStats:
+    """Early restarts, full repair loops, and turn latency by outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.restarts_by_reason: Dict[str, int] = {}
+        self.restart_wasted_seconds = 0.0
+        self._turns = {"clean": [0, 0.0], "restarted": [0, 0.0], "repaired": [0, 0.0]}
+
+    def record_restart(self, node: str, reason: str, wasted_seconds: float) -> None:
+        with self._lock:
+            key = f"{node}:{reason}"
+            self.restarts_by_reason[key] = self.restarts_by_reason.get(key, 0) + 1
+            self.restart_wasted_seconds += wasted_seconds
+
+    def record_turn(self, seconds: float, restarted: bool, repaired: bool) -> None:
+        outcome = "repaired" if repaired else "restarted" if restarted else "clean"
+        with self._lock:
+            self._turns[outcome][0] += 1
+            self._turns[outcome][1] += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(count for count, _ in self._turns.values())
+            return {
+                "turns": total,
+                "early_restarts": dict(self.restarts_by_reason),
+                "restart_wasted_seconds": round(self.restart_wasted_seconds, 1),
+                "restart_rate": round(self._turns["restarted"][0] / total, 3) if total else 0.0,
+                "repair_loop_rate": round(self._turns["repaired"][0] / total, 3) if total else 0.0,
+                "avg_seconds": {
+                    outcome: round(seconds / count, 2) if count else None
+                    for outcome, (count, seconds) in self._turns.items()
+                },
+            }
+
+
+_quality_stats = None
+
+
+def get_quality_stats() -> QualityStats:
+    """Get or create the process-wide quality stats"""
+    global _quality_stats
+    if _quality_stats is None:
+        _quality_stats = QualityStats()
+    return _quality_stats
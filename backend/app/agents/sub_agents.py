@@ -5,6 +5,7 @@ Specialized agents for different tasks
 
 from typing import Dict, List, Optional
 import logging
+import threading
 import time
 from app.agents.state import AgentState
 from app.agents.supervisor import Supervisor
@@ -118,13 +119,38 @@ class RAGAgent:
         return self.vectorstore.summarize_sources(records)
 
 
+_rag_agent = None
+_syllabus_agent = None
+_agents_lock = threading.Lock()  # Concurrent tool calls may be the first users
+
+
+def get_rag_agent() -> RAGAgent:
+    """Get or create the shared RAG agent (connects to Chroma on first use)"""
+    global _rag_agent
+    if _rag_agent is None:
+        with _agents_lock:
+            if _rag_agent is None:
+                _rag_agent = RAGAgent()
+    return _rag_agent
+
+
+def get_syllabus_agent() -> SyllabusAgent:
+    """Get or create the shared syllabus agent (connects to Chroma on first use)"""
+    global _syllabus_agent
+    if _syllabus_agent is None:
+        with _agents_lock:
+            if _syllabus_agent is None:
+                _syllabus_agent = SyllabusAgent()
+    return _syllabus_agent
+
+
 def rag_node(state: AgentState) -> AgentState:
     """
     RAG retrieval node
     Retrieves relevant context from ChromaDB
     Now instrumented with Langfuse spans.
     """
-    rag_agent = RAGAgent()
+    rag_agent = get_rag_agent()
     # Use effective_query (contextualized) if available, otherwise original query
     query = state.get("effective_query") or state.get("query", "")
     
@@ -143,7 +169,7 @@ def syllabus_node(state: AgentState) -> AgentState:
     Syllabus check node
     Checks syllabus for course information
     """
-    syllabus_agent = SyllabusAgent()
+    syllabus_agent = get_syllabus_agent()
     # Use effective_query (contextualized) if available, otherwise original query
     query = state.get("effective_query") or state.get("query", "")
     
@@ -34,7 +34,13 @@ from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.language_models import BaseChatModel
 from app.config import settings
+from app.agents.llm_cache import get_llm_result_cache, looks_like_json
+from app.agents.stream_events import INTERNAL_MODEL_TAGS
+from app.agents.model_cascade import plan_cascade, tier_model
+from app.agents.model_routing import CHARS_PER_TOKEN, ModelLatencyCallback, choose_model, model_id_of
+from app.agents.generation_budget import get_expected_length_range
 from app.observability import get_langfuse_handler
 from app.observability.langfuse_client import (
     create_observation,
@@ -224,6 +230,15 @@ AVAILABLE_MODELS = {
         "cost": "low",
         "requires_key": "groq_api_key",
     },
+    "groq-llama-8b": {
+        "name": "Llama 3.1 8B (Groq)",
+        "provider": "groq",
+        "description": "Smallest and cheapest, for simple questions",
+        "speed": "very_fast",
+        "quality": "medium",
+        "cost": "low",
+        "requires_key": "groq_api_key",
+    },
     # Local Models (Ollama)
     "ollama-mistral-7b": {
         "name": "Mistral 7B (Local)",
@@ -341,13 +356,22 @@ class Supervisor:
             callbacks=callbacks,
         )
         
+        # Cheapest Gemini tier (first model_cascade tier for simple intents)
+        self.gemini_flash_lite = ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash-lite",
+            google_api_key=settings.google_api_key,
+            temperature=0.7,
+            callbacks=callbacks,
+        )
+        
         # Fast classifier (low temperature for deterministic classification)
         self.gemini_classifier = ChatGoogleGenerativeAI(
             model="gemini-2.5-flash",  # Stable: best price-performance model
             google_api_key=settings.google_api_key,
             temperature=0.1,  # Low temperature for consistent classification
             callbacks=[],  # No callbacks for classifier to reduce overhead
-        )
+            cache=get_llm_result_cache("intent_classification", validate=looks_like_json),
+        ).with_config(tags=INTERNAL_MODEL_TAGS)  # Classification output never streams
         
         # Initialize GitHub Models (Azure OpenAI)
         github_token = os.environ.get("GITHUB_TOKEN")
@@ -393,10 +417,18 @@ class Supervisor:
                 temperature=0.7,
                 callbacks=callbacks,
             )
+            # Small model (cheapest model_cascade tier)
+            self.groq_small = ChatGroq(
+                model_name="llama-3.1-8b-instant",
+                groq_api_key=settings.groq_api_key,
+                temperature=0.7,
+                callbacks=callbacks,
+            )
         else:
             logger.warning("GROQ_API_KEY not found. Falling back to Gemini for all tasks.")
             self.groq_coder = None
             self.groq_fast = None
+            self.groq_small = None
         
         # Initialize Ollama (Local models)
         ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
@@ -417,6 +449,12 @@ class Supervisor:
             logger.info(f"Ollama not available: {e}")
             self.ollama_mistral = None
             self.ollama_qwen = None
+        
+        # Per-model TTFT / tokens-per-sec / error samples for latency-aware routing
+        for model in vars(self).values():
+            model_id = model_id_of(model) if isinstance(model, BaseChatModel) else None
+            if model_id:
+                model.callbacks = [*(model.callbacks or []), ModelLatencyCallback(model_id)]
 
     def route_from_reasoning(self, state: AgentState) -> Optional[Dict[str, Any]]:
         """
@@ -494,6 +532,19 @@ class Supervisor:
         return None
 
     def _intent_to_model(self, intent: str, state: Optional[AgentState] = None) -> str:
+        """
+        Static model for the intent, swapped for a clearly faster allowed model
+        when latency-aware routing is on (see model_routing.choose_model).
+        """
+        static_model = self._static_intent_model(intent, state)
+        state = state or {}
+        _, max_chars = get_expected_length_range(intent, state.get("is_follow_up", False), state.get("response_length_hint"))
+        model, reason = choose_model(intent, static_model, self, max_chars // CHARS_PER_TOKEN)
+        if model != static_model:
+            logger.info(f"⏱️ Latency routing: {intent} → {model} instead of {static_model} ({reason})")
+        return model
+
+    def _static_intent_model(self, intent: str, state: Optional[AgentState] = None) -> str:
         """
         Map intent to appropriate model with intelligent selection.
         
@@ -621,8 +672,11 @@ class Supervisor:
         Routing priority:
         1. Use reasoning node output if available (highest quality)
         2. Check fast-path for obvious patterns (performance optimization)
-        3. Use LLM classification for ambiguous cases
-        4. Fall back to legacy regex as last resort
+        3. Use the locally trained intent classifier when it is confident
+        4. A low-confidence reasoning result, if the reasoning node ran: its
+           structured output is the turn's one classification call
+        5. Use LLM classification for ambiguous cases (no reasoning output)
+        6. Fall back to legacy regex as last resort
         
         Args:
             state: Agent state with potential reasoning node output
@@ -644,18 +698,62 @@ class Supervisor:
             logger.debug(f"Routing from fast-path: {fast_result['intent']}")
             return fast_result
         
-        # Priority 3: Use LLM classification for ambiguous cases
+        # Priority 3: Locally trained classifier (microseconds, no API call)
+        local_result = self.classify_with_local_model(query)
+        if local_result:
+            logger.debug(f"Routing from local classifier: {local_result['intent']}")
+            return local_result
+        
+        # Priority 4: Never classify twice - a low-confidence reasoning result still decides
+        if state.get("reasoning_complete") and state.get("reasoning_intent"):
+            reasoning_intent = state["reasoning_intent"]
+            logger.debug(f"Routing from low-confidence reasoning: {reasoning_intent}")
+            return {
+                "intent": reasoning_intent,
+                "model_selected": self._intent_to_model(reasoning_intent, state),
+                "confidence": state.get("reasoning_confidence", 0),
+                "reason": f"From reasoning node (low confidence): {state.get('reasoning_strategy', 'analyzed')}",
+                "routing_method": "reasoning_node_low_confidence"
+            }
+        
+        # Priority 5: Use LLM classification for ambiguous cases
         llm_result = self.classify_with_llm(query)
         if llm_result and llm_result.get("confidence", 0) >= 0.6:
             logger.debug(f"Routing from LLM: {llm_result['intent']}")
             return llm_result
         
-        # Priority 4: Fall back to legacy regex
+        # Priority 6: Fall back to legacy regex
         legacy_result = self.route_intent(query)
         legacy_result["routing_method"] = "legacy_fallback"
         logger.debug(f"Routing from legacy: {legacy_result['intent']}")
         return legacy_result
 
+    def classify_with_local_model(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Classify intent with the trained classifier (see intent_classifier.py).
+        
+        Returns None when no model is active or its probability is below
+        settings.intent_classifier_threshold, so the caller falls back to the LLM.
+        """
+        try:
+            from app.agents.intent_classifier import classify_intent
+            prediction = classify_intent(query)
+        except Exception as e:
+            logger.warning(f"Local intent classifier failed: {e}")
+            return None
+        if prediction is None:
+            return None
+        
+        intent, confidence = prediction
+        minimal_state = {"response_length_hint": "medium"}
+        return {
+            "intent": intent,
+            "model_selected": self._intent_to_model(intent, minimal_state),
+            "confidence": confidence,
+            "reason": f"Local classifier: {intent} (p={confidence:.2f})",
+            "routing_method": "local_classifier"
+        }
+
     def classify_with_llm(self, query: str) -> Optional[Dict[str, str]]:
         """
         Use LLM to classify intent when regex patterns have low confidence.
@@ -756,7 +854,12 @@ class Supervisor:
             logger.debug(f"Regex routing confident: {regex_result['confidence']:.2f}")
             return regex_result
         
-        # Low confidence - try LLM classification
+        # Low confidence - try the local classifier, then LLM classification
+        local_result = self.classify_with_local_model(query)
+        if local_result:
+            local_result["regex_fallback"] = regex_result
+            return local_result
+        
         logger.info(f"Low regex confidence ({regex_result['confidence']:.2f}), using LLM fallback")
         llm_result = self.classify_with_llm(query)
         
@@ -789,6 +892,8 @@ class Supervisor:
             return self.gemini_25_flash
         elif model_name == "gemini-tutor":
             return self.gemini_tutor
+        elif model_name == "gemini-2.5-flash-lite":
+            return self.gemini_flash_lite
             
         # GitHub Models (Azure OpenAI)
         elif model_name == "gpt-4.1-mini":
@@ -811,7 +916,7 @@ class Supervisor:
         elif model_name == "groq-llama-70b":
             return self.groq_coder or self.gemini_flash
         elif model_name == "groq-llama-8b":
-            return self.groq_fast or self.gemini_flash
+            return self.groq_small or self.groq_fast or self.gemini_flash
             
         # Ollama local models
         elif model_name == "ollama-mistral-7b":
@@ -829,6 +934,21 @@ class Supervisor:
             logger.debug(f"Unknown model {model_name}, using gemini-flash")
             return self.gemini_flash  # Default fallback
 
+    def is_available(self, model_name: str) -> bool:
+        """Whether get_model returns the named model itself rather than a fallback"""
+        optional_models = {
+            "gpt-4.1-mini": self.gpt_41_mini,
+            "gpt-4o": self.gpt_4o,
+            "o3-mini": self.o3_mini,
+            "groq-llama-70b": self.groq_coder,
+            "groq-llama-8b": self.groq_small,
+            "ollama-mistral-7b": self.ollama_mistral,
+            "ollama-qwen2-7b": self.ollama_qwen,
+        }
+        if model_name in optional_models:
+            return optional_models[model_name] is not None
+        return model_name in AVAILABLE_MODELS or model_name in ("gemini-flash", "gemini-tutor")
+
 
 def supervisor_node(state: AgentState) -> AgentState:
     """
@@ -886,9 +1006,23 @@ def supervisor_node(state: AgentState) -> AgentState:
         # Use new LLM-first routing method
         routing = supervisor.route_with_reasoning(state)
     
+    # Cheap-first cascade: start on the cheapest adequate tier, escalate on quality failure
+    # (a user-selected model is always used as is)
+    cascade = None
+    if not model_override:
+        cascade = plan_cascade(routing["intent"], routing["model_selected"], supervisor)
+        if cascade and tier_model(cascade) != routing["model_selected"]:
+            routing["reason"] = f"{routing.get('reason', '')} (cascade from {tier_model(cascade)}, escalates to {routing['model_selected']})"
+            routing["model_selected"] = tier_model(cascade)
+    
     # Calculate processing time
     processing_time = (time.time() - start_time) * 1000  # milliseconds
     
+    # Classification LLM calls this turn: the reasoning call (unless answered locally) + any supervisor fallback
+    from app.agents.reasoning_node import get_reasoning_stats
+    classification_calls = int(state.get("reasoning_source") == "llm") + int(routing.get("routing_method") == "llm_fallback")
+    get_reasoning_stats().record_turn(classification_calls)
+    
     # Update processing times tracking
     processing_times = state.get("processing_times", {}) or {}
     processing_times["supervisor"] = processing_time
@@ -938,7 +1072,7 @@ def supervisor_node(state: AgentState) -> AgentState:
                     "query_complexity": "high" if routing["intent"] in ["math", "tutor"] else "standard",
                     "expected_performance": "optimized" if "groq" in routing["model_selected"] else "standard",
                     "pedagogical_mode": routing["intent"] in ["tutor", "math", "explain"],
-                    "used_reasoning_node": routing_method == "reasoning_node",
+                    "used_reasoning_node": routing_method.startswith("reasoning_node"),
                     "used_fast_path": "fast_path" in routing_method,
                     "used_llm_classification": routing_method == "llm_fallback"
                 }
@@ -952,6 +1086,7 @@ def supervisor_node(state: AgentState) -> AgentState:
     return {
         "intent": routing["intent"],
         "model_selected": routing["model_selected"],
+        "model_cascade": cascade,
         "processing_times": processing_times,
         "model_parameters": model_parameters
     }
@@ -0,0 +1,440 @@
+"""
+Text Matcher - Single-pass concept, misconception, topic and follow-up detection
+
+Every keyword/regex table used for per-turn text classification lives here,
+and one matcher compiled at import time serves all call sites:
+- evaluator:          concept tagging, misconception detection
+- pedagogical_tutor:  concept detection, frustrated follow-ups
+- math_agent:         math topic scoring
+- source_metadata:    topic titles for res##### files
+- tutor_agent:        recent conversation topics
+- reasoning_node:     follow-up / frustrated / incomplete heuristics
+
+How a scan works:
+1. Each pattern is parsed once (sre parser) to find literal "anchors" that
+   every match must contain, e.g. `\\bgradient.?descent` -> {"gradient"}.
+2. All anchors go into one Aho-Corasick automaton; a single pass over the
+   lowercased text yields the anchors present.
+3. Only patterns whose anchors were seen (plus the few with no usable
+   anchor) are confirmed with their own compiled regex.
+
+Results are exact - identical to running every pattern with re.search - and
+cached per text, so the reasoning node, tutor and evaluator share one scan of
+the same query. Each scope (query / source / history, see SCAN_SCOPES) has its
+own matcher so long texts are only checked for the families they need.
+
+Patterns that are only literals and alternation (e.g. `accuracy|precision`)
+need no confirmation at all: finding one of their strings is the match.
+
+pyahocorasick is optional; without it each anchor is checked with a plain
+substring test instead (still exact).
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence
+import logging
+import re
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# ========== Pattern tables ==========
+
+# Concept detection patterns for automatic tagging (evaluator + tutor)
+# Patterns should be flexible to match various phrasings
+# Note: Using word-start \b but allowing word to continue (no trailing \b for prefixes)
+# Order matters: the first matching concept is the one reported
+CONCEPT_PATTERNS = {
+    "backpropagation": r"\b(backprop\w*|back.?propagat\w*|chain.?rule|error.?propagat\w*)",
+    "gradient_descent": r"\b(gradient.?descent|learning.?rate|optimi[sz]\w+|minimize|converge|gradient)",
+    "neural_networks": r"\b(neural.?network\w*|perceptron\w*|hidden.?layer\w*|deep.?learn\w*|ann\b|neuron\w*|activation.?function\w*)",
+    "classification": r"\b(classif\w+|decision.?tree\w*|knn\b|k-?nearest|svm\b|support.?vector\w*|naive.?bayes|logistic.?regress\w*)",
+    "regression": r"\b(regress\w+|linear.?model\w*|polynomial|predict\w*.*(continuous|number|value)|linear.?regress\w*)",
+    "clustering": r"\b(cluster\w+|k-?means|hierarchical|unsupervised.?learn\w*|grouping|dbscan)",
+    "probability": r"\b(bayes\w*|probabilit\w+|prior|posterior|conditional|likelihood|distribution)",
+    "supervised_learning": r"\b(supervis\w+|labeled.?data|training.?label\w*|target.?variable|train.?test)",
+    "unsupervised_learning": r"\b(unsupervis\w+|unlabeled|dimensionality.?reduc\w*|pca\b)",
+    "model_evaluation": r"\b(accuracy|precision|recall|f1.?score|confusion.?matrix|cross.?validat\w*|overfit\w*|underfit\w*|bias.?variance)",
+    "data_preprocessing": r"\b(normali[sz]\w*|feature.?engineer\w*|data.?clean\w*|missing.?value\w*|scaling|encoding|preprocess\w*)",
+}
+
+# Fallback keywords when no specific concept matches
+COURSE_GENERAL_KEYWORDS = ["course", "class", "comp 237", "comp237"]
+
+# Common misconception patterns in AI/ML
+MISCONCEPTION_PATTERNS = {
+    "classification_regression_swap": {
+        "pattern": r"\b(regression|regress).*(categor|class|discrete)|\b(classif).*(continuous|number|value)\b",
+        "description": "Confusing classification (categories) with regression (continuous values)",
+        "concept": "classification"
+    },
+    "overfitting_underfitting_swap": {
+        "pattern": r"\b(overfit).*(simple|less\s+data)|\b(underfit).*(complex|more\s+data)\b",
+        "description": "Confusing overfitting (too complex) with underfitting (too simple)",
+        "concept": "model_evaluation"
+    },
+    "supervised_unsupervised_swap": {
+        "pattern": r"\b(supervised).*(no\s+labels|unlabeled)|\b(unsupervised).*(labeled|target)\b",
+        "description": "Confusing supervised (labeled data) with unsupervised (unlabeled)",
+        "concept": "supervised_learning"
+    },
+    "gradient_descent_direction": {
+        "pattern": r"\bgradient.*(increase|maximize|ascent)\b(?!.*negative)",
+        "description": "Thinking gradient descent goes UP the gradient (it goes DOWN)",
+        "concept": "gradient_descent"
+    },
+    "learning_rate_inverse": {
+        "pattern": r"\b(high|large)\s+learning.*(slow|precise)|\b(low|small)\s+learning.*(fast|quick)\b",
+        "description": "Inverting learning rate effects (high=fast/unstable, low=slow/stable)",
+        "concept": "gradient_descent"
+    },
+}
+
+# Math topic detection patterns (score = number of patterns matched per topic)
+MATH_TOPICS = {
+    "gradient_descent": [
+        r"gradient\s*descent", r"learning\s*rate", r"optimization",
+        r"minimize", r"gradient", r"step\s*size"
+    ],
+    "backpropagation": [
+        r"backprop", r"back\s*propagation", r"backward\s*pass",
+        r"chain\s*rule", r"error\s*propagation"
+    ],
+    "loss_functions": [
+        r"loss\s*function", r"cost\s*function", r"mse", r"mean\s*squared",
+        r"cross[\-\s]*entropy", r"error\s*function"
+    ],
+    "probability": [
+        r"bayes", r"probability", r"conditional", r"prior", r"posterior",
+        r"likelihood", r"naive\s*bayes"
+    ],
+    "linear_algebra": [
+        r"matrix", r"vector", r"transpose", r"inverse", r"dot\s*product",
+        r"eigenvalue", r"linear\s*regression"
+    ],
+    "derivatives": [
+        r"derivative", r"partial\s*derivative", r"differentiate",
+        r"calculus", r"slope", r"rate\s*of\s*change"
+    ],
+    "neural_networks": [
+        r"activation", r"sigmoid", r"relu", r"softmax", r"weights",
+        r"bias", r"neuron", r"layer"
+    ]
+}
+
+# ML/AI topic titles for res##### source files (first match wins)
+SOURCE_TOPIC_PATTERNS = [
+    (r'neural network|hidden layer|perceptron|feedforward|feed.?forward', 'Neural Networks'),
+    (r'gradient descent|learning rate', 'Gradient Descent'),
+    (r'backpropagation|back.?prop', 'Backpropagation'),
+    (r'decision tree', 'Decision Trees'),
+    (r'support vector|svm', 'Support Vector Machines'),
+    (r'k-?nearest|knn', 'K-Nearest Neighbors'),
+    (r'naive bayes', 'Naive Bayes'),
+    (r'regression|linear model', 'Regression'),
+    (r'classification|classifier', 'Classification'),
+    (r'clustering|k-?means', 'Clustering'),
+    (r'overfitting|underfitting', 'Model Fitting'),
+    (r'cross.?validation', 'Cross Validation'),
+    (r'activation function', 'Activation Functions'),
+    (r'loss function|cost function', 'Loss Functions'),
+    (r'layer|input layer|output layer', 'Network Layers'),
+    (r'epoch|batch|training', 'Model Training'),
+    (r'accuracy|precision|recall|f1', 'Model Evaluation'),
+]
+
+# Common AI/ML topic keywords in recent conversation (plain substrings)
+RECENT_TOPIC_KEYWORDS = {
+    "neural network": "Neural Networks",
+    "gradient descent": "Gradient Descent",
+    "backpropagation": "Backpropagation",
+    "classification": "Classification",
+    "regression": "Regression",
+    "clustering": "Clustering",
+    "loss function": "Loss Functions",
+    "activation function": "Activation Functions",
+    "overfitting": "Overfitting",
+    "training": "Model Training",
+    "layers": "Network Layers",
+    "weights": "Weights & Biases",
+    "learning rate": "Learning Rate",
+}
+
+# FRUSTRATED FOLLOW-UP PATTERNS (require SHORT responses)
+# These are single-word rejections or continued confusion after previous explanation
+FRUSTRATED_FOLLOW_UP_PATTERNS = [
+    r"^no\.?!?$",  # Just "no"
+    r"^nope\.?!?$",  # Just "nope"
+    r"^(i\s+)?still\s+(don'?t|can'?t)\s+(get|understand)",
+    r"^(that|it|this)\s+(doesn'?t|don'?t)\s+make\s+sense",
+    r"^not\s+really\.?$",
+    r"^(i'?m\s+)?(still\s+)?confused\.?!?$",
+    r"^huh\??$",
+    r"^what\??$",  # Just "what?" as confusion
+]
+
+# Strong follow-up signals
+FOLLOW_UP_PATTERNS = [
+    r"^(what|how|why|when|where)\s+(does|do|is|are|was|were)\s+(that|it|this|they|those)\s+",
+    r"^(what|how|why)\s+(does|do|is|are)\s+(that|it|this|they)\s+",
+    r"^(i\s+)?don'?t\s+(get|understand|know)\s+(it|that|this)?",
+    r"^(can\s+you\s+)?(explain|clarify)\s+(more|further|that|it|this)",
+    r"^(what|how)\s+(about|do\s+you\s+mean)\s+",
+    r"^(okay|ok|alright|got\s+it),\s+(what|how|why)",
+    r"^(i\s+)?(still\s+)?(don'?t|can'?t)\s+(get|understand|see|grasp)",
+    r"^(that|it|this)\s+(doesn'?t|don'?t)\s+make\s+sense",
+    r"^(i'?m\s+)?(still\s+)?(confused|lost|stuck)",
+    r"^(can\s+you\s+)?(give|show|provide)\s+(me\s+)?(an\s+)?example",
+    r"^(what|how)\s+(does|do)\s+(that|it|this)\s+work",
+]
+
+# Incomplete phrases that need context (only used for very short queries)
+INCOMPLETE_FOLLOW_UP_PATTERNS = [
+    r"^(yes|no|yeah|yep|nope|sure|okay|ok|right|exactly|correct)\b",
+    r"^(and|but|so|also|too)\s+",
+    r"^(why|how|what|huh)\s*\??!?$",  # Just "why?", "how?", "what?", "huh?"
+    r"^(really|seriously|actually)\s*\??$",
+    r"^\?\s*$",  # Just a question mark
+    r"\bmore\b",  # Contains "more" (e.g., "tell me more", "explain more")
+    r"^go\s+on\b",  # "go on"
+    r"^continue\b",  # "continue"
+]
+
+# Anchors shorter than this are not selective enough to prefilter on
+MIN_ANCHOR_LENGTH = 2
+
+
+# ========== Matcher engine ==========
+
+@dataclass(frozen=True)
+class PatternSpec:
+    """One pattern registered under a family (e.g. "concept") and label (e.g. "backpropagation")"""
+    family: str
+    label: str
+    pattern: str
+
+
+@dataclass
+class MatchResult:
+    """
+    Hits for one text
+
+    counts maps family -> {label: number of that label's patterns that matched},
+    with labels in registration order. Treat it as read-only (results are cached).
+    """
+    counts: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def labels(self, family: str) -> List[str]:
+        """All matched labels of a family, in registration order"""
+        return list(self.counts.get(family, {}))
+
+    def first(self, family: str) -> Optional[str]:
+        """First matched label of a family (registration order = priority)"""
+        for label in self.counts.get(family, {}):
+            return label
+        return None
+
+    def has(self, family: str) -> bool:
+        return bool(self.counts.get(family))
+
+
+def _literal_anchors(parsed) -> Optional[FrozenSet[str]]:
+    """
+    Literal strings such that every match of `parsed` contains at least one
+
+    Returns the most selective set found (longest shortest-member), or None
+    when no anchor of MIN_ANCHOR_LENGTH exists.
+    """
+    candidates: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def flush():
+        if len(run) >= MIN_ANCHOR_LENGTH:
+            candidates.append(frozenset(["".join(run)]))
+        run.clear()
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av).lower())
+            continue
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            sub = _literal_anchors(av[-1])
+            if sub:
+                candidates.append(sub)
+        elif op is sre_parse.BRANCH:
+            branches = [_literal_anchors(b) for b in av[1]]
+            if branches and all(branches):
+                candidates.append(frozenset().union(*branches))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            sub = _literal_anchors(av[2])
+            if sub:
+                candidates.append(sub)
+    flush()
+
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(len(s) for s in c), -len(c)))
+
+
+def _literal_set(parsed) -> Optional[FrozenSet[str]]:
+    """
+    The exact strings a pattern matches if it is only literals and alternation
+
+    e.g. `accuracy|precision` -> {"accuracy", "precision"}; None for anything
+    with classes, repeats, anchors or word boundaries. Such patterns need no
+    regex confirmation - finding one of the strings is the match.
+    """
+    strings = frozenset([""])
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            options = frozenset([chr(av).lower()])
+        elif op is sre_parse.SUBPATTERN:
+            options = _literal_set(av[-1])
+        elif op is sre_parse.BRANCH:
+            branches = [_literal_set(b) for b in av[1]]
+            options = frozenset().union(*branches) if all(b is not None for b in branches) else None
+        else:
+            return None
+        if options is None:
+            return None
+        strings = frozenset(a + b for a in strings for b in options)
+    return strings if strings and "" not in strings else None
+
+
+def extract_anchors(pattern: str) -> Optional[FrozenSet[str]]:
+    """Required literal anchors for a regex (lowercased), or None if it has none"""
+    try:
+        return _literal_anchors(sre_parse.parse(pattern))
+    except Exception as e:
+        logger.debug(f"Could not extract anchors from {pattern!r}: {e}")
+        return None
+
+
+class TextMatcher:
+    """
+    Anchor-prefiltered multi-pattern matcher
+
+    With first_match_only, a scan stops at the first matching pattern in
+    registration order (for tables where only the first hit is used).
+
+    Usage:
+        matcher = TextMatcher([PatternSpec("concept", "svm", r"\\bsvm\\b")])
+        matcher.scan("what is an SVM?").first("concept")  # -> "svm"
+    """
+
+    def __init__(self, specs: Sequence[PatternSpec], first_match_only: bool = False):
+        self.specs: List[PatternSpec] = list(specs)
+        self.first_match_only = first_match_only
+        self._compiled = [re.compile(s.pattern, re.IGNORECASE) for s in self.specs]
+
+        # anchor -> indices of specs that require it; specs without anchors always run
+        self._anchor_specs: Dict[str, List[int]] = {}
+        self._always: List[int] = []
+        self._exact: FrozenSet[int] = frozenset()  # Pure-literal specs: an anchor hit is a match
+        exact = set()
+        for i, spec in enumerate(self.specs):
+            try:
+                literals = _literal_set(sre_parse.parse(spec.pattern))
+            except Exception:
+                literals = None
+            if literals and min(len(a) for a in literals) >= MIN_ANCHOR_LENGTH:
+                exact.add(i)
+                anchors = literals
+            else:
+                anchors = extract_anchors(spec.pattern)
+            if not anchors:
+                self._always.append(i)
+                continue
+            for anchor in anchors:
+                self._anchor_specs.setdefault(anchor, []).append(i)
+        self._exact = frozenset(exact)
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self._anchor_specs:
+            self._automaton = ahocorasick.Automaton()
+            for anchor, spec_ids in self._anchor_specs.items():
+                self._automaton.add_word(anchor, tuple(spec_ids))
+            self._automaton.make_automaton()
+
+        logger.debug(
+            f"TextMatcher: {len(self.specs)} patterns ({len(self._exact)} literal), "
+            f"{len(self._anchor_specs)} anchors, {len(self._always)} unanchored"
+        )
+
+    def _candidates(self, text: str) -> List[int]:
+        """Spec indices whose anchors occur in text (one pass), plus unanchored specs"""
+        candidates = set(self._always)
+        if self._automaton is not None:
+            for _, spec_ids in self._automaton.iter(text):
+                candidates.update(spec_ids)
+        else:
+            for anchor, spec_ids in self._anchor_specs.items():
+                if anchor in text:
+                    candidates.update(spec_ids)
+        return sorted(candidates)
+
+    def scan(self, text: str) -> MatchResult:
+        """Scan text once and return hits for every family"""
+        text = (text or "").lower()
+        counts: Dict[str, Dict[str, int]] = {}
+        for i in self._candidates(text):
+            if i in self._exact or self._compiled[i].search(text):
+                spec = self.specs[i]
+                labels = counts.setdefault(spec.family, {})
+                labels[spec.label] = labels.get(spec.label, 0) + 1
+                if self.first_match_only:
+                    break
+        return MatchResult(counts=counts)
+
+
+def _default_specs() -> List[PatternSpec]:
+    specs: List[PatternSpec] = []
+    specs += [PatternSpec("concept", c, p) for c, p in CONCEPT_PATTERNS.items()]
+    specs += [PatternSpec("course_general", "course_general", re.escape(k)) for k in COURSE_GENERAL_KEYWORDS]
+    specs += [PatternSpec("misconception", m, info["pattern"]) for m, info in MISCONCEPTION_PATTERNS.items()]
+    specs += [PatternSpec("math_topic", t, p) for t, patterns in MATH_TOPICS.items() for p in patterns]
+    specs += [PatternSpec("source_topic", t, p) for p, t in SOURCE_TOPIC_PATTERNS]
+    specs += [PatternSpec("recent_topic", t, re.escape(k)) for k, t in RECENT_TOPIC_KEYWORDS.items()]
+    specs += [PatternSpec("frustrated", "frustrated", p) for p in FRUSTRATED_FOLLOW_UP_PATTERNS]
+    specs += [PatternSpec("follow_up", "follow_up", p) for p in FOLLOW_UP_PATTERNS]
+    specs += [PatternSpec("incomplete", "incomplete", p) for p in INCOMPLETE_FOLLOW_UP_PATTERNS]
+    return specs
+
+
+# Which families each kind of text is checked for, and whether only the first
+# hit is needed. Long texts (history, source previews) only pay for their own
+# tables; the query gets everything else.
+SCAN_SCOPES = {
+    "query": (("concept", "course_general", "misconception", "math_topic", "frustrated", "follow_up", "incomplete"), False),
+    "source": (("source_topic",), True),
+    "history": (("recent_topic",), False),
+}
+
+# Built once at import time and shared by every call site
+TEXT_MATCHERS = {
+    scope: TextMatcher([s for s in _default_specs() if s.family in families], first_match_only=first_only)
+    for scope, (families, first_only) in SCAN_SCOPES.items()
+}
+
+
+@lru_cache(maxsize=512)
+def scan_text(text: str, scope: str = "query") -> MatchResult:
+    """
+    Scan text with the shared matcher for a scope (see SCAN_SCOPES)
+
+    Cached - the same query is scanned by the reasoning node, tutor and evaluator.
+    """
+    return TEXT_MATCHERS[scope].scan(text)
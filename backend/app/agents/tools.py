@@ -6,16 +6,43 @@ Enhanced Tool Design (2025 Refactor):
 - Clear, action-oriented descriptions
 - Explicit usage guidelines
 - Strong input validation
+
+Tool Steps:
+- Each tool has a sync and an async implementation. The backends are sync
+  (Chroma HTTP client), so the async versions run them on a dedicated
+  executor instead of the event loop's default one.
+- The RAG/syllabus agents are created on first use (get_rag_agent /
+  get_syllabus_agent), not when this module is imported.
+- tools_node runs all calls of one model step concurrently, at most
+  settings.tool_max_calls_per_step of them; calls past the cap get an error
+  ToolMessage so the model sees them as not run. Step latency by fan-out is
+  in get_tool_step_stats().
 """
 
-from typing import List, Dict, Optional
-from langchain_core.tools import tool
-from app.agents.sub_agents import RAGAgent, SyllabusAgent
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool, StructuredTool
 from pydantic import BaseModel, Field
 
-# Initialize agents once
-rag_agent = RAGAgent()
-syllabus_agent = SyllabusAgent()
+from app.agents.sub_agents import get_rag_agent, get_syllabus_agent
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Blocking tool backends run here, so one step's calls overlap and do not queue behind other executor work
+_tool_executor = ThreadPoolExecutor(max_workers=settings.tool_executor_threads, thread_name_prefix="tool-call")
+
+
+async def _run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_tool_executor, fn, *args)
 
 
 class RetrieveContextInput(BaseModel):
@@ -31,8 +58,7 @@ class RetrieveContextInput(BaseModel):
     )
 
 
-@tool("retrieve_context", args_schema=RetrieveContextInput)
-def retrieve_context(query: str, course_id: str = "COMP237") -> List[Dict]:
+def _retrieve_context(query: str, course_id: str = "COMP237") -> List[Dict]:
     """Search and retrieve relevant content from COMP 237 course materials.
     
     WHEN TO USE THIS TOOL:
@@ -56,7 +82,20 @@ def retrieve_context(query: str, course_id: str = "COMP237") -> List[Dict]:
     """
     # Normalize course_id (remove spaces)
     course_id = course_id.replace(" ", "").upper()
-    return rag_agent.retrieve_context(query, course_id)
+    return get_rag_agent().retrieve_context(query, course_id)
+
+
+async def _aretrieve_context(query: str, course_id: str = "COMP237") -> List[Dict]:
+    return await _run_blocking(_retrieve_context, query, course_id)
+
+
+retrieve_context = StructuredTool.from_function(
+    func=_retrieve_context,
+    coroutine=_aretrieve_context,
+    name="retrieve_context",
+    description=_retrieve_context.__doc__,
+    args_schema=RetrieveContextInput,
+)
 
 
 class CheckSyllabusInput(BaseModel):
@@ -68,8 +107,7 @@ class CheckSyllabusInput(BaseModel):
     )
 
 
-@tool("check_syllabus", args_schema=CheckSyllabusInput)
-def check_syllabus(query: str) -> Dict:
+def _check_syllabus(query: str) -> Dict:
     """Check the COMP 237 course syllabus for administrative and logistics information.
     
     WHEN TO USE THIS TOOL:
@@ -92,8 +130,183 @@ def check_syllabus(query: str) -> Dict:
     - "how is the grade calculated"
     - "instructor contact information"
     """
-    return syllabus_agent.check_syllabus(query)
+    return get_syllabus_agent().check_syllabus(query)
+
+
+async def _acheck_syllabus(query: str) -> Dict:
+    return await _run_blocking(_check_syllabus, query)
+
+
+check_syllabus = StructuredTool.from_function(
+    func=_check_syllabus,
+    coroutine=_acheck_syllabus,
+    name="check_syllabus",
+    description=_check_syllabus.__doc__,
+    args_schema=CheckSyllabusInput,
+)
 
 
 # List of available tools with clear documentation
 tutor_tools = [retrieve_context, check_syllabus]
+_tools_by_name: Dict[str, BaseTool] = {t.name: t for t in tutor_tools}
+
+
+class ToolStepStats:
+    """Tool steps by fan-out (calls per model step), per-tool call latency and capped calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps: Dict[int, Dict[str, float]] = {}  # fan-out -> {"count", "total_ms", "max_ms"}
+        self.calls: Dict[str, Dict[str, float]] = {}  # tool -> {"count", "errors", "total_ms"}
+        self.capped = 0
+
+    def record_call(self, name: str, ms: float, error: bool) -> None:
+        with self._lock:
+            entry = self.calls.setdefault(name, {"count": 0, "errors": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["errors"] += int(error)
+            entry["total_ms"] += ms
+
+    def record_step(self, fan_out: int, ms: float, capped: int) -> None:
+        with self._lock:
+            entry = self.steps.setdefault(fan_out, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            self.capped += capped
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_calls_per_step": settings.tool_max_calls_per_step,
+                "capped_calls": self.capped,
+                "steps": {
+                    str(fan_out): {
+                        "count": int(e["count"]),
+                        "avg_ms": round(e["total_ms"] / e["count"], 1),
+                        "max_ms": round(e["max_ms"], 1),
+                    }
+                    for fan_out, e in sorted(self.steps.items())
+                },
+                "tools": {
+                    name: {
+                        "count": int(e["count"]),
+                        "errors": int(e["errors"]),
+                        "avg_ms": round(e["total_ms"] / e["count"], 1),
+                    }
+                    for name, e in self.calls.items()
+                },
+            }
+
+
+_tool_step_stats = None
+
+
+def get_tool_step_stats() -> ToolStepStats:
+    """Get or create the process-wide tool step stats"""
+    global _tool_step_stats
+    if _tool_step_stats is None:
+        _tool_step_stats = ToolStepStats()
+    return _tool_step_stats
+
+
+def _pending_tool_calls(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tool calls of the last AI message"""
+    messages = state.get("messages") or []
+    if not messages or not isinstance(messages[-1], AIMessage):
+        return []
+    return list(messages[-1].tool_calls or [])
+
+
+def _split_calls(calls: List[Dict[str, Any]]):
+    """Calls to run this step, and error ToolMessages for the ones past the per-step cap"""
+    limit = max(1, settings.tool_max_calls_per_step)
+    skipped = [
+        ToolMessage(
+            content=f"Not run: at most {limit} tool calls are executed per step. Ask again if this result is still needed.",
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+        )
+        for call in calls[limit:]
+    ]
+    if skipped:
+        logger.info(f"🔧 Tool step capped: running {limit} of {len(calls)} calls")
+    return calls[:limit], skipped
+
+
+def _tool_message(call: Dict[str, Any], output: Any) -> ToolMessage:
+    """ToolMessage for a result; non-string results are JSON, as post_tool_processing_node expects"""
+    if not isinstance(output, str):
+        try:
+            output = json.dumps(output, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            output = str(output)
+    return ToolMessage(content=output, name=call["name"], tool_call_id=call["id"])
+
+
+def _error_message(call: Dict[str, Any], error: Exception) -> ToolMessage:
+    logger.warning(f"Tool {call['name']} failed: {error}")
+    return ToolMessage(
+        content=f"Error: {type(error).__name__}: {error}. Please fix your mistakes.",
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+def _run_call(call: Dict[str, Any], config: Optional[RunnableConfig]) -> ToolMessage:
+    start = time.perf_counter()
+    error = True
+    try:
+        tool = _tools_by_name.get(call["name"])
+        if tool is None:
+            raise ValueError(f"{call['name']} is not a valid tool, try one of {sorted(_tools_by_name)}")
+        message = _tool_message(call, tool.invoke(call["args"], config))
+        error = False
+        return message
+    except Exception as e:
+        return _error_message(call, e)
+    finally:
+        get_tool_step_stats().record_call(call["name"], (time.perf_counter() - start) * 1000, error)
+
+
+async def _arun_call(call: Dict[str, Any], config: Optional[RunnableConfig]) -> ToolMessage:
+    start = time.perf_counter()
+    error = True
+    try:
+        tool = _tools_by_name.get(call["name"])
+        if tool is None:
+            raise ValueError(f"{call['name']} is not a valid tool, try one of {sorted(_tools_by_name)}")
+        message = _tool_message(call, await tool.ainvoke(call["args"], config))
+        error = False
+        return message
+    except Exception as e:
+        return _error_message(call, e)
+    finally:
+        get_tool_step_stats().record_call(call["name"], (time.perf_counter() - start) * 1000, error)
+
+
+def run_tools(state: Dict[str, Any], config: RunnableConfig = None) -> Dict[str, Any]:
+    """Tools node (sync graph runs): the step's calls run concurrently on the tool executor"""
+    start = time.perf_counter()
+    calls, skipped = _split_calls(_pending_tool_calls(state))
+    if len(calls) == 1:
+        messages = [_run_call(calls[0], config)]
+    else:
+        messages = list(_tool_executor.map(lambda call: _run_call(call, config), calls))
+    get_tool_step_stats().record_step(len(calls), (time.perf_counter() - start) * 1000, len(skipped))
+    return {"messages": messages + skipped}
+
+
+async def arun_tools(state: Dict[str, Any], config: RunnableConfig = None) -> Dict[str, Any]:
+    """Tools node (streamed graph runs): the step's calls run concurrently as async tools"""
+    start = time.perf_counter()
+    calls, skipped = _split_calls(_pending_tool_calls(state))
+    messages = list(await asyncio.gather(*(_arun_call(call, config) for call in calls)))
+    get_tool_step_stats().record_step(len(calls), (time.perf_counter() - start) * 1000, len(skipped))
+    return {"messages": messages + skipped}
+
+
+# Graph node for the tool loop (replaces ToolNode(tutor_tools))
+tools_node = RunnableLambda(run_tools, afunc=arun_tools, name="tools")
@@ -11,12 +11,14 @@ Key changes:
 - Context engineering provides optimized prompts
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
+import asyncio
 import logging
 import time
 import uuid
+from contextlib import nullcontext
 from langgraph.graph import StateGraph, END, START
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage, ToolMessage
 import json
 
@@ -27,8 +29,21 @@ from app.agents.evaluator import evaluator_node
 from app.agents.pedagogical_tutor import pedagogical_tutor_node
 from app.agents.math_agent import math_agent_node
 from app.agents.reasoning_node import reasoning_node  # NEW: Multi-step reasoning
-from app.agents.tools import tutor_tools
-from app.agents.source_metadata import extract_sources, Source  # Standardized source extraction
+from app.agents.tools import tools_node, tutor_tools
+from app.agents.graph_context import graph_context_node, build_graph_context_section
+from app.agents.stream_events import QUEUE_STAGES, STREAM_MODES, StreamEventMapper, with_queue_updates
+from app.agents.cancellation import CANCEL_TOKEN_KEY, CancelToken, get_cancellation_stats
+from app.agents.streaming_quality import calculate_response_confidence, get_quality_stats
+from app.agents.model_cascade import accept, add_seconds, can_escalate, escalate, tier_model
+from app.agents.deadline import (
+    apply_timeout, call_timeout, get_deadline_stats, has_budget_for, skip_stage, start_deadline
+)
+from app.agents.graph_variants import (
+    GRAPH_VARIANTS, LIGHTWEIGHT_INTENTS, get_graph_variant_stats, select_graph_variant,
+)
+from app.agents.generation_budget import (
+    apply_budget, budget_for_state, get_budget_stats, get_expected_length_range, is_hard_capped
+)
 from app.observability import create_trace, flush_langfuse, get_langfuse_handler
 from app.observability.langfuse_client import (
     create_observation,
@@ -38,6 +53,8 @@ from app.observability.langfuse_client import (
 
 logger = logging.getLogger(__name__)
 
+AGENT_BUDGET_FACTOR = 2  # Hard-cap headroom for the general agent (no sentence-end stop)
+
 
 def extract_text_from_content(content) -> str:
     """
@@ -260,14 +277,21 @@ def agent_node(state: AgentState) -> Dict[str, Any]:
     model_name = state.get("model_selected", "gemini-flash")
     model = supervisor.get_model(model_name)
     
+    # Get intent
+    intent = state.get("intent", "fast")
+    
+    # Cap output/thinking on the call. Tokens stream straight to the client here,
+    # so there is no sentence-end stop: the hard cap gets AGENT_BUDGET_FACTOR headroom
+    budget = budget_for_state(state, intent)
+    if budget:
+        budget.max_output_tokens *= AGENT_BUDGET_FACTOR
+    
     # Bind tools
-    model_with_tools = model.bind_tools(tutor_tools)
+    # Required call: its timeout is what is left of the turn budget (deadline.py)
+    model_with_tools = apply_timeout(apply_budget(model, budget), call_timeout(state)).bind_tools(tutor_tools)
     
     messages = state["messages"]
     
-    # Get intent
-    intent = state.get("intent", "fast")
-    
     # Use adaptive prompt builder for context-aware prompts
     from app.agents.prompt_builder import build_adaptive_prompt
     
@@ -280,6 +304,11 @@ def agent_node(state: AgentState) -> Dict[str, Any]:
         context_parts.append(f"[From {source}]\n{content}")
     context_str = "\n\n---\n\n".join(context_parts) if context_parts else ""
     
+    # Merge concept graph context (fetched alongside vector retrieval, token-budgeted)
+    graph_section = build_graph_context_section(state.get("graph_context"), state.get("query", ""))
+    if graph_section:
+        context_str = f"{context_str}\n\n{graph_section}" if context_str else graph_section
+    
     # Build adaptive system prompt
     system_prompt = build_adaptive_prompt(
         state=state,
@@ -306,14 +335,26 @@ def agent_node(state: AgentState) -> Dict[str, Any]:
         # Replace existing system prompt with adaptive one
         messages = [SystemMessage(content=system_prompt)] + [m for m in messages if not isinstance(m, SystemMessage)]
     
+    invoke_start = time.time()
     response = model_with_tools.invoke(messages)
+    response_text = extract_text_from_content(response.content)
+    # Generation time counts against the current cascade tier (judged in quality_gate)
+    cascade = add_seconds(state.get("model_cascade"), time.time() - invoke_start)
+    
+    # Record budget outcome for final answers (not tool-call rounds)
+    if budget and not getattr(response, "tool_calls", None):
+        budget.hard_capped = is_hard_capped(response)
+        budget.output_chars = len(response_text)
+        get_budget_stats().record(budget)
     
     # Update state with response for legacy compatibility
     # Clear repair state after successful generation
     # Handle Gemini 2.5+ list content format (after tool calls)
     return {
         "messages": [response],
-        "response": extract_text_from_content(response.content),
+        "response": response_text,
+        "generation_budget": budget.to_dict() if budget else None,
+        "model_cascade": cascade,
         "needs_repair": False,  # Clear repair flag
         "repair_guidance": None  # Clear guidance
     }
@@ -467,38 +508,25 @@ def _extract_recent_topics(conversation_history: list) -> list:
     # Look at last 4 messages (2 exchanges)
     recent = conversation_history[-4:] if len(conversation_history) >= 4 else conversation_history
     
-    # Common AI/ML topic keywords
-    topic_keywords = {
-        "neural network": "Neural Networks",
-        "gradient descent": "Gradient Descent", 
-        "backpropagation": "Backpropagation",
-        "classification": "Classification",
-        "regression": "Regression",
-        "clustering": "Clustering",
-        "loss function": "Loss Functions",
-        "activation function": "Activation Functions",
-        "overfitting": "Overfitting",
-        "training": "Model Training",
-        "layers": "Network Layers",
-        "weights": "Weights & Biases",
-        "learning rate": "Learning Rate",
-    }
+    # Common AI/ML topic keywords (RECENT_TOPIC_KEYWORDS in the shared matcher)
+    from app.agents.text_matcher import scan_text
     
-    found_topics = set()
+    found_topics = {}  # Ordered set
     for msg in recent:
-        content = msg.get("content", "").lower()
-        for keyword, display_name in topic_keywords.items():
-            if keyword in content:
-                found_topics.add(display_name)
+        for display_name in scan_text(msg.get("content", ""), "history").labels("recent_topic"):
+            found_topics[display_name] = None
     
     return list(found_topics)[:3]  # Return top 3 topics
 
-def route_agent_output(state: AgentState) -> str:
+def route_agent_output(state: AgentState) -> Union[str, List[str]]:
     """
     Determine next step after agent execution
     """
     last_msg = state["messages"][-1]
     if hasattr(last_msg, "tool_calls") and last_msg.tool_calls:
+        # First tool round: fetch concept graph context in parallel with vector retrieval
+        if state.get("graph_context") is None and state.get("key_concepts_detected"):
+            return ["tools", "graph_context"]
         return "tools"
     return "quality_gate"  # Route to quality gate for confidence check
 
@@ -530,126 +558,6 @@ def post_tool_processing_node(state: AgentState) -> Dict[str, Any]:
     return {"retrieved_context": retrieved_context}
 
 
-def get_expected_length_range(intent: str, is_follow_up: bool, response_length_hint: Optional[str] = None) -> tuple[int, int]:
-    """
-    Get expected response length range based on intent and context.
-    
-    UPDATED (Dec 2025): Relaxed limits to prevent over-truncation.
-    Follow-ups should be shorter but not artificially clipped.
-    
-    Returns:
-        Tuple of (min_chars, max_chars)
-    """
-    # Use hint from reasoning node if available
-    if response_length_hint:
-        if response_length_hint == "short":
-            return (50, 400)  # Relaxed from 300
-        elif response_length_hint == "medium":
-            if is_follow_up:
-                return (150, 800)  # Relaxed from 500
-            return (300, 1500)  # Relaxed from 1200
-        elif response_length_hint == "detailed":
-            if is_follow_up:
-                return (300, 1200)  # Relaxed from 800
-            return (800, 2800)  # Relaxed from 2500
-    
-    # Intent-based defaults (relaxed to allow natural responses)
-    if intent == "fast":
-        return (50, 400)  # 1-4 sentences
-    elif intent == "syllabus_query":
-        return (100, 600)  # 2-5 sentences
-    elif intent == "coder":
-        return (200, 2000)  # Code + explanation (code can be long)
-    elif intent == "explain":
-        if is_follow_up:
-            return (100, 800)  # Relaxed from 500 - allow substantive clarifications
-        return (400, 1800)  # 3-6 paragraphs
-    elif intent == "tutor":
-        if is_follow_up:
-            return (100, 900)  # Relaxed from 450 - clarifications need room
-        return (300, 1600)  # Relaxed from 1200 - full scaffolding
-    elif intent == "math":
-        if is_follow_up:
-            return (150, 1000)  # Math clarifications need room for formulas
-        return (300, 2500)  # Mathematical derivations can be longer
-    
-    # Default
-    if is_follow_up:
-        return (100, 800)
-    return (200, 1200)
-
-
-def calculate_response_confidence(response: str, intent: str, state: Optional[AgentState] = None) -> float:
-    """
-    Calculate confidence score for response quality with context-aware length checking.
-    
-    UPDATED (Dec 2025): More lenient scoring to avoid over-repair.
-    Focus on catching genuinely bad responses, not penalizing natural variation.
-    
-    Low confidence triggers repair loop.
-    
-    Returns:
-        Score between 0.0 and 1.0
-    """
-    if not response:
-        return 0.0
-    
-    base_score = 0.6  # Start higher - assume good until proven otherwise
-    response_length = len(response)
-    
-    # Context-aware length checking
-    is_follow_up = state.get("is_follow_up", False) if state else False
-    response_length_hint = state.get("response_length_hint") if state else None
-    min_chars, max_chars = get_expected_length_range(intent, is_follow_up, response_length_hint)
-    
-    # Length scoring - RELAXED penalties
-    if response_length < min_chars:
-        # Too short - penalize based on how short
-        ratio = response_length / min_chars if min_chars > 0 else 0
-        base_score -= 0.2 * (1 - ratio)  # Reduced from 0.3
-    elif response_length > max_chars:
-        # Too long - very mild penalty (let natural responses through)
-        excess_ratio = (response_length - max_chars) / max_chars
-        base_score -= min(0.1, excess_ratio * 0.05)  # Reduced from 0.2 cap
-    else:
-        # Within range - small bonus
-        base_score += 0.1
-    
-    # Follow-up specific check - only penalize EXTREME overages
-    if is_follow_up and response_length > max_chars * 2.0:  # Changed from 1.5x
-        base_score -= 0.15  # Reduced from 0.2
-        logger.info(f"📏 Follow-up response long ({response_length} chars) - minor penalty")
-    
-    # Question ratio check - only penalize if MOSTLY questions with NO substance
-    sentences = [s.strip() for s in response.split('.') if s.strip()]
-    if sentences:
-        question_count = sum(1 for s in sentences if '?' in s)
-        question_ratio = question_count / len(sentences)
-        
-        # Only penalize if >70% questions AND very short (likely just questions)
-        if question_ratio > 0.7 and response_length < min_chars * 0.7:
-            base_score -= 0.15  # Reduced from 0.25
-        # Reward good question balance (10-40%) for tutor intent
-        elif intent == "tutor" and 0.1 <= question_ratio <= 0.5:
-            base_score += 0.05
-    
-    # Check for explanation markers (positive signals) - reduced bonus
-    explanation_markers = [
-        'means', 'is a', 'refers to', 'for example', 'in other words',
-        'this is', 'essentially', 'simply put', 'think of it as',
-        'works by', 'the reason', 'because'
-    ]
-    response_lower = response.lower()
-    marker_count = sum(1 for m in explanation_markers if m in response_lower)
-    base_score += min(0.1, marker_count * 0.02)  # Reduced from 0.2 max
-    
-    # Structure bonus - reduced to avoid rewarding verbose formatting
-    if any(c in response for c in ['•', '-', '1.', '2.']):
-        base_score += 0.05  # Reduced from 0.1
-    
-    return max(0.0, min(1.0, base_score))
-
-
 def quality_gate_node(state: AgentState) -> Dict[str, Any]:
     """
     Quality gate that checks response quality and triggers repair if needed.
@@ -664,22 +572,36 @@ def quality_gate_node(state: AgentState) -> Dict[str, Any]:
     response = state.get("response", "")
     intent = state.get("intent", "fast")
     retry_count = state.get("quality_retry_count", 0) or 0
+    cascade = state.get("model_cascade")
     
     # Calculate confidence with context-aware length checking
     confidence = calculate_response_confidence(response, intent, state)
     
     logger.info(f"📊 Quality Gate: confidence={confidence:.2f}, retry_count={retry_count}")
     
+    # If confidence is too low and we haven't retried yet
+    CONFIDENCE_THRESHOLD = 0.5
+    MAX_RETRIES = 1
+    
+    # An answer from a cheap cascade tier is redone on the next tier (any intent)
+    escalating = confidence < CONFIDENCE_THRESHOLD and retry_count < MAX_RETRIES and can_escalate(cascade)
+    
     # Only check for repair on explain/tutor intents (not fast/syllabus)
-    if intent in ["fast", "syllabus_query"]:
+    if intent in ["fast", "syllabus_query"] and not escalating:
         return {
             "needs_repair": False,
-            "response_confidence": confidence
+            "response_confidence": confidence,
+            "model_cascade": accept(cascade, len(response))
         }
     
-    # If confidence is too low and we haven't retried yet
-    CONFIDENCE_THRESHOLD = 0.5
-    MAX_RETRIES = 1
+    if confidence < CONFIDENCE_THRESHOLD and retry_count < MAX_RETRIES and not has_budget_for(state, "repair"):
+        # Too little turn budget left for another generation: keep this answer
+        return {
+            "needs_repair": False,
+            "response_confidence": confidence,
+            "model_cascade": accept(cascade, len(response)),
+            **skip_stage(state, "repair")
+        }
     
     if confidence < CONFIDENCE_THRESHOLD and retry_count < MAX_RETRIES:
         logger.warning(f"⚠️ Quality Gate: Low confidence ({confidence:.2f}), triggering repair")
@@ -718,16 +640,22 @@ You MUST include:
 Do NOT respond with only questions. The student needs an explanation first.
 """
         
-        return {
+        repair = {
             "needs_repair": True,
             "quality_retry_count": retry_count + 1,
             "response_confidence": confidence,
             "repair_guidance": repair_text
         }
+        if escalating:
+            cascade = escalate(cascade, len(response), f"confidence {confidence:.2f}")
+            repair["model_cascade"] = cascade
+            repair["model_selected"] = tier_model(cascade)
+        return repair
     
     return {
         "needs_repair": False,
-        "response_confidence": confidence
+        "response_confidence": confidence,
+        "model_cascade": accept(cascade, len(response))
     }
 
 
@@ -745,6 +673,10 @@ def truncate_response_if_needed(state: AgentState) -> Dict[str, Any]:
     if not is_follow_up:
         return {}  # Only enforce for follow-ups
     
+    budget = state.get("generation_budget") or {}
+    if budget.get("stopped_at_budget") or budget.get("hard_capped"):
+        return {}  # Already ended at its generation budget while streaming; the student saw that text
+    
     _, max_chars = get_expected_length_range(intent, is_follow_up, state.get("response_length_hint"))
     
     if len(response) <= max_chars:
@@ -771,6 +703,13 @@ def truncate_response_if_needed(state: AgentState) -> Dict[str, Any]:
     }
 
 
+def route_streamed_answer(state: AgentState) -> str:
+    """Tutor/math answers already judged on the stream skip the quality gate"""
+    if state.get("quality_checked"):
+        return "checked"
+    return "quality_gate"
+
+
 def route_quality_gate(state: AgentState) -> str:
     """Route based on quality gate decision."""
     if state.get("needs_repair"):
@@ -778,7 +717,56 @@ def route_quality_gate(state: AgentState) -> str:
     return "continue"
 
 
-def create_tutor_agent() -> StateGraph:
+def route_lightweight_intent(state: AgentState) -> str:
+    """Supervisor edge of the minimal graph: lightweight intents go to the general agent, anything else to the full graph"""
+    if state.get("intent") in LIGHTWEIGHT_INTENTS:
+        return "agent"
+    return "reroute"
+
+
+def reroute_node(state: AgentState) -> Dict[str, Any]:
+    """
+    End a minimal-graph run whose supervisor picked a full-pipeline intent
+
+    The pre-router and the reasoning node share one classification, but the
+    supervisor can still override it (e.g. a confusion signal turns a quick
+    question into a tutor turn). Setting graph_variant to "full" tells
+    run_agent / astream_agent to rerun the turn on the full graph.
+    """
+    logger.warning(f"Graph variant pre-routed a {state.get('intent')} turn as lightweight; rerunning it on the full graph")
+    return {"graph_variant": "full"}
+
+
+def needs_full_graph(variant: str, final_state: Optional[Dict[str, Any]]) -> bool:
+    """True when a lightweight run ended in reroute_node"""
+    return variant != "full" and bool(final_state) and final_state.get("graph_variant") == "full"
+
+
+def route_lightweight_agent_output(state: AgentState) -> Union[str, List[str]]:
+    """route_agent_output for the minimal graphs: final answers see the quality gate only if the cascade could escalate"""
+    route = route_agent_output(state)
+    if route == "quality_gate" and not can_escalate(state.get("model_cascade")):
+        return "evaluator"
+    return route
+
+
+def lightweight_evaluator_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Evaluator for the minimal graph
+
+    Records the cascade tier's accepted answer (quality_gate_node's job on
+    the full graph), then runs the evaluator, which takes its lightweight
+    branch for fast / syllabus_query turns.
+    """
+    cascade = state.get("model_cascade")
+    if not cascade or cascade.get("done"):
+        return evaluator_node(state)
+    accepted = accept(cascade, len(state.get("response") or ""))
+    # Returned, not written into the input state: only node outputs are persisted
+    return {**evaluator_node({**state, "model_cascade": accepted}), "model_cascade": accepted}
+
+
+def create_tutor_agent(variant: str = "full") -> StateGraph:
     """
     Create and configure the tutor agent graph
     
@@ -787,6 +775,8 @@ def create_tutor_agent() -> StateGraph:
            (context eng)          ↓
                                  END (rejected)
     
+    agent → [tools ∥ graph_context] → post_tools → agent  (graph lookups overlap vector retrieval)
+    
     Execution Order:
     1. reasoning: Multi-step analysis, follow-up detection, context engineering (compaction)
     2. governor: Policy check (safety, compliance)
@@ -810,24 +800,47 @@ def create_tutor_agent() -> StateGraph:
     - quality_gate → sets: needs_repair, repair_guidance (if needed)
     - evaluator → sets: evaluation scores, updates mastery
     
+    Variants (see graph_variants.py):
+    - full: the graph above
+    - minimal: fast/syllabus turns; supervisor → agent only, agent answers go
+      straight to a lightweight evaluator (quality gate only while the model
+      cascade can escalate), no length enforcer. Any other intent ends in
+      reroute and the caller reruns the turn on the full graph
+    
+    Args:
+        variant: One of GRAPH_VARIANTS
+    
     Returns:
         Compiled StateGraph
     """
+    if variant not in GRAPH_VARIANTS:
+        raise ValueError(f"Unknown graph variant: {variant}")
+    lightweight = variant != "full"
+    
     # Create graph
     workflow = StateGraph(AgentState)
     
+    # Pipeline stages publish their own queue-updates to the client stream
+    def stage(name, node_fn):
+        return with_queue_updates(node_fn, QUEUE_STAGES[name])
+    
     # Add nodes (NEW: reasoning node for LLM-first architecture)
-    workflow.add_node("governor", governor_node)
-    workflow.add_node("reasoning", reasoning_node)  # NEW: Multi-step reasoning before routing
-    workflow.add_node("supervisor", supervisor_node)
-    workflow.add_node("pedagogical_tutor", pedagogical_tutor_node)  # Socratic scaffolding
-    workflow.add_node("math_agent", math_agent_node)  # Mathematical reasoning
-    workflow.add_node("agent", agent_node)  # General agent with tools
-    workflow.add_node("tools", ToolNode(tutor_tools))
+    workflow.add_node("governor", stage("governor", governor_node))
+    workflow.add_node("reasoning", stage("reasoning", reasoning_node))  # NEW: Multi-step reasoning before routing
+    workflow.add_node("supervisor", stage("supervisor", supervisor_node))
+    if not lightweight:
+        workflow.add_node("pedagogical_tutor", stage("pedagogical_tutor", pedagogical_tutor_node))  # Socratic scaffolding
+        workflow.add_node("math_agent", stage("math_agent", math_agent_node))  # Mathematical reasoning
+    workflow.add_node("agent", stage("agent", agent_node))  # General agent with tools
+    workflow.add_node("tools", tools_node)  # Concurrent, capped tool calls per step
     workflow.add_node("post_tools", post_tool_processing_node)
+    workflow.add_node("graph_context", graph_context_node)  # Concept graph lookups (parallel to tools)
     workflow.add_node("quality_gate", quality_gate_node)  # NEW: Response quality check
-    workflow.add_node("length_enforcer", truncate_response_if_needed)  # NEW: Hard length enforcement for follow-ups
-    workflow.add_node("evaluator", evaluator_node)
+    if not lightweight:
+        workflow.add_node("length_enforcer", truncate_response_if_needed)  # NEW: Hard length enforcement for follow-ups
+    workflow.add_node("evaluator", stage("evaluator", lightweight_evaluator_node if lightweight else evaluator_node))
+    if lightweight:
+        workflow.add_node("reroute", reroute_node)  # Hands full-pipeline intents back to the caller
     
     # Set entry point
     workflow.set_entry_point("reasoning")
@@ -845,49 +858,66 @@ def create_tutor_agent() -> StateGraph:
         }
     )
     
-    # Route from supervisor to specialized agents based on intent
-    workflow.add_conditional_edges(
-        "supervisor",
-        route_by_intent,
-        {
-            "pedagogical_tutor": "pedagogical_tutor",
-            "math_agent": "math_agent",
-            "agent": "agent"
-        }
-    )
-    
-    # Pedagogical tutor goes to quality gate (instead of directly to evaluator)
-    workflow.add_edge("pedagogical_tutor", "quality_gate")
-    
-    # Math agent goes to quality gate
-    workflow.add_edge("math_agent", "quality_gate")
+    if lightweight:
+        workflow.add_conditional_edges("supervisor", route_lightweight_intent, {"agent": "agent", "reroute": "reroute"})
+        workflow.add_edge("reroute", END)
+    else:
+        # Route from supervisor to specialized agents based on intent
+        workflow.add_conditional_edges(
+            "supervisor",
+            route_by_intent,
+            {
+                "pedagogical_tutor": "pedagogical_tutor",
+                "math_agent": "math_agent",
+                "agent": "agent"
+            }
+        )
+        
+        # Pedagogical tutor and math agent judge their answers on the stream (streaming_quality);
+        # only unchecked answers (e.g. fallbacks after an error) go through the quality gate
+        for answer_node in ("pedagogical_tutor", "math_agent"):
+            workflow.add_conditional_edges(
+                answer_node,
+                route_streamed_answer,
+                {
+                    "checked": "length_enforcer",
+                    "quality_gate": "quality_gate"
+                }
+            )
     
     # General agent may use tools
+    agent_routes = {
+        "tools": "tools",
+        "graph_context": "graph_context",  # Fanned out alongside tools on the first round
+        "quality_gate": "quality_gate"  # Changed: goes to quality_gate instead of evaluator
+    }
+    if lightweight:
+        agent_routes["evaluator"] = "evaluator"
     workflow.add_conditional_edges(
         "agent",
-        route_agent_output,
-        {
-            "tools": "tools",
-            "quality_gate": "quality_gate"  # Changed: goes to quality_gate instead of evaluator
-        }
+        route_lightweight_agent_output if lightweight else route_agent_output,
+        agent_routes
     )
     
     # Loop back from tools to agent via post_tools
     workflow.add_edge("tools", "post_tools")
     workflow.add_edge("post_tools", "agent")
+    # graph_context runs in the same step as tools, so post_tools runs once after both
+    workflow.add_edge("graph_context", "post_tools")
     
     # Quality gate routes to length_enforcer (for final check) or back to agent for repair
     workflow.add_conditional_edges(
         "quality_gate",
         route_quality_gate,
         {
-            "continue": "length_enforcer",  # Changed: goes through length enforcer
+            "continue": "evaluator" if lightweight else "length_enforcer",  # Changed: goes through length enforcer
             "repair": "agent"  # Repair loop: go back to agent with guidance
         }
     )
     
-    # Length enforcer always goes to evaluator
-    workflow.add_edge("length_enforcer", "evaluator")
+    if not lightweight:
+        # Length enforcer always goes to evaluator
+        workflow.add_edge("length_enforcer", "evaluator")
     
     # End after evaluator
     workflow.add_edge("evaluator", END)
@@ -895,20 +925,19 @@ def create_tutor_agent() -> StateGraph:
     # Compile graph
     app = workflow.compile()
     
-    logger.info("Tutor agent graph created successfully (LLM-first architecture)")
+    logger.info(f"Tutor agent graph created successfully (LLM-first architecture, {variant} variant)")
     return app
 
 
-# Global agent instance
-_tutor_agent = None
+# Compiled graphs, one per variant
+_tutor_agents: Dict[str, Any] = {}
 
 
-def get_tutor_agent() -> StateGraph:
-    """Get or create tutor agent instance"""
-    global _tutor_agent
-    if _tutor_agent is None:
-        _tutor_agent = create_tutor_agent()
-    return _tutor_agent
+def get_tutor_agent(variant: str = "full") -> StateGraph:
+    """Get or create the tutor agent graph for a variant"""
+    if variant not in _tutor_agents:
+        _tutor_agents[variant] = create_tutor_agent(variant)
+    return _tutor_agents[variant]
 
 
 def run_agent(
@@ -933,7 +962,9 @@ def run_agent(
     """
 
     
-    agent = get_tutor_agent()
+    # Pre-router: pick the compiled graph for this turn before it starts
+    graph_variant, _ = select_graph_variant(query, conversation_history)
+    agent = get_tutor_agent(graph_variant)
     execution_start = time.time()
     request_id = str(uuid.uuid4())
     
@@ -1025,6 +1056,7 @@ def run_agent(
         # RAG context
         "retrieved_context": [],
         "context_sources": [],
+        "graph_context": None,
         
         # Policy enforcement
         "governor_approved": False,
@@ -1050,21 +1082,30 @@ def run_agent(
         
         # Error handling
         "error": None,
+        
+        # Compiled graph running this turn (see graph_variants.py)
+        "graph_variant": graph_variant,
+        
+        # Turn budget, checked by each stage (see deadline.py)
+        "deadline": start_deadline(),
+        "deadline_skips": [],
     }
     
     # Run agent
     try:
-        if span and hasattr(span, "_otel_span"):
-            with trace.use_span(span._otel_span, end_on_exit=False):
-                final_state = agent.invoke(
-                    initial_state,
-                    config={"callbacks": callbacks}
-                )
-        else:
+        with trace.use_span(span._otel_span, end_on_exit=False) if span and hasattr(span, "_otel_span") else nullcontext():
             final_state = agent.invoke(
                 initial_state,
                 config={"callbacks": callbacks}
             )
+            if needs_full_graph(graph_variant, final_state):
+                # The supervisor overrode the pre-router: answer on the full pipeline
+                get_graph_variant_stats().record_reroute()
+                graph_variant = "full"
+                final_state = get_tutor_agent("full").invoke(
+                    {**initial_state, "graph_variant": graph_variant},
+                    config={"callbacks": callbacks}
+                )
         
         # Extract response from last message if not explicitly set
         response_text = final_state.get("response")
@@ -1076,6 +1117,7 @@ def run_agent(
         # Calculate execution metrics
         execution_end = time.time()
         total_execution_time = execution_end - execution_start
+        get_deadline_stats().record_turn(initial_state["deadline"], execution_end)
         
         # Prepare comprehensive output metadata
         output_metadata = {
@@ -1098,6 +1140,7 @@ def run_agent(
             "retrieval_analysis": final_state.get("retrieval_metrics", {}),
             "cost_analysis": final_state.get("cost_tracking", {}),
             "citations_count": len(final_state.get("response_sources", [])),
+            "deadline_skips": final_state.get("deadline_skips") or [],
             "performance_tier": "fast" if total_execution_time < 5.0 else "standard"
         }
         
@@ -1154,7 +1197,8 @@ def run_agent(
             "observability": {
                 "request_id": request_id,
                 "trace_id": span.trace_id if span else None,
-                "policy_compliant": final_state.get("governor_approved", False)
+                "policy_compliant": final_state.get("governor_approved", False),
+                "graph_variant": graph_variant
             },
             # Return messages for debugging/frontend if needed
             "messages": final_state.get("messages", [])
@@ -1319,7 +1363,8 @@ async def astream_agent(
     model: str = None
 ):
     """
-    Async generator that streams agent events using astream_events (v2)
+    Async generator that streams agent events using LangGraph stream modes
+    (updates/messages/custom, mapped by StreamEventMapper)
     
     Args:
         query: User query
@@ -1330,7 +1375,9 @@ async def astream_agent(
         conversation_history: Optional list of prior messages [{role, content, created_at}]
         model: Optional model to use (e.g., 'gemini-2.0-flash', 'gpt-4.1-mini')
     """
-    agent = get_tutor_agent()
+    # Pre-router: pick the compiled graph for this turn before it starts
+    graph_variant, _ = select_graph_variant(query, conversation_history)
+    agent = get_tutor_agent(graph_variant)
     
     # Get Langfuse handler
     langfuse_handler = get_langfuse_handler()
@@ -1346,6 +1393,7 @@ async def astream_agent(
             "chat_id": chat_id,
             "history_length": len(conversation_history) if conversation_history else 0,
             "model_override": model,
+            "graph_variant": graph_variant,
         },
         input_data={
             "query": query,
@@ -1360,6 +1408,8 @@ async def astream_agent(
     
     # Track accumulated response for final output
     accumulated_response = ""
+    stream_start = time.time()
+    first_token_ms = None  # Time to first answer token, for every intent
     
     # Use OpenTelemetry context
     from opentelemetry import trace
@@ -1419,6 +1469,7 @@ async def astream_agent(
         # RAG context
         "retrieved_context": [],
         "context_sources": [],
+        "graph_context": None,
         
         # Policy enforcement
         "governor_approved": False,
@@ -1444,6 +1495,13 @@ async def astream_agent(
         
         # Error handling
         "error": None,
+        
+        # Compiled graph running this turn (see graph_variants.py)
+        "graph_variant": graph_variant,
+        
+        # Turn budget, checked by each stage (see deadline.py)
+        "deadline": start_deadline(),
+        "deadline_skips": [],
     }
     
     # Emit trace_id first so client can reference it
@@ -1457,69 +1515,108 @@ async def astream_agent(
     if queue_steps:
         yield {"type": "queue-init", "queue": queue_steps}
     
-    # Thinking block filter state (tracks if we're inside <thinking>...</thinking>)
-    thinking_filter = {"inside_thinking": False, "buffer": ""}
-    
+    mapper = StreamEventMapper()
+    # Tripped if this generator is cancelled (client disconnected) so node threads stop generating
+    cancel_token = CancelToken()
+    current_stage = None  # Last pipeline stage that started, for cancellation stats
+    quality_outcome = {"restarted": False, "repaired": False}  # For repair-loop stats
+    # Graph that answered, nodes executed, final intent, stages skipped
+    graph_run = {"variant": graph_variant, "hops": 0, "intent": None, "deadline_skips": []}
+    run_config = {"callbacks": callbacks, "configurable": {CANCEL_TOKEN_KEY: cancel_token}}
+
+    async def client_events():
+        """Graph stream parts mapped to client events (see stream_events)"""
+        final = {}
+        async for client_event in graph_events(agent, initial_state, final):
+            yield client_event
+        if needs_full_graph(graph_run["variant"], final):
+            # The supervisor overrode the pre-router: answer on the full pipeline
+            get_graph_variant_stats().record_reroute()
+            graph_run["variant"] = "full"
+            async for client_event in graph_events(get_tutor_agent("full"), {**initial_state, "graph_variant": "full"}, final):
+                yield client_event
+        for client_event in mapper.finish():
+            yield client_event
+
+    async def graph_events(graph, state, final):
+        """One graph run's stream parts as client events; node outputs are merged into final"""
+        async for mode, data in graph.astream(state, config=run_config, stream_mode=STREAM_MODES):
+            # Dynamic Trace Naming: Update trace name with detected intent
+            if mode == "updates" and span:
+                intent = (data.get("supervisor") or {}).get("intent")
+                if intent:
+                    span.update_trace(name=f"tutor_agent_stream_{intent}")
+            if mode == "updates":
+                graph_run["hops"] += len(data)
+                for output in data.values():
+                    if isinstance(output, dict):
+                        graph_run["intent"] = output.get("intent") or graph_run["intent"]
+                        graph_run["deadline_skips"] = output.get("deadline_skips") or graph_run["deadline_skips"]
+                        quality_outcome["restarted"] |= bool(output.get("quality_restarts"))
+                        quality_outcome["repaired"] |= bool(output.get("needs_repair"))
+                        final.update(output)
+            for client_event in mapper.map(mode, data):
+                yield client_event
+
     # Stream events
+    events = client_events()
     try:
-        # Define the iterator
-        iterator = agent.astream_events(initial_state, version="v2", config={"callbacks": callbacks})
-        
         # Wrap iteration with OTel span if available
-        if span and hasattr(span, "_otel_span"):
-            with trace.use_span(span._otel_span, end_on_exit=False):
-                async for event in iterator:
-                    # Dynamic Trace Naming: Update trace name with detected intent
-                    if event["event"] == "on_chain_end" and event.get("name") == "supervisor":
-                        output = event["data"].get("output", {})
-                        intent = output.get("intent")
-                        if intent and span:
-                            span.update_trace(name=f"tutor_agent_stream_{intent}")
-                            
-                    result = await _process_event(event, thinking_filter)
-                    # Track accumulated response for trace output
-                    if isinstance(result, dict) and result.get("type") == "text-delta":
-                        accumulated_response += result.get("textDelta", "")
-                    # Handle cases where _process_event returns multiple events
-                    if isinstance(result, list):
-                        for r in result:
-                            if isinstance(r, dict) and r.get("type") == "text-delta":
-                                accumulated_response += r.get("textDelta", "")
-                            yield r
-                    else:
-                        yield result
-        else:
-            async for event in iterator:
-                # Dynamic Trace Naming: Update trace name with detected intent
-                if event["event"] == "on_chain_end" and event.get("name") == "supervisor":
-                    output = event["data"].get("output", {})
-                    intent = output.get("intent")
-                    if intent and span:
-                        span.update_trace(name=f"tutor_agent_stream_{intent}")
-                        
-                result = await _process_event(event, thinking_filter)
+        use_otel = span and hasattr(span, "_otel_span")
+        with trace.use_span(span._otel_span, end_on_exit=False) if use_otel else nullcontext():
+            async for client_event in events:
                 # Track accumulated response for trace output
-                if isinstance(result, dict) and result.get("type") == "text-delta":
-                    accumulated_response += result.get("textDelta", "")
-                if isinstance(result, list):
-                    for r in result:
-                        if isinstance(r, dict) and r.get("type") == "text-delta":
-                            accumulated_response += r.get("textDelta", "")
-                        yield r
-                else:
-                    yield result
+                if client_event.get("type") == "text-delta":
+                    if first_token_ms is None:
+                        first_token_ms = (time.time() - stream_start) * 1000
+                    accumulated_response += client_event.get("textDelta", "")
+                elif client_event.get("type") == "queue-update" and client_event.get("status") == "processing":
+                    current_stage = client_event.get("queueItemId")
+                yield client_event
+        
+        get_cancellation_stats().record_completed(len(accumulated_response), time.time() - stream_start)
+        get_quality_stats().record_turn(time.time() - stream_start, **quality_outcome)
+        get_graph_variant_stats().record_turn(graph_run["variant"], graph_run["intent"], graph_run["hops"], time.time() - stream_start)
+        get_deadline_stats().record_turn(initial_state["deadline"], time.time())
                 
         if span:
             # Update trace with final output before ending
             span.update(output={
                 "response": accumulated_response[:500] if accumulated_response else None,  # Truncate for storage
                 "response_length": len(accumulated_response),
+                "time_to_first_token_ms": first_token_ms,
+                "deadline_skips": graph_run["deadline_skips"],  # Optional stages skipped for the turn budget
                 "completed": True
             })
             span.end()
             # Flush Langfuse to ensure data is sent
             flush_langfuse()
             
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client disconnected: stop the answer stream still running in a node thread
+        cancel_token.cancel()
+        elapsed = time.time() - stream_start
+        saved = get_cancellation_stats().record_cancelled(len(accumulated_response), elapsed, stage=current_stage)
+        logger.info(
+            f"Stream cancelled during {current_stage or 'startup'} after {elapsed:.1f}s "
+            f"({len(accumulated_response)} chars sent, est. saved {saved['tokens_saved_est']} tokens / {saved['seconds_saved_est']}s)"
+        )
+        try:
+            await events.aclose()  # Close the graph stream now rather than at garbage collection
+        except BaseException:
+            pass
+        if span:
+            span.update(output={
+                "response": accumulated_response[:500] if accumulated_response else None,
+                "response_length": len(accumulated_response),
+                "time_to_first_token_ms": first_token_ms,
+                "cancelled": True,
+                "cancelled_stage": current_stage,
+                **saved,
+            })
+            span.end()
+            flush_langfuse()
+        raise
     except Exception as e:
         logger.error(f"Error in stream agent: {e}")
         if span:
@@ -1527,331 +1624,3 @@ async def astream_agent(
             span.end()
             flush_langfuse()
         yield {"type": "error", "error": str(e)}
-
-def _filter_thinking_blocks(content: str, state: dict) -> str:
-    """
-    Filter out <thinking>...</thinking> blocks from streamed content.
-    
-    Handles tags that span multiple chunks by using a buffer.
-    
-    Args:
-        content: The new content chunk
-        state: Dict with 'inside_thinking' (bool) and 'buffer' (str)
-        
-    Returns:
-        Filtered content (empty string if inside thinking block)
-    """
-    # Combine buffer with new content
-    text = state.get("buffer", "") + content
-    state["buffer"] = ""
-    
-    result = []
-    i = 0
-    
-    while i < len(text):
-        if state["inside_thinking"]:
-            # Look for </thinking>
-            end_tag = "</thinking>"
-            end_pos = text.find(end_tag, i)
-            if end_pos != -1:
-                # Found end tag, skip everything up to and including it
-                i = end_pos + len(end_tag)
-                state["inside_thinking"] = False
-            else:
-                # Check for partial end tag at the end
-                for j in range(1, len(end_tag)):
-                    if text.endswith(end_tag[:j]):
-                        state["buffer"] = text[-j:]
-                        return "".join(result).strip()
-                # Still inside thinking block, skip rest
-                return "".join(result).strip()
-        else:
-            # Look for <thinking>
-            start_tag = "<thinking>"
-            start_pos = text.find(start_tag, i)
-            if start_pos != -1:
-                # Found start tag, emit content before it
-                if start_pos > i:
-                    result.append(text[i:start_pos])
-                i = start_pos + len(start_tag)
-                state["inside_thinking"] = True
-            else:
-                # Check for partial start tag at the end
-                for j in range(1, len(start_tag)):
-                    if text[i:].endswith(start_tag[:j]):
-                        # Buffer the partial tag, emit content before it
-                        result.append(text[i:-j])
-                        state["buffer"] = text[-j:]
-                        return "".join(result).strip()
-                # No thinking tag, emit remaining content
-                result.append(text[i:])
-                break
-    
-    return "".join(result).strip()
-
-
-async def _process_event(event, thinking_filter=None):
-    """Helper to process events and emit structured AI SDK format
-    
-    Args:
-        event: The LangGraph event
-        thinking_filter: Optional dict with keys 'inside_thinking' and 'buffer' for tracking <thinking> blocks
-    """
-    kind = event["event"]
-    
-    if kind == "on_chat_model_stream":
-        # Get context about this event
-        tags = event.get("tags", []) or []
-        run_name = event.get("name", "")
-        metadata = event.get("metadata", {}) or {}
-        parent_ids = event.get("parent_ids", []) or []
-        
-        # Convert tags to lowercase for matching
-        tags_lower = [t.lower() if isinstance(t, str) else str(t).lower() for t in tags]
-        parent_str = str(parent_ids).lower()
-        
-        # Skip streaming from internal components (reasoning node, etc.)
-        # The reasoning node uses an LLM for analysis but output shouldn't stream to user
-        is_internal_output = (
-            # Check tags for internal markers
-            "reasoning_internal" in tags_lower or
-            "no_stream" in tags_lower or
-            # Check parent chain
-            "reasoning" in parent_str or
-            "multi_step_reasoning" in parent_str or
-            # Check run name
-            "reasoningengine" in run_name.lower() or
-            # Check metadata
-            metadata.get("langgraph_node") == "reasoning" or
-            metadata.get("internal") is True or
-            metadata.get("component") == "reasoning_engine"
-        )
-        
-        if is_internal_output:
-            return {"type": "ping"}  # Skip internal output
-        
-        # Get the content chunk - handle Gemini 2.5+ list format
-        chunk = event["data"]["chunk"]
-        raw_content = chunk.content if chunk.content else ""
-        
-        # Handle list content format from Gemini 2.5+
-        if isinstance(raw_content, list):
-            text_parts = []
-            for block in raw_content:
-                if isinstance(block, dict) and block.get('type') == 'text':
-                    text_parts.append(block.get('text', ''))
-                elif isinstance(block, str):
-                    text_parts.append(block)
-            content = ''.join(text_parts)
-        else:
-            content = raw_content if isinstance(raw_content, str) else str(raw_content) if raw_content else ""
-        
-        # Additional content-based filtering for any leaked internal content
-        if content and content.strip():
-            content_stripped = content.strip()
-            # Filter out JSON analysis blocks that look like reasoning output
-            if (content_stripped.startswith('{"perception"') or 
-                content_stripped.startswith('{"analysis"') or
-                (content_stripped.startswith('```') and 'perception' in content_stripped.lower()) or
-                ('"query_type"' in content and '"topic_domain"' in content)):
-                return {"type": "ping"}  # Skip reasoning JSON leakage
-        
-        # Handle <thinking> block filtering with streaming support
-        if thinking_filter is not None:
-            content = _filter_thinking_blocks(content, thinking_filter)
-            if not content:
-                return {"type": "ping"}
-        
-        if content:
-            return {"type": "text-delta", "textDelta": content}
-    
-    elif kind == "on_chain_start":
-        # Emit queue-update for major pipeline stages
-        name = event.get("name", "")
-        
-        # Map node names to queue IDs (updated for reasoning node)
-        queue_mapping = {
-            "governor": "policy-check",
-            "reasoning": "reasoning",  # NEW
-            "supervisor": "intent-routing",
-            "pedagogical_tutor": "response-gen",
-            "math_agent": "response-gen",
-            "agent": "response-gen",
-            "evaluator": "quality-check",
-        }
-        
-        if name in queue_mapping:
-            return {
-                "type": "queue-update",
-                "queueItemId": queue_mapping[name],
-                "status": "processing"
-            }
-    
-    elif kind == "on_chain_end":
-        # Emit queue-update for major pipeline stages
-        name = event.get("name", "")
-        
-        queue_mapping = {
-            "governor": "policy-check",
-            "reasoning": "reasoning",  # NEW
-            "supervisor": "intent-routing", 
-            "pedagogical_tutor": "response-gen",
-            "math_agent": "response-gen",
-            "agent": "response-gen",
-            "evaluator": "quality-check",
-        }
-        
-        if name in queue_mapping:
-            result = [{
-                "type": "queue-update",
-                "queueItemId": queue_mapping[name],
-                "status": "completed"
-            }]
-            
-            # === NEW: Emit Chain-of-Thought from reasoning node ===
-            # Based on "Chain-of-Thought Prompting Elicits Reasoning" paper
-            # This shows the actual reasoning steps to users for transparency
-            if name == "reasoning":
-                output = event["data"].get("output", {})
-                if output and isinstance(output, dict):
-                    thought_chain = output.get("thought_chain", [])
-                    if thought_chain:
-                        logger.info(f"🧠 Emitting {len(thought_chain)} chain-of-thought steps")
-                        result.append({
-                            "type": "chain-of-thought",
-                            "thoughts": thought_chain
-                        })
-                    # Also emit key concepts detected for context
-                    key_concepts = output.get("key_concepts_detected", [])
-                    if key_concepts:
-                        result.append({
-                            "type": "concepts-detected",
-                            "concepts": key_concepts
-                        })
-            
-            # Special handling for pedagogical_tutor and math_agent
-            # These nodes use model.invoke() (not streaming) so we need to emit
-            # their response as text-delta events here
-            if name in ["pedagogical_tutor", "math_agent"]:
-                output = event["data"].get("output", {})
-                if output and isinstance(output, dict):
-                    response = output.get("response", "")
-                    if response:
-                        # Filter out <thinking> blocks from non-streaming responses
-                        import re
-                        response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL)
-                        response = response.strip()
-                        if response:
-                            logger.info(f"📤 Emitting response from {name}: {len(response)} chars")
-                            result.append({
-                                "type": "text-delta",
-                                "textDelta": response
-                            })
-                        # Also emit sources if available
-                        sources = output.get("response_sources") or []
-                        if sources:
-                            result.append({
-                                "type": "sources",
-                                "sources": sources
-                            })
-            
-            # Special handling for evaluator output (scores)
-            if name == "evaluator":
-                output = event["data"].get("output", {})
-                logger.debug(f"Evaluator output keys: {output.keys() if isinstance(output, dict) else type(output)}")
-                if output and isinstance(output, dict):
-                    evaluation = output.get("evaluation")
-                    if evaluation:
-                        logger.info(f"📤 Emitting evaluation: agent={evaluation.get('agent_used')}")
-                        result.append({"type": "evaluation", "evaluation": evaluation})
-                    else:
-                        logger.warning("Evaluator output missing 'evaluation' key")
-            
-            return result if len(result) > 1 else result[0]
-    
-    elif kind == "on_tool_start":
-        # Emit both tool-call and queue-add for tools
-        tool_name = event["name"]
-        tool_input = event["data"].get("input")
-        tool_id = f"tool-{event.get('run_id', tool_name)[:8]}"
-        
-        return {
-            "type": "tool-call",
-            "toolId": tool_id,
-            "toolName": tool_name,
-            "toolInput": tool_input,
-            "timestamp": event.get("metadata", {}).get("start_time", None)
-        }
-        
-    elif kind == "on_tool_end":
-        tool_name = event["name"]
-        tool_id = f"tool-{event.get('run_id', tool_name)[:8]}"
-        output = event["data"].get("output")
-        
-        # Generic tool result
-        result = {
-            "type": "tool-result",
-            "toolId": tool_id,
-            "toolName": tool_name,
-            "toolOutput": str(output) if output else None,
-            "timestamp": event.get("metadata", {}).get("end_time", None)
-        }
-        
-        # Special handling for sources from retrieval
-        if tool_name == "retrieve_context":
-            # Handle ToolMessage or other wrappers
-            if hasattr(output, "artifact") and isinstance(output.artifact, list):
-                output = output.artifact
-            elif hasattr(output, "content"):
-                try:
-                    output = json.loads(output.content)
-                except:
-                    pass
-            
-            if isinstance(output, list):
-                # Use standardized source extraction
-                extracted_sources = extract_sources(output)
-                
-                # Format for frontend
-                sources = []
-                for i, src in enumerate(extracted_sources):
-                    if src.filename != "Unknown":
-                        sources.append({
-                            "id": f"src-{i+1}",
-                            "source_file": src.filename,
-                            "title": src.filename.replace("_", " ").replace(".pdf", ""),
-                            "page": src.page_number or src.chunk_index,
-                            "content": src.content_preview + "..." if src.content_preview else "",
-                            "description": src.content_preview[:100] if src.content_preview else "",
-                            "url": src.url  # Include the deep link URL
-                        })
-                
-                if sources:
-                    # Emit separate sources event
-                    return [
-                        result,
-                        {"type": "sources", "sources": sources}
-                    ]
-        
-        return result
-    
-    elif kind == "on_retriever_start":
-        return {
-            "type": "queue-add",
-            "queueItem": {
-                "id": "retrieval",
-                "label": "Searching course materials",
-                "status": "processing"
-            }
-        }
-    
-    elif kind == "on_retriever_end":
-        return {
-            "type": "queue-update",
-            "queueItemId": "retrieval",
-            "status": "completed"
-        }
-        
-    return {"type": "ping"} # Keepalive/ignored
-
-
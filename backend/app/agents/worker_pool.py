@@ -0,0 +1,505 @@
+"""
+Agent Worker Pool - Run chat turns in warm worker processes
+
+astream_agent ran inside the API process, so its CPU work (regex scoring,
+JSON parsing of tool output, prompt building, Langfuse serialisation, sync
+nodes) shared one GIL with request handling and SSE writing, and a node
+could only ever use one core.
+
+With settings.agent_execution_mode = "process_pool", astream_turn() hands
+each turn to a pool of worker processes instead (settings.agent_worker_processes,
+default one per core). Each worker:
+
+- is started with the "spawn" method and warms up before it takes turns:
+  compiled tutor graphs, the intent classifier, the scope index, the Chroma
+  client and the GraphRAG service (warm_up)
+- runs up to settings.agent_worker_max_turns turns concurrently on its own
+  event loop, each one the unchanged astream_agent generator
+
+Events come back over the worker's multiprocessing pipe, one JSON message
+per event (the same encoding the turn stream buffer uses). A reader thread
+per worker hands them to the API loop. Backpressure works at two levels:
+
+- admission: a turn waits up to settings.agent_worker_admission_timeout_seconds
+  for a free slot on the least-loaded ready worker, else AgentPoolBusy
+- flow control: a turn may run at most settings.agent_worker_event_window
+  events ahead of the API side reading them; the worker's generator pauses
+  until the reader acknowledges
+
+Closing the API-side generator (client gone, turn cancelled) cancels the
+turn in its worker, which trips the run's CancelToken as before. A worker
+that dies fails its in-flight turns and is replaced.
+
+Agent-side stats (cancellations, cascade, deadlines, ...) are counted in the
+process that runs the turn, so in process_pool mode they live in the
+workers; /api/admin/health reports the pool itself under "agent_workers".
+
+In "in_process" mode (the default) astream_turn is astream_agent.
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+AGENT_TARGET = "app.agents.tutor_agent:astream_agent"
+STOP_TIMEOUT_S = 10.0
+RESPAWN_DELAY_S = 5.0  # Before replacing a worker that died without becoming ready (import/config error)
+
+
+class AgentPoolBusy(Exception):
+    """No worker had a free turn slot within the admission timeout"""
+
+
+class AgentWorkerError(Exception):
+    """A turn failed in its worker process, or the worker went away"""
+
+
+def _encode(kind: str, turn_id: Optional[str], payload: Any) -> bytes:
+    return json.dumps([kind, turn_id, payload], separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+# ---------- worker process ----------
+
+def warm_up() -> None:
+    """Build what every turn needs, before the worker takes its first one"""
+    from app.agents.graph_variants import GRAPH_VARIANTS
+    from app.agents.intent_classifier import get_intent_classifier
+    from app.agents.sub_agents import get_rag_agent, get_syllabus_agent
+    from app.agents.tutor_agent import get_tutor_agent
+    from app.rag.graph_rag import get_graph_rag_service
+    from app.rag.langchain_chroma import get_langchain_chroma_client
+    from app.rag.scope_index import get_scope_index
+
+    steps: List[Callable[[], Any]] = [get_intent_classifier, get_scope_index, get_langchain_chroma_client, get_graph_rag_service]
+    steps += [get_rag_agent, get_syllabus_agent]
+    steps += [lambda variant=variant: get_tutor_agent(variant) for variant in GRAPH_VARIANTS]
+    for step in steps:
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Agent worker warm-up step failed, it will run on first use: {e}")
+
+
+_targets: Dict[str, Callable[..., AsyncIterator[Dict[str, Any]]]] = {}
+
+
+def _resolve(target: str) -> Callable[..., AsyncIterator[Dict[str, Any]]]:
+    """'module:function' -> the async generator function"""
+    if target not in _targets:
+        module, _, name = target.partition(":")
+        _targets[target] = getattr(importlib.import_module(module), name)
+    return _targets[target]
+
+
+class _Channel:
+    """Worker side of the pipe: sends from the worker's event loop"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def send(self, kind: str, turn_id: Optional[str], payload: Any = None) -> None:
+        try:
+            with self._lock:
+                self.conn.send_bytes(_encode(kind, turn_id, payload))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Agent worker: could not reach the API process: {e}")
+
+
+def _receive_commands(conn, loop: asyncio.AbstractEventLoop, inbox: asyncio.Queue) -> None:
+    while True:
+        try:
+            message = json.loads(conn.recv_bytes())
+        except (EOFError, OSError):
+            message = ["stop", None, None]  # API process gone
+        loop.call_soon_threadsafe(inbox.put_nowait, message)
+        if message[0] == "stop":
+            return
+
+
+async def _run_turn(channel: _Channel, turn_id: str, payload: Dict[str, Any], credits: asyncio.Semaphore) -> None:
+    events = _resolve(payload["target"])(**payload["kwargs"])
+    try:
+        async for event in events:
+            await credits.acquire()  # Paused while the API side is a full window behind
+            channel.send("event", turn_id, event)
+        channel.send("end", turn_id, None)
+    except asyncio.CancelledError:
+        channel.send("end", turn_id, "cancelled")
+    except Exception as e:
+        logger.error(f"Agent worker: turn {turn_id} failed: {e}", exc_info=True)
+        channel.send("end", turn_id, f"{type(e).__name__}: {e}")
+    finally:
+        await events.aclose()  # Runs astream_agent's cancellation path if it was left suspended
+
+
+async def _serve(conn, index: int, warm: bool) -> None:
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue = asyncio.Queue()
+    threading.Thread(target=_receive_commands, args=(conn, loop, inbox), name="agent-worker-inbox", daemon=True).start()
+    if warm:
+        start = time.perf_counter()
+        await asyncio.to_thread(warm_up)
+        logger.info(f"Agent worker {index} warmed up in {time.perf_counter() - start:.1f}s")
+
+    channel = _Channel(conn)
+    channel.send("ready", None, {"pid": os.getpid()})
+    turns: Dict[str, tuple] = {}  # turn_id -> (task, credits)
+    while True:
+        kind, turn_id, payload = await inbox.get()
+        if kind == "start":
+            credits = asyncio.Semaphore(payload["window"])
+            task = asyncio.create_task(_run_turn(channel, turn_id, payload, credits))
+            task.add_done_callback(lambda _task, turn_id=turn_id: turns.pop(turn_id, None))
+            turns[turn_id] = (task, credits)
+        elif kind == "ack" and turn_id in turns:
+            for _ in range(payload):
+                turns[turn_id][1].release()
+        elif kind == "cancel" and turn_id in turns:
+            turns[turn_id][0].cancel()
+        elif kind == "stop":
+            tasks = [task for task, _ in turns.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            return
+
+
+def _worker_main(conn, index: int, warm: bool) -> None:
+    """Entry point of a worker process"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - agent-worker-{index} - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_serve(conn, index, warm))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+# ---------- API process ----------
+
+class _Worker:
+    """API-side handle of one worker process"""
+
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.pid: Optional[int] = None
+        self.ready = False
+        self.turns: Dict[str, asyncio.Queue] = {}
+        self._send_lock = threading.Lock()
+
+    def send(self, kind: str, turn_id: Optional[str], payload: Any = None) -> bool:
+        try:
+            with self._send_lock:
+                self.conn.send_bytes(_encode(kind, turn_id, payload))
+            return True
+        except (OSError, ValueError) as e:
+            logger.warning(f"Agent worker {self.index}: send failed: {e}")
+            return False
+
+
+class AgentWorkerPool:
+    """Worker processes running agent turns, fed and drained from the API event loop"""
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        max_turns: Optional[int] = None,
+        window: Optional[int] = None,
+        warm: bool = True,
+    ):
+        self.processes = processes or settings.agent_worker_processes or os.cpu_count() or 1
+        self.max_turns = max_turns or settings.agent_worker_max_turns
+        self.window = window or settings.agent_worker_event_window
+        self.warm = warm
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: Dict[int, _Worker] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None  # Set when a worker becomes ready or a slot frees up
+        self._stopping = False
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    def start(self) -> None:
+        """Spawn the workers (call from the API event loop; no-op once started)"""
+        if self.started:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        logger.info(f"Starting {self.processes} agent worker processes ({self.max_turns} turns each)")
+        for index in range(self.processes):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, index, self.warm), name=f"agent-worker-{index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(index, process, parent_conn)
+        self._workers[index] = worker
+        threading.Thread(target=self._receive, args=(worker,), name=f"agent-worker-{index}-reader", daemon=True).start()
+
+    def _receive(self, worker: _Worker) -> None:
+        """Reader thread: hand each message from a worker to the API loop"""
+        while True:
+            try:
+                kind, turn_id, payload = json.loads(worker.conn.recv_bytes())
+            except (EOFError, OSError):
+                self._loop.call_soon_threadsafe(self._worker_exited, worker)
+                return
+            self._loop.call_soon_threadsafe(self._dispatch, worker, kind, turn_id, payload)
+
+    def _dispatch(self, worker: _Worker, kind: str, turn_id: Optional[str], payload: Any) -> None:
+        if kind == "ready":
+            worker.ready = True
+            worker.pid = payload.get("pid")
+            self._changed.set()
+            return
+        queue = worker.turns.get(turn_id)
+        if queue is not None:
+            queue.put_nowait((kind, payload))
+
+    def _worker_exited(self, worker: _Worker) -> None:
+        if self._workers.get(worker.index) is not worker:
+            return
+        was_ready, worker.ready = worker.ready, False
+        for queue in worker.turns.values():
+            queue.put_nowait(("end", "agent worker process exited"))
+        self._loop.run_in_executor(None, worker.process.join, STOP_TIMEOUT_S)
+        if self._stopping:
+            return
+        get_worker_pool_stats().record_restart()
+        delay = 0.0 if was_ready else RESPAWN_DELAY_S  # No tight respawn loop when workers cannot start
+        logger.warning(f"Agent worker {worker.index} exited; starting a replacement in {delay:.0f}s")
+        self._loop.call_later(delay, self._respawn, worker.index)
+
+    def _respawn(self, index: int) -> None:
+        if not self._stopping:
+            self._spawn(index)
+
+    def _pick(self) -> Optional[_Worker]:
+        free = [w for w in self._workers.values() if w.ready and len(w.turns) < self.max_turns]
+        return min(free, key=lambda w: len(w.turns)) if free else None
+
+    async def _acquire(self) -> _Worker:
+        """Least-loaded ready worker with a free slot, waiting up to the admission timeout"""
+        timeout = settings.agent_worker_admission_timeout_seconds
+        deadline = self._loop.time() + timeout
+        while True:
+            worker = self._pick()
+            if worker is not None:
+                return worker
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                raise AgentPoolBusy(f"No agent worker slot free after {timeout:g}s")
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise AgentPoolBusy(f"No agent worker slot free after {timeout:g}s")
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Wait until every worker has warmed up; False on timeout"""
+        deadline = self._loop.time() + timeout
+        while not all(w.ready for w in self._workers.values()):
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                return False
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def stream(self, kwargs: Dict[str, Any], target: str = AGENT_TARGET) -> AsyncIterator[Dict[str, Any]]:
+        """Run target(**kwargs) on a worker and yield its events"""
+        stats = get_worker_pool_stats()
+        start = time.perf_counter()
+        try:
+            worker = await self._acquire()
+        except AgentPoolBusy:
+            stats.record_busy()
+            raise
+        turn_id = uuid.uuid4().hex
+        queue: asyncio.Queue = asyncio.Queue()
+        worker.turns[turn_id] = queue
+        stats.record_admitted((time.perf_counter() - start) * 1000)
+
+        outcome = "cancelled"
+        events = unacked = 0
+        ack_every = max(1, self.window // 2)
+        try:
+            if not worker.send("start", turn_id, {"target": target, "kwargs": kwargs, "window": self.window}):
+                outcome = "failed"
+                raise AgentWorkerError(f"Agent worker {worker.index} is unreachable")
+            while True:
+                kind, payload = await queue.get()
+                if kind == "end":
+                    if payload is None:
+                        outcome = "completed"
+                        return
+                    outcome = "failed"
+                    raise AgentWorkerError(payload)
+                yield payload
+                events += 1
+                unacked += 1
+                if unacked >= ack_every:
+                    worker.send("ack", turn_id, unacked)
+                    unacked = 0
+        finally:
+            worker.turns.pop(turn_id, None)
+            if outcome == "cancelled":
+                worker.send("cancel", turn_id)
+            stats.record_turn(outcome, events)
+            self._changed.set()
+
+    async def stop(self) -> None:
+        """Stop the workers, cancelling their turns"""
+        if not self.started:
+            return
+        self._stopping = True
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.send("stop", None)
+
+        def join_all() -> None:
+            for worker in workers:
+                worker.process.join(STOP_TIMEOUT_S)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+
+        await asyncio.to_thread(join_all)
+        logger.info("Agent worker processes stopped")
+
+    def workers(self) -> List[Dict[str, Any]]:
+        return [
+            {"index": w.index, "pid": w.pid, "ready": w.ready, "in_flight": len(w.turns)}
+            for w in sorted(self._workers.values(), key=lambda w: w.index)
+        ]
+
+
+class WorkerPoolStats:
+    """Turns run on the worker pool: admission waits, busy rejections, outcomes, restarts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.busy = 0
+        self.restarts = 0
+        self.events = 0
+        self.outcomes: Dict[str, int] = {}
+        self._admission_ms = 0.0
+
+    def record_admitted(self, wait_ms: float) -> None:
+        with self._lock:
+            self.admitted += 1
+            self._admission_ms += wait_ms
+
+    def record_busy(self) -> None:
+        with self._lock:
+            self.busy += 1
+
+    def record_restart(self) -> None:
+        with self._lock:
+            self.restarts += 1
+
+    def record_turn(self, outcome: str, events: int) -> None:
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.events += events
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "busy_rejections": self.busy,
+                "avg_admission_wait_ms": round(self._admission_ms / self.admitted, 1) if self.admitted else 0.0,
+                "outcomes": dict(self.outcomes),
+                "events_relayed": self.events,
+                "worker_restarts": self.restarts,
+            }
+
+
+_agent_worker_pool = None
+_worker_pool_stats = None
+
+
+def get_agent_worker_pool() -> AgentWorkerPool:
+    """Get or create the process-wide agent worker pool (started on first use)"""
+    global _agent_worker_pool
+    if _agent_worker_pool is None:
+        _agent_worker_pool = AgentWorkerPool()
+    return _agent_worker_pool
+
+
+def get_worker_pool_stats() -> WorkerPoolStats:
+    """Get or create the process-wide worker pool stats"""
+    global _worker_pool_stats
+    if _worker_pool_stats is None:
+        _worker_pool_stats = WorkerPoolStats()
+    return _worker_pool_stats
+
+
+def worker_pool_snapshot() -> Dict[str, Any]:
+    """Execution mode, pool stats and per-worker load for the admin health payload"""
+    pool = _agent_worker_pool
+    return {
+        "mode": settings.agent_execution_mode,
+        **get_worker_pool_stats().snapshot(),
+        "workers": pool.workers() if pool is not None and pool.started else [],
+    }
+
+
+async def astream_turn(
+    query: str,
+    user_id: str = None,
+    user_email: str = None,
+    session_id: str = None,
+    chat_id: str = None,
+    conversation_history: List[Dict[str, Any]] = None,
+    model: str = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    astream_agent, run in this process or on the worker pool (settings.agent_execution_mode)
+
+    Raises AgentPoolBusy when the pool has no free slot within the admission timeout.
+    """
+    kwargs = {
+        "query": query,
+        "user_id": user_id,
+        "user_email": user_email,
+        "session_id": session_id,
+        "chat_id": chat_id,
+        "conversation_history": conversation_history,
+        "model": model,
+    }
+    if settings.agent_execution_mode == "process_pool":
+        pool = get_agent_worker_pool()
+        pool.start()
+        events = pool.stream(kwargs)
+    else:
+        from app.agents.tutor_agent import astream_agent
+        events = astream_agent(**kwargs)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await events.aclose()  # Propagate cancellation to the run now, not at garbage collection
@@ -4,7 +4,8 @@ Admin API routes for course management
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
-from typing import Optional
+from pydantic import BaseModel
+from typing import Literal, Optional
 import tempfile
 from pathlib import Path
 import logging
@@ -146,6 +147,20 @@ async def get_system_health(
     """Get system health metrics"""
     try:
         from app.rag.chromadb_client import get_chromadb_client
+        from app.agents.cancellation import get_cancellation_stats
+        from app.agents.generation_budget import get_budget_stats
+        from app.agents.streaming_quality import get_quality_stats
+        from app.agents.model_cascade import get_cascade_stats
+        from app.agents.reasoning_fast_path import get_fast_path_stats
+        from app.agents.intent_classifier import classifier_info
+        from app.agents.llm_cache import get_llm_cache_stats
+        from app.agents.reasoning_node import get_reasoning_stats
+        from app.rag.scope_index import get_scope_check_stats
+        from app.agents.graph_variants import get_graph_variant_stats
+        from app.agents.deadline import get_deadline_stats
+        from app.circuit_breaker import circuit_breaker_snapshot
+        from app.agents.worker_pool import worker_pool_snapshot
+        from app.agents.tools import get_tool_step_stats
         
         chromadb = get_chromadb_client()
         collection_info = chromadb.get_collection_info()
@@ -162,6 +177,34 @@ async def get_system_health(
                     "completed": len([j for j in etl_jobs.values() if j["status"] == "completed"]),
                     "error": len([j for j in etl_jobs.values() if j["status"] == "error"]),
                 },
+                # Stream turns cut short by client disconnects, with estimated savings
+                "chat_cancellations": get_cancellation_stats().snapshot(),
+                # Answers ended / capped by their per-intent generation budget
+                "generation_budgets": get_budget_stats().snapshot(),
+                # Streaming quality gate restarts vs full repair loops, with turn latency
+                "answer_quality": get_quality_stats().snapshot(),
+                # Per-intent cascade escalation rate, latency and estimated cost, by model
+                "model_cascade": get_cascade_stats().snapshot(),
+                # Turns classified locally instead of by the reasoning LLM, latency saved, turns sampled for the offline audit
+                "reasoning_fast_path": get_fast_path_stats().snapshot(),
+                # Active locally trained intent classifier and its held-out metrics
+                "intent_classifier": classifier_info(),
+                # Exact-prompt cache for internal LLM calls: hit rate and latency saved per namespace
+                "llm_cache": get_llm_cache_stats().snapshot(),
+                # Structured reasoning call: failure rate, classification calls per turn, stage latency
+                "reasoning": get_reasoning_stats().snapshot(),
+                # Governor scope checks decided by the centroid index vs vector search, with latency
+                "scope_check": get_scope_check_stats().snapshot(),
+                # Turns per compiled graph variant, node hops and latency per intent, estimated savings
+                "graph_variants": get_graph_variant_stats().snapshot(),
+                # Turns past their deadline, optional stages skipped and calls timed out for the budget
+                "deadlines": get_deadline_stats().snapshot(),
+                # Per-dependency breaker state, failure rate, fast-failed and degraded calls
+                "circuit_breakers": circuit_breaker_snapshot(),
+                # Execution mode; in process_pool mode, admissions, busy rejections and load per worker
+                "agent_workers": worker_pool_snapshot(),
+                # Tool-step latency by calls per step, per-tool latency/errors, calls dropped by the per-step cap
+                "tool_steps": get_tool_step_stats().snapshot(),
             }
         )
     except Exception as e:
@@ -174,3 +217,67 @@ async def get_system_health(
             status_code=500
         )
 
+
+class RoutingModeRequest(BaseModel):
+    mode: Optional[Literal["adaptive", "static"]] = None  # None clears the override (back to the setting)
+
+
+@router.get("/routing")
+async def get_routing_table(
+    user_info: dict = require_admin,
+):
+    """Current model routing per intent, with rolling per-model latency stats"""
+    import asyncio
+    from app.agents.supervisor import Supervisor
+    from app.agents.model_routing import routing_table
+    
+    try:
+        # Builds the model clients and reads Redis; keep it off the event loop
+        table = await asyncio.to_thread(lambda: routing_table(Supervisor()))
+        return JSONResponse(content=table)
+    except Exception as e:
+        logger.error(f"Error building routing table: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/routing/mode")
+async def set_routing_mode_override(
+    request: RoutingModeRequest,
+    user_info: dict = require_admin,
+):
+    """Override latency-aware routing for all workers (adaptive / static)"""
+    from app.agents.model_routing import get_routing_mode, set_routing_mode
+    
+    try:
+        set_routing_mode(request.mode)
+    except Exception as e:
+        logger.error(f"Error setting routing mode: {e}")
+        raise HTTPException(status_code=503, detail="Routing override unavailable (Redis)")
+    logger.info(f"Routing mode override set to {request.mode or 'default'} by {user_info.get('email')}")
+    return JSONResponse(content={"mode": get_routing_mode(), "override": request.mode})
+
+
+@router.get("/circuit-breakers")
+async def get_circuit_breakers(
+    user_info: dict = require_admin,
+):
+    """State, failure rate and counters of the Chroma/Neo4j/Supabase/Redis circuit breakers"""
+    from app.circuit_breaker import circuit_breaker_snapshot
+    
+    return JSONResponse(content=circuit_breaker_snapshot())
+
+
+@router.post("/circuit-breakers/{name}/reset")
+async def reset_circuit_breaker(
+    name: str,
+    user_info: dict = require_admin,
+):
+    """Close a dependency's breaker now instead of waiting for its probe"""
+    from app.circuit_breaker import DEPENDENCIES, get_circuit_breaker
+    
+    if name not in DEPENDENCIES:
+        raise HTTPException(status_code=404, detail=f"Unknown dependency: {name}")
+    breaker = get_circuit_breaker(name)
+    breaker.reset()
+    logger.info(f"Circuit breaker {name} reset by {user_info.get('email')}")
+    return JSONResponse(content={"name": name, **breaker.snapshot()})
@@ -2,15 +2,19 @@
 Chat API routes for streaming responses
 """
 import logging
-import json
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 import asyncio
+import re
+import uuid
 
 from app.api.middleware import require_student
+from app.api.sse import SSEWriter
+from app.api.stream_buffer import get_turn_stream_buffer, open_turn, read_turn, start_producer
 from app.agents.tutor_agent import run_agent
+from app.agents.worker_pool import AgentPoolBusy, astream_turn
 from app.observability import get_langfuse_client
 from app.config import settings
 from app.api.routes.history import (
@@ -25,6 +29,13 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+STREAM_ID_RE = re.compile(r"^\d+-\d+$")
+
 
 async def save_message(chat_id: str, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
     """Save message to database (wrapper for history service)"""
@@ -83,11 +94,20 @@ class ChatRequest(BaseModel):
 @router.post("/stream")
 async def stream_chat(
     request: ChatRequest,
+    http_request: Request,
     user_info: dict = Depends(require_student),
 ):
     """
     Stream chat responses from the LangGraph agent using Vercel AI SDK format.
     Returns Server-Sent Events (SSE) compatible with AI SDK v5.
+    
+    The turn's events are buffered in a Redis stream (app/api/stream_buffer.py):
+    the first event is {"type": "turn-id"}, and every frame carries an SSE id.
+    After a dropped connection the client resumes with
+    GET /api/chat/stream/{turn_id} and Last-Event-ID; generation keeps running
+    meanwhile. If nobody reads the turn for settings.stream_resume_grace_seconds
+    (or without Redis, as soon as the client disconnects) the agent run is
+    cancelled and the partial response is saved with metadata.cancelled = True.
     """
     user_message = request.messages[-1].content if request.messages else ""
     user_id = user_info.get("user_id")
@@ -108,13 +128,14 @@ async def stream_chat(
     # Auto-title chat from first query
     await update_chat_title_from_query(chat_id, user_message)
 
-    async def generate_stream():
+    async def generate_events():
         """
-        Async generator that streams responses in AI SDK v5 format.
-        Format: data: {"type":"text-delta","textDelta":"chunk"}\n\n
+        Async generator of AI SDK v5 events for this request.
+        Framing (pings dropped, text-deltas coalesced) is done by SSEWriter:
+        data: {"type":"text-delta","textDelta":"chunk"}\n\n
         """
         if not user_message:
-            yield f'data: {json.dumps({"type": "finish"})}\n\n'
+            yield {"type": "finish"}
             return
 
         full_response = ""
@@ -124,8 +145,6 @@ async def stream_chat(
         evaluation = None  # Collect evaluation for persistence
 
         try:
-            from app.agents.tutor_agent import astream_agent
-            
             # Use chat_id as session_id for Langfuse grouping if not provided
             effective_session_id = request.session_id or chat_id
             
@@ -135,7 +154,8 @@ async def stream_chat(
                 model_to_use = None
             
             # Stream events from the agent with conversation history
-            async for event in astream_agent(
+            # (in this process or on the agent worker pool, see app/agents/worker_pool.py)
+            async for event in astream_turn(
                 user_message,
                 user_id,
                 user_email,
@@ -151,6 +171,8 @@ async def stream_chat(
                 # Collect queue events for persistence in message metadata
                 if event.get("type") == "queue-init":
                     queue_steps = event.get("queue", [])
+                if event.get("type") == "queue-add" and event.get("queueItem"):
+                    queue_steps.append(dict(event["queueItem"]))
                 # Collect sources for persistence
                 if event.get("type") == "sources":
                     sources = event.get("sources", [])
@@ -166,7 +188,7 @@ async def stream_chat(
                         if step.get("id") == step_id:
                             step["status"] = status
                             break
-                yield f'data: {json.dumps(event)}\n\n'
+                yield event
 
             # Save assistant message with metadata including queue steps, sources, and evaluation
             metadata = {
@@ -178,25 +200,110 @@ async def stream_chat(
             await save_message(chat_id, "assistant", full_response, metadata)
 
             # Signal completion with chat_id and trace_id for client reference
-            yield f'data: {json.dumps({"type": "finish", "chatId": chat_id, "traceId": trace_id})}\n\n'
+            yield {"type": "finish", "chatId": chat_id, "traceId": trace_id}
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # Nobody is reading any more (turn cancelled): keep the partial answer
+            logger.info(f"Chat {chat_id}: generation cancelled after {len(full_response)} chars")
+            if full_response:
+                metadata = {
+                    "trace_id": trace_id,
+                    "queue_steps": queue_steps,
+                    "sources": sources,
+                    "evaluation": evaluation,
+                    "cancelled": True,
+                }
+                # Shielded so a second cancellation cannot drop the write
+                await asyncio.shield(save_message(chat_id, "assistant", full_response, metadata))
+            raise
+
+        except AgentPoolBusy as e:
+            logger.warning(f"Chat {chat_id}: {e}")
+            yield {"type": "error", "error": "The tutor is busy right now. Please try again in a moment."}
 
         except Exception as e:
             logger.error(f"Error during agent execution: {e}", exc_info=True)
             error_msg = "An unexpected error occurred while processing your request."
-            yield f'data: {json.dumps({"type": "error", "error": error_msg})}\n\n'
+            yield {"type": "error", "error": error_msg}
+
+    turn_id = uuid.uuid4().hex
+    buffer = await open_turn(turn_id, user_id, chat_id)
+    if buffer is None:
+        # No Redis: stream directly, generation is tied to this connection
+        return StreamingResponse(
+            SSEWriter().stream(generate_events(), is_disconnected=http_request.is_disconnected),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
+        )
+
+    start_producer(buffer, turn_id, generate_events())
+    return StreamingResponse(
+        SSEWriter().stream(read_turn(buffer, turn_id), is_disconnected=http_request.is_disconnected),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Turn-Id": turn_id}
+    )
+
+
+async def _get_owned_turn(turn_id: str, user_info: dict):
+    """The turn buffer if turn_id is a live turn of this user, else HTTPException"""
+    buffer = get_turn_stream_buffer()
+    if buffer is None:
+        raise HTTPException(status_code=503, detail="Stream resumption is unavailable")
+    try:
+        meta = await buffer.get_meta(turn_id)
+    except Exception as e:
+        logger.warning(f"Could not look up turn {turn_id}: {e}")
+        raise HTTPException(status_code=503, detail="Stream resumption is unavailable")
+    if not meta or meta.get("user_id") != (user_info.get("user_id") or ""):
+        raise HTTPException(status_code=404, detail="Turn not found or expired")
+    return buffer
 
-    # Return StreamingResponse with proper SSE headers
+
+@router.get("/stream/{turn_id}")
+async def resume_chat_stream(
+    turn_id: str,
+    http_request: Request,
+    last_event_id: Optional[str] = None,
+    user_info: dict = Depends(require_student),
+):
+    """
+    Resume a chat turn's event stream after a dropped connection.
+    
+    Replays the events after the Last-Event-ID header (or ?last_event_id=),
+    or the whole turn without one, then follows the live generation, which
+    may be running on another worker.
+    """
+    last_event_id = http_request.headers.get("last-event-id") or last_event_id
+    if last_event_id and not STREAM_ID_RE.match(last_event_id):
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    buffer = await _get_owned_turn(turn_id, user_info)
+    logger.info(f"Resuming turn {turn_id} after event {last_event_id or 'start'}")
     return StreamingResponse(
-        generate_stream(),
+        SSEWriter().stream(read_turn(buffer, turn_id, last_event_id), is_disconnected=http_request.is_disconnected),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
+        headers={**SSE_HEADERS, "X-Turn-Id": turn_id}
     )
 
 
+@router.delete("/stream/{turn_id}")
+async def cancel_chat_stream(
+    turn_id: str,
+    user_info: dict = Depends(require_student),
+):
+    """
+    Stop a turn's generation now (the stop button), instead of after the
+    reconnect grace period.
+    """
+    buffer = await _get_owned_turn(turn_id, user_info)
+    try:
+        await buffer.request_cancel(turn_id)
+    except Exception as e:
+        logger.warning(f"Could not cancel turn {turn_id}: {e}")
+        raise HTTPException(status_code=503, detail="Stream resumption is unavailable")
+    return {"status": "cancelling", "turn_id": turn_id}
+
+
 @router.post("/")
 async def chat(
     request: ChatRequest,
@@ -0,0 +1,215 @@
+"""
+SSE Writer - Compact, coalesced Server-Sent Events framing for chat streams
+
+Sits between the agent event stream and StreamingResponse:
+- drops internal "ping" events; sends an SSE comment (": keep-alive") only
+  when nothing else has been written for settings.sse_keepalive_seconds
+- coalesces consecutive text-delta events into one frame, flushed when the
+  first buffered delta is settings.sse_coalesce_ms old, when the buffer
+  reaches settings.sse_coalesce_max_chars, or before any other event
+- serializes compactly (orjson when installed, else json without spaces)
+- polls an is_disconnected() callback every settings.sse_disconnect_poll_seconds
+  and stops when the client is gone; the pending agent step is cancelled, so
+  generation stops instead of running for nobody
+
+Wire format is unchanged for the AI SDK v5 client in extension/: each frame
+is `data: <one JSON event>\\n\\n`, and comment lines are ignored by it.
+Events read back from a resumable turn stream arrive as (event_id, event);
+their frames are followed by a separate `id: <event_id>\\n\\n` block (the
+client only parses blocks that start with "data: ") which the client sends
+back as Last-Event-ID when it reconnects.
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import json
+import logging
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+
+def encode_event(event: Dict[str, Any], event_id: Optional[str] = None) -> bytes:
+    """One SSE data frame for an event (plus its id block, if it has one)"""
+    id_block = b"id: " + event_id.encode("ascii") + b"\n\n" if event_id else b""
+    if ORJSON_AVAILABLE:
+        try:
+            return b"data: " + orjson.dumps(event) + b"\n\n" + id_block
+        except TypeError:
+            pass  # Non-JSON-native values (e.g. tool inputs) - fall back to json + str()
+    payload = json.dumps(event, separators=(",", ":"), ensure_ascii=False, default=str)
+    return b"data: " + payload.encode("utf-8") + b"\n\n" + id_block
+
+
+class SSEWriter:
+    """
+    Turns agent events into SSE frames
+
+    Usage:
+        writer = SSEWriter()
+        return StreamingResponse(writer.stream(events()), media_type="text/event-stream")
+
+    Stats for the last stream are kept on the writer (frames, bytes, events,
+    and whether the client disconnected).
+    """
+
+    def __init__(
+        self,
+        coalesce_ms: Optional[float] = None,
+        max_chars: Optional[int] = None,
+        keepalive_seconds: Optional[float] = None,
+        disconnect_poll_seconds: Optional[float] = None
+    ):
+        self.coalesce_s = (settings.sse_coalesce_ms if coalesce_ms is None else coalesce_ms) / 1000.0
+        self.max_chars = settings.sse_coalesce_max_chars if max_chars is None else max_chars
+        self.keepalive_s = settings.sse_keepalive_seconds if keepalive_seconds is None else keepalive_seconds
+        self.disconnect_poll_s = (
+            settings.sse_disconnect_poll_seconds if disconnect_poll_seconds is None else disconnect_poll_seconds
+        )
+
+        self._text: List[str] = []
+        self._text_len = 0
+        self._text_since: Optional[float] = None
+        self._text_id: Optional[str] = None
+        self._last_write = time.monotonic()
+        self.stats = {"events": 0, "dropped_pings": 0, "frames": 0, "bytes": 0, "keepalives": 0, "disconnected": False}
+
+    # ---------- framing ----------
+
+    def _frame(self, data: bytes) -> bytes:
+        self._last_write = time.monotonic()
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(data)
+        return data
+
+    def _flush_text(self) -> Optional[bytes]:
+        if not self._text:
+            return None
+        text = "".join(self._text)
+        event_id = self._text_id  # Id of the last delta in the frame
+        self._text.clear()
+        self._text_len = 0
+        self._text_since = None
+        self._text_id = None
+        return self._frame(encode_event({"type": "text-delta", "textDelta": text}, event_id))
+
+    def feed(self, event: Dict[str, Any], event_id: Optional[str] = None) -> List[bytes]:
+        """Frames ready to send after this event (possibly none)"""
+        self.stats["events"] += 1
+        kind = event.get("type")
+
+        if kind == "ping":
+            self.stats["dropped_pings"] += 1
+            return []
+
+        if kind == "text-delta":
+            delta = event.get("textDelta") or ""
+            if not delta:
+                return []
+            if event_id:
+                self._text_id = event_id
+            if self._text_since is None:
+                self._text_since = time.monotonic()
+            self._text.append(delta)
+            self._text_len += len(delta)
+            if self._text_len >= self.max_chars:
+                return [self._flush_text()]
+            return []
+
+        frames = []
+        pending = self._flush_text()  # Keep ordering: buffered text goes before the next event
+        if pending:
+            frames.append(pending)
+        frames.append(self._frame(encode_event(event, event_id)))
+        return frames
+
+    def tick(self) -> List[bytes]:
+        """Frames due by time alone: an aged text buffer or a keep-alive"""
+        now = time.monotonic()
+        if self._text_since is not None and now - self._text_since >= self.coalesce_s:
+            return [self._flush_text()]
+        if self._text_since is None and now - self._last_write >= self.keepalive_s:
+            self.stats["keepalives"] += 1
+            return [self._frame(KEEPALIVE_FRAME)]
+        return []
+
+    def close(self) -> List[bytes]:
+        """Flush anything buffered at the end of the stream"""
+        pending = self._flush_text()
+        return [pending] if pending else []
+
+    def _next_deadline(self) -> float:
+        if self._text_since is not None:
+            return self._text_since + self.coalesce_s
+        return self._last_write + self.keepalive_s
+
+    # ---------- async driver ----------
+
+    async def stream(
+        self,
+        events: AsyncIterator[Union[Dict[str, Any], Tuple[str, Dict[str, Any]]]],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Frame an async event stream
+
+        The next event is awaited as a task so a coalescing/keep-alive deadline
+        can fire while the agent is still working, without cancelling it.
+        When is_disconnected() reports the client gone, that task is cancelled,
+        which raises CancelledError inside the event generator.
+        Items may be plain events or (event_id, event) pairs.
+        """
+        iterator = events.__aiter__()
+        next_event = asyncio.ensure_future(iterator.__anext__())
+        next_poll = time.monotonic() + self.disconnect_poll_s
+        try:
+            while True:
+                deadline = self._next_deadline()
+                if is_disconnected is not None:
+                    deadline = min(deadline, next_poll)
+                timeout = max(0.0, deadline - time.monotonic())
+                done, _ = await asyncio.wait({next_event}, timeout=timeout)
+
+                if is_disconnected is not None and time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + self.disconnect_poll_s
+                    if await is_disconnected():
+                        self.stats["disconnected"] = True
+                        logger.info("SSE client disconnected, cancelling the stream")
+                        break
+
+                if not done:
+                    for frame in self.tick():
+                        yield frame
+                    continue
+
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    break
+                next_event = asyncio.ensure_future(iterator.__anext__())
+
+                event_id = None
+                if isinstance(event, tuple):
+                    event_id, event = event
+                for frame in self.feed(event, event_id):
+                    yield frame
+                for frame in self.tick():
+                    yield frame
+
+            if not self.stats["disconnected"]:
+                for frame in self.close():
+                    yield frame
+        finally:
+            if not next_event.done():
+                next_event.cancel()
+            logger.debug(f"SSE stream closed: {self.stats}")
@@ -0,0 +1,255 @@
+"""
+Turn Stream Buffer - Resumable chat streams backed by Redis streams
+
+Every chat turn gets a turn id. Its events are appended to a Redis stream
+(chat:turn:{turn_id}:events, one XADD per event, expiring
+settings.stream_resume_ttl_seconds after the last write) by a producer task
+that is not tied to the HTTP response. Responses are readers of that stream:
+the original POST reads it from the start, and a reconnect
+(GET /api/chat/stream/{turn_id} with Last-Event-ID, on any worker) replays
+what comes after that id and then follows the live tail with XREAD BLOCK.
+A dropped connection therefore costs a reconnect, not a regeneration.
+
+Liveness keys, refreshed every LIVENESS_INTERVAL_S:
+- chat:turn:{turn_id}:producer - set by the generating worker; if it expires
+  before the end marker is written the worker died, and readers get an error
+- chat:turn:{turn_id}:reader - set by every attached reader; once no reader
+  has been attached for settings.stream_resume_grace_seconds (or
+  chat:turn:{turn_id}:cancel is set by an explicit stop), the producer is
+  cancelled, which stops generation as in app/agents/cancellation.py
+
+Every Redis call goes through the "redis" circuit breaker
+(app/circuit_breaker.py), shared with the sync client: while it is open, new
+turns stream directly, as they did before this buffer existed, and the
+others fail fast instead of each waiting out a socket timeout.
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import math
+
+from app.circuit_breaker import OPEN, get_circuit_breaker
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+END_EVENT = "stream-end"  # Internal end-of-turn marker, never sent to the client
+LIVENESS_INTERVAL_S = 1.0
+PRODUCER_TTL_S = 5
+READ_BATCH = 500
+
+# Producer tasks outlive their request; keep references so they are not collected
+_producer_tasks: Set[asyncio.Task] = set()
+
+
+def _key(turn_id: str, suffix: str) -> str:
+    return f"chat:turn:{turn_id}:{suffix}"
+
+
+def _entries(response: Any) -> List[Tuple[str, Dict[str, str]]]:
+    """XREAD reply (RESP2 list or RESP3 dict) -> [(entry_id, fields)]"""
+    if not response:
+        return []
+    streams = response.items() if isinstance(response, dict) else response
+    entries = []
+    for _stream, items in streams:
+        if items and isinstance(items[0], list):
+            items = items[0]  # RESP3 wraps the entry list once more
+        entries.extend(items)
+    return entries
+
+
+class TurnStreamBuffer:
+    """Redis-backed event log for one worker's view of chat turns"""
+
+    def __init__(self, client=None):
+        if client is None:
+            from app.redis_client import get_async_redis_client
+            client = get_async_redis_client()
+        self.client = client
+        self.breaker = get_circuit_breaker("redis")
+        self.ttl = settings.stream_resume_ttl_seconds
+        self.grace = max(1, math.ceil(settings.stream_resume_grace_seconds))
+        self.maxlen = settings.stream_resume_max_events
+
+    async def _pipeline(self, *commands: Tuple[str, tuple, dict]) -> List[Any]:
+        """Run (method, args, kwargs) commands in one round trip through the breaker"""
+        async def execute():
+            async with self.client.pipeline(transaction=False) as pipe:
+                for method, args, kwargs in commands:
+                    getattr(pipe, method)(*args, **kwargs)
+                return await pipe.execute()
+        return await self.breaker.acall(execute)
+
+    async def create(self, turn_id: str, user_id: Optional[str], chat_id: Optional[str]) -> None:
+        """Register a turn; the original request counts as an attached reader"""
+        await self._pipeline(
+            ("hset", (_key(turn_id, "meta"),), {"mapping": {"user_id": user_id or "", "chat_id": chat_id or ""}}),
+            ("expire", (_key(turn_id, "meta"), self.ttl), {}),
+            ("set", (_key(turn_id, "reader"), "1"), {"ex": self.grace}),
+            ("set", (_key(turn_id, "producer"), "1"), {"ex": PRODUCER_TTL_S}),
+        )
+
+    async def get_meta(self, turn_id: str) -> Optional[Dict[str, str]]:
+        """Owner and chat of a turn, or None once it has expired"""
+        meta = await self.breaker.acall(self.client.hgetall, _key(turn_id, "meta"))
+        return meta or None
+
+    async def append(self, turn_id: str, event: Dict[str, Any]) -> str:
+        """Append one event; returns its stream id (the SSE event id)"""
+        payload = json.dumps(event, separators=(",", ":"), ensure_ascii=False, default=str)
+        results = await self._pipeline(
+            ("xadd", (_key(turn_id, "events"), {"e": payload}), {"maxlen": self.maxlen, "approximate": True}),
+            ("expire", (_key(turn_id, "events"), self.ttl), {}),
+            ("expire", (_key(turn_id, "meta"), self.ttl), {}),
+        )
+        return results[0]
+
+    async def read(self, turn_id: str, after_id: str, block_ms: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """Events after after_id, waiting up to block_ms for the first one"""
+        response = await self.breaker.acall(
+            self.client.xread, {_key(turn_id, "events"): after_id}, count=READ_BATCH, block=block_ms
+        )
+        return [(entry_id, json.loads(fields["e"])) for entry_id, fields in _entries(response)]
+
+    async def touch_reader(self, turn_id: str) -> None:
+        await self.breaker.acall(self.client.set, _key(turn_id, "reader"), "1", ex=self.grace)
+
+    async def producer_alive(self, turn_id: str) -> bool:
+        return bool(await self.breaker.acall(self.client.exists, _key(turn_id, "producer")))
+
+    async def request_cancel(self, turn_id: str) -> None:
+        """Explicit stop from the client: cancel at the next liveness check"""
+        await self.breaker.acall(self.client.set, _key(turn_id, "cancel"), "1", ex=self.ttl)
+
+    async def heartbeat(self, turn_id: str) -> bool:
+        """Refresh the producer key; False when the turn should be cancelled"""
+        _, has_reader, cancel_requested = await self._pipeline(
+            ("set", (_key(turn_id, "producer"), "1"), {"ex": PRODUCER_TTL_S}),
+            ("exists", (_key(turn_id, "reader"),), {}),
+            ("exists", (_key(turn_id, "cancel"),), {}),
+        )
+        return bool(has_reader) and not cancel_requested
+
+
+_turn_stream_buffer = None
+
+
+def get_turn_stream_buffer() -> Optional[TurnStreamBuffer]:
+    """Get or create the turn stream buffer (None when disabled or the Redis breaker is open)"""
+    global _turn_stream_buffer
+    if not settings.stream_resume_enabled or get_circuit_breaker("redis").state == OPEN:
+        return None
+    if _turn_stream_buffer is None:
+        try:
+            _turn_stream_buffer = TurnStreamBuffer()
+        except Exception as e:
+            logger.warning(f"Turn stream buffer unavailable, streaming directly: {e}")
+            return None
+    return _turn_stream_buffer
+
+
+async def open_turn(turn_id: str, user_id: Optional[str], chat_id: Optional[str]) -> Optional[TurnStreamBuffer]:
+    """
+    Register a new turn and write its turn-id event
+
+    Returns None (stream directly) if Redis cannot be reached; the failure
+    counts towards the "redis" breaker, and once it opens further turns skip
+    the buffer instead of each paying a connection timeout.
+    """
+    buffer = get_turn_stream_buffer()
+    if buffer is None:
+        return None
+    try:
+        await buffer.create(turn_id, user_id, chat_id)
+        await buffer.append(turn_id, {"type": "turn-id", "turnId": turn_id})
+        return buffer
+    except Exception as e:
+        logger.warning(f"Turn stream buffer unavailable, streaming directly: {e}")
+        return None
+
+
+# ---------- producer ----------
+
+async def _watch_readers(buffer: TurnStreamBuffer, turn_id: str, producer: asyncio.Task) -> None:
+    while True:
+        await asyncio.sleep(LIVENESS_INTERVAL_S)
+        try:
+            keep_going = await buffer.heartbeat(turn_id)
+        except Exception as e:
+            logger.warning(f"Turn {turn_id}: liveness check failed: {e}")
+            continue
+        if not keep_going:
+            logger.info(f"Turn {turn_id}: no reader attached (or stop requested), cancelling generation")
+            producer.cancel()
+            return
+
+
+async def _produce(buffer: TurnStreamBuffer, turn_id: str, events: AsyncIterator[Dict[str, Any]]) -> None:
+    watchdog = asyncio.create_task(_watch_readers(buffer, turn_id, asyncio.current_task()))
+    reason = "finished"
+    try:
+        async for event in events:
+            if event.get("type") == "ping":
+                continue  # Readers send their own keep-alives
+            await buffer.append(turn_id, event)
+    except asyncio.CancelledError:
+        reason = "cancelled"
+        raise
+    except Exception as e:
+        # Redis went away mid-turn: nobody can read the rest, so stop generating
+        reason = "error"
+        logger.warning(f"Turn {turn_id}: stream buffer append failed, stopping generation: {e}")
+    finally:
+        watchdog.cancel()
+        try:
+            # Runs the turn's cancellation path (CancelToken, partial-answer save) now, not at garbage collection
+            await asyncio.shield(events.aclose())
+        except (asyncio.CancelledError, Exception) as e:
+            logger.warning(f"Turn {turn_id}: closing the event generator failed: {e!r}")
+        try:
+            await asyncio.shield(buffer.append(turn_id, {"type": END_EVENT, "reason": reason}))
+        except Exception as e:
+            logger.warning(f"Turn {turn_id}: could not write end marker: {e}")
+
+
+def start_producer(buffer: TurnStreamBuffer, turn_id: str, events: AsyncIterator[Dict[str, Any]]) -> asyncio.Task:
+    """Run a turn's event generator in the background, appending to its stream"""
+    task = asyncio.create_task(_produce(buffer, turn_id, events))
+    _producer_tasks.add(task)
+    task.add_done_callback(_producer_tasks.discard)
+    return task
+
+
+# ---------- readers ----------
+
+async def read_turn(
+    buffer: TurnStreamBuffer,
+    turn_id: str,
+    last_event_id: Optional[str] = None
+) -> AsyncIterator[Any]:
+    """
+    Replay a turn after last_event_id, then follow it live
+
+    Yields (event_id, event) pairs for SSEWriter.stream, and stops at the end
+    marker. If the producing worker disappears, yields one error event.
+    """
+    after_id = last_event_id or "0-0"
+    # XREAD BLOCK must return well inside the Redis socket timeout (the breaker's timeout)
+    block_ms = int(min(LIVENESS_INTERVAL_S, settings.circuit_timeouts.get("redis", 1.0) / 2) * 1000)
+    while True:
+        await buffer.touch_reader(turn_id)
+        entries = await buffer.read(turn_id, after_id, block_ms)
+        if not entries:
+            if not await buffer.producer_alive(turn_id):
+                logger.warning(f"Turn {turn_id}: producer gone without an end marker")
+                yield {"type": "error", "error": "The response was interrupted. Please try again."}
+                return
+            continue
+        for entry_id, event in entries:
+            after_id = entry_id
+            if event.get("type") == END_EVENT:
+                return
+            yield entry_id, event
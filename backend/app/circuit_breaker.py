@@ -0,0 +1,388 @@
+"""
+Circuit Breakers - Fast-fail for Chroma, Neo4j, Supabase and Redis
+
+A degraded dependency used to cost every turn its full client timeout: the
+Supabase helpers swallow errors only after the HTTP call gives up, Redis
+waited out 5 s socket timeouts (and retried them), Neo4j and Chroma queries
+had no bound at all. One CircuitBreaker per dependency now sits in front of
+those calls:
+
+- timeout: settings.circuit_timeouts[name]. Calls run on the dependency's
+  own executor and the caller stops waiting at the timeout (a late call
+  finishes on its own; Neo4j queries also carry the timeout server-side).
+  Redis is called inline: its socket timeout is set to the same value in
+  app/redis_client.py, for the sync client and for the async one used by
+  the resumable chat streams (app/api/stream_buffer.py), which share the
+  "redis" breaker. A call that answers but takes longer than the
+  timeout still counts as a failure.
+- bulkhead: each executor has settings.circuit_max_in_flight[name] threads,
+  and a call is rejected at once (BulkheadFullError) while that many calls,
+  late ones included, are still running. A hung dependency can only tie up
+  its own threads; it cannot queue up the other dependencies' calls and
+  trip their breakers too.
+- trip: once settings.circuit_min_calls calls are in the window of the last
+  settings.circuit_window, a failure rate of settings.circuit_failure_rate
+  opens the breaker. Open breakers reject calls immediately
+  (CircuitOpenError) for settings.circuit_open_seconds.
+- half-open: after that, settings.circuit_half_open_probes calls go through
+  as probes; a success closes the breaker, a failure re-opens it.
+
+Each call site picks what happens when the call is rejected or fails:
+
+    breaker.call(fn, *args, degraded="skip", fallback=[])       # return fallback
+    breaker.call(fn, *args, degraded="cache", cache_key=key)    # last good result for key, else raise
+    breaker.call(fn, *args)                                     # "fail": raise
+    await breaker.acall(coro_fn, *args)                         # async clients, same modes
+
+Breaker state, failure rate, calls in flight and counters are in circuit_breaker_snapshot(),
+served by GET /api/admin/circuit-breakers and the admin health payload.
+With settings.circuit_breakers_enabled off, calls go straight through.
+"""
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+import asyncio
+import logging
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCIES = ("chroma", "neo4j", "supabase", "redis")
+# Clients that enforce the timeout themselves (socket timeouts); their calls run inline
+INLINE_DEPENDENCIES = frozenset({"redis"})
+DEGRADED_MODES = ("skip", "cache", "fail")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+class CircuitOpenError(Exception):
+    """A call was rejected because the dependency's breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open (next probe in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class BulkheadFullError(Exception):
+    """A call was rejected because the dependency already has its maximum of calls in flight"""
+
+    def __init__(self, name: str, in_flight: int):
+        super().__init__(f"{name} has {in_flight} calls in flight (bulkhead full)")
+        self.name = name
+        self.in_flight = in_flight
+
+
+class CircuitBreaker:
+    """Failure-rate breaker with half-open probing for one dependency"""
+
+    def __init__(self, name: str, timeout: Optional[float] = None, inline: bool = False, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.name = name
+        self.timeout = timeout
+        self.inline = inline
+        self.max_in_flight = max(1, max_in_flight)
+        self._executor: Optional[ThreadPoolExecutor] = None  # Bulkhead: this dependency's calls only
+        self._in_flight = 0  # Submitted calls not finished yet, timed-out ones included
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=settings.circuit_window)  # True for a failure
+        self._opened_at = 0.0
+        self._probes = 0
+        self._last_good: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.bulkhead_rejected = 0
+        self.trips = 0
+        self.degraded: Dict[str, int] = {}
+        self.last_error: Optional[str] = None
+        self._success_ms = 0.0
+        self._successes = 0
+
+    @property
+    def state(self) -> str:
+        """closed / open / half_open; an open breaker whose cooldown is over reads half_open"""
+        with self._lock:
+            if self._state == OPEN and self._retry_in() <= 0:
+                return HALF_OPEN  # The next call goes through as a probe
+            return self._state
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + settings.circuit_open_seconds - time.monotonic())
+
+    def _open(self, reason: str) -> None:
+        """Trip the breaker (lock held)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self.trips += 1
+        logger.warning(
+            f"⚡ Circuit breaker {self.name} opened ({reason}); "
+            f"fast-failing for {settings.circuit_open_seconds:.0f}s"
+        )
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (takes a probe slot when half-open)"""
+        with self._lock:
+            if self._state == OPEN:
+                if self._retry_in() > 0:
+                    return False
+                self._state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"Circuit breaker {self.name} half-open, probing")
+            if self._state == HALF_OPEN:
+                if self._probes >= settings.circuit_half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self, ms: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self._successes += 1
+            self._success_ms += ms
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"✅ Circuit breaker {self.name} closed after a successful probe")
+            self._outcomes.append(False)
+
+    def record_failure(self, error: BaseException, timed_out: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.timeouts += int(timed_out)
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self._state == HALF_OPEN:
+                self._open("probe failed")
+                return
+            if self._state == OPEN:
+                return  # A call let through before the trip finished late
+            self._outcomes.append(True)
+            failed = sum(self._outcomes)
+            if len(self._outcomes) >= settings.circuit_min_calls and failed / len(self._outcomes) >= settings.circuit_failure_rate:
+                self._open(f"{failed}/{len(self._outcomes)} recent calls failed, last: {self.last_error}")
+
+    def _release_probe(self) -> None:
+        """Give back a half-open probe slot taken by a call that never ran"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def reset(self) -> None:
+        """Close the breaker and forget recent outcomes (admin action)"""
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._probes = 0
+        logger.info(f"Circuit breaker {self.name} reset")
+
+    def _submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        """Run fn on the bulkhead executor; raises BulkheadFullError when every slot is taken"""
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self.bulkhead_rejected += 1
+                raise BulkheadFullError(self.name, self._in_flight)
+            self._in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=f"circuit-{self.name}")
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._call_done)
+        return future
+
+    def _call_done(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _remember(self, cache_key: Hashable, result: Any) -> None:
+        with self._lock:
+            self._last_good[cache_key] = result
+            self._last_good.move_to_end(cache_key)
+            while len(self._last_good) > settings.circuit_cache_size:
+                self._last_good.popitem(last=False)
+
+    def _degrade(self, mode: str, fallback: Any, cache_key: Optional[Hashable], error: Exception) -> Any:
+        """What a call site gets instead of a result it could not have"""
+        if mode == "skip":
+            with self._lock:
+                self.degraded["skip"] = self.degraded.get("skip", 0) + 1
+            if not isinstance(error, (CircuitOpenError, BulkheadFullError)):
+                logger.warning(f"{self.name} call failed, skipping: {error}")
+            return fallback
+        if mode == "cache" and cache_key is not None:
+            with self._lock:
+                found = cache_key in self._last_good
+                if found:
+                    self._last_good.move_to_end(cache_key)
+                    cached = self._last_good[cache_key]
+                    self.degraded["cache"] = self.degraded.get("cache", 0) + 1
+            if found:
+                if not isinstance(error, (CircuitOpenError, BulkheadFullError)):
+                    logger.warning(f"{self.name} call failed, serving the last good result: {error}")
+                return cached
+        with self._lock:
+            self.degraded["fail"] = self.degraded.get("fail", 0) + 1
+        raise error
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        degraded: str = "fail",
+        fallback: Any = None,
+        cache_key: Optional[Hashable] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Call fn through the breaker
+
+        Args:
+            degraded: "skip" returns fallback, "cache" returns the last good
+                result stored under cache_key (raising if there is none),
+                "fail" raises, when the breaker is open or the call fails
+            fallback: Result for "skip"
+            cache_key: Key for "cache" call sites; successful results are stored under it
+        """
+        if not settings.circuit_breakers_enabled:
+            return fn(*args, **kwargs)
+        if not self.allow():
+            with self._lock:
+                self.rejected += 1
+                error = CircuitOpenError(self.name, self._retry_in())
+            return self._degrade(degraded, fallback, cache_key, error)
+
+        start = time.perf_counter()
+        try:
+            if self.inline or self.timeout is None:
+                result = fn(*args, **kwargs)
+            else:
+                future = self._submit(fn, *args, **kwargs)
+                result = future.result(timeout=self.timeout)
+        except BulkheadFullError as e:
+            self._release_probe()
+            return self._degrade(degraded, fallback, cache_key, e)
+        except FutureTimeoutError:
+            error = TimeoutError(f"{self.name} call exceeded {self.timeout}s")
+            self.record_failure(error, timed_out=True)
+            return self._degrade(degraded, fallback, cache_key, error)
+        except Exception as e:
+            self.record_failure(e)
+            return self._degrade(degraded, fallback, cache_key, e)
+
+        return self._finish(start, result, cache_key)
+
+    async def acall(
+        self,
+        fn: Callable[..., Awaitable[Any]],
+        *args: Any,
+        degraded: str = "fail",
+        fallback: Any = None,
+        cache_key: Optional[Hashable] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Await fn(*args, **kwargs) through the breaker (async clients, e.g. redis.asyncio)
+
+        Same breaker, outcomes and degraded modes as call(). Inline
+        dependencies rely on their client's timeout; others are cancelled
+        at the breaker timeout.
+        """
+        if not settings.circuit_breakers_enabled:
+            return await fn(*args, **kwargs)
+        if not self.allow():
+            with self._lock:
+                self.rejected += 1
+                error = CircuitOpenError(self.name, self._retry_in())
+            return self._degrade(degraded, fallback, cache_key, error)
+
+        start = time.perf_counter()
+        try:
+            if self.inline or self.timeout is None:
+                result = await fn(*args, **kwargs)
+            else:
+                result = await asyncio.wait_for(fn(*args, **kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"{self.name} call exceeded {self.timeout}s")
+            self.record_failure(error, timed_out=True)
+            return self._degrade(degraded, fallback, cache_key, error)
+        except asyncio.CancelledError:
+            self._release_probe()  # The caller went away; says nothing about the dependency
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            return self._degrade(degraded, fallback, cache_key, e)
+        return self._finish(start, result, cache_key)
+
+    def _finish(self, start: float, result: Any, cache_key: Optional[Hashable]) -> Any:
+        """Record a call that returned"""
+        elapsed = time.perf_counter() - start
+        if self.timeout is not None and elapsed > self.timeout:
+            # Answered, but too slowly to count as healthy
+            self.record_failure(TimeoutError(f"{self.name} call took {elapsed:.2f}s"), timed_out=True)
+        else:
+            self.record_success(elapsed * 1000)
+        if cache_key is not None:
+            self._remember(cache_key, result)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            window = len(self._outcomes)
+            state = HALF_OPEN if self._state == OPEN and self._retry_in() <= 0 else self._state
+            return {
+                "state": state,
+                "timeout_seconds": self.timeout,
+                "in_flight": self._in_flight,
+                "max_in_flight": None if self.inline else self.max_in_flight,
+                "window_calls": window,
+                "failure_rate": round(sum(self._outcomes) / window, 3) if window else 0.0,
+                "retry_in_seconds": round(self._retry_in(), 1) if state == OPEN else 0.0,
+                "calls": self.calls,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "bulkhead_rejected": self.bulkhead_rejected,
+                "trips": self.trips,
+                "degraded": dict(self.degraded),
+                "cached_results": len(self._last_good),
+                "avg_success_ms": round(self._success_ms / self._successes, 1) if self._successes else 0.0,
+                "last_error": self.last_error,
+            }
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get or create the process-wide breaker for a dependency"""
+    breaker = _circuit_breakers.get(name)
+    if breaker is None:
+        with _circuit_breakers_lock:
+            breaker = _circuit_breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    timeout=settings.circuit_timeouts.get(name),
+                    inline=name in INLINE_DEPENDENCIES,
+                    max_in_flight=settings.circuit_max_in_flight.get(name, DEFAULT_MAX_IN_FLIGHT),
+                )
+                _circuit_breakers[name] = breaker
+    return breaker
+
+
+def circuit_breaker_snapshot() -> Dict[str, Any]:
+    """State and counters of every dependency breaker"""
+    return {
+        "enabled": settings.circuit_breakers_enabled,
+        "breakers": {name: get_circuit_breaker(name).snapshot() for name in DEPENDENCIES},
+    }
@@ -3,7 +3,7 @@ Application configuration using Pydantic Settings
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -44,6 +44,129 @@ class Settings(BaseSettings):
     # E2B
     e2b_api_key: Optional[str] = None
     
+    # GraphRAG (concept graph context alongside vector retrieval)
+    graph_rag_enabled: bool = True
+    graph_lookup_deadline_ms: int = 250  # Per-concept lookup deadline
+    graph_context_token_budget: int = 300  # Max tokens of graph context in the prompt
+
+    # Governor scope check (see app/rag/scope_index.py)
+    scope_index_enabled: bool = True  # Score queries against precomputed course centroids before any vector search
+    scope_accept_similarity: float = 0.75  # Best course similarity at or above this approves without Chroma
+    scope_reject_similarity: float = 0.55  # Below this (and closer to an off-topic exemplar) rejects without Chroma
+    scope_cache_size: int = 4096  # Scores cached per normalised query
+
+    # Chat SSE framing (see app/api/sse.py)
+    sse_coalesce_ms: int = 30  # Max age of buffered text before it is flushed as one frame
+    sse_coalesce_max_chars: int = 1024  # Flush buffered text at this size
+    sse_keepalive_seconds: float = 15.0  # Keep-alive comment after this much silence
+    sse_disconnect_poll_seconds: float = 1.0  # How often to check for a gone client (cancels generation)
+
+    # Generation budgets (see app/agents/generation_budget.py)
+    generation_budget_enabled: bool = True  # Cap answer length/thinking on the model call, per intent
+    generation_budget_headroom: float = 1.25  # First-turn soft budget = expected max chars x this
+    generation_budget_tail_tokens: int = 60  # Extra tokens allowed to finish the sentence at the budget
+
+    # Streaming quality gate (see app/agents/streaming_quality.py)
+    streaming_quality_enabled: bool = True  # Judge tutor/math answers on the stream instead of regenerating after
+    quality_probe_chars: int = 240  # Opening text held back and checked before it is sent
+
+    # Reasoning fast path (see app/agents/reasoning_fast_path.py)
+    reasoning_fast_path_enabled: bool = True  # Classify trivial/obvious turns locally instead of calling the reasoning LLM
+    reasoning_fast_path_threshold: float = 0.85  # Local confidence needed to skip the LLM
+    reasoning_fast_path_sample_rate: float = 0.02  # Share of fast-path turns logged for the offline LLM audit (scripts/audit_reasoning_fast_path.py --samples)
+    reasoning_fast_path_sample_path: str = ""  # Sample log, JSONL (default: logs/reasoning_fast_path_samples.jsonl)
+
+    # Turn deadlines (see app/agents/deadline.py)
+    turn_deadline_enabled: bool = True  # Carry a per-turn deadline in the run state; stages skip/shorten work as it runs out
+    turn_deadline_seconds: float = 30.0  # Time budget per turn
+    deadline_stage_min_seconds: Dict[str, float] = {  # Budget left needed to run each optional stage (JSON in env)
+        "student_history": 24.0,
+        "compaction": 22.0,
+        "graph_context": 12.0,
+        "repair": 12.0,
+        "evaluator_persistence": 1.0,  # Below this, logging/mastery updates run in the background instead
+    }
+    deadline_min_call_timeout_seconds: float = 2.0  # Floor for timeouts derived from the remaining budget
+    student_history_timeout_seconds: float = 2.0  # Cap for the personalization fetch
+    reasoning_timeout_seconds: float = 8.0  # Reasoning LLM call (fixed: it runs first, and is part of its cache key)
+
+    # Tiered graph variants (see app/agents/graph_variants.py)
+    graph_variants_enabled: bool = True  # Run fast/syllabus/greeting turns on shorter compiled graphs, chosen before the run
+
+    # Dependency circuit breakers (see app/circuit_breaker.py)
+    circuit_breakers_enabled: bool = True  # Fast-fail calls to Chroma/Neo4j/Supabase/Redis while they are failing
+    circuit_timeouts: Dict[str, float] = {  # Per-dependency call timeout in seconds; slower calls count as failures (JSON in env)
+        "chroma": 3.0,
+        "neo4j": 2.0,
+        "supabase": 3.0,
+        "redis": 1.0,  # Also the Redis socket timeout
+    }
+    circuit_max_in_flight: Dict[str, int] = {  # Bulkhead: threads / concurrent calls per dependency, late calls included (JSON in env)
+        "chroma": 8,
+        "neo4j": 4,
+        "supabase": 8,
+    }
+    circuit_window: int = 20  # Recent calls the failure rate is computed over
+    circuit_min_calls: int = 5  # Calls in the window before the breaker may trip
+    circuit_failure_rate: float = 0.5  # Failure share that opens the breaker
+    circuit_open_seconds: float = 30.0  # Fast-fail this long before letting a probe call through
+    circuit_half_open_probes: int = 1  # Concurrent probe calls while half-open
+    circuit_cache_size: int = 256  # Last good results kept per breaker for "cache" call sites
+
+    # Agent worker processes (see app/agents/worker_pool.py)
+    agent_execution_mode: str = "in_process"  # "in_process", or "process_pool": stream turns from warm worker processes
+    agent_worker_processes: int = 0  # Worker processes in the pool (0 = one per CPU core)
+    agent_worker_max_turns: int = 8  # Concurrent turns per worker process
+    agent_worker_admission_timeout_seconds: float = 10.0  # Wait this long for a free turn slot before reporting busy
+    agent_worker_event_window: int = 256  # Events a turn may run ahead of the API process reading them
+
+    # Agent tool steps (see app/agents/tools.py)
+    tool_max_calls_per_step: int = 4  # Tool calls run per model step; extra calls get a "not run" error result
+    tool_executor_threads: int = 8  # Threads for the blocking tool backends (Chroma), shared by all turns
+
+    # Locally trained intent classifier (see app/agents/intent_classifier.py)
+    intent_classifier_enabled: bool = True  # Route with the trained model when one is active; LLM is the fallback
+    intent_classifier_dir: str = ""  # Model directory (default: cleaned_data/models/intent_classifier)
+    intent_classifier_threshold: float = 0.9  # Probability needed to skip the LLM classifier
+
+    # Exact-prompt cache for internal LLM calls (see app/agents/llm_cache.py)
+    llm_cache_enabled: bool = True  # Reuse results of reasoning/classification/compaction calls with identical prompts
+    llm_cache_ttl_seconds: int = 86400  # How long a cached result is reused
+    llm_cache_max_entries: int = 20000  # Per namespace; oldest entries are evicted beyond this
+    llm_cache_max_entry_bytes: int = 65536  # Larger results are not cached
+
+    # Cheap-first model cascade (see app/agents/model_cascade.py)
+    model_cascade_enabled: bool = True  # Start on a cheap tier, escalate to the routed model on quality failure
+    model_cascade_tiers: Dict[str, List[str]] = {  # Cheap tiers per intent, cheapest first (JSON in env)
+        "fast": ["groq-llama-8b", "gemini-2.5-flash-lite"],
+        "syllabus_query": ["gemini-2.5-flash-lite"],
+        "explain": ["gemini-2.5-flash-lite"],
+        "tutor": ["gemini-2.5-flash-lite"],
+    }
+    model_cascade_min_success_rate: float = 0.7  # Skip a cheap tier whose recorded success rate is below this
+    model_cascade_min_samples: int = 20  # Attempts before a tier's success rate is trusted
+    model_cascade_explore_rate: float = 0.1  # Share of turns that still try a skipped tier
+
+    # Latency-aware routing (see app/agents/model_routing.py)
+    adaptive_routing_enabled: bool = True  # Route to the fastest allowed model; admin API can override at runtime
+    model_routing_candidates: Dict[str, List[str]] = {  # Models each intent may be routed to besides its static one
+        "coder": ["groq-llama-70b", "gemini-flash", "gpt-4.1-mini"],
+        "explain": ["gemini-2.5-flash", "gpt-4.1-mini", "groq-llama-70b"],
+        "fast": ["gemini-flash", "groq-llama-70b", "gpt-4.1-mini"],
+        "syllabus_query": ["gemini-flash", "groq-llama-70b"],
+    }
+    model_routing_max_cost_per_mtok: float = 3.0  # Cost ceiling (USD per 1M output tokens) for switching models
+    model_routing_window_seconds: int = 900  # Latency samples older than this are ignored
+    model_routing_max_samples: int = 200  # Latency samples kept per model
+    model_routing_min_samples: int = 10  # Samples before a model's latency is trusted
+    model_routing_explore_rate: float = 0.05  # Share of turns routed to an unmeasured allowed model
+
+    # Resumable chat streams (see app/api/stream_buffer.py)
+    stream_resume_enabled: bool = True  # Buffer each turn's events in a Redis stream so clients can reconnect
+    stream_resume_ttl_seconds: int = 300  # How long a finished turn can still be replayed
+    stream_resume_grace_seconds: float = 20.0  # Keep generating this long with no reader before cancelling
+    stream_resume_max_events: int = 5000  # Approximate MAXLEN per turn stream
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
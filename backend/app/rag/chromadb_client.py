@@ -4,8 +4,11 @@ ChromaDB client for vector storage
 
 import chromadb
 from chromadb.config import Settings
+from collections import OrderedDict
 from typing import List, Dict, Optional
 import logging
+import threading
+from app.circuit_breaker import get_circuit_breaker
 from app.config import settings
 
 from app.rag.embeddings import get_embedding_generator
@@ -15,8 +18,12 @@ logger = logging.getLogger(__name__)
 
 class ChromaEmbeddingWrapper:
     """Wrapper to make LangChain embeddings compatible with ChromaDB"""
+    QUERY_MEMO_SIZE = 256  # Recent query embeddings, shared by the Governor scope check and retrieval
+
     def __init__(self, langchain_embeddings):
         self.langchain_embeddings = langchain_embeddings
+        self._query_memo: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
         
     def __call__(self, input: List[str]) -> List[List[float]]:
         # logger.info(f"Embedding input type: {type(input)}")
@@ -27,7 +34,17 @@ class ChromaEmbeddingWrapper:
     def embed_query(self, input: str) -> List[float]:
         if isinstance(input, list):
             return self.langchain_embeddings.embed_documents(input)
-        return self.langchain_embeddings.embed_query(input)
+        with self._memo_lock:
+            embedding = self._query_memo.get(input)
+            if embedding is not None:
+                self._query_memo.move_to_end(input)
+                return embedding
+        embedding = self.langchain_embeddings.embed_query(input)
+        with self._memo_lock:
+            self._query_memo[input] = embedding
+            if len(self._query_memo) > self.QUERY_MEMO_SIZE:
+                self._query_memo.popitem(last=False)
+        return embedding
         
     def embed_documents(self, input: List[str]) -> List[List[float]]:
         return self.langchain_embeddings.embed_documents(input)
@@ -46,8 +63,8 @@ class ChromaDBClient:
                 port=settings.chromadb_port,
                 settings=Settings(anonymized_telemetry=False)
             )
-            # Test connection
-            self.client.heartbeat()
+            # Test connection (bounded by the chroma breaker's timeout)
+            get_circuit_breaker("chroma").call(self.client.heartbeat)
             logger.info(f"Connected to ChromaDB HTTP server at {settings.chromadb_host}:{settings.chromadb_port}")
         except Exception as e:
             logger.warning(f"Could not connect to ChromaDB HTTP server: {e}. Falling back to PersistentClient.")
@@ -131,7 +148,8 @@ class ChromaDBClient:
             Dictionary with ids, documents, metadatas, distances
         """
         try:
-            results = self.collection.query(
+            results = get_circuit_breaker("chroma").call(
+                self.collection.query,
                 query_texts=query_texts,
                 n_results=n_results,
                 where=where
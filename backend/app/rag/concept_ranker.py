@@ -0,0 +1,206 @@
+"""
+Concept Ranker - Personalized PageRank over the concept graph
+
+Ranks related and next topics for a set of seed concepts (the concepts
+detected in the query), weighted by the student's mastery vector.
+
+Two walks are precomputed per graph:
+- "related": undirected walk over every concept edge
+- "next":    directed walk along prerequisite -> follow-up edges
+
+For a restart probability alpha and column-stochastic transition matrix P,
+personalized PageRank with dangling mass returned to the seeds is
+    r ∝ (I - (1 - alpha) P)^-1 s
+so for the small course graph the inverse is precomputed once and ranking
+is a single matrix product. Seeds for many queries/students are stacked as
+columns of S and scored together (rank_batch). Larger graphs fall back to
+power iteration on the sparse P.
+
+Mastery weighting: scores are discounted by (1 - mastery_discount * mastery),
+so well-mastered concepts sink and unexplored ones rise.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+DEFAULT_ALPHA = 0.15  # Restart probability
+DEFAULT_MASTERY_DISCOUNT = 0.7
+DENSE_SOLVE_MAX_NODES = 2000  # Precompute the PPR operator up to this size
+POWER_ITERATIONS = 50
+POWER_TOLERANCE = 1e-8
+
+
+class ConceptRanker:
+    """
+    Personalized PageRank ranking over a fixed concept graph
+
+    Usage:
+        ranker = ConceptRanker(["a", "b", "c"], [("a", "b"), ("b", "c")])
+        ranker.rank(["a"], mastery={"b": 0.9}, k=2, mode="next")
+    """
+
+    MODES = ("related", "next")
+
+    def __init__(
+        self,
+        concept_ids: Sequence[str],
+        edges: Iterable[Tuple[str, str]],
+        alpha: float = DEFAULT_ALPHA,
+        mastery_discount: float = DEFAULT_MASTERY_DISCOUNT
+    ):
+        """
+        Args:
+            concept_ids: All concept node ids
+            edges: Directed (source, target) edges, prerequisite -> follow-up
+                or parent -> subtopic. Edges to unknown ids are ignored.
+            alpha: Restart probability of the walk
+            mastery_discount: How strongly mastery pushes a concept down (0-1)
+        """
+        self.concept_ids: List[str] = list(dict.fromkeys(concept_ids))
+        self.index: Dict[str, int] = {c: i for i, c in enumerate(self.concept_ids)}
+        self.alpha = alpha
+        self.mastery_discount = mastery_discount
+
+        n = len(self.concept_ids)
+        pairs = {
+            (self.index[s], self.index[t])
+            for s, t in edges
+            if s in self.index and t in self.index and s != t
+        }
+        src = np.array([p[0] for p in pairs], dtype=np.int64)
+        dst = np.array([p[1] for p in pairs], dtype=np.int64)
+
+        # Forward walk follows edges; related walk ignores direction
+        self._transitions = {
+            "next": self._transition_matrix(n, src, dst),
+            "related": self._transition_matrix(n, np.concatenate([src, dst]), np.concatenate([dst, src])),
+        }
+        # Precomputed PPR operators (dense) for small graphs
+        self._operators: Dict[str, Optional[np.ndarray]] = {
+            mode: self._ppr_operator(P) if n <= DENSE_SOLVE_MAX_NODES else None
+            for mode, P in self._transitions.items()
+        }
+
+    @staticmethod
+    def _transition_matrix(n: int, src: np.ndarray, dst: np.ndarray):
+        """Column-stochastic P with P[dst, src] = 1 / outdegree(src); dangling columns stay zero"""
+        outdeg = np.bincount(src, minlength=n).astype(np.float64) if n else np.zeros(0)
+        weights = 1.0 / outdeg[src] if len(src) else np.zeros(0)
+        if SCIPY_AVAILABLE:
+            return sparse.csr_matrix((weights, (dst, src)), shape=(n, n))
+        P = np.zeros((n, n), dtype=np.float64)
+        np.add.at(P, (dst, src), weights)
+        return P
+
+    def _ppr_operator(self, P) -> np.ndarray:
+        """(I - (1 - alpha) P)^-1, so PPR for seed columns S is this @ S (up to column scale)"""
+        n = len(self.concept_ids)
+        dense = P.toarray() if SCIPY_AVAILABLE else P
+        return np.linalg.inv(np.eye(n) - (1.0 - self.alpha) * dense)
+
+    # ---------- scoring ----------
+
+    def _seed_matrix(self, seed_lists: Sequence[Sequence[str]]) -> np.ndarray:
+        S = np.zeros((len(self.concept_ids), len(seed_lists)), dtype=np.float64)
+        for col, seeds in enumerate(seed_lists):
+            idx = [self.index[s] for s in seeds if s in self.index]
+            if idx:
+                S[idx, col] = 1.0 / len(idx)
+        return S
+
+    def _mastery_matrix(self, mastery_list: Sequence[Optional[Dict[str, float]]]) -> np.ndarray:
+        M = np.zeros((len(self.concept_ids), len(mastery_list)), dtype=np.float64)
+        for col, mastery in enumerate(mastery_list):
+            for concept, score in (mastery or {}).items():
+                i = self.index.get(concept)
+                if i is not None:
+                    M[i, col] = min(1.0, max(0.0, float(score)))
+        return M
+
+    def _personalized_pagerank(self, S: np.ndarray, mode: str) -> np.ndarray:
+        """PPR scores for every seed column of S (columns sum to 1, or 0 for empty seeds)"""
+        operator = self._operators[mode]
+        if operator is not None:
+            R = operator @ S
+        else:
+            # Power iteration; dangling mass returns to the seeds
+            P = self._transitions[mode]
+            R = S.copy()
+            for _ in range(POWER_ITERATIONS):
+                walked = P @ R
+                dangling = 1.0 - walked.sum(axis=0)
+                R_next = self.alpha * S + (1.0 - self.alpha) * (walked + S * dangling)
+                if np.abs(R_next - R).sum() < POWER_TOLERANCE:
+                    R = R_next
+                    break
+                R = R_next
+        totals = R.sum(axis=0)
+        totals[totals == 0] = 1.0
+        return R / totals
+
+    def score_batch(
+        self,
+        seed_lists: Sequence[Sequence[str]],
+        mastery_list: Optional[Sequence[Optional[Dict[str, float]]]] = None,
+        mode: str = "related"
+    ) -> np.ndarray:
+        """
+        Mastery-weighted PPR scores, one column per (seeds, mastery) pair
+
+        Returns:
+            (num_concepts, batch) array; seed concepts themselves score 0
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown ranking mode: {mode}")
+        if mastery_list is None:
+            mastery_list = [None] * len(seed_lists)
+
+        S = self._seed_matrix(seed_lists)
+        R = self._personalized_pagerank(S, mode)
+        R *= 1.0 - self.mastery_discount * self._mastery_matrix(mastery_list)
+        R[S > 0] = 0.0
+        return R
+
+    def rank_batch(
+        self,
+        seed_lists: Sequence[Sequence[str]],
+        mastery_list: Optional[Sequence[Optional[Dict[str, float]]]] = None,
+        k: int = 5,
+        mode: str = "related"
+    ) -> List[List[Tuple[str, float]]]:
+        """Top-k (concept_id, score) per seed list, highest first; zero scores dropped"""
+        if not self.concept_ids or not seed_lists:
+            return [[] for _ in seed_lists]
+
+        R = self.score_batch(seed_lists, mastery_list, mode)
+        k = min(k, len(self.concept_ids))
+        results = []
+        for col in range(R.shape[1]):
+            scores = R[:, col]
+            if k <= 0:
+                results.append([])
+                continue
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(self.concept_ids[i], float(scores[i])) for i in top if scores[i] > 0])
+        return results
+
+    def rank(
+        self,
+        seeds: Sequence[str],
+        mastery: Optional[Dict[str, float]] = None,
+        k: int = 5,
+        mode: str = "related"
+    ) -> List[Tuple[str, float]]:
+        """Top-k (concept_id, score) for one seed set"""
+        return self.rank_batch([list(seeds)], [mastery], k=k, mode=mode)[0]
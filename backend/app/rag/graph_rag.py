@@ -12,10 +12,14 @@ Based on research showing 35% improvement in RAG accuracy with hybrid approach.
 import os
 import json
 import logging
+import threading
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from dataclasses import dataclass
 
+from app.circuit_breaker import get_circuit_breaker
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
 # Neo4j settings
@@ -25,7 +29,7 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "luminate_graph_pass")
 
 # Try to import neo4j, fall back to in-memory graph if not available
 try:
-    from neo4j import GraphDatabase
+    from neo4j import GraphDatabase, Query
     NEO4J_AVAILABLE = True
 except ImportError:
     NEO4J_AVAILABLE = False
@@ -64,7 +68,12 @@ class Neo4jGraphService:
             
             for attempt in range(max_retries):
                 try:
-                    self.driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+                    self.driver = GraphDatabase.driver(
+                        NEO4J_URI,
+                        auth=(NEO4J_USER, NEO4J_PASSWORD),
+                        connection_timeout=settings.circuit_timeouts.get("neo4j", 2.0),
+                        connection_acquisition_timeout=settings.circuit_timeouts.get("neo4j", 2.0),
+                    )
                     # Test connection
                     with self.driver.session() as session:
                         session.run("RETURN 1")
@@ -78,6 +87,11 @@ class Neo4jGraphService:
                         logger.warning(f"Neo4j connection failed after {max_retries} attempts: {e}. Using in-memory fallback.")
                         self.driver = None
     
+    @staticmethod
+    def _query(cypher: str) -> "Query":
+        """Cypher with a server-side transaction timeout, so a query the breaker gave up on does not run on"""
+        return Query(cypher, timeout=settings.circuit_timeouts.get("neo4j", 2.0))
+    
     def close(self):
         if self.driver:
             self.driver.close()
@@ -129,9 +143,9 @@ class Neo4jGraphService:
         if not self.driver:
             return {}
         
-        try:
+        def run() -> Dict:
             with self.driver.session() as session:
-                result = session.run("""
+                result = session.run(self._query("""
                     MATCH (c:Concept {id: $id})
                     OPTIONAL MATCH (c)-[:HAS_SUBTOPIC]->(child:Concept)
                     OPTIONAL MATCH (prereq:Concept)-[:PREREQUISITE_FOR]->(c)
@@ -140,7 +154,7 @@ class Neo4jGraphService:
                            collect(DISTINCT child.id) as children,
                            collect(DISTINCT prereq.id) as prerequisites,
                            collect(DISTINCT next.id) as leads_to
-                """, id=concept_id)
+                """), id=concept_id)
                 
                 record = result.single()
                 if record:
@@ -153,159 +167,197 @@ class Neo4jGraphService:
                         "leads_to": [l for l in record["leads_to"] if l]
                     }
                 return {}
-        except Exception as e:
-            logger.error(f"Neo4j query failed: {e}")
-            return {}
+        
+        return get_circuit_breaker("neo4j").call(run, degraded="skip", fallback={})
     
     def find_learning_path(self, from_concept: str, to_concept: str, max_depth: int = 5) -> List[str]:
         """Find shortest learning path between concepts"""
         if not self.driver:
             return []
         
-        try:
+        def run() -> List[str]:
             with self.driver.session() as session:
-                result = session.run("""
+                result = session.run(self._query("""
                     MATCH path = shortestPath(
                         (start:Concept {id: $from})-[:PREREQUISITE_FOR|HAS_SUBTOPIC*..%d]->(end:Concept {id: $to})
                     )
                     RETURN [n in nodes(path) | n.id] as path
-                """ % max_depth, from_concept=from_concept, to=to_concept)
+                """ % max_depth), from_concept=from_concept, to=to_concept)
                 
                 record = result.single()
                 if record:
                     return record["path"]
                 return []
-        except Exception as e:
-            logger.error(f"Learning path query failed: {e}")
-            return []
+        
+        return get_circuit_breaker("neo4j").call(run, degraded="skip", fallback=[])
     
-    def get_related_concepts(self, concept_id: str, limit: int = 5) -> List[str]:
-        """Get concepts related to the given concept"""
+    def get_related_concepts(
+        self,
+        concept_id: str,
+        limit: int = 5,
+        mastery_scores: Optional[Dict[str, float]] = None
+    ) -> List[str]:
+        """Get concepts related to the given concept (within 2 hops; mastery_scores not applied)"""
         if not self.driver:
             return []
         
-        try:
+        def run() -> List[str]:
             with self.driver.session() as session:
-                result = session.run("""
+                result = session.run(self._query("""
                     MATCH (c:Concept {id: $id})-[:HAS_SUBTOPIC|PREREQUISITE_FOR*1..2]-(related:Concept)
                     WHERE related.id <> $id
                     RETURN DISTINCT related.id as id, related.label as label
                     LIMIT $limit
-                """, id=concept_id, limit=limit)
+                """), id=concept_id, limit=limit)
                 
                 return [record["id"] for record in result]
-        except Exception as e:
-            logger.error(f"Related concepts query failed: {e}")
-            return []
+        
+        return get_circuit_breaker("neo4j").call(run, degraded="skip", fallback=[])
 
 
 class InMemoryGraphService:
-    """In-memory fallback for when Neo4j is not available"""
+    """
+    In-memory fallback for when Neo4j is not available
+    
+    Backed by a ConceptGraphSnapshot: the binary snapshot written at ingest
+    time is memory-mapped read-only (pages shared across workers); if there
+    is no snapshot, it is built from concept_graph.json instead. Nothing is
+    loaded until the graph is first queried.
+    """
     
     def __init__(self):
-        self.nodes: Dict[str, ConceptNode] = {}
-        self.edges: List[Dict] = []
-        self._load_from_file()
+        self._graph = None
+        self._ranker = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+    
+    def _ensure_loaded(self):
+        """Load the graph on first use (snapshot first, JSON fallback)"""
+        if self._loaded:
+            return self._graph
+        with self._load_lock:
+            if not self._loaded:
+                self._graph = self._load_graph()
+                self._ranker = self._build_ranker(self._graph)
+                self._loaded = True
+        return self._graph
+    
+    @staticmethod
+    def _build_ranker(graph):
+        """Precompute the personalized PageRank ranker over concept-to-concept edges"""
+        if graph is None:
+            return None
+        try:
+            from app.rag.concept_ranker import ConceptRanker
+            edges = []
+            for edge_type in ("HAS_SUBTOPIC", "PREREQUISITE_FOR"):
+                edges.extend(
+                    (graph.string(s), graph.string(t)) for s, t in graph.edges(edge_type)
+                )
+            return ConceptRanker(graph.node_ids(), edges)
+        except Exception as e:
+            logger.warning(f"Could not build concept ranker: {e}")
+            return None
     
-    def _load_from_file(self):
-        """Load concept graph from JSON file"""
-        graph_path = Path(__file__).parent.parent.parent / "cleaned_data" / "processed" / "concept_graph.json"
-        if not graph_path.exists():
-            logger.warning(f"Concept graph not found at {graph_path}")
-            return
+    def _load_graph(self):
+        """Open the binary snapshot, or build one in memory from concept_graph.json"""
+        try:
+            from app.rag.graph_snapshot import ConceptGraphSnapshot, SNAPSHOT_DIR, GRAPH_JSON_PATH
+        except ImportError as e:
+            logger.warning(f"Concept graph snapshot support unavailable ({e}). In-memory graph disabled.")
+            return None
+        
+        if ConceptGraphSnapshot.is_stale():
+            logger.warning("Concept graph snapshot is older than concept_graph.json; rebuild with `python -m app.rag.graph_snapshot`")
+        else:
+            graph = ConceptGraphSnapshot.open(SNAPSHOT_DIR)
+            if graph is not None:
+                logger.info(f"✅ Memory-mapped concept graph snapshot ({graph.num_nodes} concepts)")
+                return graph
+        
+        if not GRAPH_JSON_PATH.exists():
+            logger.warning(f"Concept graph not found at {GRAPH_JSON_PATH}")
+            return None
         
         try:
-            with open(graph_path, 'r') as f:
+            with open(GRAPH_JSON_PATH, 'r') as f:
                 data = json.load(f)
-            
-            for node in data.get("nodes", []):
-                hierarchy = node.get("hierarchy_info", {})
-                self.nodes[node["id"]] = ConceptNode(
-                    id=node["id"],
-                    label=node["label"],
-                    document_count=node.get("document_count", 0),
-                    children=hierarchy.get("children", []),
-                    prerequisites=hierarchy.get("prerequisites", [])
-                )
-            
-            self.edges = data.get("edges", [])
-            logger.info(f"✅ Loaded {len(self.nodes)} concepts from in-memory graph")
+            graph = ConceptGraphSnapshot.from_graph_data(data)
+            logger.info(f"✅ Loaded {graph.num_nodes} concepts from in-memory graph")
+            return graph
         except Exception as e:
             logger.error(f"Failed to load concept graph: {e}")
+            return None
     
     def is_available(self) -> bool:
-        return len(self.nodes) > 0
+        graph = self._ensure_loaded()
+        return graph is not None and graph.num_nodes > 0
     
     def get_concept_context(self, concept_id: str) -> Dict:
         """Get concept with relationships"""
-        if concept_id not in self.nodes:
+        graph = self._ensure_loaded()
+        node = graph.node_index(concept_id) if graph else None
+        if node is None:
             return {}
         
-        node = self.nodes[concept_id]
-        leads_to = [e["target"] for e in self.edges 
-                    if e["source"] == concept_id and e["type"] == "PREREQUISITE_FOR"]
+        concept_idx = graph.string_index(concept_id)
+        leads_to = [graph.string(t) for t in graph.targets(concept_idx, ["PREREQUISITE_FOR"])]
         
         return {
-            "id": node.id,
-            "label": node.label,
-            "document_count": node.document_count,
-            "children": node.children,
-            "prerequisites": node.prerequisites,
+            "id": concept_id,
+            "label": graph.node_label(node),
+            "document_count": graph.node_doc_count(node),
+            "children": graph.node_children(node),
+            "prerequisites": graph.node_prerequisites(node),
             "leads_to": leads_to
         }
     
     def find_learning_path(self, from_concept: str, to_concept: str, max_depth: int = 5) -> List[str]:
         """Simple BFS to find learning path"""
-        if from_concept not in self.nodes or to_concept not in self.nodes:
+        graph = self._ensure_loaded()
+        if not graph or graph.node_index(from_concept) is None or graph.node_index(to_concept) is None:
             return []
         
-        # Build adjacency list
-        adj = {}
-        for edge in self.edges:
-            if edge["type"] in ["PREREQUISITE_FOR", "HAS_SUBTOPIC"]:
-                if edge["source"] not in adj:
-                    adj[edge["source"]] = []
-                adj[edge["source"]].append(edge["target"])
+        start = graph.string_index(from_concept)
+        goal = graph.string_index(to_concept)
+        edge_types = ["PREREQUISITE_FOR", "HAS_SUBTOPIC"]
         
-        # BFS
-        visited = {from_concept}
-        queue = [(from_concept, [from_concept])]
+        # BFS over string indices
+        visited = {start}
+        queue = [(start, [start])]
         
         while queue:
             current, path = queue.pop(0)
-            if current == to_concept:
-                return path
+            if current == goal:
+                return [graph.string(i) for i in path]
             if len(path) >= max_depth:
                 continue
             
-            for neighbor in adj.get(current, []):
+            for neighbor in graph.targets(current, edge_types):
                 if neighbor not in visited:
                     visited.add(neighbor)
                     queue.append((neighbor, path + [neighbor]))
         
         return []
     
-    def get_related_concepts(self, concept_id: str, limit: int = 5) -> List[str]:
-        """Get related concepts"""
-        if concept_id not in self.nodes:
-            return []
-        
-        related = set()
-        node = self.nodes[concept_id]
-        
-        # Add children and prerequisites
-        related.update(node.children)
-        related.update(node.prerequisites)
+    def get_related_concepts(
+        self,
+        concept_id: str,
+        limit: int = 5,
+        mastery_scores: Optional[Dict[str, float]] = None
+    ) -> List[str]:
+        """
+        Get related concepts, ranked by personalized PageRank
         
-        # Add concepts this one leads to
-        for edge in self.edges:
-            if edge["source"] == concept_id:
-                related.add(edge["target"])
-            if edge["target"] == concept_id:
-                related.add(edge["source"])
+        Seeded by concept_id; concepts the student has already mastered
+        (mastery_scores) are ranked lower.
+        """
+        graph = self._ensure_loaded()
+        if graph is None or graph.node_index(concept_id) is None or self._ranker is None:
+            return []
         
-        related.discard(concept_id)
-        return list(related)[:limit]
+        ranked = self._ranker.rank([concept_id], mastery=mastery_scores, k=limit, mode="related")
+        return [related_id for related_id, _ in ranked]
 
 
 class GraphRAGService:
@@ -318,48 +370,97 @@ class GraphRAGService:
     """
     
     def __init__(self):
-        # Try Neo4j first, fall back to in-memory
+        # Try Neo4j first, fall back to in-memory (loaded lazily, only if queried)
         self.neo4j = Neo4jGraphService()
         self.in_memory = InMemoryGraphService()
         
         self.graph_service = self.neo4j if self.neo4j.is_available() else self.in_memory
+        self._breaker = get_circuit_breaker("neo4j")
         logger.info(f"GraphRAG using: {'Neo4j' if self.neo4j.is_available() else 'In-memory graph'}")
     
-    def get_graph_context(self, concepts: List[str]) -> Dict:
-        """Get knowledge graph context for detected concepts"""
+    def _graph(self):
+        """The graph to query: the in-memory copy while the Neo4j circuit breaker is open"""
+        if self.graph_service is self.neo4j and self._breaker.state == "open":
+            return self.in_memory
+        return self.graph_service
+    
+    def get_concept_graph_context(
+        self,
+        concept_id: str,
+        mastery_scores: Optional[Dict[str, float]] = None
+    ) -> Dict:
+        """
+        Get graph context for a single concept (one lookup)
+        
+        Returns the concept data with its related concepts attached under
+        "related" (ranked for the student when mastery_scores is given),
+        or {} if the concept is not in the graph.
+        """
+        graph_service = self._graph()
+        concept_data = graph_service.get_concept_context(concept_id)
+        if concept_data:
+            concept_data["related"] = graph_service.get_related_concepts(
+                concept_id, mastery_scores=mastery_scores
+            )
+        return concept_data
+    
+    @staticmethod
+    def merge_concept_contexts(concept_contexts: List[Dict]) -> Dict:
+        """Merge per-concept lookups into a single graph context (order-preserving, deduplicated)"""
         context = {
             "concepts": [],
-            "prerequisites": set(),
-            "next_topics": set(),
-            "related": set()
+            "prerequisites": {},
+            "next_topics": {},
+            "related": {}
         }
         
-        for concept_id in concepts:
-            concept_data = self.graph_service.get_concept_context(concept_id)
+        # Dicts as ordered sets so ranked related concepts keep their order
+        for concept_data in concept_contexts:
             if concept_data:
                 context["concepts"].append(concept_data)
-                context["prerequisites"].update(concept_data.get("prerequisites", []))
-                context["next_topics"].update(concept_data.get("leads_to", []))
-                context["related"].update(self.graph_service.get_related_concepts(concept_id))
+                context["prerequisites"].update(dict.fromkeys(concept_data.get("prerequisites", [])))
+                context["next_topics"].update(dict.fromkeys(concept_data.get("leads_to", [])))
+                context["related"].update(dict.fromkeys(concept_data.get("related", [])))
         
-        # Convert sets to lists
+        # Convert to lists
         context["prerequisites"] = list(context["prerequisites"])
         context["next_topics"] = list(context["next_topics"])
         context["related"] = list(context["related"])
         
         return context
     
+    def get_graph_context(
+        self,
+        concepts: List[str],
+        mastery_scores: Optional[Dict[str, float]] = None
+    ) -> Dict:
+        """Get knowledge graph context for detected concepts"""
+        return self.merge_concept_contexts(
+            [self.get_concept_graph_context(concept_id, mastery_scores) for concept_id in concepts]
+        )
+    
     def get_learning_path(self, from_concept: str, to_concept: str) -> List[str]:
         """Find optimal learning path between concepts"""
-        return self.graph_service.find_learning_path(from_concept, to_concept)
+        return self._graph().find_learning_path(from_concept, to_concept)
     
     def build_combined_context(
         self, 
         vector_results: List[Dict],
         graph_context: Dict,
-        query: str
+        query: str,
+        max_tokens: Optional[int] = None
     ) -> str:
-        """Build combined context string for LLM"""
+        """
+        Build combined context string for LLM
+        
+        Args:
+            vector_results: Results from ChromaDB vector search
+            graph_context: Output of get_graph_context()
+            query: User's question
+            max_tokens: Optional token budget (~4 chars/token). Sections are
+                added in priority order and the first one that does not fit
+                is cut at a line boundary; nothing after it is added.
+        """
         parts = []
         
         # Add vector search results
@@ -390,7 +491,19 @@ class GraphRAGService:
             for topic in graph_context["next_topics"][:3]:
                 parts.append(f"- {topic}")
         
-        return "\n".join(parts)
+        if max_tokens is None:
+            return "\n".join(parts)
+        
+        max_chars = max_tokens * 4
+        kept = []
+        used = 0
+        for part in parts:
+            cost = len(part) + 1
+            if used + cost > max_chars:
+                break
+            kept.append(part)
+            used += cost
+        return "\n".join(kept)
     
     def query(
         self,
@@ -436,13 +549,16 @@ class GraphRAGService:
 
 # Singleton instance
 _graph_rag_service: Optional[GraphRAGService] = None
+_graph_rag_lock = threading.Lock()
 
 
 def get_graph_rag_service() -> GraphRAGService:
-    """Get or create GraphRAG service singleton"""
+    """Get or create GraphRAG service singleton (safe to call from worker threads)"""
     global _graph_rag_service
     if _graph_rag_service is None:
-        _graph_rag_service = GraphRAGService()
+        with _graph_rag_lock:
+            if _graph_rag_service is None:
+                _graph_rag_service = GraphRAGService()
     return _graph_rag_service
 
 
@@ -0,0 +1,303 @@
+"""
+Concept Graph Snapshot - Compact binary form of concept_graph.json
+
+The JSON concept graph is parsed into Python objects in every uvicorn worker.
+This module writes it once, at ingest time, as a directory of NumPy arrays
+that workers memory-map read-only, so the pages are shared by the OS page
+cache across processes and "loading" is just an mmap.
+
+Layout (concept_graph.snapshot/):
+    strings.npy           uint8   UTF-8 bytes of every interned string
+    string_offsets.npy    int64   (S+1,) start offset of string i; i+1 is its end
+    node_ids.npy          int32   (N,) string index of each node id
+    node_labels.npy       int32   (N,) string index of each node label
+    doc_counts.npy        int32   (N,) document count per node
+    children_indptr.npy   int32   (N+1,) CSR row pointers into children.npy
+    children.npy          int32   string indices of hierarchy children
+    prereqs_indptr.npy    int32   (N+1,) CSR row pointers into prereqs.npy
+    prereqs.npy           int32   string indices of hierarchy prerequisites
+    edges_<TYPE>.npy      int32   (M, 2) [source, target] string indices per edge type
+    manifest.json         written last; a snapshot without it is ignored
+
+Usage:
+    python -m app.rag.graph_snapshot   # Rebuild snapshot from concept_graph.json
+"""
+
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+GRAPH_JSON_PATH = Path(__file__).parent.parent.parent / "cleaned_data" / "processed" / "concept_graph.json"
+SNAPSHOT_DIR = GRAPH_JSON_PATH.parent / "concept_graph.snapshot"
+MANIFEST_FILE = "manifest.json"
+
+
+class _StringInterner:
+    """Assigns a stable integer to every distinct string"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, value: str) -> int:
+        value = str(value)
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            self.index[value] = idx
+            self.strings.append(value)
+        return idx
+
+    def to_arrays(self):
+        encoded = [s.encode("utf-8") for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(b) for b in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+        return blob, offsets
+
+
+def _csr(rows: List[List[int]]):
+    indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    if rows:
+        indptr[1:] = np.cumsum([len(r) for r in rows])
+    flat = [i for r in rows for i in r]
+    return indptr, np.asarray(flat, dtype=np.int32)
+
+
+def build_snapshot_arrays(graph_data: Dict) -> Dict[str, np.ndarray]:
+    """Convert concept graph JSON (nodes/edges) into snapshot arrays"""
+    interner = _StringInterner()
+    nodes = graph_data.get("nodes", [])
+
+    node_ids, node_labels, doc_counts = [], [], []
+    children_rows, prereq_rows = [], []
+    for node in nodes:
+        hierarchy = node.get("hierarchy_info", {}) or {}
+        node_ids.append(interner.intern(node["id"]))
+        node_labels.append(interner.intern(node.get("label", node["id"])))
+        doc_counts.append(int(node.get("document_count", 0)))
+        children_rows.append([interner.intern(c) for c in hierarchy.get("children", [])])
+        prereq_rows.append([interner.intern(p) for p in hierarchy.get("prerequisites", [])])
+
+    edges_by_type: Dict[str, List[List[int]]] = {}
+    for edge in graph_data.get("edges", []):
+        edges_by_type.setdefault(edge["type"], []).append(
+            [interner.intern(edge["source"]), interner.intern(edge["target"])]
+        )
+
+    strings, string_offsets = interner.to_arrays()
+    children_indptr, children = _csr(children_rows)
+    prereqs_indptr, prereqs = _csr(prereq_rows)
+
+    arrays = {
+        "strings": strings,
+        "string_offsets": string_offsets,
+        "node_ids": np.asarray(node_ids, dtype=np.int32),
+        "node_labels": np.asarray(node_labels, dtype=np.int32),
+        "doc_counts": np.asarray(doc_counts, dtype=np.int32),
+        "children_indptr": children_indptr,
+        "children": children,
+        "prereqs_indptr": prereqs_indptr,
+        "prereqs": prereqs,
+    }
+    for edge_type, pairs in edges_by_type.items():
+        arrays[f"edges_{edge_type}"] = np.asarray(pairs, dtype=np.int32).reshape(-1, 2)
+    return arrays
+
+
+def write_graph_snapshot(graph_data: Dict, snapshot_dir: Path = SNAPSHOT_DIR) -> Path:
+    """
+    Write a snapshot for the given concept graph
+
+    The manifest is written last (atomically), so readers never see a
+    half-written snapshot as valid.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = snapshot_dir / MANIFEST_FILE
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    arrays = build_snapshot_arrays(graph_data)
+    for name, array in arrays.items():
+        np.save(snapshot_dir / f"{name}.npy", array, allow_pickle=False)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "num_nodes": int(arrays["node_ids"].shape[0]),
+        "num_strings": int(arrays["string_offsets"].shape[0] - 1),
+        "edge_types": sorted(k[len("edges_"):] for k in arrays if k.startswith("edges_")),
+    }
+    tmp_path = snapshot_dir / (MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    logger.info(
+        f"✅ Wrote concept graph snapshot: {manifest['num_nodes']} nodes, "
+        f"{manifest['num_strings']} strings, edge types {manifest['edge_types']} → {snapshot_dir}"
+    )
+    return snapshot_dir
+
+
+class ConceptGraphSnapshot:
+    """
+    Read-only view over snapshot arrays
+
+    Arrays are memory-mapped when opened from disk (see open()) or held in
+    memory when built straight from JSON (see from_graph_data()). The only
+    per-process state is a small id -> node index dict and a decoded-string cache.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], edge_types: List[str]):
+        self._a = arrays
+        self.edge_types = edge_types
+        self._strings: Dict[int, str] = {}
+        self._node_index: Optional[Dict[str, int]] = None
+        self._string_to_node: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def open(cls, snapshot_dir: Path = SNAPSHOT_DIR) -> Optional["ConceptGraphSnapshot"]:
+        """Memory-map a snapshot; returns None if it is missing or incompatible"""
+        snapshot_dir = Path(snapshot_dir)
+        manifest_path = snapshot_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return None
+
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") != SNAPSHOT_VERSION:
+                logger.warning(f"Concept graph snapshot version {manifest.get('version')} != {SNAPSHOT_VERSION}, ignoring")
+                return None
+
+            names = [
+                "strings", "string_offsets", "node_ids", "node_labels", "doc_counts",
+                "children_indptr", "children", "prereqs_indptr", "prereqs",
+            ] + [f"edges_{t}" for t in manifest.get("edge_types", [])]
+            arrays = {}
+            for name in names:
+                path = snapshot_dir / f"{name}.npy"
+                try:
+                    arrays[name] = np.load(path, mmap_mode="r", allow_pickle=False)
+                except ValueError:
+                    # Empty arrays cannot be memory-mapped on some platforms
+                    arrays[name] = np.load(path, allow_pickle=False)
+            return cls(arrays, manifest.get("edge_types", []))
+        except Exception as e:
+            logger.warning(f"Could not open concept graph snapshot at {snapshot_dir}: {e}")
+            return None
+
+    @staticmethod
+    def is_stale(snapshot_dir: Path = SNAPSHOT_DIR, graph_json_path: Path = GRAPH_JSON_PATH) -> bool:
+        """True if concept_graph.json was regenerated after the snapshot was written"""
+        manifest_path = Path(snapshot_dir) / MANIFEST_FILE
+        if not manifest_path.exists() or not Path(graph_json_path).exists():
+            return False
+        return Path(graph_json_path).stat().st_mtime > manifest_path.stat().st_mtime
+
+    @classmethod
+    def from_graph_data(cls, graph_data: Dict) -> "ConceptGraphSnapshot":
+        """Build an in-memory snapshot straight from JSON graph data"""
+        arrays = build_snapshot_arrays(graph_data)
+        edge_types = sorted(k[len("edges_"):] for k in arrays if k.startswith("edges_"))
+        return cls(arrays, edge_types)
+
+    # ---------- strings ----------
+
+    def string(self, idx: int) -> str:
+        idx = int(idx)
+        value = self._strings.get(idx)
+        if value is None:
+            offsets = self._a["string_offsets"]
+            value = bytes(self._a["strings"][offsets[idx]:offsets[idx + 1]]).decode("utf-8")
+            self._strings[idx] = value
+        return value
+
+    def _strings_of(self, indices) -> List[str]:
+        return [self.string(i) for i in indices]
+
+    # ---------- nodes ----------
+
+    @property
+    def num_nodes(self) -> int:
+        return int(self._a["node_ids"].shape[0])
+
+    def node_index(self, concept_id: str) -> Optional[int]:
+        """Node index for a concept id, or None if it is not a concept node"""
+        if self._node_index is None:
+            self._node_index = {
+                self.string(s): i for i, s in enumerate(self._a["node_ids"])
+            }
+        return self._node_index.get(concept_id)
+
+    def string_index(self, concept_id: str) -> Optional[int]:
+        """String table index of a concept node id"""
+        node = self.node_index(concept_id)
+        return None if node is None else int(self._a["node_ids"][node])
+
+    def node_label(self, node: int) -> str:
+        return self.string(self._a["node_labels"][node])
+
+    def node_doc_count(self, node: int) -> int:
+        return int(self._a["doc_counts"][node])
+
+    def node_children(self, node: int) -> List[str]:
+        indptr = self._a["children_indptr"]
+        return self._strings_of(self._a["children"][indptr[node]:indptr[node + 1]])
+
+    def node_prerequisites(self, node: int) -> List[str]:
+        indptr = self._a["prereqs_indptr"]
+        return self._strings_of(self._a["prereqs"][indptr[node]:indptr[node + 1]])
+
+    def node_ids(self) -> List[str]:
+        return self._strings_of(self._a["node_ids"])
+
+    # ---------- edges ----------
+
+    def edges(self, edge_type: str) -> np.ndarray:
+        """(M, 2) [source, target] string indices for an edge type"""
+        edges = self._a.get(f"edges_{edge_type}")
+        return edges if edges is not None else np.zeros((0, 2), dtype=np.int32)
+
+    def targets(self, source_idx: int, edge_types: List[str]) -> List[int]:
+        """String indices reachable from source_idx by one edge of the given types"""
+        out: List[int] = []
+        for edge_type in edge_types:
+            edges = self.edges(edge_type)
+            if len(edges):
+                out.extend(int(t) for t in edges[edges[:, 0] == source_idx, 1])
+        return out
+
+    def sources(self, target_idx: int, edge_types: List[str]) -> List[int]:
+        """String indices with an edge of the given types into target_idx"""
+        out: List[int] = []
+        for edge_type in edge_types:
+            edges = self.edges(edge_type)
+            if len(edges):
+                out.extend(int(s) for s in edges[edges[:, 1] == target_idx, 0])
+        return out
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not GRAPH_JSON_PATH.exists():
+        logger.error(f"Concept graph not found at {GRAPH_JSON_PATH}")
+        return 1
+    with open(GRAPH_JSON_PATH, "r") as f:
+        graph_data = json.load(f)
+    write_graph_snapshot(graph_data)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,6 +4,7 @@ This provides better compatibility with embeddings and query operations
 """
 
 from typing import List, Dict, Optional, Tuple
+import json
 import logging
 # Updated import for LangChain 0.2+ compatibility
 try:
@@ -11,6 +12,7 @@ try:
 except ImportError:
     from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
+from app.circuit_breaker import get_circuit_breaker
 from app.config import settings
 from app.rag.embeddings import get_embedding_generator
 from app.rag.chromadb_client import ChromaEmbeddingWrapper
@@ -40,8 +42,8 @@ class LangChainChromaClient:
                 port=settings.chromadb_port,
                 settings=ChromaSettings(anonymized_telemetry=False)
             )
-            # Test connection
-            self.chroma_client.heartbeat()
+            # Test connection (bounded by the chroma breaker's timeout)
+            get_circuit_breaker("chroma").call(self.chroma_client.heartbeat)
             logger.info(f"Connected to ChromaDB HTTP server at {settings.chromadb_host}:{settings.chromadb_port}")
         except Exception as e:
             logger.warning(f"Could not connect to ChromaDB HTTP server: {e}. Falling back to PersistentClient.")
@@ -79,8 +81,10 @@ class LangChainChromaClient:
         k: int = 5,
         filter: Optional[Dict] = None
     ) -> List[Tuple[Document, float]]:
-        """Compatibility wrapper for legacy callers."""
-        return self.vectorstore.similarity_search_with_score(query=query, k=k, filter=filter)
+        """Compatibility wrapper for legacy callers (fails fast while Chroma is down)."""
+        return get_circuit_breaker("chroma").call(
+            self.vectorstore.similarity_search_with_score, query=query, k=k, filter=filter
+        )
 
     def _normalize_document(
         self,
@@ -116,12 +120,18 @@ class LangChainChromaClient:
     ) -> List[Dict]:
         """
         Perform similarity search and return structured metadata records
+        
+        While Chroma is failing, the last good results for the same query,
+        k and filter are served; without them the error is raised.
         """
         try:
-            results = self.vectorstore.similarity_search_with_score(
+            results = get_circuit_breaker("chroma").call(
+                self.vectorstore.similarity_search_with_score,
                 query=query,
                 k=k,
-                filter=filter
+                filter=filter,
+                degraded="cache",
+                cache_key=(query, k, json.dumps(filter, sort_keys=True, default=str)),
             )
             structured = [self._normalize_document(doc, score) for doc, score in results]
             logger.info(f"✅ Retrieved {len(structured)} structured documents")
@@ -0,0 +1,320 @@
+"""
+Course Scope Index - In-memory scope classifier for the Governor
+
+Governor._check_scope ran a k=3 Chroma similarity search on every turn the
+reasoning node was not confident about. This module precomputes, at ingest
+time, a small matrix of unit vectors:
+
+- in scope: one centroid per course module (mean of its chunk embeddings)
+  plus each concept-graph node's own embedding
+- out of scope: embeddings of OUT_OF_SCOPE_EXEMPLARS (weather, recipes, ...)
+
+A query is scored with one matrix-vector product against it: the best
+in-scope and best out-of-scope cosine similarity. Clear cases are decided
+here; only the ambiguous band between settings.scope_reject_similarity and
+settings.scope_accept_similarity falls back to the Chroma search. Scores
+are cached per normalised query, and the query embedding itself comes from
+ChromaEmbeddingWrapper's memo, so retrieval later in the turn reuses it.
+
+Layout (scope_index/):
+    vectors.npy    float32 (M, D) unit vectors
+    in_scope.npy   bool    (M,)   True for course rows, False for exemplars
+    labels.json            row labels (module name, concept label, exemplar)
+    manifest.json          written last; an index without it is ignored
+
+Usage:
+    python -m app.rag.scope_index   # Rebuild from the Chroma collection
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+INDEX_DIR = Path(__file__).parent.parent.parent / "cleaned_data" / "processed" / "scope_index"
+MANIFEST_FILE = "manifest.json"
+COURSE_ID = "COMP237"
+PAGE_SIZE = 500
+
+OUT_OF_SCOPE_EXEMPLARS = [
+    "What is the capital of France?",
+    "What's the weather going to be like tomorrow?",
+    "Give me a recipe for chocolate chip cookies",
+    "Who won the football game last night?",
+    "Recommend a good movie to watch this weekend",
+    "How do I fix a leaking kitchen faucet?",
+    "Write me a love poem",
+    "What are the best stocks to buy right now?",
+    "Tell me a joke",
+    "How do I lose weight fast?",
+    "Who is the president of the United States?",
+    "Plan a trip to Japan for me",
+    "What is the meaning of life?",
+    "Help me write a cover letter for a retail job",
+    "How do I bake sourdough bread?",
+    "What time does the mall close today?",
+    "Translate this sentence into Spanish",
+    "Summarize the plot of Harry Potter",
+    "How do I change a car tire?",
+    "What's a good name for my dog?",
+]
+
+_NORMALIZE_RE = re.compile(r"[^a-z0-9\s]+")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: lowercase, punctuation dropped, whitespace collapsed"""
+    return " ".join(_NORMALIZE_RE.sub(" ", query.lower()).split())
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# ---------- build (ingest time) ----------
+
+def build_scope_index_arrays(
+    embeddings: Sequence[Sequence[float]],
+    metadatas: Sequence[Dict[str, Any]],
+    exemplar_embeddings: Sequence[Sequence[float]],
+    exemplars: Sequence[str] = OUT_OF_SCOPE_EXEMPLARS,
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """(vectors, in_scope, labels) from the course chunks and the out-of-scope exemplars"""
+    chunks = _unit_rows(np.asarray(embeddings, dtype=np.float32))
+    rows: List[np.ndarray] = []
+    labels: List[str] = []
+
+    modules: Dict[str, List[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        metadata = metadata or {}
+        if metadata.get("content_type") == "concept_node":
+            rows.append(chunks[i])
+            labels.append(f"concept:{metadata.get('label') or metadata.get('concept_id', '')}")
+        else:
+            module = metadata.get("module") or metadata.get("source_filename") or "Unknown"
+            modules.setdefault(str(module), []).append(i)
+    for module, members in sorted(modules.items()):
+        rows.append(chunks[members].mean(axis=0))
+        labels.append(f"module:{module}")
+
+    n_course = len(rows)
+    rows.extend(_unit_rows(np.asarray(exemplar_embeddings, dtype=np.float32)))
+    labels.extend(f"out:{text}" for text in exemplars)
+
+    vectors = _unit_rows(np.vstack(rows)).astype(np.float32)
+    in_scope = np.zeros(len(rows), dtype=bool)
+    in_scope[:n_course] = True
+    return vectors, in_scope, labels
+
+
+def write_scope_index(
+    vectors: np.ndarray,
+    in_scope: np.ndarray,
+    labels: List[str],
+    index_dir: Path = INDEX_DIR,
+    embedding_model: str = "",
+) -> Path:
+    """Write the index arrays; the manifest goes last so readers never see a partial index"""
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = index_dir / MANIFEST_FILE
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    np.save(index_dir / "vectors.npy", vectors, allow_pickle=False)
+    np.save(index_dir / "in_scope.npy", in_scope, allow_pickle=False)
+    with open(index_dir / "labels.json", "w") as f:
+        json.dump(labels, f)
+
+    manifest = {
+        "version": INDEX_VERSION,
+        "dim": int(vectors.shape[1]),
+        "rows": int(vectors.shape[0]),
+        "in_scope_rows": int(in_scope.sum()),
+        "embedding_model": embedding_model,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    tmp_path = index_dir / (MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    logger.info(
+        f"✅ Wrote scope index: {manifest['in_scope_rows']} course rows, "
+        f"{manifest['rows'] - manifest['in_scope_rows']} out-of-scope exemplars → {index_dir}"
+    )
+    return index_dir
+
+
+def build_scope_index(collection, embeddings, index_dir: Path = INDEX_DIR, course_id: str = COURSE_ID) -> Path:
+    """
+    Build the index from a Chroma collection's stored embeddings
+
+    Args:
+        collection: chromadb Collection holding the course chunks
+        embeddings: LangChain embeddings used for the collection (embeds the exemplars)
+    """
+    all_embeddings: List[Sequence[float]] = []
+    all_metadatas: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        page = collection.get(
+            where={"course_id": course_id},
+            include=["embeddings", "metadatas"],
+            limit=PAGE_SIZE,
+            offset=offset,
+        )
+        page_embeddings = page.get("embeddings")
+        if page_embeddings is None or len(page_embeddings) == 0:
+            break
+        all_embeddings.extend(page_embeddings)
+        all_metadatas.extend(page.get("metadatas") or [{}] * len(page_embeddings))
+        offset += len(page_embeddings)
+    if not all_embeddings:
+        raise ValueError(f"No {course_id} documents with embeddings in collection {collection.name}")
+
+    exemplar_embeddings = embeddings.embed_documents(OUT_OF_SCOPE_EXEMPLARS)
+    vectors, in_scope, labels = build_scope_index_arrays(all_embeddings, all_metadatas, exemplar_embeddings)
+    return write_scope_index(vectors, in_scope, labels, index_dir, getattr(embeddings, "model", ""))
+
+
+# ---------- query time ----------
+
+class ScopeIndex:
+    """Scores query embeddings against the course / out-of-scope rows"""
+
+    def __init__(self, vectors: np.ndarray, in_scope: np.ndarray, labels: List[str]):
+        self.vectors = vectors
+        self.in_scope = in_scope
+        self.labels = labels
+        self.dim = int(vectors.shape[1])
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, float, str]]" = OrderedDict()
+
+    @classmethod
+    def open(cls, index_dir: Path = INDEX_DIR) -> Optional["ScopeIndex"]:
+        """Load an index; returns None if it is missing or incompatible"""
+        index_dir = Path(index_dir)
+        manifest_path = index_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") != INDEX_VERSION:
+                logger.warning(f"Scope index version {manifest.get('version')} != {INDEX_VERSION}, ignoring")
+                return None
+            vectors = np.load(index_dir / "vectors.npy", allow_pickle=False)
+            in_scope = np.load(index_dir / "in_scope.npy", allow_pickle=False)
+            with open(index_dir / "labels.json") as f:
+                labels = json.load(f)
+            return cls(vectors, in_scope, labels)
+        except Exception as e:
+            logger.warning(f"Could not open scope index at {index_dir}: {e}")
+            return None
+
+    def score(self, embedding: Sequence[float]) -> Tuple[float, float, str]:
+        """(best in-scope similarity, best out-of-scope similarity, label of the best course row)"""
+        query = np.asarray(embedding, dtype=np.float32)
+        similarities = self.vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        course = np.where(self.in_scope, similarities, -1.0)
+        best = int(course.argmax())
+        out = similarities[~self.in_scope]
+        return float(course[best]), float(out.max()) if out.size else -1.0, self.labels[best]
+
+    def score_query(self, query: str, embed: Callable[[str], Sequence[float]]) -> Tuple[Tuple[float, float, str], bool]:
+        """Score a query text, embedding it only on a cache miss; returns (score, cache_hit)"""
+        key = normalize_query(query)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached, True
+        embedding = embed(query)
+        if len(embedding) != self.dim:
+            raise ValueError(f"Query embedding has {len(embedding)} dims, scope index has {self.dim}")
+        result = self.score(embedding)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > settings.scope_cache_size:
+                self._cache.popitem(last=False)
+        return result, False
+
+
+class ScopeCheckStats:
+    """How scope checks were decided, and how long each path took"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.decisions: Dict[str, int] = {}
+        self._ms: Dict[str, List[float]] = {}  # path -> [total ms, count]
+
+    def record(self, path: str, ms: float) -> None:
+        with self._lock:
+            self.decisions[path] = self.decisions.get(path, 0) + 1
+            total = self._ms.setdefault(path, [0.0, 0])
+            total[0] += ms
+            total[1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            checks = sum(self.decisions.values())
+            vector = self.decisions.get("vector_search", 0)
+            return {
+                "checks": checks,
+                "decisions": dict(self.decisions),
+                "vector_search_rate": round(vector / checks, 3) if checks else 0.0,
+                "avg_ms": {path: round(total / count, 3) for path, (total, count) in self._ms.items() if count},
+            }
+
+
+_scope_index = None
+_scope_index_loaded = False
+_scope_check_stats = None
+
+
+def get_scope_index() -> Optional[ScopeIndex]:
+    """Get the scope index (loaded once), or None when disabled or not built"""
+    global _scope_index, _scope_index_loaded
+    if not settings.scope_index_enabled:
+        return None
+    if not _scope_index_loaded:
+        _scope_index_loaded = True
+        _scope_index = ScopeIndex.open()
+        if _scope_index is None:
+            logger.info(f"No scope index in {INDEX_DIR}; scope checks use vector search (python -m app.rag.scope_index)")
+    return _scope_index
+
+
+def get_scope_check_stats() -> ScopeCheckStats:
+    """Get or create the process-wide scope check stats"""
+    global _scope_check_stats
+    if _scope_check_stats is None:
+        _scope_check_stats = ScopeCheckStats()
+    return _scope_check_stats
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from app.rag.langchain_chroma import get_langchain_chroma_client
+    client = get_langchain_chroma_client()
+    collection = client.chroma_client.get_collection(client.collection_name)
+    build_scope_index(collection, client.embeddings.langchain_embeddings)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
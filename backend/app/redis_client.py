@@ -13,12 +13,17 @@ Features:
 - Health check interval of 30 seconds
 - Auto-reconnect on connection loss
 - Thread-safe singleton pattern
+- Short socket timeouts, no retries: calls go through the "redis" circuit
+  breaker (app/circuit_breaker.py), which fast-fails while Redis is down
 """
 
 import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 from typing import Optional
 import logging
 
+from app.circuit_breaker import get_circuit_breaker
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -45,9 +50,10 @@ def get_redis_pool() -> redis.ConnectionPool:
             password=settings.redis_password,
             max_connections=20,
             health_check_interval=30,
-            socket_timeout=5,
-            socket_connect_timeout=5,
-            retry_on_timeout=True,
+            # The circuit breaker's timeout; a retried timeout would double it
+            socket_timeout=settings.circuit_timeouts.get("redis", 1.0),
+            socket_connect_timeout=settings.circuit_timeouts.get("redis", 1.0),
+            retry=Retry(NoBackoff(), 0),
             decode_responses=True,  # Return strings instead of bytes
         )
         
@@ -105,7 +111,7 @@ def close_redis_pool() -> None:
 def cache_get(key: str) -> Optional[str]:
     """Get a value from cache, returns None if not found."""
     try:
-        return get_redis_client().get(key)
+        return get_circuit_breaker("redis").call(get_redis_client().get, key, degraded="skip")
     except Exception as e:
         logger.warning(f"Cache get failed for {key}: {e}")
         return None
@@ -114,7 +120,9 @@ def cache_get(key: str) -> Optional[str]:
 def cache_set(key: str, value: str, ttl_seconds: int = 3600) -> bool:
     """Set a value in cache with TTL. Returns True on success."""
     try:
-        return get_redis_client().set(key, value, ex=ttl_seconds)
+        return get_circuit_breaker("redis").call(
+            get_redis_client().set, key, value, ex=ttl_seconds, degraded="skip", fallback=False
+        )
     except Exception as e:
         logger.warning(f"Cache set failed for {key}: {e}")
         return False
@@ -123,7 +131,41 @@ def cache_set(key: str, value: str, ttl_seconds: int = 3600) -> bool:
 def cache_delete(key: str) -> bool:
     """Delete a key from cache. Returns True on success."""
     try:
-        return get_redis_client().delete(key) > 0
+        return get_circuit_breaker("redis").call(get_redis_client().delete, key, degraded="skip", fallback=0) > 0
     except Exception as e:
         logger.warning(f"Cache delete failed for {key}: {e}")
         return False
+
+
+# Async client (for request handlers; blocking stream reads hold a connection each)
+
+_async_redis_pool = None
+
+
+def get_async_redis_client():
+    """
+    Get a redis.asyncio client using a shared async connection pool.
+    
+    Used by the resumable chat streams (app/api/stream_buffer.py), whose
+    XREAD BLOCK calls must not block the event loop. Same timeouts as the
+    sync pool, no retries: its calls go through the same "redis" breaker.
+    """
+    global _async_redis_pool
+    import redis.asyncio as aioredis
+    from redis.asyncio.retry import Retry as AsyncRetry
+    
+    if _async_redis_pool is None:
+        logger.info(f"Creating async Redis connection pool: {settings.redis_host}:{settings.redis_port}")
+        _async_redis_pool = aioredis.ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            max_connections=100,  # One per live stream reader while it blocks
+            health_check_interval=30,
+            socket_timeout=settings.circuit_timeouts.get("redis", 1.0),
+            socket_connect_timeout=settings.circuit_timeouts.get("redis", 1.0),
+            retry=AsyncRetry(NoBackoff(), 0),
+            decode_responses=True,
+        )
+    
+    return aioredis.Redis(connection_pool=_async_redis_pool)
@@ -827,6 +827,16 @@ def main():
         }, f, indent=2)
     print(f"💾 Concept graph saved to: {graph_path}")
     
+    # Binary snapshot of the graph - memory-mapped by API workers instead of parsing JSON
+    snapshot_path = None
+    try:
+        from app.rag.graph_snapshot import write_graph_snapshot
+        with open(graph_path, 'r') as f:
+            snapshot_path = write_graph_snapshot(json.load(f), OUTPUT_DIR / "concept_graph.snapshot")
+        print(f"💾 Concept graph snapshot saved to: {snapshot_path}")
+    except Exception as e:
+        print(f"⚠️ Could not write concept graph snapshot: {e}")
+    
     # Final summary
     print("\n" + "=" * 60)
     print("✅ DATA QUALITY PIPELINE COMPLETE")
@@ -835,6 +845,8 @@ def main():
     print(f"   1. {assessment_path.name} - Quality assessment report")
     print(f"   2. {cleaned_path.name} - Cleaned content for ChromaDB")
     print(f"   3. {graph_path.name} - Concept graph for GraphRAG")
+    if snapshot_path:
+        print(f"   4. {snapshot_path.name}/ - Memory-mappable concept graph snapshot")
     
     print(f"\n🔜 NEXT STEPS:")
     print("   1. Review quality_assessment.json for issues")
@@ -396,6 +396,13 @@ def main():
     
     verify_ingestion(collection, embeddings, test_queries)
     
+    # Rebuild the Governor's scope index (module centroids) from what was just ingested
+    try:
+        from app.rag.scope_index import build_scope_index
+        build_scope_index(collection, embeddings)
+    except Exception as e:
+        logger.warning(f"Could not build scope index (Governor falls back to vector search): {e}")
+    
     # Summary
     logger.info("\n" + "=" * 60)
     logger.info("📈 INGESTION SUMMARY")
@@ -36,6 +36,31 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def load_local_models():
+    """Load the trained intent classifier and the scope index before the first request needs them"""
+    from app.agents.intent_classifier import get_intent_classifier
+    from app.rag.scope_index import get_scope_index
+    get_intent_classifier()
+    get_scope_index()
+
+
+@app.on_event("startup")
+async def start_agent_workers():
+    """Spawn the agent worker processes now, so they are warm before the first turn"""
+    if settings.agent_execution_mode == "process_pool":
+        from app.agents.worker_pool import get_agent_worker_pool
+        get_agent_worker_pool().start()
+
+
+@app.on_event("shutdown")
+async def stop_agent_workers():
+    """Stop the agent worker processes, cancelling turns still running there"""
+    if settings.agent_execution_mode == "process_pool":
+        from app.agents.worker_pool import get_agent_worker_pool
+        await get_agent_worker_pool().stop()
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Audit the reasoning fast path (classify_locally) against the reasoning LLM
+
+For each query: which local rule (if any) handles it, with what intent and
+confidence, and - with --llm - the intent ReasoningEngine.reason returns.
+Reports the fast-path rate at the configured threshold, the time the local
+classifier takes, and every query where the two intents disagree.
+
+Queries come from --queries (one per line, e.g. exported from chat logs)
+or a built-in sample. A line "<history>||<query>" runs the query with a
+two-message history (so follow-up detection applies). --samples reads the
+fast-path turns sampled in production (reasoning_fast_path.maybe_sample,
+JSONL) instead, and audits the rule/intent recorded when they were served.
+
+Run: cd backend && python scripts/audit_reasoning_fast_path.py [--queries q.txt | --samples logs/reasoning_fast_path_samples.jsonl] [--llm]
+"""
+
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents.reasoning_fast_path import SAMPLE_LOG, classify_locally  # noqa: E402
+from app.config import settings  # noqa: E402
+
+SAMPLE_QUERIES = [
+    "hi",
+    "thanks!",
+    "ok got it",
+    "when is the midterm exam",
+    "what is this course about",
+    "Traceback (most recent call last): File \"x.py\"",
+    "what is backpropagation?",
+    "briefly, what is k-means clustering",
+    "I don't understand gradient descent",
+    "explain overfitting",
+    "derive the gradient of the mean squared error loss",
+    "how does a perceptron decide which class an input belongs to and why",
+    "Backpropagation was explained||what does that mean",
+    "Let me explain SVMs||no",
+    "yes",
+]
+
+
+def load_queries(path):
+    lines = SAMPLE_QUERIES if path is None else Path(path).read_text().splitlines()
+    cases = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if "||" in line:
+            previous, query = line.split("||", 1)
+            history = [{"role": "user", "content": "..."}, {"role": "assistant", "content": previous}]
+        else:
+            query, history = line, []
+        cases.append((query, history, None))
+    return cases
+
+
+def load_samples(path):
+    """(query, history, (rule, local intent) as served) from the production sample log"""
+    cases = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        sample = json.loads(line)
+        cases.append((sample["query"], sample.get("history") or [], (sample["rule"], sample["local_intent"])))
+    return cases
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", help="File with one query per line (default: built-in sample)")
+    parser.add_argument("--samples", nargs="?", const=str(SAMPLE_LOG), help="Audit the production sample log (JSONL)")
+    parser.add_argument("--llm", action="store_true", help="Also run the reasoning LLM and compare intents")
+    parser.add_argument("--threshold", type=float, default=settings.reasoning_fast_path_threshold)
+    args = parser.parse_args()
+
+    engine = None
+    if args.llm:
+        from app.agents.reasoning_node import ReasoningEngine
+        engine = ReasoningEngine()
+
+    cases = load_samples(args.samples) if args.samples else load_queries(args.queries)
+    rules = Counter()
+    disagreements = []
+    local_seconds = 0.0
+    llm_seconds = 0.0
+    fast = 0
+
+    print(f"{'rule':<18} {'local':<15} {'conf':>5}  {'llm':<15} query")
+    for query, history, served in cases:
+        start = time.perf_counter()
+        local = classify_locally(query, history)
+        local_seconds += time.perf_counter() - start
+        taken = local is not None and local[1].confidence >= args.threshold
+        rule, local_intent, confidence = (local[0], local[1].recommended_intent, local[1].confidence) if local else ("-", "-", 0.0)
+        if served is not None:
+            # Audit the decision the turn was served with, not today's classifier
+            taken, (rule, local_intent) = True, served
+        if taken:
+            fast += 1
+            rules[rule] += 1
+
+        llm_intent = ""
+        if engine is not None:
+            start = time.perf_counter()
+            llm_intent = engine.reason(query=query, conversation_history=history).recommended_intent
+            llm_seconds += time.perf_counter() - start
+            if taken and llm_intent != local_intent:
+                disagreements.append((query, rule, local_intent, llm_intent))
+
+        print(f"{rule:<18} {local_intent:<15} {confidence:>5.2f}  {llm_intent:<15} {query[:60]!r}")
+
+    total = len(cases)
+    print()
+    print(f"fast path: {fast}/{total} ({fast / total:.0%}) at threshold {args.threshold}")
+    print(f"by rule:   {dict(rules)}")
+    print(f"local classifier: {local_seconds / total * 1e6:.0f} us/query")
+    if engine is not None:
+        print(f"reasoning LLM:    {llm_seconds / total * 1000:.0f} ms/query "
+              f"(~{llm_seconds / total * fast:.1f}s saved over these queries)")
+        print(f"disagreements: {len(disagreements)}/{fast}")
+        for query, rule, local_intent, llm_intent in disagreements:
+            print(f"  [{rule}] local={local_intent} llm={llm_intent}: {query[:80]!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
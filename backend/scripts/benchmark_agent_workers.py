@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat turn throughput: in-process astream_agent vs the agent worker pool
+
+Runs --concurrency turns at a time, --turns in total, once in this process
+(as the API did) and once on an AgentWorkerPool, and reports per mode:
+    turns/sec, mean and p95 turn latency, events/sec
+    event-loop lag - how late a 10 ms timer on the API loop fires while the
+                     turns run (p50 / p99 / max): what request handling and
+                     SSE writing would wait for
+
+By default turns are synthetic, shaped like a tutor turn: a burst of sync
+CPU work (prompt building), then --tokens answer deltas arriving --token-ms
+apart (model IO), each followed by the per-chunk CPU work done on our side
+(the shared regex matcher over the answer so far, a JSON round trip of
+tool-output-sized metadata). --agent runs real astream_agent turns on
+SAMPLE_QUERIES instead (needs the model API keys, Chroma, Redis, ...).
+
+Run: cd backend && python scripts/benchmark_agent_workers.py [--turns 64] [--concurrency 16] [--workers 4] [--agent]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))  # Workers import synthetic_turn from this module
+
+from app.agents.text_matcher import TEXT_MATCHERS  # noqa: E402
+from app.agents.worker_pool import AGENT_TARGET, AgentWorkerPool  # noqa: E402
+
+SYNTHETIC_TARGET = "benchmark_agent_workers:synthetic_turn"
+WORDS = (
+    "gradient descent moves the weights a small step against the gradient of the loss "
+    "so each update lowers the error a little the learning rate sets the step size "
+    "backpropagation applies the chain rule layer by layer to get those gradients"
+).split()
+SOURCES = [{"title": f"Week {i} Lecture", "url": f"https://example.edu/res{i:05d}", "preview": " ".join(WORDS)} for i in range(8)]
+SAMPLE_QUERIES = [
+    "What is gradient descent?",
+    "Explain backpropagation step by step",
+    "How does k-nearest neighbors classify a point?",
+    "when is the midterm",
+    "thanks!",
+    "What is the difference between BFS and DFS?",
+]
+
+
+async def synthetic_turn(query: str, tokens: int = 300, token_ms: float = 5.0, prompt_ms: float = 20.0, **_):
+    """Stand-in for astream_agent: sync prompt building, then streamed tokens with per-chunk CPU work"""
+    end = time.perf_counter() + prompt_ms / 1000
+    while time.perf_counter() < end:  # Prompt building / sync nodes hold the GIL
+        TEXT_MATCHERS["query"].scan(query)
+    yield {"type": "queue-init", "queue": [{"id": "tutor", "status": "in_progress"}]}
+    answer = []
+    for i in range(tokens):
+        await asyncio.sleep(token_ms / 1000)
+        token = WORDS[(i * 7 + len(query)) % len(WORDS)] + " "
+        answer.append(token)
+        TEXT_MATCHERS["query"].scan("".join(answer[-60:]))
+        json.loads(json.dumps({"sources": SOURCES, "chunk": i}))
+        yield {"type": "text-delta", "textDelta": token}
+    yield {"type": "sources", "sources": SOURCES}
+
+
+async def probe_loop_lag(samples: list, stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run_mode(stream_factory, args, queries):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, lag = [], []
+    events = 0
+
+    async def one(i):
+        nonlocal events
+        async with semaphore:
+            start = time.perf_counter()
+            async for _ in stream_factory(queries[i % len(queries)]):
+                events += 1
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe_loop_lag(lag, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.turns)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+    lag.sort()
+    return {
+        "turns_per_sec": args.turns / elapsed,
+        "events_per_sec": events / elapsed,
+        "mean_s": statistics.mean(latencies),
+        "p95_s": sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+        "lag_p50_ms": lag[len(lag) // 2] if lag else 0.0,
+        "lag_p99_ms": lag[int(0.99 * (len(lag) - 1))] if lag else 0.0,
+        "lag_max_ms": lag[-1] if lag else 0.0,
+    }
+
+
+async def run(args) -> int:
+    queries = SAMPLE_QUERIES if args.agent else [f"{q} ({i})" for i, q in enumerate(SAMPLE_QUERIES)]
+    turn_kwargs = {} if args.agent else {"tokens": args.tokens, "token_ms": args.token_ms, "prompt_ms": args.prompt_ms}
+    target = AGENT_TARGET if args.agent else SYNTHETIC_TARGET
+
+    if args.agent:
+        from app.agents.tutor_agent import astream_agent
+
+        def in_process(query):
+            return astream_agent(query=query)
+    else:
+        def in_process(query):
+            return synthetic_turn(query, **turn_kwargs)
+
+    results = {"in_process": await run_mode(in_process, args, queries)}
+
+    pool = AgentWorkerPool(processes=args.workers, max_turns=args.concurrency, warm=args.agent)
+    pool.start()
+    if not await pool.wait_ready(args.startup_timeout):
+        print(f"workers not ready after {args.startup_timeout:.0f}s")
+        await pool.stop()
+        return 1
+    try:
+        results["process_pool"] = await run_mode(lambda query: pool.stream({"query": query, **turn_kwargs}, target), args, queries)
+    finally:
+        await pool.stop()
+
+    print(f"turns: {args.turns}, concurrency: {args.concurrency}, workers: {pool.processes}, "
+          f"{'astream_agent' if args.agent else f'synthetic ({args.tokens} tokens x {args.token_ms} ms)'}")
+    print(f"{'mode':<13} {'turns/s':>8} {'events/s':>9} {'mean s':>7} {'p95 s':>7} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<13} {r['turns_per_sec']:>8.2f} {r['events_per_sec']:>9.0f} {r['mean_s']:>7.2f} {r['p95_s']:>7.2f} "
+              f"{r['lag_p50_ms']:>6.1f}ms {r['lag_p99_ms']:>6.1f}ms {r['lag_max_ms']:>6.1f}ms")
+    speedup = results["process_pool"]["turns_per_sec"] / results["in_process"]["turns_per_sec"]
+    print(f"\nthroughput, pool vs in-process: {speedup:.2f}x")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=64, help="Turns per mode")
+    parser.add_argument("--concurrency", type=int, default=16, help="Turns in flight at once")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = setting / CPU count)")
+    parser.add_argument("--tokens", type=int, default=300, help="Answer deltas per synthetic turn")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Model IO between synthetic deltas")
+    parser.add_argument("--prompt-ms", type=float, default=20.0, help="Sync CPU work at the start of a synthetic turn")
+    parser.add_argument("--agent", action="store_true", help="Run real astream_agent turns")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Seconds to wait for workers to warm up")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark the answer-cleaning transducer (AnswerStreamFilter)
+
+Throughput: long responses fed in model-sized chunks, compared with the
+previous streaming path (tutor_agent._filter_thinking_blocks per chunk, then
+both whole-response helpers at the end). Sizes grow 10x to show scaling.
+The streaming-equivalence checks are in tests/test_answer_stream.py.
+
+Run: cd backend && python scripts/benchmark_answer_filter.py [--sizes 2000 20000 200000]
+"""
+
+import sys
+import re
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents.answer_stream import AnswerStreamFilter, SCAFFOLDING_LABELS  # noqa: E402
+
+
+# ---------- previous implementations ----------
+
+def legacy_strip_thinking_blocks(text: str) -> str:
+    if not text:
+        return text
+    cleaned = re.sub(r'<thinking>.*?</thinking>\s*', '', text, flags=re.DOTALL | re.IGNORECASE)
+    cleaned = re.sub(r'</?thinking>\s*', '', cleaned, flags=re.IGNORECASE)
+    return cleaned.strip()
+
+
+def legacy_strip_scaffolding_labels(text: str) -> str:
+    if not text:
+        return text
+    patterns = [rf'\*\*{label}:\*\*\s*' for label in SCAFFOLDING_LABELS] + [rf'{label}:\s*' for label in SCAFFOLDING_LABELS]
+    cleaned = text
+    for pattern in patterns:
+        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+    return cleaned.strip()
+
+
+def legacy_clean(text: str, strip_labels: bool) -> str:
+    cleaned = legacy_strip_thinking_blocks(text)
+    return legacy_strip_scaffolding_labels(cleaned) if strip_labels else cleaned
+
+
+def legacy_filter_thinking_chunk(content: str, state: dict) -> str:
+    """tutor_agent._filter_thinking_blocks (per streamed chunk)"""
+    text = state.get("buffer", "") + content
+    state["buffer"] = ""
+    result = []
+    i = 0
+    while i < len(text):
+        if state["inside_thinking"]:
+            end_pos = text.find("</thinking>", i)
+            if end_pos != -1:
+                i = end_pos + len("</thinking>")
+                state["inside_thinking"] = False
+            else:
+                for j in range(1, len("</thinking>")):
+                    if text.endswith("</thinking>"[:j]):
+                        state["buffer"] = text[-j:]
+                        return "".join(result).strip()
+                return "".join(result).strip()
+        else:
+            start_pos = text.find("<thinking>", i)
+            if start_pos != -1:
+                if start_pos > i:
+                    result.append(text[i:start_pos])
+                i = start_pos + len("<thinking>")
+                state["inside_thinking"] = True
+            else:
+                for j in range(1, len("<thinking>")):
+                    if text[i:].endswith("<thinking>"[:j]):
+                        result.append(text[i:-j])
+                        state["buffer"] = text[-j:]
+                        return "".join(result).strip()
+                result.append(text[i:])
+                break
+    return "".join(result).strip()
+
+
+# ---------- inputs ----------
+
+def stream(chunks: list, strip_labels: bool) -> str:
+    answer_filter = AnswerStreamFilter(strip_labels=strip_labels)
+    return "".join(answer_filter.feed(c) for c in chunks) + answer_filter.finish()
+
+
+def long_response(size: int, rnd: random.Random) -> str:
+    paragraphs = ["<thinking>Plan: activate prior knowledge, then guide.</thinking>\n"]
+    while sum(len(p) for p in paragraphs) < size:
+        label = rnd.choice(SCAFFOLDING_LABELS)
+        body = " ".join(rnd.choice(["gradient", "descent", "moves", "weights", "against", "the", "loss", "step", "**rate**", "`lr`"]) for _ in range(60))
+        paragraphs.append(f"**{label}:** {body}.\n\n")
+    return "".join(paragraphs)[:size]
+
+
+# ---------- runs ----------
+
+def run_legacy_stream(chunks: list) -> str:
+    state = {"inside_thinking": False, "buffer": ""}
+    streamed = "".join(legacy_filter_thinking_chunk(c, state) for c in chunks)
+    return legacy_clean("".join(chunks), strip_labels=True) or streamed
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AnswerStreamFilter")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 200000], help="Response lengths (chars)")
+    parser.add_argument("--chunk", type=int, default=16, help="Chars per streamed chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"THROUGHPUT ({args.chunk}-char chunks, tutor: thinking + labels)")
+    print("=" * 70)
+    rnd = random.Random(args.seed)
+    for size in args.sizes:
+        text = long_response(size, rnd)
+        chunks = [text[i:i + args.chunk] for i in range(0, len(text), args.chunk)]
+        legacy_s = timed(run_legacy_stream, chunks)
+        new_s = timed(stream, chunks, True)
+        print(
+            f"  {size:7d} chars | legacy {legacy_s * 1000:8.2f} ms ({size / legacy_s / 1e6:6.2f} MB/s) | "
+            f"transducer {new_s * 1000:8.2f} ms ({size / new_s / 1e6:6.2f} MB/s) | {legacy_s / new_s:5.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
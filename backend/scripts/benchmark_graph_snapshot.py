@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark concept graph loading: JSON parse vs memory-mapped snapshot
+
+Each mode runs in a fresh subprocess (like a new uvicorn worker) and reports:
+- cold start: time to load the graph and answer one concept query
+- RSS growth and the private/shared split from /proc/self/smaps_rollup
+  (mmapped snapshot pages show up as shared/clean and are reused across workers)
+
+Modes:
+    json      - previous behaviour: json.load + ConceptNode objects per node
+    snapshot  - ConceptGraphSnapshot.open() (read-only mmap)
+
+Run: cd backend && python scripts/benchmark_graph_snapshot.py [--runs 5]
+     (builds the snapshot first if it does not exist)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from statistics import mean
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _memory_kb() -> dict:
+    """Current RSS plus private/shared breakdown (Linux only)"""
+    stats = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    stats[key] = int(rest.split()[0])
+    except OSError:
+        import resource
+        stats["Rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return stats
+
+
+def _run_mode(mode: str) -> dict:
+    """Load the graph once in this process and report timings/memory"""
+    import numpy  # noqa: F401 - imported up front so it is not charged to either mode
+    from app.rag.graph_rag import ConceptNode
+    from app.rag.graph_snapshot import ConceptGraphSnapshot, GRAPH_JSON_PATH, SNAPSHOT_DIR
+
+    before = _memory_kb()
+    start = time.perf_counter()
+
+    if mode == "json":
+        with open(GRAPH_JSON_PATH) as f:
+            data = json.load(f)
+        nodes = {}
+        for node in data.get("nodes", []):
+            hierarchy = node.get("hierarchy_info", {})
+            nodes[node["id"]] = ConceptNode(
+                id=node["id"],
+                label=node["label"],
+                document_count=node.get("document_count", 0),
+                children=hierarchy.get("children", []),
+                prerequisites=hierarchy.get("prerequisites", []),
+            )
+        edges = data.get("edges", [])
+        first = next(iter(nodes), None)
+        _ = [e["target"] for e in edges if e["source"] == first and e["type"] == "PREREQUISITE_FOR"]
+    else:
+        graph = ConceptGraphSnapshot.open(SNAPSHOT_DIR)
+        ids = graph.node_ids()
+        if ids:
+            idx = graph.string_index(ids[0])
+            _ = graph.targets(idx, ["PREREQUISITE_FOR"])
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    after = _memory_kb()
+    return {
+        "mode": mode,
+        "cold_start_ms": elapsed_ms,
+        "rss_delta_kb": after.get("Rss", 0) - before.get("Rss", 0),
+        "private_delta_kb": (after.get("Private_Clean", 0) + after.get("Private_Dirty", 0))
+        - (before.get("Private_Clean", 0) + before.get("Private_Dirty", 0)),
+        "shared_delta_kb": (after.get("Shared_Clean", 0) + after.get("Shared_Dirty", 0))
+        - (before.get("Shared_Clean", 0) + before.get("Shared_Dirty", 0)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concept graph loading")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--child", choices=["json", "snapshot"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_mode(args.child)))
+        return 0
+
+    from app.rag.graph_snapshot import ConceptGraphSnapshot, GRAPH_JSON_PATH, SNAPSHOT_DIR, write_graph_snapshot
+
+    if not GRAPH_JSON_PATH.exists():
+        print(f"❌ Concept graph not found at {GRAPH_JSON_PATH} - run assess_course_data_quality.py first")
+        return 1
+    if ConceptGraphSnapshot.open(SNAPSHOT_DIR) is None or ConceptGraphSnapshot.is_stale():
+        with open(GRAPH_JSON_PATH) as f:
+            write_graph_snapshot(json.load(f))
+
+    print("=" * 70)
+    print(f"CONCEPT GRAPH LOAD BENCHMARK ({args.runs} fresh processes per mode)")
+    print("=" * 70)
+    print(f"  JSON:     {GRAPH_JSON_PATH.stat().st_size / 1024:.1f} KB")
+    print(f"  Snapshot: {sum(p.stat().st_size for p in SNAPSHOT_DIR.iterdir()) / 1024:.1f} KB")
+
+    env = {**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent)}
+    for mode in ("json", "snapshot"):
+        results = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode],
+                capture_output=True, text=True, env=env, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(
+            f"  {mode:<9} cold start {mean(r['cold_start_ms'] for r in results):8.2f} ms | "
+            f"RSS +{mean(r['rss_delta_kb'] for r in results):8.0f} KB | "
+            f"private +{mean(r['private_delta_kb'] for r in results):8.0f} KB | "
+            f"shared +{mean(r['shared_delta_kb'] for r in results):8.0f} KB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/chat/stream framing: one frame per event vs SSEWriter
+
+Replays an agent event trace with its original timing through:
+    legacy  - previous behaviour: f"data: {json.dumps(event)}\\n\\n" for every event, pings included
+    writer  - SSEWriter (pings dropped, text-deltas coalesced, compact encoding)
+
+Each yielded chunk is one write to the socket, so frames ~ send syscalls.
+The writer output is also parsed the way extension/src/hooks/use-chat.ts does
+(split on blank lines, JSON.parse each `data:` line) and checked against the
+legacy stream: same answer text, same non-text events in the same order.
+
+Trace file (optional): JSONL, one {"dt_ms": <gap before event>, "event": {...}}
+per line, e.g. recorded by logging events in astream_agent. Without one a
+synthetic turn is used (reasoning-node pings, queue updates, sources,
+~600 answer tokens at ~12 ms, evaluation).
+
+Run: cd backend && python scripts/benchmark_sse_writer.py [--trace turn.jsonl] [--coalesce-ms 30 80]
+"""
+
+import sys
+import json
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.sse import SSEWriter, ORJSON_AVAILABLE  # noqa: E402
+from app.config import settings  # noqa: E402
+
+WORDS = (
+    "gradient descent moves the weights a small step against the gradient of the loss "
+    "so each update lowers the error a little the learning rate sets the step size"
+).split()
+
+
+def synthetic_trace(seed: int = 0) -> list:
+    """One tutor turn as astream_agent emits it today"""
+    rnd = random.Random(seed)
+    trace = [
+        (0, {"type": "trace-id", "traceId": "4f3c2a1b9d8e7f6a5b4c3d2e1f0a9b8c"}),
+        (1, {"type": "queue-init", "queue": [
+            {"id": s, "label": s.replace("-", " ").title(), "status": "pending"}
+            for s in ("policy-check", "reasoning", "intent-routing", "response-gen", "quality-check")
+        ]}),
+        (5, {"type": "queue-update", "queueItemId": "policy-check", "status": "processing"}),
+        (20, {"type": "queue-update", "queueItemId": "policy-check", "status": "completed"}),
+        (1, {"type": "queue-update", "queueItemId": "reasoning", "status": "processing"}),
+    ]
+    # Reasoning node output tokens and unhandled chain/model events -> pings
+    trace += [(rnd.uniform(3, 9), {"type": "ping"}) for _ in range(320)]
+    trace += [
+        (1, {"type": "queue-update", "queueItemId": "reasoning", "status": "completed"}),
+        (0, {"type": "chain-of-thought", "thoughts": ["Student asks about gradient descent", "Use guided scaffolding"]}),
+        (0, {"type": "concepts-detected", "concepts": ["gradient_descent", "learning_rate"]}),
+        (30, {"type": "queue-update", "queueItemId": "intent-routing", "status": "completed"}),
+        (1, {"type": "queue-update", "queueItemId": "response-gen", "status": "processing"}),
+    ]
+    trace += [(rnd.uniform(1, 4), {"type": "ping"}) for _ in range(40)]
+    for i in range(600):
+        token = rnd.choice(WORDS) + (" " if rnd.random() < 0.8 else ", ")
+        trace.append((rnd.uniform(6, 18), {"type": "text-delta", "textDelta": token}))
+        if i % 5 == 0:  # Unhandled on_chain_stream / metadata events between tokens
+            trace.append((0.1, {"type": "ping"}))
+    trace += [
+        (2, {"type": "queue-update", "queueItemId": "response-gen", "status": "completed"}),
+        (0, {"type": "sources", "sources": [
+            {"title": f"Week {i} Lecture", "url": f"https://example.edu/res{i:05d}", "description": "Gradient descent and learning rate", "relevance_score": 0.8}
+            for i in range(1, 5)
+        ]}),
+        (400, {"type": "queue-update", "queueItemId": "quality-check", "status": "completed"}),
+        (1, {"type": "evaluation", "evaluation": {"agent_used": "tutor", "pedagogical_score": 0.82, "coherence_score": 0.9}}),
+        (1, {"type": "finish", "chatId": "c0ffee00-0000-0000-0000-000000000000", "traceId": "4f3c2a1b9d8e7f6a5b4c3d2e1f0a9b8c"}),
+    ]
+    return trace
+
+
+def load_trace(path: Path) -> list:
+    trace = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                trace.append((float(record.get("dt_ms", 0)), record["event"]))
+    return trace
+
+
+async def replay(trace: list, speed: float):
+    for dt_ms, event in trace:
+        if dt_ms > 0:
+            await asyncio.sleep(dt_ms / 1000.0 / speed)
+        yield event
+
+
+async def run_legacy(trace: list, speed: float) -> list:
+    frames = []
+    async for event in replay(trace, speed):
+        frames.append(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+    return frames
+
+
+async def run_writer(trace: list, speed: float, coalesce_ms: float) -> tuple:
+    writer = SSEWriter(coalesce_ms=coalesce_ms)
+    frames = [frame async for frame in writer.stream(replay(trace, speed))]
+    return frames, writer.stats
+
+
+def parse_like_client(frames: list) -> list:
+    """extension/src/hooks/use-chat.ts: split on blank lines, JSON.parse `data: ` lines"""
+    events = []
+    for block in b"".join(frames).decode("utf-8").split("\n\n"):
+        if block.startswith("data: "):
+            events.append(json.loads(block[6:]))
+    return events
+
+
+def summarize(events: list) -> tuple:
+    text = "".join(e.get("textDelta", "") for e in events if e.get("type") == "text-delta")
+    others = [e for e in events if e.get("type") not in ("text-delta", "ping")]
+    return text, others
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSE framing for /api/chat/stream")
+    parser.add_argument("--trace", type=Path, help="JSONL trace ({dt_ms, event} per line)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument(
+        "--coalesce-ms", type=float, nargs="+", default=[settings.sse_coalesce_ms],
+        help="Coalescing windows to compare (default: settings.sse_coalesce_ms)"
+    )
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace()
+
+    legacy = asyncio.run(run_legacy(trace, args.speed))
+    legacy_bytes = sum(len(f) for f in legacy)
+    legacy_text, legacy_other = summarize(parse_like_client(legacy))
+
+    print("=" * 70)
+    print(f"SSE FRAMING BENCHMARK ({len(trace)} events, {'recorded' if args.trace else 'synthetic'} trace)")
+    print("=" * 70)
+    print(f"  Encoder: {'orjson' if ORJSON_AVAILABLE else 'json (compact)'}")
+    print(f"  legacy         {len(legacy):6d} frames (~send calls) | {legacy_bytes / 1024:8.1f} KB")
+
+    compatible = True
+    for coalesce_ms in args.coalesce_ms:
+        writer, stats = asyncio.run(run_writer(trace, args.speed, coalesce_ms))
+        writer_bytes = sum(len(f) for f in writer)
+        writer_text, writer_other = summarize(parse_like_client(writer))
+        same = writer_text == legacy_text and writer_other == legacy_other
+        compatible = compatible and same
+        print(
+            f"  writer {coalesce_ms:4.0f}ms  {len(writer):6d} frames (~send calls) | {writer_bytes / 1024:8.1f} KB | "
+            f"frames {len(legacy) / max(1, len(writer)):5.1f}x fewer, bytes {legacy_bytes / max(1, writer_bytes):4.1f}x fewer | "
+            f"pings dropped {stats['dropped_pings']} | client-visible stream identical: {'yes' if same else 'NO'}"
+        )
+    return 0 if compatible else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
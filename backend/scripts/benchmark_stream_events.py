@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-turn event handling: astream_events filtering vs narrow stream modes
+
+Builds one synthetic tutor turn in both shapes and times only the Python work
+done on our side of the graph:
+    legacy  - astream_events(v2): every chain/model/parser start, stream and end
+              event of every node, each run through the old _process_event
+              filter (tag/parent/metadata checks, JSON-leak checks, <thinking>
+              buffering) - most end up as pings
+    narrow  - stream_mode=["updates", "messages", "custom"] with internal models
+              tagged nostream: only queue-updates, answer text and one update
+              per node reach StreamEventMapper
+
+Both paths must produce the same client-visible events (pings excluded); the
+script exits non-zero if they differ.
+
+Run: cd backend && python scripts/benchmark_stream_events.py [--turns 200] [--tokens 600]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_core.messages import AIMessageChunk  # noqa: E402
+
+from app.agents.answer_stream import AnswerStreamFilter  # noqa: E402
+from app.agents.stream_events import QUEUE_STAGES, StreamEventMapper  # noqa: E402
+
+WORDS = (
+    "gradient descent moves the weights a small step against the gradient of the loss "
+    "so each update lowers the error a little the learning rate sets the step size"
+).split()
+
+NODES = ["reasoning", "governor", "supervisor", "pedagogical_tutor", "quality_gate", "length_enforcer", "evaluator"]
+REASONING_OUTPUT = {"thought_chain": ["Student asks about gradient descent", "Use guided scaffolding"],
+                    "key_concepts_detected": ["gradient_descent", "learning_rate"]}
+TUTOR_OUTPUT = {"response_sources": [{"title": f"Week {i} Lecture", "url": f"https://example.edu/res{i:05d}"} for i in range(1, 5)]}
+EVALUATOR_OUTPUT = {"evaluation": {"agent_used": "tutor", "pedagogical_score": 0.82}}
+NODE_OUTPUTS = {"reasoning": REASONING_OUTPUT, "pedagogical_tutor": TUTOR_OUTPUT, "evaluator": EVALUATOR_OUTPUT}
+
+
+def answer_tokens(count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    return [rnd.choice(WORDS) + (" " if rnd.random() < 0.8 else ", ") for _ in range(count)]
+
+
+# ---------- legacy shape ----------
+
+def legacy_events(tokens: list, reasoning_tokens: int) -> list:
+    """astream_events(v2) sequence for one turn"""
+    events = [{"event": "on_chain_start", "name": "LangGraph", "data": {}}]
+    for node in NODES:
+        meta = {"langgraph_node": node}
+        events.append({"event": "on_chain_start", "name": node, "data": {}, "metadata": meta})
+        if node == "reasoning":
+            events.append({"event": "on_chat_model_start", "name": "ChatGoogleGenerativeAI", "data": {}, "metadata": meta})
+            for _ in range(reasoning_tokens):
+                events.append({
+                    "event": "on_chat_model_stream", "name": "ChatGoogleGenerativeAI",
+                    "tags": ["reasoning_internal", "no_stream"], "metadata": meta, "parent_ids": ["reasoning"],
+                    "data": {"chunk": AIMessageChunk(content='"analysis": "step"')},
+                })
+            events.append({"event": "on_chat_model_end", "name": "ChatGoogleGenerativeAI", "data": {}, "metadata": meta})
+        if node == "pedagogical_tutor":
+            events.append({"event": "on_chat_model_start", "name": "ChatGoogleGenerativeAI", "data": {}, "metadata": meta})
+            for token in tokens:
+                # Raw model chunk (tagged no_stream) followed by the filtered answer_delta
+                events.append({
+                    "event": "on_chat_model_stream", "name": "ChatGoogleGenerativeAI",
+                    "tags": ["no_stream"], "metadata": meta, "parent_ids": ["pedagogical_tutor"],
+                    "data": {"chunk": AIMessageChunk(content=token)},
+                })
+                events.append({"event": "on_custom_event", "name": "answer_delta", "data": {"node": node, "text": token}})
+            events.append({"event": "on_chat_model_end", "name": "ChatGoogleGenerativeAI", "data": {}, "metadata": meta})
+        # Channel writes / routing functions show up as nested chains
+        events.append({"event": "on_chain_start", "name": "ChannelWrite", "data": {}, "metadata": meta})
+        events.append({"event": "on_chain_end", "name": "ChannelWrite", "data": {}, "metadata": meta})
+        events.append({"event": "on_chain_stream", "name": node, "data": {"chunk": NODE_OUTPUTS.get(node, {})}, "metadata": meta})
+        events.append({"event": "on_chain_end", "name": node, "data": {"output": NODE_OUTPUTS.get(node, {})}, "metadata": meta})
+    events.append({"event": "on_chain_end", "name": "LangGraph", "data": {}})
+    return events
+
+
+def legacy_process_event(event, thinking_filter):
+    """The removed tutor_agent._process_event, reduced to the branches this turn exercises"""
+    kind = event["event"]
+    if kind == "on_chat_model_stream":
+        tags = event.get("tags", []) or []
+        run_name = event.get("name", "")
+        metadata = event.get("metadata", {}) or {}
+        tags_lower = [t.lower() if isinstance(t, str) else str(t).lower() for t in tags]
+        parent_str = str(event.get("parent_ids", []) or []).lower()
+        if (
+            "reasoning_internal" in tags_lower or "no_stream" in tags_lower or
+            "reasoning" in parent_str or "multi_step_reasoning" in parent_str or
+            "reasoningengine" in run_name.lower() or metadata.get("langgraph_node") == "reasoning" or
+            metadata.get("internal") is True or metadata.get("component") == "reasoning_engine"
+        ):
+            return {"type": "ping"}
+        content = event["data"]["chunk"].content or ""
+        stripped = content.strip()
+        if stripped.startswith('{"perception"') or stripped.startswith('{"analysis"') or (
+                '"query_type"' in content and '"topic_domain"' in content):
+            return {"type": "ping"}
+        content = thinking_filter.feed(content)
+        return {"type": "text-delta", "textDelta": content} if content else {"type": "ping"}
+
+    if kind == "on_custom_event" and event.get("name") == "answer_delta":
+        return {"type": "text-delta", "textDelta": event["data"]["text"]}
+
+    if kind in ("on_chain_start", "on_chain_end") and event.get("name") in QUEUE_STAGES:
+        name = event["name"]
+        status = "processing" if kind == "on_chain_start" else "completed"
+        result = [{"type": "queue-update", "queueItemId": QUEUE_STAGES[name], "status": status}]
+        if kind == "on_chain_end":
+            output = event["data"].get("output", {}) or {}
+            if name == "reasoning":
+                if output.get("thought_chain"):
+                    result.append({"type": "chain-of-thought", "thoughts": output["thought_chain"]})
+                if output.get("key_concepts_detected"):
+                    result.append({"type": "concepts-detected", "concepts": output["key_concepts_detected"]})
+            if name == "pedagogical_tutor" and output.get("response_sources"):
+                result.append({"type": "sources", "sources": output["response_sources"]})
+            if name == "evaluator" and output.get("evaluation"):
+                result.append({"type": "evaluation", "evaluation": output["evaluation"]})
+        return result if len(result) > 1 else result[0]
+    return {"type": "ping"}
+
+
+def run_legacy(events: list) -> list:
+    thinking_filter = AnswerStreamFilter()
+    out = []
+    for event in events:
+        result = legacy_process_event(event, thinking_filter)
+        out.extend(result if isinstance(result, list) else [result])
+    return out
+
+
+# ---------- narrow shape ----------
+
+def narrow_parts(tokens: list) -> list:
+    """(mode, data) parts from astream(stream_mode=STREAM_MODES) for one turn"""
+    parts = []
+    for node in NODES:
+        queue_id = QUEUE_STAGES.get(node)
+        if queue_id:
+            parts.append(("custom", {"type": "queue-update", "queueItemId": queue_id, "status": "processing"}))
+        if node == "pedagogical_tutor":
+            parts.extend(("custom", {"type": "text-delta", "textDelta": token}) for token in tokens)
+        if queue_id:
+            parts.append(("custom", {"type": "queue-update", "queueItemId": queue_id, "status": "completed"}))
+        parts.append(("updates", {node: NODE_OUTPUTS.get(node, {})}))
+    return parts
+
+
+def run_narrow(parts: list) -> list:
+    mapper = StreamEventMapper()
+    out = []
+    for mode, data in parts:
+        out.extend(mapper.map(mode, data))
+    out.extend(mapper.finish())
+    return out
+
+
+def client_view(events: list) -> list:
+    """Events as the extension sees them (pings dropped, text joined in place)"""
+    view, text = [], []
+    for event in events:
+        if event["type"] == "ping":
+            continue
+        if event["type"] == "text-delta":
+            text.append(event["textDelta"])
+            continue
+        if text:
+            view.append({"type": "text-delta", "textDelta": "".join(text)})
+            text = []
+        view.append(event)
+    if text:
+        view.append({"type": "text-delta", "textDelta": "".join(text)})
+    # queue-update completed may be reported before or after the node's update part
+    return sorted(json.dumps(e, sort_keys=True) for e in view)
+
+
+def time_per_turn(fn, payload, turns: int) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        fn(payload)
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent event stream handling per turn")
+    parser.add_argument("--turns", type=int, default=200, help="Turns to time")
+    parser.add_argument("--tokens", type=int, default=600, help="Answer tokens per turn")
+    parser.add_argument("--reasoning-tokens", type=int, default=300, help="Internal reasoning tokens per turn")
+    args = parser.parse_args()
+
+    tokens = answer_tokens(args.tokens, seed=0)
+    legacy = legacy_events(tokens, args.reasoning_tokens)
+    narrow = narrow_parts(tokens)
+
+    legacy_out = run_legacy(legacy)
+    narrow_out = run_narrow(narrow)
+    same = client_view(legacy_out) == client_view(narrow_out)
+
+    legacy_us = time_per_turn(run_legacy, legacy, args.turns)
+    narrow_us = time_per_turn(run_narrow, narrow, args.turns)
+    pings = sum(1 for e in legacy_out if e["type"] == "ping")
+
+    print("=" * 70)
+    print(f"STREAM EVENT BENCHMARK ({args.tokens} answer tokens, {args.reasoning_tokens} reasoning tokens, {args.turns} turns)")
+    print("=" * 70)
+    print(f"  legacy  {len(legacy):6d} graph events -> {len(legacy_out):5d} out ({pings} pings) | {legacy_us:8.1f} us/turn")
+    print(f"  narrow  {len(narrow):6d} stream parts -> {len(narrow_out):5d} out             | {narrow_us:8.1f} us/turn")
+    print(f"  {len(legacy) / max(1, len(narrow)):.1f}x fewer events, {legacy_us / max(narrow_us, 1e-9):.1f}x less time")
+    print(f"  client-visible events identical: {'yes' if same else 'NO'}")
+    print("  (excludes LangGraph's own cost of building the events, which also drops)")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
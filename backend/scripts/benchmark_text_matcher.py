@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-turn text classification: per-pattern regex loops vs shared TextMatcher
+
+One "turn" runs every text check a chat request performs:
+- reasoning node:    frustrated / follow-up / incomplete heuristics on the query
+- evaluator:         concept tagging + misconception detection on the query
+- pedagogical tutor: concept detection + frustrated check on the query
+- math agent:        math topic scoring on the query
+- source metadata:   topic titles for 5 res##### source previews
+- tutor agent:       recent topics over the last 4 history messages
+
+Modes:
+    legacy   - previous behaviour: re.search for every pattern of every table
+    matcher  - scan_text() (cache cleared between turns, so each turn scans cold)
+
+Run: cd backend && python scripts/benchmark_text_matcher.py [--turns 2000]
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents.text_matcher import (  # noqa: E402
+    AHOCORASICK_AVAILABLE,
+    CONCEPT_PATTERNS,
+    COURSE_GENERAL_KEYWORDS,
+    FOLLOW_UP_PATTERNS,
+    FRUSTRATED_FOLLOW_UP_PATTERNS,
+    INCOMPLETE_FOLLOW_UP_PATTERNS,
+    MATH_TOPICS,
+    MISCONCEPTION_PATTERNS,
+    RECENT_TOPIC_KEYWORDS,
+    SOURCE_TOPIC_PATTERNS,
+    TEXT_MATCHERS,
+    scan_text,
+)
+
+QUERIES = [
+    "what is backpropagation?",
+    "no",
+    "i still don't get it",
+    "how does gradient descent minimize the loss function?",
+    "can you explain that again with an example",
+    "what's the difference between knn and svm for classification",
+    "tell me more",
+    "when is the midterm?",
+    "derive the partial derivative of the sigmoid activation",
+    "is a neural network just linear regression with more layers?",
+]
+
+FILLER = (
+    "In this lecture we cover how models are trained on labeled data, how the "
+    "learning rate affects convergence, why overfitting happens with too many "
+    "parameters, and how cross validation gives an honest estimate of accuracy. "
+)
+
+
+def _make_turn(rnd: random.Random) -> dict:
+    return {
+        "query": rnd.choice(QUERIES),
+        "previews": [FILLER[rnd.randint(0, 80):][:300] + str(rnd.random()) for _ in range(5)],
+        "history": [(FILLER * 4) + str(rnd.random()) for _ in range(4)],
+    }
+
+
+def legacy_turn(turn: dict) -> None:
+    """Per-pattern loops as the call sites ran them before the shared matcher"""
+    query_lower = turn["query"].lower().strip()
+
+    # reasoning node
+    any(re.search(p, query_lower, re.IGNORECASE) for p in FRUSTRATED_FOLLOW_UP_PATTERNS)
+    any(re.search(p, query_lower) for p in FOLLOW_UP_PATTERNS)
+    any(re.search(p, query_lower) for p in INCOMPLETE_FOLLOW_UP_PATTERNS)
+
+    # evaluator
+    found = [c for c, p in CONCEPT_PATTERNS.items() if re.search(p, query_lower, re.IGNORECASE)]
+    if not found:
+        any(k in query_lower for k in COURSE_GENERAL_KEYWORDS)
+    [m for m, info in MISCONCEPTION_PATTERNS.items() if re.search(info["pattern"], query_lower, re.IGNORECASE)]
+
+    # pedagogical tutor
+    next((c for c, p in CONCEPT_PATTERNS.items() if re.search(p, query_lower, re.IGNORECASE)), None)
+    any(re.search(p, query_lower, re.IGNORECASE) for p in FRUSTRATED_FOLLOW_UP_PATTERNS)
+
+    # math agent
+    {t: sum(1 for p in ps if re.search(p, query_lower)) for t, ps in MATH_TOPICS.items()}
+
+    # source metadata
+    for preview in turn["previews"]:
+        content = preview.lower()
+        next((title for p, title in SOURCE_TOPIC_PATTERNS if re.search(p, content)), None)
+
+    # tutor agent
+    for message in turn["history"]:
+        content = message.lower()
+        [t for k, t in RECENT_TOPIC_KEYWORDS.items() if k in content]
+
+
+def matcher_turn(turn: dict) -> None:
+    """The same checks through scan_text()"""
+    query_lower = turn["query"].lower().strip()
+
+    matches = scan_text(query_lower)
+    matches.has("frustrated"), matches.has("follow_up"), matches.has("incomplete")
+
+    matches = scan_text(turn["query"])
+    matches.labels("concept") or matches.has("course_general")
+    matches.labels("misconception")
+    matches.first("concept")
+    scan_text(query_lower).has("frustrated")
+    matches.counts.get("math_topic", {})
+
+    for preview in turn["previews"]:
+        scan_text(preview, "source").first("source_topic")
+    for message in turn["history"]:
+        scan_text(message, "history").labels("recent_topic")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn text classification")
+    parser.add_argument("--turns", type=int, default=2000, help="Turns per mode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    turns = [_make_turn(rnd) for _ in range(args.turns)]
+
+    print("=" * 70)
+    print(f"TEXT CLASSIFICATION BENCHMARK ({args.turns} turns)")
+    print("=" * 70)
+    print(f"  Patterns: {sum(len(m.specs) for m in TEXT_MATCHERS.values())} | Aho-Corasick: {'yes' if AHOCORASICK_AVAILABLE else 'no (regex fallback)'}")
+
+    results = {}
+    for mode, run in (("legacy", legacy_turn), ("matcher", matcher_turn)):
+        run(turns[0])  # warm the re module cache
+        start = time.process_time()
+        for turn in turns:
+            if mode == "matcher":
+                scan_text.cache_clear()
+            run(turn)
+        per_turn_us = (time.process_time() - start) / len(turns) * 1e6
+        results[mode] = per_turn_us
+        print(f"  {mode:<8} {per_turn_us:9.1f} µs CPU / turn")
+
+    print(f"  speedup  {results['legacy'] / results['matcher']:9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
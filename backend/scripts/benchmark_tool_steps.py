@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark tool-step latency for multi-call steps
+
+Builds model steps with 1..--max-calls tool calls (retrieve_context for
+several concepts plus check_syllabus, as the model emits them) and times,
+per fan-out:
+    sequential - the calls one after another (the blocking path)
+    sync       - tools_node.invoke (calls on the tool executor)
+    async      - await tools_node.ainvoke (async tools, one gather per step)
+reporting p50 / p95 step latency. Fan-outs above
+settings.tool_max_calls_per_step are capped, so their extra calls return at
+once with a "not run" result.
+
+By default the RAG/syllabus agents are replaced with stand-ins that block
+for --latency-ms per call, like a Chroma HTTP query. --live uses the real
+agents (needs Chroma).
+
+Run: cd backend && python scripts/benchmark_tool_steps.py [--max-calls 4] [--steps 20] [--latency-ms 120] [--live]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_core.messages import AIMessage  # noqa: E402
+
+from app.agents import sub_agents  # noqa: E402
+from app.agents.tools import get_tool_step_stats, tools_node, tutor_tools  # noqa: E402
+from app.config import settings  # noqa: E402
+
+CONCEPTS = ["backpropagation", "gradient descent", "k-means clustering", "decision trees", "naive bayes", "perceptron"]
+
+
+class SimulatedRAGAgent:
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def retrieve_context(self, query, course_id="COMP237", state=None):
+        time.sleep(self.latency_s)
+        return [{"content": f"{query} notes", "source_filename": "week3.pdf", "course_id": course_id}]
+
+
+class SimulatedSyllabusAgent:
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def check_syllabus(self, query):
+        time.sleep(self.latency_s)
+        return {"found": True, "content": [f"Syllabus: {query}"]}
+
+
+def make_step(calls: int, step: int) -> dict:
+    """State whose last message is a model step with `calls` tool calls"""
+    tool_calls = [{"name": "check_syllabus", "args": {"query": "midterm date"}, "id": f"s{step}"}]
+    tool_calls += [
+        {"name": "retrieve_context", "args": {"query": CONCEPTS[(step + i) % len(CONCEPTS)]}, "id": f"r{step}-{i}"}
+        for i in range(calls - 1)
+    ]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls[:calls])]}
+
+
+def run_sequential(state: dict) -> None:
+    tools = {t.name: t for t in tutor_tools}
+    for call in state["messages"][-1].tool_calls:
+        tools[call["name"]].invoke(call["args"])
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+async def run(args) -> int:
+    if not args.live:
+        sub_agents._rag_agent = SimulatedRAGAgent(args.latency_ms / 1000)
+        sub_agents._syllabus_agent = SimulatedSyllabusAgent(args.latency_ms / 1000)
+
+    modes = {
+        "sequential": lambda state: asyncio.to_thread(run_sequential, state),
+        "sync": lambda state: asyncio.to_thread(tools_node.invoke, state),
+        "async": tools_node.ainvoke,
+    }
+    await tools_node.ainvoke(make_step(1, 0))  # First use creates the agents
+
+    print(f"steps per fan-out: {args.steps}, cap: {settings.tool_max_calls_per_step} calls/step, "
+          f"{'live Chroma' if args.live else f'simulated {args.latency_ms:g} ms per call'}")
+    print(f"{'calls':>5} " + " ".join(f"{mode + ' p50':>15} {mode + ' p95':>15}" for mode in modes))
+    for calls in range(1, args.max_calls + 1):
+        row = []
+        for run_step in modes.values():
+            samples = []
+            for step in range(args.steps):
+                state = make_step(calls, step)
+                start = time.perf_counter()
+                await run_step(state)
+                samples.append((time.perf_counter() - start) * 1000)
+            row.append(f"{percentile(samples, 0.5):>13.1f}ms {percentile(samples, 0.95):>13.1f}ms")
+        print(f"{calls:>5} " + " ".join(row))
+
+    print(f"\ncapped calls: {get_tool_step_stats().snapshot()['capped_calls']}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-calls", type=int, default=4, help="Largest tool fan-out per step")
+    parser.add_argument("--steps", type=int, default=20, help="Steps timed per fan-out and mode")
+    parser.add_argument("--latency-ms", type=float, default=120.0, help="Simulated backend latency per call")
+    parser.add_argument("--live", action="store_true", help="Call the real RAG/syllabus agents")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
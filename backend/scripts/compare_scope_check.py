@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare the Governor's scope index against the vector-search scope check
+
+For each query, the old behaviour (k=3 Chroma search, closest distance vs
+0.80) and the new one (centroid index, vector search only in the ambiguous
+band) are both run. Reports how often the index decides on its own, the
+agreement with the old decision, every disagreement, and the time each
+path takes. The reasoning-node bypass is left out: it is the same in both.
+
+Queries come from --queries (one per line), from logged turns in the
+Supabase `interactions` table (--from-interactions), or a built-in sample.
+Needs ChromaDB, the embedding API and a built index
+(python -m app.rag.scope_index).
+
+Run: cd backend && python scripts/compare_scope_check.py [--queries q.txt | --from-interactions]
+"""
+
+import sys
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents.governor import Governor  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.rag.scope_index import get_scope_index  # noqa: E402
+
+SAMPLE_QUERIES = [
+    "What is machine learning?",
+    "Explain backpropagation algorithm",
+    "How does gradient descent work?",
+    "What is the Turing test?",
+    "K-nearest neighbors classification",
+    "how does minimax pruning work in games",
+    "what's the difference between BFS and DFS",
+    "when is assignment 2 due",
+    "What is the capital of France?",
+    "Give me a recipe for lasagna",
+    "who won the world cup",
+    "help me write my resume",
+]
+
+
+def load_queries(args):
+    if args.queries:
+        return [line.strip() for line in Path(args.queries).read_text().splitlines() if line.strip()]
+    if not args.from_interactions:
+        return SAMPLE_QUERIES
+    from supabase import create_client
+    client = create_client(settings.supabase_url, settings.supabase_service_role_key)
+    rows = (
+        client.table("interactions").select("metadata")
+        .eq("type", "question_asked").order("created_at", desc=True)
+        .limit(args.limit).execute().data
+    )
+    queries = [(row.get("metadata") or {}).get("query_preview") for row in rows]
+    return list(dict.fromkeys(q for q in queries if q))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--from-interactions", action="store_true", help="Use logged queries from Supabase")
+    parser.add_argument("--limit", type=int, default=500, help="Max logged queries")
+    args = parser.parse_args()
+
+    index = get_scope_index()
+    if index is None:
+        print("No scope index; build it with: python -m app.rag.scope_index")
+        return 1
+    governor = Governor()
+    queries = load_queries(args)
+
+    outcomes = Counter()
+    disagreements = []
+    old_ms, index_ms = [], []
+    print(f"{'old':<5} {'new':<5} {'path':<10} {'course':>6} {'off':>6}  query")
+    for query in queries:
+        start = time.perf_counter()
+        old = governor._check_scope_vector(query, 0.80)["approved"]
+        old_ms.append((time.perf_counter() - start) * 1000)
+
+        governor.vectorstore.embeddings.embed_query(query)  # Embedding is shared with retrieval; time only the scoring
+        start = time.perf_counter()
+        decision = governor._check_scope_index(query)
+        index_ms.append((time.perf_counter() - start) * 1000)
+        (in_sim, out_sim, _), _ = index.score_query(query, governor.vectorstore.embeddings.embed_query)
+
+        path = "index" if decision is not None else "ambiguous"
+        new = decision["approved"] if decision is not None else old
+        outcomes[path] += 1
+        if new != old:
+            disagreements.append((query, old, new, in_sim, out_sim))
+        print(f"{str(old):<5} {str(new):<5} {path:<10} {in_sim:>6.3f} {out_sim:>6.3f}  {query[:70]!r}")
+
+    total = len(queries)
+    print()
+    print(f"queries: {total}; decided by index: {outcomes['index']} ({outcomes['index'] / total:.0%}), "
+          f"vector search: {outcomes['ambiguous']}")
+    print(f"agreement with vector-search decision: {(total - len(disagreements)) / total:.1%}")
+    print(f"bands: accept >= {settings.scope_accept_similarity}, reject < {settings.scope_reject_similarity}")
+    print(f"vector search: {sum(old_ms) / total:.1f} ms/query    index scoring: {sum(index_ms) / total:.3f} ms/query")
+    for query, old, new, in_sim, out_sim in disagreements:
+        print(f"  old={old} new={new} course={in_sim:.3f} off={out_sim:.3f}: {query[:80]!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Evaluate the local intent classifier against held-out LLM labels
+
+Reports overall accuracy, per-intent precision/recall, the confusion
+matrix, and - for a range of confidence thresholds - the share of turns
+the classifier would route on its own (coverage) and its accuracy on
+those turns. The rest would still go to the LLM classifier, so the
+threshold to pick is the lowest one whose accuracy is acceptable
+(settings.intent_classifier_threshold).
+
+Labels come from the version's own held-out file written at training time
+(intent-<version>.heldout.jsonl) or from --data (same JSONL/CSV format as
+train_intent_classifier.py).
+
+Run: cd backend && python scripts/evaluate_intent_classifier.py [--version V] [--data heldout.jsonl] [--activate]
+"""
+
+import sys
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents.intent_classifier import MODEL_DIR, IntentClassifier, activate_version  # noqa: E402
+from app.config import settings  # noqa: E402
+from scripts.train_intent_classifier import load_from_file, prepare  # noqa: E402
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", help="Model version (default: the active one)")
+    parser.add_argument("--data", help="Labelled JSONL/CSV (default: the version's held-out file)")
+    parser.add_argument("--model-dir", default=settings.intent_classifier_dir or str(MODEL_DIR))
+    parser.add_argument("--activate", action="store_true", help="Make this version the active model")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    classifier = IntentClassifier.load(args.version, model_dir)
+    if classifier is None:
+        print(f"No intent classifier {args.version or '(active)'} in {model_dir}")
+        return 1
+
+    data = args.data or model_dir / f"intent-{classifier.version}.heldout.jsonl"
+    examples = prepare(load_from_file(data))
+    if not examples:
+        print(f"No labelled examples in {data}")
+        return 1
+    queries = [q for q, _ in examples]
+    truth = [i for _, i in examples]
+
+    start = time.perf_counter()
+    for query in queries:
+        classifier.predict(query)
+    per_query_us = (time.perf_counter() - start) / len(queries) * 1e6
+    predicted, confidence = classifier.predict_batch(queries)
+    correct = np.array([p == t for p, t in zip(predicted, truth)])
+
+    print(f"model {classifier.version} on {len(examples)} examples from {data}")
+    print(f"accuracy: {correct.mean():.3f}    predict: {per_query_us:.0f} us/query")
+    print()
+
+    labels = sorted(set(truth) | set(predicted), key=lambda x: (x not in classifier.labels, x))
+    print(f"{'intent':<16}{'support':>8}{'precision':>11}{'recall':>8}")
+    support = Counter(truth)
+    for label in labels:
+        tp = sum(p == label and t == label for p, t in zip(predicted, truth))
+        n_predicted = sum(p == label for p in predicted)
+        precision = tp / n_predicted if n_predicted else 0.0
+        recall = tp / support[label] if support[label] else 0.0
+        print(f"{label:<16}{support[label]:>8}{precision:>11.3f}{recall:>8.3f}")
+    print()
+
+    width = max(len(label) for label in labels) + 2
+    print("confusion (rows = LLM label, columns = predicted)")
+    print(" " * width + "".join(f"{label[:8]:>9}" for label in labels))
+    pairs = Counter(zip(truth, predicted))
+    for row in labels:
+        print(f"{row:<{width}}" + "".join(f"{pairs[(row, col)]:>9}" for col in labels))
+    print()
+
+    print(f"{'threshold':>9}{'coverage':>10}{'accuracy':>10}   (configured: {settings.intent_classifier_threshold})")
+    for threshold in THRESHOLDS:
+        confident = confidence >= threshold
+        accuracy = f"{correct[confident].mean():.3f}" if confident.any() else "-"
+        print(f"{threshold:>9.2f}{confident.mean():>10.1%}{accuracy:>10}")
+
+    if args.activate:
+        activate_version(classifier.version, model_dir)
+        print(f"\nactivated {classifier.version}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
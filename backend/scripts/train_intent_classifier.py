@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Train the local intent classifier from logged turns
+
+Training data is (query, intent) pairs, either pulled from the Supabase
+`interactions` table (intent column + metadata.query_preview) or read from
+--data: a JSONL file of {"query": ..., "intent": ...} objects or a CSV with
+query,intent columns. Turns whose intent came from the classifier itself
+(metadata.intent_source "local_classifier" / "fast_path:learned") are left
+out so the model does not learn from its own predictions.
+
+Queries are de-duplicated (majority intent wins), then split by a stable
+hash of the query into train and held-out sets, so the same query never
+lands in both and re-running on the same data gives the same split. The
+held-out set is written next to the model as intent-<version>.heldout.jsonl
+for scripts/evaluate_intent_classifier.py, and its accuracy is recorded in
+the model metadata.
+
+Run: cd backend && python scripts/train_intent_classifier.py [--data turns.jsonl] [--activate]
+"""
+
+import sys
+import csv
+import json
+import time
+import zlib
+import argparse
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.agents.intent_classifier import (  # noqa: E402
+    INTENTS, MODEL_DIR, activate_version, train_intent_classifier,
+)
+from app.config import settings  # noqa: E402
+
+SELF_LABELED_SOURCES = {"local_classifier", "fast_path:learned"}
+PAGE_SIZE = 1000
+
+
+def load_from_supabase(limit):
+    from supabase import create_client
+
+    if not settings.supabase_url or not settings.supabase_service_role_key:
+        raise SystemExit("Supabase is not configured (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY); use --data")
+    client = create_client(settings.supabase_url, settings.supabase_service_role_key)
+    pairs, skipped = [], 0
+    offset = 0
+    while offset < limit:
+        rows = (
+            client.table("interactions")
+            .select("intent, metadata")
+            .eq("type", "question_asked")
+            .order("created_at", desc=True)
+            .range(offset, min(offset + PAGE_SIZE, limit) - 1)
+            .execute()
+            .data
+        )
+        for row in rows:
+            metadata = row.get("metadata") or {}
+            if metadata.get("intent_source") in SELF_LABELED_SOURCES:
+                skipped += 1
+                continue
+            pairs.append((metadata.get("query_preview") or "", row.get("intent") or ""))
+        if len(rows) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    print(f"Loaded {len(pairs)} interactions from Supabase ({skipped} self-labeled skipped)")
+    return pairs
+
+
+def load_from_file(path):
+    path = Path(path)
+    if path.suffix == ".csv":
+        with open(path, newline="") as f:
+            return [(row.get("query", ""), row.get("intent", "")) for row in csv.DictReader(f)]
+    pairs = []
+    for line in path.read_text().splitlines():
+        if line.strip():
+            row = json.loads(line)
+            if row.get("intent_source") not in SELF_LABELED_SOURCES:
+                pairs.append((row.get("query", ""), row.get("intent", "")))
+    return pairs
+
+
+def prepare(pairs):
+    """Drop unknown intents and empty queries; one majority intent per normalised query"""
+    votes = defaultdict(Counter)
+    originals = {}
+    for query, intent in pairs:
+        query = " ".join(query.split())
+        if not query or intent not in INTENTS:
+            continue
+        key = query.lower()
+        votes[key][intent] += 1
+        originals.setdefault(key, query)
+    return [(originals[key], counter.most_common(1)[0][0]) for key, counter in votes.items()]
+
+
+def is_heldout(query, fraction):
+    return zlib.crc32(query.lower().encode("utf-8")) % 1000 < fraction * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="JSONL/CSV of query,intent pairs (default: Supabase interactions)")
+    parser.add_argument("--limit", type=int, default=50000, help="Max interactions to pull from Supabase")
+    parser.add_argument("--heldout", type=float, default=0.2, help="Share of queries held out for evaluation")
+    parser.add_argument("--min-examples", type=int, default=200, help="Refuse to train on fewer examples")
+    parser.add_argument("--epochs", type=int, default=150)
+    parser.add_argument("--l2", type=float, default=1e-5)
+    parser.add_argument("--model-dir", default=settings.intent_classifier_dir or str(MODEL_DIR))
+    parser.add_argument("--activate", action="store_true", help="Make the new version the active model")
+    args = parser.parse_args()
+
+    pairs = load_from_file(args.data) if args.data else load_from_supabase(args.limit)
+    examples = prepare(pairs)
+    if len(examples) < args.min_examples:
+        print(f"Only {len(examples)} usable examples (< --min-examples {args.min_examples}); not training")
+        return 1
+
+    train = [(q, i) for q, i in examples if not is_heldout(q, args.heldout)]
+    heldout = [(q, i) for q, i in examples if is_heldout(q, args.heldout)]
+    print(f"{len(examples)} unique queries: {len(train)} train, {len(heldout)} held out")
+    print(f"class counts: {dict(Counter(i for _, i in examples))}")
+
+    start = time.perf_counter()
+    classifier = train_intent_classifier(
+        [q for q, _ in train], [i for _, i in train], epochs=args.epochs, l2=args.l2,
+    )
+    print(f"trained in {time.perf_counter() - start:.1f}s (train accuracy {classifier.metadata['train_accuracy']:.3f})")
+
+    if heldout:
+        predicted, confidence = classifier.predict_batch([q for q, _ in heldout])
+        correct = [p == i for p, (_, i) in zip(predicted, heldout)]
+        confident = confidence >= settings.intent_classifier_threshold
+        confident_correct = sum(c for c, ok in zip(correct, confident) if ok)
+        classifier.metadata["heldout"] = {
+            "examples": len(heldout),
+            "accuracy": round(sum(correct) / len(heldout), 4),
+            "threshold": settings.intent_classifier_threshold,
+            "coverage": round(float(confident.mean()), 4),
+            "accuracy_when_confident": round(float(confident_correct / confident.sum()), 4) if confident.any() else None,
+        }
+        print(f"held-out: {classifier.metadata['heldout']}")
+
+    classifier.metadata["source"] = args.data or "supabase:interactions"
+    classifier.save(Path(args.model_dir))
+    model_dir = Path(args.model_dir)
+    with open(model_dir / f"intent-{classifier.version}.heldout.jsonl", "w") as f:
+        for query, intent in heldout:
+            f.write(json.dumps({"query": query, "intent": intent}) + "\n")
+    print(f"saved version {classifier.version} to {model_dir}")
+
+    if args.activate:
+        activate_version(classifier.version, model_dir)
+        print(f"activated {classifier.version} (restart the API or wait for the next deploy to load it)")
+    else:
+        print(f"not activated; check it with scripts/evaluate_intent_classifier.py --version {classifier.version} [--activate]")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,142 @@
+"""
+Answer nodes keep the stored response equal to what the client was streamed
+
+- the model fails mid-stream: the partial answer stays and gets an
+  interruption notice; the canned fallback is only sent when nothing was
+- a step after generation fails: the client keeps the streamed answer and
+  so does the state (no fallback swapped in behind its back)
+
+Run: cd backend && python -m pytest tests/test_answer_errors.py -q
+"""
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from app.agents import answer_stream, math_agent, pedagogical_tutor, stream_events
+from app.agents.answer_stream import INTERRUPTED_NOTICE, AnswerStreamError, stream_answer
+from app.config import settings
+
+ANSWER = "Gradient descent moves the weights a small step against the gradient of the loss. " * 6
+
+
+class FakeModel:
+    """Chat model stand-in: streams `text` in chunks, then raises if `fail` is set"""
+
+    def __init__(self, text: str = ANSWER, fail: bool = False, chunk: int = 20):
+        self.text, self.fail, self.chunk = text, fail, chunk
+
+    def with_config(self, **_):
+        return self
+
+    def stream(self, prompt, config=None):
+        for i in range(0, len(self.text), self.chunk):
+            yield AIMessageChunk(content=self.text[i:i + self.chunk])
+        if self.fail:
+            raise RuntimeError("model connection reset")
+
+
+class FakeSupervisor:
+    model = FakeModel()
+
+    def get_model(self, name):
+        return self.model
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    """Text deltas published to the client stream"""
+    deltas = []
+    monkeypatch.setattr(stream_events, "publish", lambda event: deltas.append(event.get("textDelta", "")) if event.get("type") == "text-delta" else None)
+    monkeypatch.setattr(settings, "generation_budget_enabled", False)
+    monkeypatch.setattr(settings, "streaming_quality_enabled", False)
+    monkeypatch.setattr(settings, "model_cascade_enabled", False)
+    return deltas
+
+
+def test_stream_answer_reports_partial_text(streamed):
+    with pytest.raises(AnswerStreamError) as raised:
+        stream_answer(FakeModel(fail=True), "prompt", "pedagogical_tutor")
+    assert raised.value.partial and ANSWER.startswith(raised.value.partial)
+    assert raised.value.partial == "".join(streamed)
+    assert isinstance(raised.value.__cause__, RuntimeError)
+
+
+def test_stream_answer_failure_before_text_reports_nothing(streamed):
+    with pytest.raises(AnswerStreamError) as raised:
+        stream_answer(FakeModel(text="", fail=True), "prompt", "math_agent")
+    assert raised.value.partial == ""
+    assert streamed == []
+
+
+def _tutor_state(**overrides):
+    state = {
+        "query": "How does gradient descent work?",
+        "retrieved_context": [{"content": "Gradient descent notes", "source_file": "week3.pdf"}],
+        "conversation_history": [],
+        "is_follow_up": True,  # No next-concept/diagram/quiz lookups unless a test wants them
+    }
+    state.update(overrides)
+    return state
+
+
+@pytest.mark.parametrize("node_module,node_fn", [
+    (pedagogical_tutor, "pedagogical_tutor_node"),
+    (math_agent, "math_agent_node"),
+])
+def test_model_failure_mid_stream_keeps_partial_answer(monkeypatch, streamed, node_module, node_fn):
+    monkeypatch.setattr(FakeSupervisor, "model", FakeModel(fail=True))
+    monkeypatch.setattr(node_module, "Supervisor", FakeSupervisor)
+    result = getattr(node_module, node_fn)(_tutor_state())
+    assert result["response"] == "".join(streamed)
+    assert result["response"].endswith(INTERRUPTED_NOTICE)
+    assert result["response"].startswith(ANSWER[:40])
+
+
+@pytest.mark.parametrize("node_module,node_fn", [
+    (pedagogical_tutor, "pedagogical_tutor_node"),
+    (math_agent, "math_agent_node"),
+])
+def test_model_failure_before_any_text_sends_fallback(monkeypatch, streamed, node_module, node_fn):
+    monkeypatch.setattr(FakeSupervisor, "model", FakeModel(text="", fail=True))
+    monkeypatch.setattr(node_module, "Supervisor", FakeSupervisor)
+    result = getattr(node_module, node_fn)(_tutor_state())
+    assert result["response"] == "".join(streamed)
+    assert result["response"] and INTERRUPTED_NOTICE not in result["response"]
+
+
+def test_failure_after_generation_keeps_streamed_answer(monkeypatch, streamed):
+    monkeypatch.setattr(FakeSupervisor, "model", FakeModel())
+    monkeypatch.setattr(pedagogical_tutor, "Supervisor", FakeSupervisor)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("cascade bookkeeping failed")
+
+    monkeypatch.setattr(pedagogical_tutor, "finish_streamed", broken)
+    result = pedagogical_tutor.pedagogical_tutor_node(_tutor_state())
+    assert result["response"] == "".join(streamed) == ANSWER.strip()
+
+
+def test_post_processing_additions_are_streamed(monkeypatch, streamed):
+    from app.agents import quiz_generator, visual_diagrams
+
+    monkeypatch.setattr(FakeSupervisor, "model", FakeModel())
+    monkeypatch.setattr(pedagogical_tutor, "Supervisor", FakeSupervisor)
+    monkeypatch.setattr(pedagogical_tutor, "detect_concept_from_query", lambda query: "gradient_descent")
+    monkeypatch.setattr(visual_diagrams, "get_diagram_for_detected_concept", lambda concept: {"diagram": "x"})
+    monkeypatch.setattr(visual_diagrams, "format_diagram_for_response", lambda diagram, title=None: "\n\n[diagram]")
+
+    def broken_quiz(concept, count=1):
+        raise RuntimeError("quiz bank unavailable")
+
+    monkeypatch.setattr(quiz_generator, "get_quiz_for_concept", broken_quiz)
+    state = _tutor_state(query="Walk me through gradient descent step by step", is_follow_up=False)
+    monkeypatch.setattr(pedagogical_tutor, "select_scaffolding_level", lambda *args, **kwargs: "explained")
+    result = pedagogical_tutor.pedagogical_tutor_node(state)
+    assert result["response"] == "".join(streamed)
+    assert result["response"].endswith("[diagram]")
+
+
+def test_finish_interrupted_answer(streamed):
+    assert answer_stream.finish_interrupted_answer("", "fallback") == "fallback"
+    assert answer_stream.finish_interrupted_answer("Half an ans", "fallback") == "Half an ans" + INTERRUPTED_NOTICE
+    assert streamed == ["fallback", INTERRUPTED_NOTICE]
@@ -0,0 +1,141 @@
+"""
+Streaming-equivalence checks for the answer-cleaning transducer (AnswerStreamFilter)
+
+Random responses built from markdown, whitespace, thinking tags, scaffolding
+labels, fences and braces are split into random chunks:
+    1. streaming == clean_answer(whole text), for every chunking
+    2. clean_answer == the removed whole-response helpers
+       (strip_thinking_blocks, then strip_scaffolding_labels for the tutor).
+       The helpers ran one re.sub per pattern, so a removal could join text
+       into a new tag/label that a later pattern then removed too. A streaming
+       pass cannot retract text it already sent, so those inputs are checked
+       against the same regexes applied in a single pass instead
+    3. reasoning-node JSON leaks (bare, fenced, split anywhere) are removed
+       and the text around them is kept
+
+Throughput is measured by scripts/benchmark_answer_filter.py.
+
+Run: cd backend && python -m pytest tests/test_answer_stream.py -q
+"""
+
+import random
+import re
+
+import pytest
+
+from app.agents.answer_stream import AnswerStreamFilter, SCAFFOLDING_LABELS, clean_answer
+
+CASES = 3000
+CHUNKINGS_PER_LEAK = 50
+
+
+# ---------- reference implementations (the removed whole-response helpers) ----------
+
+def legacy_strip_thinking_blocks(text: str) -> str:
+    if not text:
+        return text
+    cleaned = re.sub(r'<thinking>.*?</thinking>\s*', '', text, flags=re.DOTALL | re.IGNORECASE)
+    cleaned = re.sub(r'</?thinking>\s*', '', cleaned, flags=re.IGNORECASE)
+    return cleaned.strip()
+
+
+def legacy_strip_scaffolding_labels(text: str) -> str:
+    if not text:
+        return text
+    patterns = [rf'\*\*{label}:\*\*\s*' for label in SCAFFOLDING_LABELS] + [rf'{label}:\s*' for label in SCAFFOLDING_LABELS]
+    cleaned = text
+    for pattern in patterns:
+        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+    return cleaned.strip()
+
+
+def legacy_clean(text: str, strip_labels: bool) -> str:
+    cleaned = legacy_strip_thinking_blocks(text)
+    return legacy_strip_scaffolding_labels(cleaned) if strip_labels else cleaned
+
+
+def single_pass_clean(text: str, strip_labels: bool) -> str:
+    """The helpers' regexes as one leftmost pass (no matches created by earlier removals)"""
+    if not text:
+        return text
+    labels = "|".join(SCAFFOLDING_LABELS)
+    pattern = r'<thinking>.*?</thinking>|</?thinking>'
+    if strip_labels:
+        pattern += rf'|\*\*(?:{labels}):\*\*|(?:{labels}):'
+    cleaned = re.sub(rf'(?:{pattern})\s*', '', text, flags=re.DOTALL | re.IGNORECASE)
+    if strip_labels:
+        cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+    return cleaned.strip()
+
+
+# ---------- inputs ----------
+
+FRAGMENTS = [
+    "Gradient descent", " updates", " the weights", ".", ",", " ", "  ", "\n", "\n\n", "\n\n\n", "\t",
+    "**", "*", ":", "Activation", "**Activation:**", "Guidance:", "**Exploration:**", "understanding",
+    "Challenge: ", "verification:", "<thinking>", "</thinking>", "<think", "ing>", "<", ">",
+    "{", "}", "{x}", '{"a": 1}', "```", "```python\n", "```json\n", "json", '"', "- ", "1. ", "$x^2$",
+]
+
+LEAK = '{\n  "perception": {"query_type": "question", "topic_domain": "ml_concepts"},\n  "analysis": {"note": "a } in \\"a string\\""}\n}'
+LEAK_CASES = [
+    (LEAK + "\n\nGradient descent lowers the loss.", "Gradient descent lowers the loss."),
+    ("```json\n" + LEAK + "\n```\nGradient descent lowers the loss.", "Gradient descent lowers the loss."),
+    ("Here is the idea.\n  " + LEAK + "\nIt lowers the loss.", "Here is the idea.\nIt lowers the loss."),
+    ('<thinking>plan</thinking>\n{"decision": {"recommended_intent": "tutor"}}\nAnswer.', "Answer."),
+    ('Set {"perception": 1} inline stays.', 'Set {"perception": 1} inline stays.'),
+    ('```python\n{"a": 1}\n```', '```python\n{"a": 1}\n```'),
+]
+
+
+def random_text(rnd: random.Random) -> str:
+    return "".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(0, 40)))
+
+
+def random_chunks(text: str, rnd: random.Random) -> list:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rnd.randint(1, 12)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def stream(chunks: list, strip_labels: bool) -> str:
+    answer_filter = AnswerStreamFilter(strip_labels=strip_labels)
+    return "".join(answer_filter.feed(c) for c in chunks) + answer_filter.finish()
+
+
+# ---------- tests ----------
+
+@pytest.mark.parametrize("strip_labels", [False, True])
+def test_streaming_matches_whole_text(strip_labels):
+    rnd = random.Random(0)
+    for _ in range(CASES):
+        text = random_text(rnd)
+        assert stream(random_chunks(text, rnd), strip_labels) == clean_answer(text, strip_labels), text
+
+
+@pytest.mark.parametrize("strip_labels", [False, True])
+def test_clean_answer_matches_legacy_helpers(strip_labels):
+    rnd = random.Random(1)
+    for _ in range(CASES):
+        text = random_text(rnd)
+        reference = legacy_clean(text, strip_labels)
+        if reference != single_pass_clean(text, strip_labels):
+            reference = single_pass_clean(text, strip_labels)  # The helpers cascaded
+        assert clean_answer(text, strip_labels) == reference, text
+
+
+@pytest.mark.parametrize("text,expected", LEAK_CASES)
+def test_leaked_reasoning_json_removed(text, expected):
+    rnd = random.Random(2)
+    for _ in range(CHUNKINGS_PER_LEAK):
+        assert stream(random_chunks(text, rnd), strip_labels=True) == expected
+
+
+@pytest.mark.parametrize("text,expected", LEAK_CASES)
+def test_leaked_reasoning_json_removed_at_every_split(text, expected):
+    for i in range(len(text) + 1):
+        assert stream([text[:i], text[i:]], strip_labels=True) == expected, i
@@ -0,0 +1,224 @@
+"""
+Dependency circuit breakers (app/circuit_breaker.py), with a fake clock
+
+- trip: the breaker opens once the failure rate over the window reaches
+  the threshold (not before circuit_min_calls), and then rejects calls
+  without running them
+- half-open: after circuit_open_seconds one probe goes through; success
+  closes the breaker, failure re-opens it
+- timeouts: a call past the timeout fails (the caller stops waiting), and
+  a slow answer still counts as a failure
+- bulkhead: a dependency with every slot taken by hung calls rejects at
+  once, and other dependencies keep working
+- degraded modes: skip returns the fallback, cache the last good result
+- acall: the same breaker for async clients
+
+Run: cd backend && python -m pytest tests/test_circuit_breaker.py -q
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import circuit_breaker
+from app.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, BulkheadFullError, CircuitBreaker, CircuitOpenError, get_circuit_breaker,
+)
+from app.config import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(settings, "circuit_breakers_enabled", True)
+    monkeypatch.setattr(settings, "circuit_window", 10)
+    monkeypatch.setattr(settings, "circuit_min_calls", 4)
+    monkeypatch.setattr(settings, "circuit_failure_rate", 0.5)
+    monkeypatch.setattr(settings, "circuit_open_seconds", 30.0)
+    monkeypatch.setattr(settings, "circuit_half_open_probes", 1)
+    monkeypatch.setattr(circuit_breaker, "_circuit_breakers", {})
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter))
+    return clock
+
+
+def ok():
+    return "ok"
+
+
+def boom():
+    raise ConnectionError("down")
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            breaker.call(boom)
+
+
+def trip(breaker):
+    fail(breaker, settings.circuit_min_calls)
+    assert breaker.state == OPEN
+
+
+def test_trips_at_failure_rate(clock):
+    breaker = CircuitBreaker("chroma", inline=True)
+    fail(breaker, settings.circuit_min_calls - 1)
+    assert breaker.state == CLOSED  # Not enough calls yet
+    assert breaker.call(ok) == "ok"
+    assert breaker.state == CLOSED  # 3 of 4 failed
+    fail(breaker)
+    assert breaker.state == OPEN  # 4 of 5
+    assert breaker.snapshot()["trips"] == 1
+
+
+def test_below_failure_rate_stays_closed(clock):
+    breaker = CircuitBreaker("chroma", inline=True)
+    for _ in range(10):
+        breaker.call(ok)
+        breaker.call(ok)
+        fail(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_open_breaker_rejects_without_calling(clock):
+    breaker = CircuitBreaker("chroma", inline=True)
+    trip(breaker)
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+    assert breaker.call(lambda: calls.append(1), degraded="skip", fallback=[]) == []
+    assert breaker.snapshot()["rejected"] == 2
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = CircuitBreaker("chroma", inline=True)
+    trip(breaker)
+    clock.now += settings.circuit_open_seconds - 1
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+    assert breaker.call(ok) == "ok"
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == CLOSED  # The window was cleared on close
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = CircuitBreaker("chroma", inline=True)
+    trip(breaker)
+    clock.now += settings.circuit_open_seconds
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["trips"] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.call(ok)
+
+
+def test_half_open_allows_limited_probes(clock):
+    breaker = CircuitBreaker("chroma", inline=True)
+    trip(breaker)
+    clock.now += settings.circuit_open_seconds
+    assert breaker.allow()  # Probe slot taken
+    assert not breaker.allow()
+    breaker._release_probe()
+    assert breaker.allow()
+
+
+def test_timeout_fails_fast(clock):
+    breaker = CircuitBreaker("neo4j", timeout=0.05, max_in_flight=2)
+    release = threading.Event()
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        breaker.call(release.wait, 5)
+    assert time.perf_counter() - start < 1.0
+    release.set()
+    assert breaker.snapshot()["timeouts"] == 1
+
+
+def test_slow_answer_counts_as_failure(clock):
+    breaker = CircuitBreaker("redis", timeout=0.01, inline=True)
+    assert breaker.call(time.sleep, 0.03) is None
+    assert breaker.snapshot()["failures"] == 1 and breaker.snapshot()["timeouts"] == 1
+
+
+def test_bulkhead_rejects_when_full_and_isolates_dependencies(clock, monkeypatch):
+    monkeypatch.setattr(settings, "circuit_timeouts", {"neo4j": 0.05, "chroma": 1.0})
+    monkeypatch.setattr(settings, "circuit_max_in_flight", {"neo4j": 2, "chroma": 2})
+    monkeypatch.setattr(settings, "circuit_min_calls", 100)  # Keep the breaker closed
+    neo4j, chroma = get_circuit_breaker("neo4j"), get_circuit_breaker("chroma")
+    release = threading.Event()
+    try:
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                neo4j.call(release.wait, 5)
+        assert neo4j.snapshot()["in_flight"] == 2  # Timed-out calls still hold their threads
+
+        start = time.perf_counter()
+        with pytest.raises(BulkheadFullError):
+            neo4j.call(ok)
+        assert time.perf_counter() - start < 0.05  # Rejected without waiting for the timeout
+        assert neo4j.call(ok, degraded="skip", fallback={}) == {}
+        assert neo4j.snapshot()["bulkhead_rejected"] == 2
+        assert neo4j.snapshot()["failures"] == 2  # Rejections are not dependency failures
+
+        assert chroma.call(ok) == "ok"
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while neo4j.snapshot()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert neo4j.call(ok) == "ok"
+
+
+def test_cache_mode_serves_last_good_result(clock):
+    breaker = CircuitBreaker("supabase", inline=True)
+    assert breaker.call(lambda: {"score": 0.7}, degraded="cache", cache_key=("mastery", "u1")) == {"score": 0.7}
+    assert breaker.call(boom, degraded="cache", cache_key=("mastery", "u1")) == {"score": 0.7}
+    with pytest.raises(ConnectionError):
+        breaker.call(boom, degraded="cache", cache_key=("mastery", "u2"))
+
+
+def test_disabled_calls_go_straight_through(clock, monkeypatch):
+    monkeypatch.setattr(settings, "circuit_breakers_enabled", False)
+    breaker = CircuitBreaker("chroma", inline=True)
+    trip_calls = settings.circuit_min_calls
+    for _ in range(trip_calls):
+        with pytest.raises(ConnectionError):
+            breaker.call(boom)
+    assert breaker.state == CLOSED and breaker.snapshot()["calls"] == 0
+
+
+def test_acall_shares_breaker_state(clock):
+    breaker = get_circuit_breaker("redis")
+
+    async def aboom():
+        raise ConnectionError("down")
+
+    async def aok():
+        return "ok"
+
+    async def run():
+        assert await breaker.acall(aok) == "ok"
+        for _ in range(settings.circuit_min_calls - 1):  # 3 of 4 failed
+            with pytest.raises(ConnectionError):
+                await breaker.acall(aboom)
+        with pytest.raises(CircuitOpenError):
+            await breaker.acall(aok)
+        return await breaker.acall(aok, degraded="skip", fallback=None)
+
+    assert asyncio.run(run()) is None
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(ok)  # The sync path is open too
@@ -0,0 +1,95 @@
+"""
+Personalized PageRank ranking (app/rag/concept_ranker.py)
+
+- the precomputed dense operator and power iteration on P (used above
+  DENSE_SOLVE_MAX_NODES) give the same scores, for both walks, on random
+  graphs with dangling nodes, with and without scipy
+- seeds never rank themselves, mastery pushes a concept down, and unknown
+  or empty seeds rank nothing
+
+Run: cd backend && python -m pytest tests/test_concept_ranker.py -q
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.rag import concept_ranker
+from app.rag.concept_ranker import ConceptRanker
+
+GRAPHS = 20
+
+
+def random_graph(rnd: random.Random):
+    n = rnd.randint(2, 40)
+    ids = [f"c{i}" for i in range(n)]
+    edges = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(rnd.randint(0, 3 * n))]
+    edges.append(("c0", "not_a_concept"))  # Ignored
+    return ids, edges
+
+
+def power_iteration(ranker: ConceptRanker) -> ConceptRanker:
+    """The same ranker with the dense operators dropped, as for a large graph"""
+    ranker._operators = {mode: None for mode in ranker._operators}
+    return ranker
+
+
+@pytest.fixture(params=[True, False], ids=["scipy", "numpy"])
+def scipy_available(request, monkeypatch):
+    if request.param and not concept_ranker.SCIPY_AVAILABLE:
+        pytest.skip("scipy not installed")
+    monkeypatch.setattr(concept_ranker, "SCIPY_AVAILABLE", request.param)
+
+
+@pytest.mark.parametrize("mode", ConceptRanker.MODES)
+def test_dense_matches_power_iteration(scipy_available, mode, monkeypatch):
+    monkeypatch.setattr(concept_ranker, "POWER_ITERATIONS", 500)
+    rnd = random.Random(mode)
+    for _ in range(GRAPHS):
+        ids, edges = random_graph(rnd)
+        seeds = [rnd.sample(ids, rnd.randint(1, min(3, len(ids)))) for _ in range(4)] + [[]]
+        mastery = [{c: rnd.random() for c in rnd.sample(ids, len(ids) // 2)} for _ in seeds]
+        dense = ConceptRanker(ids, edges).score_batch(seeds, mastery, mode)
+        power = power_iteration(ConceptRanker(ids, edges)).score_batch(seeds, mastery, mode)
+        np.testing.assert_allclose(power, dense, atol=1e-7)
+
+
+def test_default_iterations_close_to_dense():
+    rnd = random.Random(1)
+    ids, edges = random_graph(rnd)
+    dense = ConceptRanker(ids, edges).score_batch([["c0"]])
+    power = power_iteration(ConceptRanker(ids, edges)).score_batch([["c0"]])
+    np.testing.assert_allclose(power, dense, atol=1e-3)
+
+
+@pytest.fixture
+def chain():
+    # a -> b -> c -> d, and a -> e
+    return ConceptRanker(list("abcde"), [("a", "b"), ("b", "c"), ("c", "d"), ("a", "e")])
+
+
+def test_seeds_are_not_ranked(chain):
+    assert "a" not in [c for c, _ in chain.rank(["a"], k=5)]
+
+
+def test_next_walk_follows_edge_direction(chain):
+    assert [c for c, _ in chain.rank(["c"], k=5, mode="next")] == ["d"]
+    assert {c for c, _ in chain.rank(["c"], k=5, mode="related")} == {"a", "b", "d", "e"}
+
+
+def test_mastery_pushes_concept_down(chain):
+    plain = dict(chain.rank(["a"], k=5))
+    mastered = dict(chain.rank(["a"], mastery={"b": 1.0}, k=5))
+    assert plain["b"] > plain["e"]  # b also collects the walk coming back from c and d
+    assert mastered["b"] == pytest.approx(plain["b"] * (1 - concept_ranker.DEFAULT_MASTERY_DISCOUNT))
+    assert mastered["e"] == pytest.approx(plain["e"])
+    assert mastered["b"] < mastered["e"]
+
+
+def test_unknown_or_empty_seeds(chain):
+    assert chain.rank(["nope"]) == []
+    assert chain.rank_batch([]) == []
+    assert ConceptRanker([], []).rank(["a"]) == []
+    with pytest.raises(ValueError):
+        chain.score_batch([["a"]], mode="sideways")
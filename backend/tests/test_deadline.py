@@ -0,0 +1,174 @@
+"""
+Turn deadlines (app/agents/deadline.py), with a fake clock
+
+- has_budget_for: optional stages run while the remaining budget is above
+  their deadline_stage_min_seconds, and always without a deadline
+- skip_stage records the skip in DeadlineStats, processing_times and
+  deadline_skips (appending to earlier skips)
+- call_timeout / apply_timeout / run_with_timeout bound required calls
+- graph context lookups are not started without budget, and a streamed
+  answer ends at the first chunk past the deadline
+
+Run: cd backend && python -m pytest tests/test_deadline.py -q
+"""
+
+import concurrent.futures
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from pydantic import BaseModel
+
+from app.agents import deadline, graph_context, stream_events
+from app.agents.answer_stream import stream_answer
+from app.agents.deadline import (
+    DeadlineStats, apply_timeout, call_timeout, has_budget_for, remaining_seconds, run_with_timeout, skip_stage,
+    start_deadline,
+)
+from app.config import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(settings, "turn_deadline_enabled", True)
+    monkeypatch.setattr(settings, "turn_deadline_seconds", 30.0)
+    monkeypatch.setattr(settings, "deadline_stage_min_seconds", {"student_history": 24.0, "graph_context": 12.0})
+    monkeypatch.setattr(settings, "deadline_min_call_timeout_seconds", 2.0)
+    monkeypatch.setattr(deadline, "_deadline_stats", DeadlineStats())
+    clock = Clock()
+    monkeypatch.setattr(deadline, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+def test_start_deadline(clock, monkeypatch):
+    assert start_deadline() == 1030.0
+    monkeypatch.setattr(settings, "turn_deadline_enabled", False)
+    assert start_deadline() is None
+
+
+def test_stages_run_while_budget_lasts(clock):
+    state = {"deadline": start_deadline()}
+    assert has_budget_for(state, "student_history") and has_budget_for(state, "graph_context")
+    clock.now += 10
+    assert not has_budget_for(state, "student_history") and has_budget_for(state, "graph_context")
+    clock.now += 8.5
+    assert not has_budget_for(state, "graph_context")
+    assert has_budget_for(state, "no_minimum")
+    clock.now += 20
+    assert remaining_seconds(state) == -8.5
+
+
+def test_no_deadline_runs_everything(clock):
+    assert has_budget_for({}, "student_history")
+    assert remaining_seconds({"deadline": None}) is None
+    assert call_timeout({}) is None and call_timeout({}, cap=5.0) == 5.0
+
+
+def test_skip_stage_records_everywhere(clock):
+    state = {
+        "deadline": start_deadline(),
+        "processing_times": {"reasoning": 900},
+        "deadline_skips": [{"stage": "student_history", "remaining_ms": 25000}],
+    }
+    clock.now += 20.5
+    update = skip_stage(state, "graph_context")
+    assert update["processing_times"] == {"reasoning": 900, "graph_context_skipped": 9500}
+    assert update["deadline_skips"][-1] == {"stage": "graph_context", "remaining_ms": 9500}
+    assert len(state["deadline_skips"]) == 1  # Returned as updates, the input state is untouched
+    assert deadline.get_deadline_stats().snapshot()["skipped"] == {"graph_context": 1}
+
+
+def test_call_timeout(clock):
+    state = {"deadline": start_deadline()}
+    assert call_timeout(state) == 30.0
+    assert call_timeout(state, cap=5.0) == 5.0
+    clock.now += 29
+    assert call_timeout(state, cap=5.0) == 2.0  # Floor, so a late call can still answer
+    clock.now += 10
+    assert call_timeout(state) == 2.0
+
+
+class GeminiModel(BaseModel):
+    timeout: Optional[float] = None
+
+
+class GroqModel(BaseModel):
+    request_timeout: Optional[float] = None
+
+
+def test_apply_timeout():
+    model = GeminiModel()
+    assert apply_timeout(model, 4.0).timeout == 4.0 and model.timeout is None
+    assert apply_timeout(GroqModel(), 4.0).request_timeout == 4.0
+    assert apply_timeout(model, None) is model
+    plain = object()
+    assert apply_timeout(plain, 4.0) is plain
+
+
+def test_run_with_timeout():
+    release = threading.Event()
+    start = time.perf_counter()
+    with pytest.raises(concurrent.futures.TimeoutError):
+        run_with_timeout(release.wait, 0.05, 5)
+    assert time.perf_counter() - start < 1.0
+    release.set()
+    assert run_with_timeout(sum, None, [1, 2]) == 3
+    assert run_with_timeout(sum, 1.0, [1, 2]) == 3
+
+
+def test_deadline_stats():
+    stats = DeadlineStats()
+    stats.record_turn(None, 5.0)  # No deadline: not counted
+    stats.record_turn(100.0, 99.0)
+    stats.record_turn(100.0, 100.25)
+    snapshot = stats.snapshot()
+    assert (snapshot["turns"], snapshot["exceeded"], snapshot["exceeded_rate"], snapshot["avg_overrun_ms"]) == (2, 1, 0.5, 250)
+
+
+def test_graph_lookup_skipped_without_budget(clock, monkeypatch):
+    monkeypatch.setattr(settings, "graph_rag_enabled", True)
+    looked_up = []
+    monkeypatch.setattr(graph_context, "_lookup_concept", lambda concept_id, mastery: looked_up.append(concept_id))
+    state = {"deadline": start_deadline()}
+    clock.now += 20
+    assert graph_context.start_graph_lookup(["Neural Networks"], state=state) is None
+    assert looked_up == []
+    assert state["deadline_skips"] == [{"stage": "graph_context", "remaining_ms": 10000}]
+
+
+class SlowModel:
+    """Streams one word per chunk, `delay` seconds apart"""
+
+    def __init__(self, words: int, delay: float):
+        self.words, self.delay = words, delay
+        self.chunks_sent = 0
+
+    def with_config(self, **_):
+        return self
+
+    def stream(self, prompt, config=None):
+        for i in range(self.words):
+            time.sleep(self.delay)
+            self.chunks_sent += 1
+            yield AIMessageChunk(content=f"word{i} ")
+
+
+def test_streamed_answer_ends_at_deadline(monkeypatch):
+    monkeypatch.setattr(stream_events, "publish", lambda event: None)
+    monkeypatch.setattr(deadline, "_deadline_stats", DeadlineStats())
+    model = SlowModel(words=100, delay=0.01)
+    response, _ = stream_answer(model, "prompt", "math_agent", deadline=time.time() + 0.1)
+    assert 0 < model.chunks_sent < 100
+    assert response.split() == [f"word{i}" for i in range(model.chunks_sent)]  # Ends with the chunk past the deadline
+    assert deadline.get_deadline_stats().snapshot()["timed_out"] == {"math_agent": 1}
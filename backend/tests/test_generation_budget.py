@@ -0,0 +1,197 @@
+"""
+Per-intent generation budgets (app/agents/generation_budget.py)
+
+- budget_for_state: soft budget from the expected length range (headroom on
+  first turns only), hard token cap = soft budget + tail + thinking
+- apply_budget sets the caps on a copy of the chat model, and leaves
+  o-series reasoning models and models without the fields alone
+- BudgetGuard cuts at the first sentence end past the soft budget (never
+  inside a code block), at a word boundary when the tail runs out, and
+  gives the same text however the stream is chunked
+- stream_answer stops the model stream at the budget and ends the answer
+  with the continuation offer
+
+Run: cd backend && python -m pytest tests/test_generation_budget.py -q
+"""
+
+import random
+from typing import Optional
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from pydantic import BaseModel
+
+from app.agents import generation_budget, stream_events
+from app.agents.answer_stream import stream_answer
+from app.agents.generation_budget import (
+    CONTINUATION_OFFER, BudgetGuard, BudgetStats, GenerationBudget, apply_budget, budget_for_state, is_hard_capped,
+)
+from app.config import settings
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    monkeypatch.setattr(settings, "generation_budget_enabled", True)
+    monkeypatch.setattr(settings, "generation_budget_headroom", 1.25)
+    monkeypatch.setattr(settings, "generation_budget_tail_tokens", 60)
+
+
+@pytest.mark.parametrize("state,soft_chars,thinking", [
+    ({"intent": "tutor"}, 2000, 512),  # 1600 expected max x 1.25
+    ({"intent": "tutor", "is_follow_up": True}, 900, 0),  # Follow-ups: exactly the expected max
+    ({"intent": "math", "is_follow_up": True}, 1000, 256),
+    ({"intent": "math", "response_length_hint": "short"}, 500, 0),  # Short answers never think
+    ({}, 500, 0),  # No intent: "fast"
+])
+def test_budget_for_state(budgets, state, soft_chars, thinking):
+    budget = budget_for_state(state)
+    assert (budget.soft_chars, budget.thinking_budget) == (soft_chars, thinking)
+    assert budget.tail_chars == 60 * generation_budget.CHARS_PER_TOKEN
+    assert budget.max_output_tokens == soft_chars // generation_budget.CHARS_PER_TOKEN + 60 + thinking
+
+
+def test_budget_disabled(budgets, monkeypatch):
+    monkeypatch.setattr(settings, "generation_budget_enabled", False)
+    assert budget_for_state({"intent": "tutor"}) is None
+
+
+class GeminiModel(BaseModel):
+    model: str = "gemini-2.5-flash"
+    max_output_tokens: Optional[int] = None
+    thinking_budget: Optional[int] = None
+
+
+class OpenAIModel(BaseModel):
+    model_name: str = "gpt-4o"
+    max_tokens: Optional[int] = None
+
+
+def test_apply_budget_sets_caps_on_a_copy():
+    budget = GenerationBudget("tutor", soft_chars=2000, tail_chars=240, max_output_tokens=1072, thinking_budget=512)
+    model = GeminiModel()
+    capped = apply_budget(model, budget)
+    assert (capped.max_output_tokens, capped.thinking_budget) == (1072, 512)
+    assert model.max_output_tokens is None
+    assert apply_budget(OpenAIModel(), budget).max_tokens == 1072
+    reasoning = OpenAIModel(model_name="o3-mini")
+    assert apply_budget(reasoning, budget) is reasoning  # Hidden reasoning would eat the cap
+    assert apply_budget(model, None) is model
+    plain = object()
+    assert apply_budget(plain, budget) is plain
+
+
+def guard(soft_chars, tail_chars=400):
+    return BudgetGuard(GenerationBudget("tutor", soft_chars, tail_chars, max_output_tokens=0, thinking_budget=0))
+
+
+def feed_all(g, pieces):
+    emitted = []
+    for piece in pieces:
+        text, stop = g.feed(piece)
+        emitted.append(text)
+        if stop:
+            break
+    return "".join(emitted)
+
+
+ANSWER = "A perceptron sums its weighted inputs. It fires above a threshold. Training nudges the weights. Done."
+
+
+def test_guard_cuts_at_sentence_end_past_soft_budget():
+    g = guard(soft_chars=45)
+    assert feed_all(g, [ANSWER]) == "A perceptron sums its weighted inputs. It fires above a threshold."
+    assert g.stopped and g.budget.stopped_at_budget
+    assert g.feed("more") == ("", True)
+    assert g.finish() == CONTINUATION_OFFER
+
+
+def test_guard_under_budget_passes_everything():
+    g = guard(soft_chars=1000)
+    assert feed_all(g, [ANSWER]) == ANSWER
+    assert g.finish() == ""
+
+
+def test_guard_same_cut_for_any_chunking():
+    rnd = random.Random(7)
+    for soft_chars in range(0, len(ANSWER), 5):
+        whole = feed_all(guard(soft_chars), [ANSWER])
+        for _ in range(20):
+            cuts = sorted(rnd.sample(range(1, len(ANSWER)), rnd.randint(1, 10)))
+            pieces = [ANSWER[i:j] for i, j in zip([0] + cuts, cuts + [len(ANSWER)])]
+            assert feed_all(guard(soft_chars), pieces) == whole
+
+
+def test_guard_never_cuts_inside_code():
+    text = "Code:\n```\nw = w - lr * grad. b = b - lr.\n```\nThat is one step. More text."
+    g = guard(soft_chars=8)
+    assert feed_all(g, [text]) == "Code:\n```\nw = w - lr * grad. b = b - lr.\n```"
+    assert g.finish() == CONTINUATION_OFFER
+
+
+def test_guard_closes_open_code_block_at_tail():
+    g = guard(soft_chars=5, tail_chars=20)
+    emitted = feed_all(g, ["```\nfor epoch in range(10): train(model, data)"])
+    assert emitted == "```\nfor epoch in"
+    assert g.finish() == "\n```" + CONTINUATION_OFFER
+
+
+def test_guard_word_boundary_without_sentence_end():
+    g = guard(soft_chars=10, tail_chars=10)
+    assert feed_all(g, ["aaaa bbbb cccc dddd eeee ffff"]) == "aaaa bbbb cccc dddd"
+
+
+def test_hard_cap():
+    assert is_hard_capped(AIMessageChunk(content="", response_metadata={"finish_reason": "MAX_TOKENS"}))
+    assert is_hard_capped(AIMessageChunk(content="", response_metadata={"finish_reason": "length"}))
+    assert not is_hard_capped(AIMessageChunk(content="", response_metadata={"finish_reason": "STOP"}))
+    g = guard(soft_chars=1000)
+    g.budget.hard_capped = True
+    assert g.finish() == "..." + CONTINUATION_OFFER
+
+
+def test_budget_stats():
+    stats = BudgetStats()
+    stats.record(GenerationBudget("tutor", 100, 10, 0, 0, stopped_at_budget=True, output_chars=120))
+    stats.record(GenerationBudget("tutor", 100, 10, 0, 0, output_chars=80))
+    tutor = stats.snapshot()["tutor"]
+    assert (tutor["turns"], tutor["hit_budget"], tutor["hit_rate"], tutor["avg_output_chars"]) == (2, 1, 0.5, 100)
+
+
+class FakeModel:
+    """Chat model stand-in: streams `text` in chunks, noting whether the stream was closed early"""
+
+    def __init__(self, text: str, chunk: int = 10):
+        self.text, self.chunk = text, chunk
+        self.chunks_sent = 0
+        self.closed_early = False
+
+    def with_config(self, **_):
+        return self
+
+    def stream(self, prompt, config=None):
+        try:
+            for i in range(0, len(self.text), self.chunk):
+                self.chunks_sent += 1
+                yield AIMessageChunk(content=self.text[i:i + self.chunk])
+        except GeneratorExit:
+            self.closed_early = True
+            raise
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    deltas = []
+    monkeypatch.setattr(stream_events, "publish", lambda event: deltas.append(event["textDelta"]))
+    monkeypatch.setattr(generation_budget, "_budget_stats", BudgetStats())
+    return deltas
+
+
+def test_stream_answer_stops_at_budget(streamed):
+    model = FakeModel(ANSWER * 10)
+    budget = GenerationBudget("tutor", soft_chars=45, tail_chars=400, max_output_tokens=0, thinking_budget=0)
+    response, _ = stream_answer(model, "prompt", "pedagogical_tutor", budget=budget)
+    assert response == "A perceptron sums its weighted inputs. It fires above a threshold." + CONTINUATION_OFFER
+    assert "".join(streamed) == response
+    assert model.closed_early and model.chunks_sent < len(ANSWER * 10) // model.chunk
+    assert budget.stopped_at_budget and budget.output_chars == len(response)
+    assert generation_budget.get_budget_stats().snapshot()["tutor"]["stopped_at_budget"] == 1
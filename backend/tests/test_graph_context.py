@@ -0,0 +1,65 @@
+"""
+Graph context lookups (app/agents/graph_context.py)
+
+- lookups that miss the deadline are dropped, and the answer does not wait
+- while every pool thread is busy with a hung lookup, new concepts are
+  skipped instead of queueing; once the hung lookups finish, they run again
+
+Run: cd backend && python -m pytest tests/test_graph_context.py -q
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.agents import graph_context
+from app.agents.graph_context import GRAPH_LOOKUP_THREADS, collect_graph_context, start_graph_lookup
+from app.config import settings
+
+
+@pytest.fixture
+def hung_graph(monkeypatch):
+    """_lookup_concept blocks until the returned event is set"""
+    monkeypatch.setattr(settings, "graph_rag_enabled", True)
+    monkeypatch.setattr(settings, "graph_lookup_deadline_ms", 50)
+    release = threading.Event()
+
+    def lookup(concept_id, mastery_scores):
+        release.wait(10)
+        return None
+
+    monkeypatch.setattr(graph_context, "_lookup_concept", lookup)
+    yield release
+    release.set()
+    wait_for_idle()
+
+
+def wait_for_idle(timeout=5.0):
+    stop = time.monotonic() + timeout
+    while graph_context._in_flight and time.monotonic() < stop:
+        time.sleep(0.01)
+    assert graph_context._in_flight == 0
+
+
+def test_missed_deadline_is_dropped(hung_graph):
+    lookup = start_graph_lookup(["Neural Networks"])
+    start = time.monotonic()
+    assert collect_graph_context(lookup) is None
+    assert time.monotonic() - start < 1.0
+
+
+def test_saturated_pool_skips_new_lookups(hung_graph):
+    concepts = [[f"concept {i}"] for i in range(GRAPH_LOOKUP_THREADS)]
+    busy = [start_graph_lookup(c) for c in concepts]
+    assert all(len(lookup.futures) == 1 for lookup in busy)
+    for lookup in busy:
+        collect_graph_context(lookup)  # Deadline missed; the threads are still running
+
+    lookup = start_graph_lookup(["backpropagation"])
+    assert lookup.futures == {} and lookup.skipped == ["backpropagation"]
+
+    hung_graph.set()
+    wait_for_idle()
+    lookup = start_graph_lookup(["backpropagation"])
+    assert list(lookup.futures) == ["backpropagation"] and lookup.skipped == []
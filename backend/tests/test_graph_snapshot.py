@@ -0,0 +1,116 @@
+"""
+Concept graph snapshot round trip (app/rag/graph_snapshot.py)
+
+A graph written with write_graph_snapshot and memory-mapped back with
+ConceptGraphSnapshot.open (or built in memory with from_graph_data) reads
+the same nodes, labels, document counts, hierarchy and edges as its JSON,
+including non-ASCII labels, nodes without hierarchy info and an empty graph.
+
+Run: cd backend && python -m pytest tests/test_graph_snapshot.py -q
+"""
+
+import os
+
+import pytest
+
+from app.rag.graph_snapshot import MANIFEST_FILE, ConceptGraphSnapshot, write_graph_snapshot
+
+GRAPH = {
+    "nodes": [
+        {"id": "machine_learning", "label": "Machine Learning", "document_count": 12,
+         "hierarchy_info": {"children": ["neural_networks", "clustering"], "prerequisites": []}},
+        {"id": "neural_networks", "label": "Neural Networks", "document_count": 7,
+         "hierarchy_info": {"children": ["backpropagation"], "prerequisites": ["linear_algebra"]}},
+        {"id": "backpropagation", "label": "Rétropropagation ∂L/∂w", "document_count": 3,
+         "hierarchy_info": {"children": [], "prerequisites": ["neural_networks", "calculus"]}},
+        {"id": "clustering", "document_count": 0},
+    ],
+    "edges": [
+        {"source": "machine_learning", "target": "neural_networks", "type": "HAS_SUBTOPIC"},
+        {"source": "machine_learning", "target": "clustering", "type": "HAS_SUBTOPIC"},
+        {"source": "neural_networks", "target": "backpropagation", "type": "PREREQUISITE_FOR"},
+        {"source": "linear_algebra", "target": "neural_networks", "type": "PREREQUISITE_FOR"},
+    ],
+}
+EMPTY = {"nodes": [], "edges": []}
+
+
+def as_json(graph: ConceptGraphSnapshot) -> dict:
+    """The graph read back through the snapshot API, in the JSON layout"""
+    nodes = []
+    for node, node_id in enumerate(graph.node_ids()):
+        nodes.append({
+            "id": node_id,
+            "label": graph.node_label(node),
+            "document_count": graph.node_doc_count(node),
+            "children": graph.node_children(node),
+            "prerequisites": graph.node_prerequisites(node),
+        })
+    edges = [
+        {"source": graph.string(s), "target": graph.string(t), "type": edge_type}
+        for edge_type in graph.edge_types
+        for s, t in graph.edges(edge_type)
+    ]
+    return {"nodes": nodes, "edges": sorted(edges, key=lambda e: (e["type"], e["source"], e["target"]))}
+
+
+def expected(graph_data: dict) -> dict:
+    nodes = []
+    for node in graph_data["nodes"]:
+        hierarchy = node.get("hierarchy_info", {})
+        nodes.append({
+            "id": node["id"],
+            "label": node.get("label", node["id"]),
+            "document_count": node.get("document_count", 0),
+            "children": hierarchy.get("children", []),
+            "prerequisites": hierarchy.get("prerequisites", []),
+        })
+    return {"nodes": nodes, "edges": sorted(graph_data["edges"], key=lambda e: (e["type"], e["source"], e["target"]))}
+
+
+@pytest.fixture(params=["mmap", "in_memory"])
+def load(request, tmp_path):
+    def load_graph(graph_data):
+        if request.param == "in_memory":
+            return ConceptGraphSnapshot.from_graph_data(graph_data)
+        write_graph_snapshot(graph_data, tmp_path / "snapshot")
+        return ConceptGraphSnapshot.open(tmp_path / "snapshot")
+    return load_graph
+
+
+@pytest.mark.parametrize("graph_data", [GRAPH, EMPTY], ids=["graph", "empty"])
+def test_round_trip(load, graph_data):
+    graph = load(graph_data)
+    assert graph is not None
+    assert graph.num_nodes == len(graph_data["nodes"])
+    assert as_json(graph) == expected(graph_data)
+
+
+def test_lookups(load):
+    graph = load(GRAPH)
+    assert graph.node_index("backpropagation") == 2
+    assert graph.node_index("linear_algebra") is None  # Referenced, but not a concept node
+    ml = graph.string_index("machine_learning")
+    assert [graph.string(t) for t in graph.targets(ml, ["HAS_SUBTOPIC"])] == ["neural_networks", "clustering"]
+    nn = graph.string_index("neural_networks")
+    assert sorted(graph.string(s) for s in graph.sources(nn, ["HAS_SUBTOPIC", "PREREQUISITE_FOR"])) == [
+        "linear_algebra", "machine_learning",
+    ]
+    assert len(graph.edges("NO_SUCH_TYPE")) == 0
+
+
+def test_snapshot_without_manifest_is_ignored(tmp_path):
+    write_graph_snapshot(GRAPH, tmp_path)
+    (tmp_path / MANIFEST_FILE).unlink()
+    assert ConceptGraphSnapshot.open(tmp_path) is None
+
+
+def test_stale_snapshot(tmp_path):
+    graph_json = tmp_path / "concept_graph.json"
+    graph_json.write_text("{}")
+    write_graph_snapshot(GRAPH, tmp_path / "snapshot")
+    manifest_mtime = (tmp_path / "snapshot" / MANIFEST_FILE).stat().st_mtime
+    os.utime(graph_json, (manifest_mtime - 10, manifest_mtime - 10))
+    assert not ConceptGraphSnapshot.is_stale(tmp_path / "snapshot", graph_json)
+    os.utime(graph_json, (manifest_mtime + 10, manifest_mtime + 10))
+    assert ConceptGraphSnapshot.is_stale(tmp_path / "snapshot", graph_json)
@@ -0,0 +1,125 @@
+"""
+Per-turn graph variants (graph_variants.py, create_tutor_agent)
+
+- select_graph_variant: greetings, acknowledgements and logistics lookups
+  take the minimal graph; replies to a pending tutor question, tutor
+  questions and a disabled pre-router take the full graph
+- the minimal graph keeps the governor, answers lightweight intents with
+  the general agent, and reroutes any other intent to the full graph
+  (run_agent and astream_agent rerun the turn there)
+
+Run: cd backend && python -m pytest tests/test_graph_variants.py -q
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.agents import tutor_agent
+from app.agents.graph_variants import GraphVariantStats, select_graph_variant
+from app.config import settings
+
+PENDING_QUESTION = [
+    {"role": "user", "content": "How does backpropagation work?"},
+    {"role": "assistant", "content": "Before I explain, what do you think the chain rule does here?"},
+]
+
+
+@pytest.fixture
+def preroute(monkeypatch):
+    monkeypatch.setattr(settings, "graph_variants_enabled", True)
+    monkeypatch.setattr(settings, "reasoning_fast_path_enabled", True)
+
+
+@pytest.mark.parametrize("query", ["hi", "Thanks so much!", "ok got it", "When is the midterm?"])
+def test_lightweight_turns_take_minimal_graph(preroute, query):
+    variant, intent = select_graph_variant(query, [])
+    assert variant == "minimal"
+    assert intent in ("fast", "syllabus_query")
+
+
+@pytest.mark.parametrize("query", ["ok", "thanks"])
+def test_reply_to_pending_question_takes_full_graph(preroute, query):
+    assert select_graph_variant(query, PENDING_QUESTION)[0] == "full"
+
+
+def test_tutor_question_takes_full_graph(preroute):
+    assert select_graph_variant("Can you walk me through how backpropagation updates the weights in a network?", [])[0] == "full"
+
+
+def test_disabled_preroute_takes_full_graph(preroute, monkeypatch):
+    monkeypatch.setattr(settings, "graph_variants_enabled", False)
+    assert select_graph_variant("hi", []) == ("full", None)
+
+
+@pytest.mark.parametrize("intent,route", [("fast", "agent"), ("syllabus_query", "agent"), ("tutor", "reroute"), ("math", "reroute"), (None, "reroute")])
+def test_route_lightweight_intent(intent, route):
+    assert tutor_agent.route_lightweight_intent({"intent": intent}) == route
+
+
+def test_minimal_graph_keeps_governor():
+    nodes = tutor_agent.create_tutor_agent("minimal").get_graph().nodes
+    assert "governor" in nodes and "reroute" in nodes
+    assert "pedagogical_tutor" not in nodes
+
+
+@pytest.fixture
+def stub_nodes(monkeypatch):
+    """Pipeline nodes replaced by stand-ins; the supervisor turns "confused" queries into tutor turns"""
+    ran = []
+
+    def node(name, output):
+        def run(state):
+            ran.append(name)
+            return output(state) if callable(output) else output
+        return run
+
+    answer = "Here is a quick answer."
+    monkeypatch.setattr(tutor_agent, "reasoning_node", node("reasoning", {"intent": "fast"}))
+    monkeypatch.setattr(tutor_agent, "governor_node", node("governor", {"governor_approved": True}))
+    monkeypatch.setattr(tutor_agent, "supervisor_node", node(
+        "supervisor", lambda state: {"intent": "tutor" if "confused" in state["query"] else "fast"}
+    ))
+    monkeypatch.setattr(tutor_agent, "agent_node", node("agent", {"response": answer, "messages": [AIMessage(content=answer)]}))
+    monkeypatch.setattr(tutor_agent, "pedagogical_tutor_node", node("pedagogical_tutor", {"response": "Tutor answer", "quality_checked": True}))
+    monkeypatch.setattr(tutor_agent, "quality_gate_node", node("quality_gate", {"needs_repair": False}))
+    monkeypatch.setattr(tutor_agent, "truncate_response_if_needed", node("length_enforcer", {}))
+    monkeypatch.setattr(tutor_agent, "evaluator_node", node("evaluator", {}))
+    monkeypatch.setattr(tutor_agent, "_tutor_agents", {})
+    monkeypatch.setattr(tutor_agent, "select_graph_variant", lambda query, history=None: ("minimal", "fast"))
+    stats = GraphVariantStats()
+    monkeypatch.setattr(tutor_agent, "get_graph_variant_stats", lambda: stats)
+    return ran, stats
+
+
+def test_run_agent_answers_lightweight_turn_on_minimal_graph(stub_nodes):
+    ran, stats = stub_nodes
+    result = tutor_agent.run_agent("hi")
+    assert result["response"] == "Here is a quick answer."
+    assert "pedagogical_tutor" not in ran and "governor" in ran
+    assert stats.mismatches == 0
+
+
+def test_run_agent_reroutes_overridden_intent_to_full_graph(stub_nodes):
+    ran, stats = stub_nodes
+    result = tutor_agent.run_agent("I'm confused")
+    assert result["response"] == "Tutor answer"
+    assert ran.count("supervisor") == 2 and "agent" not in ran
+    assert ran[-3:] == ["pedagogical_tutor", "length_enforcer", "evaluator"]
+    assert stats.mismatches == 1
+
+
+def test_astream_agent_reroutes_overridden_intent_to_full_graph(stub_nodes):
+    ran, stats = stub_nodes
+
+    async def collect():
+        return [event async for event in tutor_agent.astream_agent("I'm confused")]
+
+    events = asyncio.run(collect())
+    assert not [e for e in events if e.get("type") == "error"]
+    assert ran.count("supervisor") == 2 and "agent" not in ran
+    assert "pedagogical_tutor" in ran
+    snapshot = stats.snapshot()
+    assert snapshot["intent_mismatches"] == 1
+    assert snapshot["turns"] == {"full": 1}
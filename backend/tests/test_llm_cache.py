@@ -0,0 +1,209 @@
+"""
+Exact-prompt LLM result cache (app/agents/llm_cache.py) against an in-memory Redis
+
+- key: the same prompt and model parameters hit; a different prompt,
+  model parameter or namespace misses
+- validator: outputs it rejects (and oversized ones) are never stored
+- eviction: each namespace is trimmed to llm_cache_max_entries, oldest first
+- a model with cache= set skips the call on a hit
+- Redis errors and an open breaker count as misses, never as failures
+
+Run: cd backend && python -m pytest tests/test_llm_cache.py -q
+"""
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from app import circuit_breaker, redis_client
+from app.agents import llm_cache
+from app.agents.llm_cache import LLMCacheStats, LLMResultCache, looks_like_json
+from app.config import settings
+
+
+class FakeRedis:
+    """The sync redis commands the cache uses (TTLs ignored)"""
+
+    def __init__(self):
+        self.values, self.zsets = {}, {}
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("Redis is down")
+
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.values[key] = value
+        return True
+
+    def zadd(self, key, mapping):
+        self._check()
+        zset = self.zsets.setdefault(key, {})
+        zset.update(mapping)
+        return len(mapping)
+
+    def zcard(self, key):
+        self._check()
+        return len(self.zsets.get(key, {}))
+
+    def zpopmin(self, key, count=1):
+        self._check()
+        zset = self.zsets.get(key, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+
+    def zrange(self, key, start, end):
+        self._check()
+        return [member for member, _ in sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])]
+
+    def expire(self, key, seconds):
+        self._check()
+        return True
+
+    def delete(self, *keys):
+        self._check()
+        deleted = 0
+        for key in keys:
+            deleted += int(self.values.pop(key, None) is not None or self.zsets.pop(key, None) is not None)
+        return deleted
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args, **kwargs: self.commands.append((method, args, kwargs))
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", True)
+    monkeypatch.setattr(settings, "circuit_breakers_enabled", True)
+    monkeypatch.setattr(circuit_breaker, "_circuit_breakers", {})
+    monkeypatch.setattr(llm_cache, "_llm_cache_stats", LLMCacheStats())
+    monkeypatch.setattr(llm_cache, "_llm_result_caches", {})
+    client = FakeRedis()
+    monkeypatch.setattr(redis_client, "get_redis_client", lambda: client)
+    return client
+
+
+def generations(*texts):
+    return [ChatGeneration(message=AIMessage(content=text)) for text in texts]
+
+
+def contents(result):
+    return [g.message.content for g in result] if result is not None else None
+
+
+LLM = "gemini-2.0-flash temperature=0.1"
+
+
+def test_hit_after_update(redis):
+    cache = LLMResultCache("reasoning")
+    assert cache.lookup("prompt", LLM) is None
+    cache.update("prompt", LLM, generations('{"intent": "tutor"}'))
+    assert contents(cache.lookup("prompt", LLM)) == ['{"intent": "tutor"}']
+    stats = llm_cache.get_llm_cache_stats().snapshot()["reasoning"]
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 1)
+
+
+@pytest.mark.parametrize("prompt,llm,namespace", [
+    ("prompt ", LLM, "reasoning"),  # Any change to the rendered prompt
+    ("prompt", LLM.replace("0.1", "0.2"), "reasoning"),  # or the model's parameters
+    ("prompt", LLM, "classification"),  # or the namespace
+])
+def test_key_covers_prompt_model_and_namespace(redis, prompt, llm, namespace):
+    LLMResultCache("reasoning").update("prompt", LLM, generations("answer"))
+    assert LLMResultCache(namespace).lookup(prompt, llm) is None
+
+
+def test_validator_rejects_failed_outputs(redis):
+    cache = LLMResultCache("reasoning", validate=looks_like_json)
+    cache.update("prompt", LLM, generations("Sorry, I cannot help with that."))
+    assert cache.lookup("prompt", LLM) is None
+    cache.update("other", LLM, generations("   "))
+    assert LLMResultCache("summaries").lookup("other", LLM) is None  # Default validator: non-empty text
+    assert llm_cache.get_llm_cache_stats().snapshot()["reasoning"]["rejected"] == 2
+
+
+def test_oversized_entries_not_stored(redis, monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_max_entry_bytes", 32)
+    cache = LLMResultCache("summaries")
+    cache.update("prompt", LLM, generations("x" * 100))
+    assert cache.lookup("prompt", LLM) is None
+
+
+def test_eviction_oldest_first(redis, monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_max_entries", 3)
+    clock = iter(range(100))
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    cache = LLMResultCache("classification")
+    for i in range(5):
+        cache.update(f"prompt {i}", LLM, generations(f"answer {i}"))
+    assert [contents(cache.lookup(f"prompt {i}", LLM)) for i in range(5)] == [
+        None, None, ["answer 2"], ["answer 3"], ["answer 4"],
+    ]
+    assert len(redis.values) == 3  # Evicted entries are deleted, not left to their TTL
+
+
+def test_clear_drops_namespace_only(redis):
+    reasoning, summaries = LLMResultCache("reasoning"), LLMResultCache("summaries")
+    reasoning.update("prompt", LLM, generations("a"))
+    summaries.update("prompt", LLM, generations("b"))
+    reasoning.clear()
+    assert reasoning.lookup("prompt", LLM) is None
+    assert contents(summaries.lookup("prompt", LLM)) == ["b"]
+
+
+def test_model_skips_call_on_hit(redis):
+    model = FakeListChatModel(responses=["first", "second"], cache=llm_cache.get_llm_result_cache("summaries"))
+    assert model.invoke("Summarise the chat").content == "first"
+    assert model.invoke("Summarise the chat").content == "first"  # Cached: "second" never requested
+    assert model.invoke("Summarise another chat").content == "second"
+
+
+def test_redis_errors_are_misses(redis):
+    cache = LLMResultCache("reasoning")
+    cache.update("prompt", LLM, generations("answer"))
+    redis.fail = True
+    assert cache.lookup("prompt", LLM) is None
+    cache.update("prompt", LLM, generations("answer"))  # Does not raise
+    assert llm_cache.get_llm_cache_stats().snapshot()["reasoning"]["errors"] == 2
+
+
+def test_open_breaker_skips_redis(redis):
+    cache = LLMResultCache("reasoning")
+    cache.update("prompt", LLM, generations("answer"))
+    breaker = circuit_breaker.get_circuit_breaker("redis")
+    breaker._open("test")
+    redis.fail = True  # Would count an error if it were called
+    assert cache.lookup("prompt", LLM) is None
+    assert llm_cache.get_llm_cache_stats().snapshot()["reasoning"]["errors"] == 0
+
+
+def test_disabled_gives_no_cache(redis, monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    assert llm_cache.get_llm_result_cache("reasoning") is None
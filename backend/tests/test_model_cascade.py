@@ -0,0 +1,166 @@
+"""
+Cheap-first model cascade (app/agents/model_cascade.py)
+
+- plan_cascade: available cheap tiers for the intent, then the routed
+  model; a cheap tier with a poor recorded success rate is skipped except
+  on exploration turns
+- escalate / accept / finish_streamed: a failed tier is recorded and the
+  turn moves up one tier; the accepted answer and the turn are recorded once
+- quality_gate_node escalates a low-confidence answer to the next tier
+  (any intent) and accepts it at the top tier or without repair budget
+- stream_answer regenerates a failing opening on the escalation model
+
+Run: cd backend && python -m pytest tests/test_model_cascade.py -q
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from app.agents import model_cascade, stream_events, tutor_agent
+from app.agents.answer_stream import stream_answer
+from app.agents.model_cascade import (
+    CascadeStats, accept, add_seconds, can_escalate, escalate, finish_streamed, next_tier_model, plan_cascade,
+    tier_model, with_top_tier,
+)
+from app.agents.streaming_quality import QualityProbe
+from app.config import settings
+
+CHEAP, LITE, ROUTED = "groq-llama-8b", "gemini-2.5-flash-lite", "gemini-2.0-flash"
+QUESTIONS = "What do you think happens to the weights? Why would they change? Have you seen this before?"
+EXPLANATION = "Backpropagation works by applying the chain rule from the output layer back to the inputs."
+
+
+class FakeSupervisor:
+    def __init__(self, unavailable=()):
+        self.unavailable = set(unavailable)
+
+    def is_available(self, model):
+        return model not in self.unavailable
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setattr(settings, "model_cascade_enabled", True)
+    monkeypatch.setattr(settings, "model_cascade_tiers", {"fast": [CHEAP, LITE], "tutor": [LITE]})
+    monkeypatch.setattr(settings, "model_cascade_min_samples", 2)
+    monkeypatch.setattr(settings, "model_cascade_min_success_rate", 0.7)
+    monkeypatch.setattr(settings, "model_cascade_explore_rate", 0.1)
+    monkeypatch.setattr(model_cascade, "_cascade_stats", CascadeStats())
+    monkeypatch.setattr(model_cascade, "random", SimpleNamespace(random=lambda: 0.99))  # Never explore
+
+
+def test_plan_tiers(cascade):
+    plan = plan_cascade("fast", ROUTED, FakeSupervisor())
+    assert plan["tiers"] == [CHEAP, LITE, ROUTED] and tier_model(plan) == CHEAP
+    assert plan_cascade("fast", ROUTED, FakeSupervisor(unavailable=[CHEAP]))["tiers"] == [LITE, ROUTED]
+    assert plan_cascade("fast", LITE, FakeSupervisor())["tiers"] == [CHEAP, LITE]  # Routed model listed once
+    assert plan_cascade("coder", ROUTED, FakeSupervisor())["tiers"] == [ROUTED]  # Still measured
+    assert not can_escalate(plan_cascade("coder", ROUTED, FakeSupervisor()))
+
+
+def test_plan_disabled(cascade, monkeypatch):
+    monkeypatch.setattr(settings, "model_cascade_enabled", False)
+    assert plan_cascade("fast", ROUTED, FakeSupervisor()) is None
+
+
+def test_plan_skips_poor_tier_unless_exploring(cascade, monkeypatch):
+    stats = model_cascade.get_cascade_stats()
+    stats.record_attempt("fast", CHEAP, 1.0, 100, accepted=False)
+    assert plan_cascade("fast", ROUTED, FakeSupervisor())["tier"] == 0  # One attempt is not a rate yet
+    stats.record_attempt("fast", CHEAP, 1.0, 100, accepted=False)
+    assert tier_model(plan_cascade("fast", ROUTED, FakeSupervisor())) == LITE
+    monkeypatch.setattr(model_cascade, "random", SimpleNamespace(random=lambda: 0.0))
+    assert tier_model(plan_cascade("fast", ROUTED, FakeSupervisor())) == CHEAP
+
+
+def test_escalate_then_accept(cascade):
+    plan = add_seconds(plan_cascade("fast", ROUTED, FakeSupervisor()), 1.0)
+    assert next_tier_model(plan) == LITE
+    plan = add_seconds(escalate(plan, 40, "confidence 0.30"), 2.0)
+    assert (tier_model(plan), plan["escalations"], plan["spent_seconds"], plan["seconds"]) == (LITE, 1, 1.0, 2.0)
+    done = accept(plan, 400)
+    assert done["done"] and not can_escalate(done)
+    assert accept(done, 400) is done  # Recorded once
+
+    report = model_cascade.get_cascade_stats().snapshot()["fast"]
+    assert (report["turns"], report["escalation_rate"], report["p50_seconds"]) == (1, 1.0, 3.0)
+    assert report["models"][CHEAP]["success_rate"] == 0.0
+    assert report["models"][LITE]["success_rate"] == 1.0
+
+
+def test_with_top_tier(cascade):
+    plan = plan_cascade("tutor", ROUTED, FakeSupervisor())
+    assert with_top_tier(plan, "gemini-flash")["tiers"] == [LITE, "gemini-flash"]
+    fixed = with_top_tier(plan, LITE)  # The node's own model is never a cheap tier below itself
+    assert fixed["tiers"] == [LITE] and fixed["tier"] == 0
+    assert with_top_tier(None, "gemini-flash") is None
+
+
+def test_finish_streamed(cascade):
+    plan = plan_cascade("tutor", ROUTED, FakeSupervisor())
+    assert finish_streamed(plan, 2.0, 500)["done"] is False  # Left for quality_gate_node
+
+    quality = QualityProbe("tutor", probe_chars=10)
+    quality.text, quality.reason, quality.restarted, quality.restart_seconds = QUESTIONS, "questions_only", True, 0.5
+    done = finish_streamed(plan, 2.0, 500, quality)
+    assert (tier_model(done), done["escalations"], done["done"]) == (ROUTED, 1, True)
+    report = model_cascade.get_cascade_stats().snapshot()["tutor"]
+    assert report["p50_seconds"] == 2.0
+    assert report["models"][LITE]["avg_seconds"] == 0.5
+    assert report["models"][ROUTED]["avg_seconds"] == 1.5
+
+
+@pytest.fixture
+def gate(cascade, monkeypatch):
+    monkeypatch.setattr(settings, "deadline_stage_min_seconds", {"repair": 3.0})
+    return plan_cascade("fast", ROUTED, FakeSupervisor())
+
+
+def test_quality_gate_escalates_low_confidence(gate):
+    update = tutor_agent.quality_gate_node({"response": "Why?", "intent": "fast", "model_cascade": gate})
+    assert update["needs_repair"] and update["model_selected"] == LITE
+    assert tier_model(update["model_cascade"]) == LITE
+
+
+def test_quality_gate_accepts_good_answer(gate):
+    update = tutor_agent.quality_gate_node({"response": EXPLANATION, "intent": "fast", "model_cascade": gate})
+    assert not update["needs_repair"] and update["model_cascade"]["done"]
+
+
+def test_quality_gate_accepts_at_top_tier(gate):
+    top = {**gate, "tier": len(gate["tiers"]) - 1}
+    update = tutor_agent.quality_gate_node({"response": "Why?", "intent": "fast", "model_cascade": top})
+    assert not update["needs_repair"] and update["model_cascade"]["done"]  # fast/syllabus turns are never repaired
+
+
+def test_quality_gate_accepts_without_repair_budget(gate):
+    state = {"response": "Why?", "intent": "fast", "model_cascade": gate, "deadline": time.time() + 1}
+    update = tutor_agent.quality_gate_node(state)
+    assert not update["needs_repair"] and update["model_cascade"]["done"]
+    assert update["deadline_skips"][0]["stage"] == "repair"
+
+
+class FakeModel:
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+
+    def with_config(self, **_):
+        return self
+
+    def stream(self, prompt, config=None):
+        self.prompts.append(prompt)
+        for i in range(0, len(self.text), 15):
+            yield AIMessageChunk(content=self.text[i:i + 15])
+
+
+def test_stream_answer_restarts_on_escalation_model(monkeypatch):
+    monkeypatch.setattr(stream_events, "publish", lambda event: None)
+    cheap, top = FakeModel(" ".join([QUESTIONS] * 3)), FakeModel(EXPLANATION)
+    quality = QualityProbe("tutor", probe_chars=60)
+    response, _ = stream_answer(cheap, "Explain backprop", "pedagogical_tutor", quality=quality, escalate_to=top)
+    assert response == EXPLANATION and quality.restarted
+    assert len(cheap.prompts) == 1 and len(top.prompts) == 1
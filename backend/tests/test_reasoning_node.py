@@ -0,0 +1,36 @@
+"""
+Reasoning node structured output
+
+The model is asked for native JSON-schema output; langchain-google-genai
+versions without it get their default function calling instead.
+
+Run: cd backend && python -m pytest tests/test_reasoning_node.py -q
+"""
+
+from app.agents.reasoning_node import ReasoningSchema, _structured_output
+
+
+class FakeModel:
+    """Records with_structured_output calls; rejects `method` like langchain-google-genai 1.x"""
+
+    def __init__(self, supports_method: bool):
+        self.supports_method = supports_method
+        self.calls = []
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        if kwargs and not self.supports_method:
+            raise ValueError(f"Received unsupported arguments {kwargs}")
+        self.calls.append((schema, include_raw, kwargs.get("method")))
+        return self
+
+
+def test_json_schema_when_supported():
+    model = FakeModel(supports_method=True)
+    _structured_output(model)
+    assert model.calls == [(ReasoningSchema, True, "json_schema")]
+
+
+def test_function_calling_fallback():
+    model = FakeModel(supports_method=False)
+    _structured_output(model)
+    assert model.calls == [(ReasoningSchema, True, None)]
@@ -0,0 +1,174 @@
+"""
+SSE framing for chat streams (app/api/sse.py)
+
+- consecutive text deltas are coalesced into one frame, flushed by age,
+  by size, before any other event and at the end of the stream
+- pings are dropped; a keep-alive comment is sent only after a quiet
+  keepalive interval
+- events read back from a turn stream carry their id in a separate
+  `id:` block; a coalesced text frame carries the id of its last delta
+- a disconnected client stops the stream and cancels the pending event
+
+Run: cd backend && python -m pytest tests/test_sse.py -q
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.api import sse
+from app.api.sse import KEEPALIVE_FRAME, SSEWriter, encode_event
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sse.time, "monotonic", clock)
+    return clock
+
+
+def writer(**overrides):
+    options = {"coalesce_ms": 50, "max_chars": 100, "keepalive_seconds": 15, "disconnect_poll_seconds": 1}
+    options.update(overrides)
+    return SSEWriter(**options)
+
+
+def parse(frames):
+    """[(event, id)] for data frames, "keep-alive" for comments"""
+    out = []
+    for frame in frames:
+        if frame == KEEPALIVE_FRAME:
+            out.append("keep-alive")
+            continue
+        blocks = frame.decode().split("\n\n")
+        event = json.loads(blocks[0][len("data: "):])
+        event_id = blocks[1][len("id: "):] if blocks[1].startswith("id: ") else None
+        out.append((event, event_id))
+    return out
+
+
+def delta(text):
+    return {"type": "text-delta", "textDelta": text}
+
+
+def test_deltas_coalesce_until_age(clock):
+    w = writer()
+    assert w.feed(delta("Hel")) == [] and w.feed(delta("lo")) == []
+    clock.now += 0.049
+    assert w.tick() == []
+    clock.now += 0.002
+    assert parse(w.tick()) == [(delta("Hello"), None)]
+    assert w.tick() == []
+
+
+def test_deltas_flush_at_size(clock):
+    w = writer(max_chars=5)
+    assert w.feed(delta("abc")) == []
+    assert parse(w.feed(delta("def"))) == [(delta("abcdef"), None)]
+
+
+def test_other_event_flushes_text_first(clock):
+    w = writer()
+    w.feed(delta("partial"))
+    sources = {"type": "sources", "sources": [{"title": "week3.pdf"}]}
+    assert parse(w.feed(sources)) == [(delta("partial"), None), (sources, None)]
+
+
+def test_close_flushes_remaining_text(clock):
+    w = writer()
+    w.feed(delta("tail"))
+    assert parse(w.close()) == [(delta("tail"), None)]
+    assert w.close() == []
+
+
+def test_keepalive_only_when_quiet(clock):
+    w = writer()
+    assert w.feed({"type": "ping"}) == []
+    assert w.stats["dropped_pings"] == 1
+    clock.now += 14
+    assert w.tick() == []
+    w.feed({"type": "queue-update", "queueItemId": "reasoning", "status": "processing"})
+    clock.now += 14
+    assert w.tick() == []  # The event reset the quiet period
+    clock.now += 1
+    assert w.tick() == [KEEPALIVE_FRAME]
+    assert w.stats["keepalives"] == 1
+
+
+def test_ids_on_frames(clock):
+    w = writer()
+    event = {"type": "tool-call", "toolName": "retrieve_context"}
+    assert parse(w.feed(event, "5-0")) == [(event, "5-0")]
+    w.feed(delta("a"), "6-0")
+    w.feed(delta("b"), "7-0")
+    assert parse(w.close()) == [(delta("ab"), "7-0")]  # Resuming after 7-0 skips both deltas
+
+
+def test_encode_event_is_compact_and_handles_non_json_values():
+    assert encode_event({"type": "x", "n": 1}) == b'data: {"type":"x","n":1}\n\n'
+    assert encode_event({"type": "x"}, "1-0") == b'data: {"type":"x"}\n\nid: 1-0\n\n'
+    frame = encode_event({"type": "tool-call", "toolInput": {"when": object()}})
+    assert frame.startswith(b'data: {"type":"tool-call"')
+
+
+def test_stream_frames_events_and_pairs():
+    async def events():
+        yield {"type": "trace-id", "traceId": "t"}
+        yield "1-0", delta("Hi")
+        yield "2-0", delta(" there")
+        yield {"type": "ping"}
+
+    async def run():
+        return [frame async for frame in writer(coalesce_ms=10_000).stream(events())]
+
+    assert parse(asyncio.run(run())) == [({"type": "trace-id", "traceId": "t"}, None), (delta("Hi there"), "2-0")]
+
+
+def test_stream_flushes_aged_text_while_waiting():
+    async def events():
+        yield delta("early")
+        await asyncio.sleep(0.2)
+        yield delta("late")
+
+    async def run():
+        frames = []
+        async for frame in writer(coalesce_ms=20).stream(events()):
+            frames.append(frame)
+        return frames
+
+    assert parse(asyncio.run(run())) == [(delta("early"), None), (delta("late"), None)]
+
+
+def test_stream_stops_on_disconnect():
+    cancelled = asyncio.Event()
+
+    async def events():
+        try:
+            yield delta("partial")
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def is_disconnected():
+        return True
+
+    async def run():
+        w = writer(disconnect_poll_seconds=0.01)
+        frames = [frame async for frame in w.stream(events(), is_disconnected=is_disconnected)]
+        await asyncio.sleep(0)
+        return w, frames
+
+    w, frames = asyncio.run(run())
+    assert w.stats["disconnected"]
+    assert cancelled.is_set()
+    assert frames == []  # Buffered text is not flushed to a client that is gone
@@ -0,0 +1,213 @@
+"""
+Resumable chat streams (app/api/stream_buffer.py) against an in-memory Redis
+
+- a reader replays the whole turn, or only what follows Last-Event-ID,
+  and stops at the end marker
+- a producer that disappears without an end marker yields one error event
+- the producer closes the turn's event generator when it is cancelled
+- Redis failures count towards the shared "redis" circuit breaker; once it
+  is open, new turns stream directly
+
+Run: cd backend && python -m pytest tests/test_stream_buffer.py -q
+"""
+
+import asyncio
+import fnmatch
+
+import pytest
+
+from app import circuit_breaker
+from app.api import stream_buffer
+from app.api.stream_buffer import END_EVENT, TurnStreamBuffer, open_turn, read_turn, start_producer
+from app.config import settings
+
+
+class FakeRedis:
+    """The redis.asyncio commands the buffer uses, kept in dicts (TTLs ignored, deletes via `drop`)"""
+
+    def __init__(self):
+        self.strings, self.hashes, self.streams = {}, {}, {}
+        self.seq = 0
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("Redis is down")
+
+    async def set(self, key, value, ex=None):
+        self._check()
+        self.strings[key] = value
+        return True
+
+    async def exists(self, key):
+        self._check()
+        return int(key in self.strings or key in self.hashes or key in self.streams)
+
+    async def expire(self, key, seconds):
+        self._check()
+        return True
+
+    async def hset(self, key, mapping):
+        self._check()
+        self.hashes.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def hgetall(self, key):
+        self._check()
+        return dict(self.hashes.get(key, {}))
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        self._check()
+        self.seq += 1
+        entry_id = f"{self.seq}-0"
+        self.streams.setdefault(key, []).append((entry_id, dict(fields)))
+        return entry_id
+
+    async def xread(self, streams, count=None, block=None):
+        self._check()
+        (key, after_id), = streams.items()
+        after = int(after_id.split("-")[0])
+        entries = [(i, f) for i, f in self.streams.get(key, []) if int(i.split("-")[0]) > after][:count]
+        if not entries:
+            await asyncio.sleep((block or 0) / 1000)
+            return []
+        return [[key, entries]]
+
+    def drop(self, pattern):
+        for store in (self.strings, self.hashes, self.streams):
+            for key in [k for k in store if fnmatch.fnmatch(k, pattern)]:
+                del store[key]
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args, **kwargs: self.commands.append((method, args, kwargs))
+
+    async def execute(self):
+        return [await method(*args, **kwargs) for method, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    monkeypatch.setattr(settings, "stream_resume_enabled", True)
+    monkeypatch.setattr(settings, "circuit_breakers_enabled", True)
+    monkeypatch.setattr(settings, "circuit_min_calls", 3)
+    monkeypatch.setattr(settings, "circuit_failure_rate", 0.5)
+    monkeypatch.setattr(circuit_breaker, "_circuit_breakers", {})
+    client = FakeRedis()
+    monkeypatch.setattr(stream_buffer, "_turn_stream_buffer", TurnStreamBuffer(client))
+    monkeypatch.setattr(stream_buffer, "LIVENESS_INTERVAL_S", 0.01)
+    return client
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+EVENTS = [{"type": "text-delta", "textDelta": f"part {i} "} for i in range(5)]
+
+
+async def write_turn(buffer, turn_id):
+    ids = [await buffer.append(turn_id, event) for event in EVENTS]
+    await buffer.append(turn_id, {"type": END_EVENT, "reason": "finished"})
+    return ids
+
+
+def test_replay_from_start(redis):
+    async def run():
+        buffer = await open_turn("t1", "u1", "c1")
+        await write_turn(buffer, "t1")
+        return await collect(read_turn(buffer, "t1"))
+
+    replayed = asyncio.run(run())
+    assert [event for _, event in replayed] == [{"type": "turn-id", "turnId": "t1"}, *EVENTS]
+
+
+def test_replay_after_last_event_id(redis):
+    async def run():
+        buffer = await open_turn("t1", "u1", "c1")
+        ids = await write_turn(buffer, "t1")
+        return ids, await collect(read_turn(buffer, "t1", last_event_id=ids[1]))
+
+    ids, replayed = asyncio.run(run())
+    assert [entry_id for entry_id, _ in replayed] == ids[2:]
+    assert [event for _, event in replayed] == EVENTS[2:]
+
+
+def test_live_tail_follows_producer(redis):
+    async def events():
+        for event in EVENTS:
+            await asyncio.sleep(0.005)
+            yield event
+
+    async def run():
+        buffer = await open_turn("t1", "u1", "c1")
+        start_producer(buffer, "t1", events())
+        return await collect(read_turn(buffer, "t1"))
+
+    replayed = asyncio.run(run())
+    assert [event for _, event in replayed][1:] == EVENTS
+
+
+def test_producer_gone_without_end_marker(redis):
+    async def run():
+        buffer = await open_turn("t1", "u1", "c1")
+        await buffer.append("t1", EVENTS[0])
+        redis.drop("chat:turn:t1:producer")
+        return await collect(read_turn(buffer, "t1"))
+
+    replayed = asyncio.run(run())
+    assert replayed[-1]["type"] == "error"
+    assert [event for _, event in replayed[:-1]][1:] == EVENTS[:1]
+
+
+def test_cancelled_producer_closes_generator(redis):
+    closed = asyncio.Event()
+
+    async def events():
+        try:
+            yield EVENTS[0]
+            await asyncio.sleep(60)
+        finally:
+            closed.set()
+
+    async def run():
+        buffer = await open_turn("t1", "u1", "c1")
+        task = start_producer(buffer, "t1", events())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return closed.is_set(), redis.streams["chat:turn:t1:events"][-1]
+
+    was_closed, (_, last) = asyncio.run(run())
+    assert was_closed
+    assert '"reason":"cancelled"' in last["e"]
+
+
+def test_redis_failures_open_shared_breaker(redis):
+    redis.fail = True
+
+    async def run():
+        return [await open_turn(f"t{i}", "u1", "c1") for i in range(3)]
+
+    assert asyncio.run(run()) == [None, None, None]
+    breaker = circuit_breaker.get_circuit_breaker("redis")
+    assert breaker.state == circuit_breaker.OPEN
+    # Sync and async Redis paths share the breaker: new turns stream directly without a call
+    calls = breaker.calls
+    assert stream_buffer.get_turn_stream_buffer() is None
+    assert breaker.calls == calls
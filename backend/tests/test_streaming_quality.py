@@ -0,0 +1,126 @@
+"""
+Streaming quality gate (app/agents/streaming_quality.py, stream_answer)
+
+- QualityProbe: undecided until probe_chars of text, then fails an opening
+  that is mostly questions with no explanation and passes anything else;
+  finish() decides for shorter answers
+- stream_answer holds the opening back: a failing one is discarded before
+  the client sees it and regenerated once with RESTART_GUIDANCE; a passing
+  one streams unchanged
+- with too little turn budget for a repair the failing opening is kept and
+  streamed on, and flagged
+
+Run: cd backend && python -m pytest tests/test_streaming_quality.py -q
+"""
+
+import time
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from app.agents import deadline, stream_events, streaming_quality
+from app.agents.answer_stream import stream_answer
+from app.agents.deadline import DeadlineStats
+from app.agents.streaming_quality import RESTART_GUIDANCE, QualityProbe, QualityStats, with_guidance
+from app.config import settings
+
+QUESTIONS = "What do you think happens to the weights? Why would they change? Have you seen this before?"
+EXPLANATION = "Backpropagation works by applying the chain rule from the output layer back to the inputs."
+
+
+def repeat(text, times):
+    return " ".join([text] * times)
+
+
+def test_probe_undecided_until_window():
+    probe = QualityProbe("tutor", probe_chars=len(QUESTIONS) + 1)
+    assert probe.feed(QUESTIONS) is None
+    assert probe.feed(" And") is False
+    assert probe.reason == "questions_only"
+
+
+@pytest.mark.parametrize("text,verdict", [
+    (QUESTIONS, False),
+    (EXPLANATION + " " + QUESTIONS, True),  # An explanation marker redeems the questions
+    ("What is the output? " + "Each layer transforms its inputs. " * 3, True),
+    ("Why? Really?", False),
+    ("Why?", True),  # One sentence is not enough to judge
+])
+def test_probe_verdicts(text, verdict):
+    probe = QualityProbe("tutor", probe_chars=1)
+    assert probe.feed(text) is verdict
+
+
+def test_probe_finish_judges_short_answers():
+    probe = QualityProbe("tutor", probe_chars=1000)
+    assert probe.feed(QUESTIONS) is None
+    assert probe.finish() is False
+    assert probe.signals() == {"sentences": 3, "questions": 3, "markers": 0}
+
+
+def test_with_guidance():
+    assert with_guidance("Explain it.", "Be clear.") == "Explain it.\n\nBe clear."
+    assert with_guidance([("user", "Explain it.")], "Be clear.") == [("user", "Explain it."), ("system", "Be clear.")]
+
+
+class FakeModel:
+    """Chat model stand-in: streams `text` in chunks, or `restart_text` for a prompt carrying RESTART_GUIDANCE"""
+
+    def __init__(self, text: str, restart_text: str = EXPLANATION, chunk: int = 15):
+        self.text, self.restart_text, self.chunk = text, restart_text, chunk
+        self.prompts = []
+
+    def with_config(self, **_):
+        return self
+
+    def stream(self, prompt, config=None):
+        self.prompts.append(prompt)
+        text = self.restart_text if RESTART_GUIDANCE in prompt else self.text
+        for i in range(0, len(text), self.chunk):
+            yield AIMessageChunk(content=text[i:i + self.chunk])
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    deltas = []
+    monkeypatch.setattr(stream_events, "publish", lambda event: deltas.append(event["textDelta"]))
+    monkeypatch.setattr(settings, "quality_probe_chars", 60)
+    monkeypatch.setattr(streaming_quality, "_quality_stats", QualityStats())
+    monkeypatch.setattr(deadline, "_deadline_stats", DeadlineStats())
+    return deltas
+
+
+def test_failing_opening_regenerated_before_client_sees_it(streamed):
+    model = FakeModel(repeat(QUESTIONS, 3))
+    probe = QualityProbe("tutor")
+    response, _ = stream_answer(model, "Explain backprop", "pedagogical_tutor", quality=probe)
+    assert response == EXPLANATION == "".join(streamed)
+    assert model.prompts == ["Explain backprop", with_guidance("Explain backprop", RESTART_GUIDANCE)]
+    assert probe.restarted and not probe.kept_failing
+    assert streaming_quality.get_quality_stats().snapshot()["early_restarts"] == {"pedagogical_tutor:questions_only": 1}
+
+
+def test_short_failing_answer_regenerated(streamed):
+    model = FakeModel("Why? Really why?")  # Ends inside the probe window
+    probe = QualityProbe("tutor")
+    response, _ = stream_answer(model, "Explain backprop", "math_agent", quality=probe)
+    assert response == EXPLANATION and probe.restarted
+
+
+@pytest.mark.parametrize("text", [EXPLANATION + " " + repeat(QUESTIONS, 2), "Short and fine."])
+def test_passing_answer_streams_unchanged(streamed, text):
+    model = FakeModel(text)
+    probe = QualityProbe("tutor")
+    response, _ = stream_answer(model, "Explain backprop", "pedagogical_tutor", quality=probe)
+    assert response == text == "".join(streamed)
+    assert len(model.prompts) == 1 and not probe.restarted
+
+
+def test_failing_opening_kept_without_repair_budget(streamed, monkeypatch):
+    monkeypatch.setattr(settings, "deadline_stage_min_seconds", {"repair": 10.0})
+    model = FakeModel(repeat(QUESTIONS, 3))
+    probe = QualityProbe("tutor")
+    response, _ = stream_answer(model, "Explain backprop", "pedagogical_tutor", quality=probe, deadline=time.time() + 5)
+    assert response == repeat(QUESTIONS, 3) == "".join(streamed)
+    assert probe.kept_failing and not probe.restarted
+    assert deadline.get_deadline_stats().snapshot()["skipped"] == {"repair": 1}
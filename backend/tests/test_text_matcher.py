@@ -0,0 +1,99 @@
+"""
+TextMatcher agrees with brute-force regex (app/agents/text_matcher.py)
+
+Random texts built from the tables' own keywords, near-misses and filler
+are scanned by each shared matcher and compared with re.search over every
+pattern of that scope:
+    - all-matches scopes: the same labels, with the same per-label counts,
+      in registration order
+    - first-match scopes: the first matching pattern's label
+with and without the Aho-Corasick automaton.
+
+Throughput is measured by scripts/benchmark_text_matcher.py.
+
+Run: cd backend && python -m pytest tests/test_text_matcher.py -q
+"""
+
+import random
+import re
+
+import pytest
+
+from app.agents import text_matcher
+from app.agents.text_matcher import (
+    CONCEPT_PATTERNS, RECENT_TOPIC_KEYWORDS, PatternSpec, TextMatcher, TEXT_MATCHERS, extract_anchors,
+)
+
+CASES = 2000
+
+FRAGMENTS = [
+    "backprop", "back propagation", "back-propagating", "chain rule", "gradient", "descent", "gradient descent",
+    "learning rate", "optimise", "optimizer", "neural", "network", "perceptrons", "hidden layer", "ann", "annual",
+    "knn", "k-nearest", "svm", "svms", "naive bayes", "regression", "regress", "categories", "continuous",
+    "cluster", "k means", "kmeans", "pca", "accuracy", "overfitting", "normalise", "scaling", "derivative",
+    "partial", "sigmoid", "matrix", "dot product", "probability", "prior", "res00123", "comp 237", "COMP237",
+    "course", "i still don't get it", "what about", "tell me more", "that", "it", "again", "why", "huh?",
+    "confused", "example", "and", "the", "of", " ", "  ", "\n", ".", ",", "?", "!", "-", "_", "'",
+]
+
+
+def random_text(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(0, 25)))
+
+
+def brute_force(matcher: TextMatcher, text: str) -> dict:
+    """re.search for every pattern in registration order"""
+    text = text.lower()
+    counts: dict = {}
+    for spec in matcher.specs:
+        if re.search(spec.pattern, text, re.IGNORECASE):
+            labels = counts.setdefault(spec.family, {})
+            labels[spec.label] = labels.get(spec.label, 0) + 1
+            if matcher.first_match_only:
+                break
+    return counts
+
+
+def as_ordered(counts: dict) -> dict:
+    return {family: list(labels.items()) for family, labels in counts.items()}
+
+
+@pytest.fixture(params=[True, False], ids=["automaton", "substring"])
+def matchers(request, monkeypatch):
+    """The shared matchers, rebuilt without pyahocorasick for the substring variant"""
+    if request.param:
+        if not text_matcher.AHOCORASICK_AVAILABLE:
+            pytest.skip("pyahocorasick not installed")
+        return TEXT_MATCHERS
+    monkeypatch.setattr(text_matcher, "AHOCORASICK_AVAILABLE", False)
+    return {scope: TextMatcher(m.specs, first_match_only=m.first_match_only) for scope, m in TEXT_MATCHERS.items()}
+
+
+@pytest.mark.parametrize("scope", sorted(TEXT_MATCHERS))
+def test_scan_matches_brute_force(matchers, scope):
+    rnd = random.Random(scope)
+    matcher = matchers[scope]
+    for _ in range(CASES):
+        text = random_text(rnd)
+        assert as_ordered(matcher.scan(text).counts) == as_ordered(brute_force(matcher, text)), text
+
+
+def test_first_concept_follows_table_order():
+    matcher = TEXT_MATCHERS["query"]
+    # Both backpropagation and gradient_descent match; the table lists backpropagation first
+    assert matcher.scan("the chain rule gives the gradient").first("concept") == "backpropagation"
+    assert list(CONCEPT_PATTERNS)[:2] == ["backpropagation", "gradient_descent"]
+
+
+def test_literal_patterns_need_no_regex():
+    matcher = TextMatcher([PatternSpec("t", k, re.escape(k)) for k in RECENT_TOPIC_KEYWORDS])
+    assert len(matcher._exact) == len(RECENT_TOPIC_KEYWORDS)
+
+
+@pytest.mark.parametrize("pattern,anchors", [
+    (r"\bgradient.?descent", {"gradient"}),
+    (r"\b(knn\b|svm\b)", {"knn", "svm"}),
+    (r"\b\w+", None),
+])
+def test_extract_anchors(pattern, anchors):
+    assert extract_anchors(pattern) == (frozenset(anchors) if anchors else None)
@@ -0,0 +1,109 @@
+"""
+Tools node fan-out (app/agents/tools.py), with stand-in RAG/syllabus agents
+
+- all calls of a model step run concurrently, in the sync and async nodes,
+  and the results come back in call order
+- calls past settings.tool_max_calls_per_step are not run and get a
+  "Not run" error ToolMessage, so every tool call is answered
+- a failing or unknown tool gives an error ToolMessage, not an exception
+
+Run: cd backend && python -m pytest tests/test_tools.py -q
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.agents import sub_agents, tools
+from app.agents.tools import ToolStepStats, tools_node
+from app.config import settings
+
+LATENCY_S = 0.1
+
+
+class RAGAgent:
+    def __init__(self):
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def retrieve_context(self, query, course_id="COMP237", state=None):
+        if query == "broken":
+            raise ConnectionError("Chroma is down")
+        time.sleep(LATENCY_S)
+        with self._lock:
+            self.queries.append(query)
+        return [{"content": f"{query} notes", "source_filename": "week3.pdf", "course_id": course_id}]
+
+
+class SyllabusAgent:
+    def check_syllabus(self, query):
+        time.sleep(LATENCY_S)
+        return {"found": True, "content": [f"Syllabus: {query}"]}
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    monkeypatch.setattr(settings, "tool_max_calls_per_step", 3)
+    monkeypatch.setattr(tools, "_tool_step_stats", ToolStepStats())
+    agent = RAGAgent()
+    monkeypatch.setattr(sub_agents, "_rag_agent", agent)
+    monkeypatch.setattr(sub_agents, "_syllabus_agent", SyllabusAgent())
+    return agent
+
+
+def step(*queries):
+    calls = [
+        {"name": "check_syllabus", "args": {"query": q[len("syllabus:"):]}, "id": f"call-{i}"}
+        if q.startswith("syllabus:") else
+        {"name": "retrieve_context", "args": {"query": q}, "id": f"call-{i}"}
+        for i, q in enumerate(queries)
+    ]
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+
+def run(state, mode):
+    if mode == "async":
+        return asyncio.run(tools_node.ainvoke(state))["messages"]
+    return tools_node.invoke(state)["messages"]
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_step_calls_run_concurrently_in_order(rag, mode):
+    start = time.perf_counter()
+    messages = run(step("backpropagation", "syllabus:midterm date", "perceptron"), mode)
+    assert time.perf_counter() - start < 2 * LATENCY_S  # Not 3 calls one after another
+    assert [m.tool_call_id for m in messages] == ["call-0", "call-1", "call-2"]
+    assert json.loads(messages[0].content)[0]["content"] == "backpropagation notes"
+    assert json.loads(messages[1].content)["content"] == ["Syllabus: midterm date"]
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_calls_past_cap_are_not_run(rag, mode):
+    messages = run(step("a", "b", "c", "d", "e"), mode)
+    assert [m.tool_call_id for m in messages] == [f"call-{i}" for i in range(5)]  # Every call answered
+    assert sorted(rag.queries) == ["a", "b", "c"]
+    skipped = messages[3:]
+    assert all(m.status == "error" and m.content.startswith("Not run: at most 3 tool calls") for m in skipped)
+    assert [m.name for m in skipped] == ["retrieve_context", "retrieve_context"]
+    stats = tools.get_tool_step_stats().snapshot()
+    assert stats["capped_calls"] == 2
+    assert stats["steps"]["3"]["count"] == 1
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_failures_become_error_messages(rag, mode):
+    state = step("broken", "perceptron")
+    state["messages"][-1].tool_calls.append({"name": "search_web", "args": {}, "id": "call-x", "type": "tool_call"})
+    broken, ok, unknown = run(state, mode)
+    assert broken.status == "error" and "ConnectionError" in broken.content
+    assert ok.status == "success"
+    assert unknown.status == "error" and "not a valid tool" in unknown.content
+    assert tools.get_tool_step_stats().snapshot()["tools"]["retrieve_context"]["errors"] == 1
+
+
+def test_no_tool_calls(rag):
+    assert tools_node.invoke({"messages": [AIMessage(content="Hi!")]}) == {"messages": []}
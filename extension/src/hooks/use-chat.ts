@@ -6,6 +6,10 @@ import type { Session } from "@supabase/supabase-js"
 const API_BASE_URL = process.env.PLASMO_PUBLIC_API_URL || "http://localhost:8000"
 const isDevelopment = process.env.NODE_ENV !== "production"
 
+// Reconnects to a turn's buffered stream after a dropped connection
+const MAX_RESUME_ATTEMPTS = 3
+const RESUME_BACKOFF_MS = 500
+
 // Generate or retrieve a persistent session ID for observability tracking
 const getSessionId = (): string => {
   const STORAGE_KEY = "luminate_session_id"
@@ -56,6 +60,10 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
   // Track the current streaming message ID
   const currentMessageIdRef = useRef<string | null>(null)
 
+  // Current turn (from the "turn-id" event) and last SSE id, for resuming the stream
+  const turnIdRef = useRef<string | null>(null)
+  const lastEventIdRef = useRef<string | null>(null)
+
   // Fetch messages when chatId changes
   useEffect(() => {
     if (!chatId || !session?.access_token) {
@@ -125,6 +133,16 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
       abortControllerRef.current.abort()
       abortControllerRef.current = null
     }
+
+    // The backend keeps generating for a while so a dropped connection can resume; stop it now
+    if (turnIdRef.current) {
+      fetch(`${API_BASE_URL}/api/chat/stream/${turnIdRef.current}`, {
+        method: "DELETE",
+        headers: { Authorization: session?.access_token ? `Bearer ${session.access_token}` : "" },
+        keepalive: true,
+      }).catch(() => {})
+      turnIdRef.current = null
+    }
     
     // Mark current message as stopped
     if (currentMessageIdRef.current) {
@@ -145,7 +163,7 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
     
     setIsLoading(false)
     currentMessageIdRef.current = null
-  }, [])
+  }, [session])
 
   /**
    * Process SSE events from the stream
@@ -367,6 +385,9 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
     
     // Create new abort controller
     abortControllerRef.current = new AbortController()
+    const signal = abortControllerRef.current.signal
+    turnIdRef.current = null
+    lastEventIdRef.current = null
     
     setIsLoading(true)
     setError(null)
@@ -413,7 +434,7 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
           session_id: getSessionId(), // Include session ID for observability tracking
           model: model || undefined
         }),
-        signal: abortControllerRef.current.signal,
+        signal,
       })
 
       if (response.status === 401) {
@@ -423,39 +444,93 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
       if (!response.ok) throw new Error("Network response was not ok")
       if (!response.body) throw new Error("No response body")
 
-      const reader = response.body.getReader()
-      const decoder = new TextDecoder()
-      let buffer = ""
-
-      while (true) {
-        const { done, value } = await reader.read()
-        if (done) break
-
-        buffer += decoder.decode(value, { stream: true })
-        const lines = buffer.split("\n\n")
-        buffer = lines.pop() || ""
-
-        for (const line of lines) {
-          if (line.startsWith("data: ")) {
-            const data = line.slice(6)
-            if (data === "[DONE]") continue
-
-            try {
-              const parsed = JSON.parse(data)
-              
-              // Handle chat creation
-              if (parsed.type === "finish" && parsed.chatId && !chatId && chatCreatedRef.current !== parsed.chatId) {
-                chatCreatedRef.current = parsed.chatId
-                onChatCreated?.(parsed.chatId)
+      // Returns true once the turn has ended (finish or error event)
+      const readStream = async (body: ReadableStream<Uint8Array>): Promise<boolean> => {
+        const reader = body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ""
+        let ended = false
+
+        while (true) {
+          const { done, value } = await reader.read()
+          if (done) break
+
+          buffer += decoder.decode(value, { stream: true })
+          const lines = buffer.split("\n\n")
+          buffer = lines.pop() || ""
+
+          for (const line of lines) {
+            // Each event frame is followed by its own "id: <event id>" block
+            if (line.startsWith("id: ")) {
+              lastEventIdRef.current = line.slice(4)
+              continue
+            }
+            if (line.startsWith("data: ")) {
+              const data = line.slice(6)
+              if (data === "[DONE]") continue
+
+              try {
+                const parsed = JSON.parse(data)
+
+                if (parsed.type === "turn-id") {
+                  turnIdRef.current = parsed.turnId
+                  continue
+                }
+                if (parsed.type === "finish" || parsed.type === "error") {
+                  ended = true
+                }
+                
+                // Handle chat creation
+                if (parsed.type === "finish" && parsed.chatId && !chatId && chatCreatedRef.current !== parsed.chatId) {
+                  chatCreatedRef.current = parsed.chatId
+                  onChatCreated?.(parsed.chatId)
+                }
+                
+                processStreamEvent(parsed, assistantMessageId)
+              } catch (e) {
+                console.error("Error parsing SSE data:", e)
               }
-              
-              processStreamEvent(parsed, assistantMessageId)
-            } catch (e) {
-              console.error("Error parsing SSE data:", e)
             }
           }
         }
+        return ended
+      }
+
+      let ended = false
+      let attempts = 0
+      let body: ReadableStream<Uint8Array> | null = response.body
+      while (true) {
+        if (body) {
+          try {
+            ended = await readStream(body)
+          } catch (readError: any) {
+            if (readError.name === 'AbortError' || !turnIdRef.current) throw readError
+          }
+          body = null
+        }
+        if (ended || !turnIdRef.current || attempts >= MAX_RESUME_ATTEMPTS) break
+
+        // Connection dropped mid-turn: resume from the last event we saw
+        attempts++
+        await new Promise(resolve => setTimeout(resolve, RESUME_BACKOFF_MS * attempts))
+        if (isDevelopment) {
+          console.log(`Resuming turn ${turnIdRef.current} after ${lastEventIdRef.current} (attempt ${attempts})`)
+        }
+        try {
+          const resumed = await fetch(`${API_BASE_URL}/api/chat/stream/${turnIdRef.current}`, {
+            headers: {
+              Authorization: session?.access_token ? `Bearer ${session.access_token}` : "",
+              ...(lastEventIdRef.current ? { "Last-Event-ID": lastEventIdRef.current } : {}),
+            },
+            signal,
+          })
+          if (resumed.status === 404) break  // Turn expired
+          if (resumed.ok && resumed.body) body = resumed.body
+        } catch (resumeError: any) {
+          if (resumeError.name === 'AbortError') throw resumeError
+        }
       }
+      if (!ended && attempts > 0) throw new Error("Connection lost while streaming the response")
     } catch (error: any) {
       if (error.name === 'AbortError') {
         console.log("Request aborted")
@@ -478,6 +553,7 @@ export default function useChat(options?: UseChatOptions): UseChatReturn {
       setIsLoading(false)
       currentMessageIdRef.current = null
       abortControllerRef.current = null
+      turnIdRef.current = null
     }
   }, [messages, session, chatId, model, onChatCreated, processStreamEvent])
 